@@ -15,6 +15,14 @@ from .models import (
     ATSFormField,
     ATSFormSubmission,
     ATSFormSubmissionFile,
+    ATSFormUpload,
+    ChatFinalization,
+    DocumentExtractionItem,
+    IMAPMailboxCheckpoint,
+    OutboundEmail,
+    ProcessedIncomingEmail,
+    StoredBlob,
+    TelegramUpdate,
     WorkforceArea,
     WorkforceAuditLog,
     WorkforcePlan,
@@ -186,6 +194,70 @@ class ATSFormSubmissionFileAdmin(admin.ModelAdmin):
     list_display = ("submission", "form_field", "original_name")
 
 
+@admin.register(ATSFormUpload)
+class ATSFormUploadAdmin(admin.ModelAdmin):
+    list_display = ("original_name", "form", "status", "received_size", "total_size", "created_at")
+    list_filter = ("status",)
+    search_fields = ("original_name", "token")
+    readonly_fields = ("token", "parts", "storage_name", "blob", "created_at", "updated_at")
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "storage_name", "size", "ref_count", "created_at")
+    search_fields = ("sha256", "storage_name")
+    readonly_fields = ("sha256", "storage_name", "size", "ref_count", "created_at")
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "client", "status", "attempts", "next_attempt_at", "sent_at", "created_at")
+    list_filter = ("status", "use_client_smtp")
+    search_fields = ("subject", "client__company_name")
+    readonly_fields = ("created_at", "sent_at", "last_error")
+
+
+@admin.register(ChatFinalization)
+class ChatFinalizationAdmin(admin.ModelAdmin):
+    list_display = ("session_uuid", "submission", "source", "stage", "status", "attempts", "next_attempt_at", "created_at")
+    list_filter = ("status", "stage", "source")
+    search_fields = ("session_uuid",)
+    readonly_fields = ("session_uuid", "submission", "data", "created_at", "completed_at", "last_error")
+
+
+@admin.register(IMAPMailboxCheckpoint)
+class IMAPMailboxCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("user", "host", "folder", "uidvalidity", "last_uid", "failed_uid", "failed_attempts", "bootstrapping", "updated_at")
+    search_fields = ("user", "host")
+    readonly_fields = ("updated_at",)
+
+
+@admin.register(ProcessedIncomingEmail)
+class ProcessedIncomingEmailAdmin(admin.ModelAdmin):
+    list_display = ("message_key", "mailbox", "outcome", "from_email", "subject", "processed_at")
+    list_filter = ("outcome",)
+    search_fields = ("message_key", "mailbox", "from_email", "subject")
+    readonly_fields = ("mailbox", "message_key", "content_hash", "uid", "submission", "processed_at")
+
+
+@admin.register(DocumentExtractionItem)
+class DocumentExtractionItemAdmin(admin.ModelAdmin):
+    list_display = ("filename", "job", "document_type", "status", "cached", "attempts", "finished_at")
+    list_filter = ("status", "document_type", "cached")
+    search_fields = ("job__public_id", "sha256", "filename")
+    # Los datos extraídos (INE, domicilio) no se muestran en el admin.
+    exclude = ("result",)
+    readonly_fields = ("job", "position", "sha256", "storage_name", "attempts", "finished_at")
+
+
+@admin.register(TelegramUpdate)
+class TelegramUpdateAdmin(admin.ModelAdmin):
+    list_display = ("update_id", "partition_key", "status", "received_at", "processed_at")
+    list_filter = ("status",)
+    search_fields = ("update_id",)
+    readonly_fields = ("update_id", "partition_key", "payload", "received_at", "processed_at")
+
+
 @admin.register(ATSNotification)
 class ATSNotificationAdmin(admin.ModelAdmin):
     list_display = ("title", "client", "type", "read", "created_at")
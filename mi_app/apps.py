@@ -9,4 +9,5 @@ class MiAppConfig(AppConfig):
     name = "mi_app"
 
     def ready(self):
+        from mi_app import signals  # noqa: F401
         logger.info("mi_app ready: aplicación cargada")
@@ -1,34 +1,48 @@
 """Context processors para el proyecto."""
+from django.utils.functional import SimpleLazyObject
 
 
 def orbita_notifications(request):
-    """Añade notificaciones (clientes o admin) y contadores al contexto en páginas Órbita."""
+    """
+    Añade notificaciones (clientes o admin) y contadores al contexto en páginas Órbita.
+    Los valores son perezosos: se leen de la caché por cliente (ver
+    `get_notification_context`) solo si el template los usa.
+    """
     if not request.user.is_authenticated:
         return {}
     if not request.path.startswith("/orbita/plataforma/"):
         return {}
     orbita_client = getattr(request.user, "ats_client", None)
     if orbita_client:
-        from mi_app.models import ATSNotification
-        from mi_app.orbita_plans import get_subscription_module_flags
-        notifications = list(ATSNotification.objects.filter(client=orbita_client)[:10])
-        unread_count = ATSNotification.objects.filter(client=orbita_client, read=False).count()
-        subscription = getattr(request.user, "ats_subscription", None)
+        from mi_app.orbita_notifications import get_notification_context
+
+        def data():
+            return get_notification_context(orbita_client, getattr(request.user, "ats_subscription", None))
+
+        data = _memoize(data)
         return {
-            "orbita_notifications": notifications,
-            "orbita_unread_count": unread_count,
-            "orbita_modules": get_subscription_module_flags(subscription),
+            "orbita_notifications": SimpleLazyObject(lambda: data()["notifications"]),
+            "orbita_unread_count": SimpleLazyObject(lambda: data()["unread_count"]),
+            "orbita_modules": SimpleLazyObject(lambda: data()["modules"]),
         }
     if request.user.is_staff:
-        from mi_app.models import PlanChangeRequest
-        plan_requests = list(
-            PlanChangeRequest.objects.filter(status=PlanChangeRequest.STATUS_PENDING)
-            .select_related("client")
-            .order_by("-created_at")[:10]
-        )
-        admin_count = PlanChangeRequest.objects.filter(status=PlanChangeRequest.STATUS_PENDING).count()
+        from mi_app.orbita_notifications import get_admin_plan_requests_context
+
+        data = _memoize(get_admin_plan_requests_context)
         return {
-            "orbita_admin_notifications": plan_requests,
-            "orbita_admin_unread_count": admin_count,
+            "orbita_admin_notifications": SimpleLazyObject(lambda: data()["notifications"]),
+            "orbita_admin_unread_count": SimpleLazyObject(lambda: data()["unread_count"]),
         }
     return {}
+
+
+def _memoize(func):
+    """Una sola lectura de caché por request aunque el template use varias claves."""
+    result = []
+
+    def wrapper():
+        if not result:
+            result.append(func())
+        return result[0]
+
+    return wrapper
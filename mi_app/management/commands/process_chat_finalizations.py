@@ -0,0 +1,52 @@
+"""
+Completa los cierres de chat en cola (ChatFinalization): archivos, candidato, análisis de CV
+y notificación al reclutador.
+
+Uso:
+  python manage.py process_chat_finalizations --once
+  python manage.py process_chat_finalizations --loop --interval 5
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from mi_app.services.chat_finalization import process_finalizations
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Procesa los cierres de chat pendientes (web y Telegram) con reintentos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Procesa la cola hasta vaciarla y termina.")
+        parser.add_argument("--loop", action="store_true", help="Ejecuta en bucle continuo.")
+        parser.add_argument("--interval", type=int, default=5, help="Segundos entre ciclos cuando se usa --loop.")
+        parser.add_argument("--batch-size", type=int, default=20, help="Máximo de cierres por lote.")
+
+    def handle(self, *args, **options):
+        run_loop = bool(options.get("loop"))
+        interval = max(int(options.get("interval") or 5), 1)
+        batch_size = max(int(options.get("batch_size") or 20), 1)
+
+        self.stdout.write(self.style.SUCCESS("Worker de cierres de chat iniciado."))
+        while True:
+            try:
+                while True:
+                    stats = process_finalizations(batch_size=batch_size)
+                    if any(stats.values()):
+                        self.stdout.write(
+                            f"Cierres: completados={stats['done']} reintento={stats['retry']} "
+                            f"fallidos={stats['failed']}"
+                        )
+                    # Lote incompleto: no queda nada vencido por ahora.
+                    if sum(stats.values()) < batch_size:
+                        break
+            except Exception as exc:
+                logger.exception("Error en ciclo de cierres de chat: %s", exc)
+                self.stdout.write(self.style.ERROR(f"Error en ciclo: {exc}"))
+
+            if not run_loop:
+                break
+            time.sleep(interval)
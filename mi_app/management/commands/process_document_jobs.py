@@ -0,0 +1,55 @@
+"""
+Extrae los documentos de los lotes enviados a /api/documents/extract/batch/ y purga los
+lotes vencidos.
+
+Uso:
+  python manage.py process_document_jobs --once
+  python manage.py process_document_jobs --loop --interval 5
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from mi_app.services.document_jobs import drain_jobs, prune_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Procesa los lotes de extracción de documentos (INE, comprobante) en paralelo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Procesa la cola hasta vaciarla y termina.")
+        parser.add_argument("--loop", action="store_true", help="Ejecuta en bucle continuo.")
+        parser.add_argument("--interval", type=int, default=5, help="Segundos entre ciclos cuando se usa --loop.")
+        parser.add_argument("--batch-size", type=int, default=20, help="Máximo de documentos por lote.")
+
+    def handle(self, *args, **options):
+        run_loop = bool(options.get("loop"))
+        interval = max(int(options.get("interval") or 5), 1)
+        batch_size = max(int(options.get("batch_size") or 20), 1)
+
+        self.stdout.write(self.style.SUCCESS("Worker de extracción de documentos iniciado."))
+        while True:
+            try:
+                while True:
+                    stats = drain_jobs(batch_size=batch_size)
+                    if any(stats.values()):
+                        self.stdout.write(
+                            f"Documentos: listos={stats['done']} caché={stats['cached']} "
+                            f"reintento={stats['retry']} fallidos={stats['failed']}"
+                        )
+                    # Lote incompleto: no queda nada vencido por ahora.
+                    if sum(stats.values()) < batch_size:
+                        break
+                jobs, results = prune_jobs()
+                if jobs or results:
+                    self.stdout.write(f"Purgados: lotes={jobs} resultados en caché={results}")
+            except Exception as exc:
+                logger.exception("Error en ciclo de documentos: %s", exc)
+                self.stdout.write(self.style.ERROR(f"Error en ciclo: {exc}"))
+
+            if not run_loop:
+                break
+            time.sleep(interval)
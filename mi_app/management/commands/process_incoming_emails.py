@@ -5,40 +5,90 @@ Prioridad de conexión:
 1) IMAP configurado por cliente en Config. correo.
 2) Buzón global por ENV (fallback para clientes sin IMAP propio).
 
+Cada buzón guarda un checkpoint (UIDVALIDITY + último UID) y solo lee los UID nuevos; de
+cada correo se bajan primero encabezados y BODYSTRUCTURE, y el texto y los adjuntos solo
+si coincide con la regex de algún cliente (ver mi_app/services/imap_fetch.py). El cliente y
+el formulario de destino se resuelven con un índice precompilado, sin consultas por correo
+(ver mi_app/services/email_routing.py).
+
+Cada buzón se procesa en un pool de hilos acotado (--workers / ORBITA_IMAP_MAX_WORKERS)
+con timeouts de conexión y lectura: un servidor lento o caído no frena a los demás.
+
 Uso:
   python manage.py process_incoming_emails --once
   python manage.py process_incoming_emails --loop --interval 60
   python manage.py process_incoming_emails --once --dry-run
+  python manage.py process_incoming_emails --loop --workers 8
+  python manage.py process_incoming_emails --idle
+
+Con --idle cada buzón mantiene una conexión autenticada y espera correo con IMAP IDLE:
+los correos nuevos se procesan en segundos. Si el servidor no soporta IDLE, ese buzón
+consulta cada --interval segundos sobre la misma conexión. Ante errores de red se
+reconecta con backoff exponencial (hasta ORBITA_IMAP_RECONNECT_MAX_SECONDS).
 """
 from __future__ import annotations
 
 import imaplib
 import logging
 import os
-import re
+import tempfile
+import threading
 import time
-from dataclasses import dataclass
-from email import message_from_bytes
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
 from email.header import decode_header, make_header
 from email.utils import getaddresses, parseaddr
 from typing import Dict, List, Optional, Sequence, Set, Tuple
 
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.files import File
 from django.core.management.base import BaseCommand
+from django.db import IntegrityError, close_old_connections, connections, transaction
 from django.urls import reverse
 
 from mi_app.orbita_notifications import notify_orbita_client
-from mi_app.models import ATSClientEmailConfig, ATSForm, ATSFormSubmission, ATSFormSubmissionFile, ATSNotification
-from mi_app.views.orbita.orbita_views import _create_candidate_from_submission
+from mi_app.models import ATSClientEmailConfig, ATSNotification, ProcessedIncomingEmail
+from mi_app.services import email_ledger
+from mi_app.services.blob_store import attach_to_submission, store_file
+from mi_app.services.email_routing import RoutingIndex, current_index
+from mi_app.services.form_submissions import create_submission_once
+from mi_app.services.imap_fetch import (
+    MessagePart,
+    PartTooLarge,
+    fetch_headers,
+    fetch_part_to,
+    fetch_parts,
+    idle_wait,
+    load_checkpoint,
+    record_failure,
+    save_checkpoint,
+    search_uids,
+    select_response,
+    supports_idle,
+)
+from mi_app.views.orbita.orbita_views import (
+    _auto_analyze_candidate_if_applicable,
+    _create_candidate_from_submission,
+)
 
 logger = logging.getLogger(__name__)
 
+# Del cuerpo de texto solo se descarga el comienzo; el payload guarda 10.000 caracteres.
+TEXT_FETCH_MAX_BYTES = 256 * 1024
+# Adjuntos de hasta este tamaño quedan en memoria; los mayores pasan a un temporal en disco.
+ATTACHMENT_SPOOL_MAX_MEMORY = 1024 * 1024
+# Primera espera antes de reconectar un buzón en modo --idle; se duplica en cada fallo.
+RECONNECT_MIN_SECONDS = 1.0
+
 
 @dataclass
 class ParsedAttachment:
+    """Adjunto ya decodificado en un temporal (ver `_download_attachments`)."""
     name: str
-    content: bytes
+    file: object
+    sha256: str
+    size: int
 
 
 @dataclass(frozen=True)
@@ -52,6 +102,33 @@ class MailboxConnection:
     source: str
 
 
+@dataclass
+class MailboxStats:
+    """Métricas de un buzón en un ciclo."""
+    mailbox: str
+    new: int = 0
+    fetched: int = 0
+    downloaded_bytes: int = 0
+    created: int = 0
+    skipped: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    error: str = ""
+    # Segundos acumulados por etapa (search, headers, route, ledger, text, attachments, store, analysis, notify).
+    stages: Dict[str, float] = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def stages_summary(self) -> str:
+        return ",".join(f"{name}:{seconds:.3f}" for name, seconds in self.stages.items())
+
+
 def _env_bool(name: str, default: bool) -> bool:
     raw = os.environ.get(name)
     if raw is None:
@@ -78,111 +155,40 @@ def _extract_emails_from_header_values(values: Sequence[str]) -> Set[str]:
     return emails
 
 
-def _extract_plain_text(msg) -> str:
-    chunks: List[str] = []
-    if msg.is_multipart():
-        for part in msg.walk():
-            disposition = (part.get_content_disposition() or "").lower()
-            if disposition == "attachment":
-                continue
-            content_type = (part.get_content_type() or "").lower()
-            if content_type != "text/plain":
-                continue
-            payload = part.get_payload(decode=True)
-            if not payload:
-                continue
-            charset = part.get_content_charset() or "utf-8"
-            try:
-                chunks.append(payload.decode(charset, errors="replace"))
-            except Exception:
-                chunks.append(payload.decode("utf-8", errors="replace"))
-    else:
-        payload = msg.get_payload(decode=True)
-        if payload:
-            charset = msg.get_content_charset() or "utf-8"
-            try:
-                chunks.append(payload.decode(charset, errors="replace"))
-            except Exception:
-                chunks.append(payload.decode("utf-8", errors="replace"))
-    return "\n".join(chunks).strip()
-
-
-def _extract_attachments(msg, allowed_ext: Set[str]) -> List[ParsedAttachment]:
-    found: List[ParsedAttachment] = []
-    for part in msg.walk():
-        content_disposition = (part.get_content_disposition() or "").lower()
-        filename = _decode_mime(part.get_filename() or "").strip()
-        if content_disposition != "attachment" and not filename:
-            continue
-        payload = part.get_payload(decode=True)
-        if not payload:
+def _is_attachment(part: MessagePart) -> bool:
+    return part.disposition == "attachment" or bool(part.filename)
+
+
+def _text_parts(parts: Sequence[MessagePart]) -> List[MessagePart]:
+    return [p for p in parts if p.content_type == "text/plain" and p.disposition != "attachment"]
+
+
+def _attachment_parts(parts: Sequence[MessagePart], allowed_ext: Set[str]) -> List[MessagePart]:
+    found: List[MessagePart] = []
+    for part in parts:
+        if not _is_attachment(part):
             continue
-        safe_name = filename or "adjunto.bin"
+        safe_name = part.filename or "adjunto.bin"
         ext = safe_name.rsplit(".", 1)[-1].lower() if "." in safe_name else ""
         if allowed_ext and ext and ext not in allowed_ext:
             continue
-        found.append(ParsedAttachment(name=safe_name, content=payload))
+        found.append(part)
     return found
 
 
-def _candidate_inbox_addresses(config: ATSClientEmailConfig) -> Set[str]:
-    values = [
-        (config.company_from_email or "").strip().lower(),
-        (config.notification_email or "").strip().lower(),
-        (config.smtp_user or "").strip().lower(),
-        (getattr(config, "imap_user", "") or "").strip().lower(),
-    ]
-    return {v for v in values if v and "@" in v}
-
-
-def _match_config_for_email(
-    subject: str,
-    recipient_emails: Set[str],
-    configs: Sequence[ATSClientEmailConfig],
-) -> Optional[ATSClientEmailConfig]:
-    candidates: List[Tuple[int, ATSClientEmailConfig]] = []
-    for config in configs:
-        pattern = (config.incoming_subject_regex or "").strip()
-        if not pattern:
-            continue
-        try:
-            if not re.search(pattern, subject or ""):
-                continue
-        except re.error:
-            logger.warning("Regex inválida en config %s: %s", config.pk, pattern)
-            continue
-        score = 1
-        inbox_addresses = _candidate_inbox_addresses(config)
-        if inbox_addresses and recipient_emails.intersection(inbox_addresses):
-            score = 2
-        candidates.append((score, config))
-
-    if not candidates:
-        return None
-
-    candidates.sort(key=lambda item: (item[0], item[1].pk), reverse=True)
-    return candidates[0][1]
-
-
-def _pick_target_form(client, subject: str, body: str) -> Optional[ATSForm]:
-    forms = list(
-        ATSForm.objects.filter(client=client, is_active=True)
-        .select_related("vacancy")
-        .order_by("-updated_at", "-id")
-    )
-    if not forms:
-        return None
+def _decode_text(part: MessagePart, content: bytes) -> str:
+    try:
+        return content.decode(part.charset, errors="replace")
+    except LookupError:
+        return content.decode("utf-8", errors="replace")
 
-    lookup_text = f"{subject}\n{body}".lower()
-    for form in forms:
-        vacancy_title = (getattr(form.vacancy, "title", "") or "").strip().lower()
-        if vacancy_title and vacancy_title in lookup_text:
-            return form
 
-    for form in forms:
-        if form.vacancy_id:
-            return form
-    return forms[0]
+def _allowed_extensions() -> Set[str]:
+    return {
+        e.strip().lower()
+        for e in getattr(settings, "ORBITA_FORM_PUBLIC_ALLOWED_EXTENSIONS", ["pdf", "doc", "docx"])
+        if e and str(e).strip()
+    }
 
 
 def _candidate_name_from_sender(from_name: str, from_email: str) -> str:
@@ -201,8 +207,19 @@ class Command(BaseCommand):
         parser.add_argument("--once", action="store_true", help="Ejecuta una sola lectura y termina.")
         parser.add_argument("--loop", action="store_true", help="Ejecuta en bucle continuo.")
         parser.add_argument("--interval", type=int, default=60, help="Segundos entre ciclos cuando se usa --loop.")
-        parser.add_argument("--max-emails", type=int, default=20, help="Máximo de correos UNSEEN por ciclo.")
+        parser.add_argument("--max-emails", type=int, default=20, help="Máximo de correos nuevos por buzón y ciclo.")
         parser.add_argument("--dry-run", action="store_true", help="No guarda en BD ni marca correos como leídos.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Buzones procesados en paralelo (por defecto ORBITA_IMAP_MAX_WORKERS).",
+        )
+        parser.add_argument(
+            "--idle",
+            action="store_true",
+            help="Conexiones persistentes con IMAP IDLE (sondeo cada --interval si el servidor no lo soporta).",
+        )
 
     def handle(self, *args, **options):
         run_once = bool(options.get("once"))
@@ -210,19 +227,20 @@ class Command(BaseCommand):
         interval = max(int(options.get("interval") or 60), 10)
         max_emails = max(int(options.get("max_emails") or 20), 1)
         dry_run = bool(options.get("dry_run"))
+        self.workers = max(int(options.get("workers") or getattr(settings, "ORBITA_IMAP_MAX_WORKERS", 4)), 1)
 
         if not run_once and not run_loop:
             run_once = True
 
-        allowed_ext = {
-            e.strip().lower()
-            for e in getattr(settings, "ORBITA_FORM_PUBLIC_ALLOWED_EXTENSIONS", ["pdf", "doc", "docx"])
-            if e and str(e).strip()
-        }
+        allowed_ext = _allowed_extensions()
         self.stdout.write(self.style.SUCCESS("Procesador de correo entrante ATS iniciado."))
         if dry_run:
             self.stdout.write(self.style.WARNING("Modo dry-run activo: no se guardarán cambios."))
 
+        if options.get("idle"):
+            self._run_idle(max_emails=max_emails, dry_run=dry_run, allowed_ext=allowed_ext, poll_interval=interval)
+            return
+
         while True:
             try:
                 self._run_cycle(max_emails=max_emails, dry_run=dry_run, allowed_ext=allowed_ext)
@@ -234,15 +252,15 @@ class Command(BaseCommand):
                 break
             time.sleep(interval)
 
-    def _run_cycle(self, max_emails: int, dry_run: bool, allowed_ext: Set[str]) -> None:
-        configs = list(
-            ATSClientEmailConfig.objects.select_related("client", "client__user")
-            .exclude(incoming_subject_regex="")
-            .order_by("id")
-        )
+    @staticmethod
+    def _load_configs() -> List[ATSClientEmailConfig]:
+        return list(current_index().configs)
+
+    def _run_cycle(self, max_emails: int, dry_run: bool, allowed_ext: Set[str]) -> List[MailboxStats]:
+        configs = self._load_configs()
         if not configs:
             self.stdout.write("No hay clientes con regex de asunto configurada.")
-            return
+            return []
 
         mailboxes = self._resolve_mailboxes(configs)
         if not mailboxes:
@@ -252,16 +270,177 @@ class Command(BaseCommand):
                     "o define ATS_IMAP_* como fallback global."
                 )
             )
-            return
+            return []
+
+        started = time.monotonic()
+        jobs = [
+            dict(mailbox_conn=conn, configs=mailbox_configs, max_emails=max_emails, dry_run=dry_run, allowed_ext=allowed_ext)
+            for conn, mailbox_configs in mailboxes.items()
+        ]
+        workers = min(getattr(self, "workers", 1), len(jobs))
+        if workers <= 1:
+            results = [self._run_mailbox(**job) for job in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="imap") as pool:
+                results = list(pool.map(lambda job: self._run_mailbox_in_thread(**job), jobs))
+
+        for stats in results:
+            self._report(stats)
+        logger.info(
+            "imap_cycle mailboxes=%s workers=%s failed=%s seconds=%.2f",
+            len(results), workers, sum(1 for r in results if r.error), time.monotonic() - started,
+        )
+        return results
+
+    def _report(self, stats: MailboxStats) -> None:
+        line = (
+            f"Buzón {stats.mailbox}: nuevos={stats.new} leídos={stats.fetched} creados={stats.created} "
+            f"omitidos={stats.skipped} errores={stats.errors} descargado={stats.downloaded_bytes}B "
+            f"({stats.seconds:.1f}s)"
+        )
+        if stats.error:
+            self.stdout.write(self.style.ERROR(f"{line} | fallo: {stats.error}"))
+        else:
+            self.stdout.write(line)
+
+    def _run_idle(self, max_emails: int, dry_run: bool, allowed_ext: Set[str], poll_interval: int) -> None:
+        """
+        Modo --idle: un hilo por buzón con conexión persistente. Cada
+        ORBITA_IMAP_IDLE_REFRESH_SECONDS se vuelven a leer las configuraciones: se abren los
+        buzones nuevos y se cierran los que ya no aplican.
+        """
+        refresh = max(float(getattr(settings, "ORBITA_IMAP_IDLE_REFRESH_SECONDS", 300)), 1.0)
+        watchers: Dict[MailboxConnection, Tuple[threading.Thread, threading.Event]] = {}
+        self._idle_configs: Dict[MailboxConnection, List[ATSClientEmailConfig]] = {}
+        self.stdout.write(self.style.SUCCESS("Modo IDLE: conexiones persistentes por buzón."))
+        try:
+            while True:
+                try:
+                    close_old_connections()
+                    self._idle_configs = self._resolve_mailboxes(self._load_configs())
+                except Exception as exc:
+                    logger.exception("Error leyendo configuraciones de correo entrante: %s", exc)
+                else:
+                    for conn in list(watchers):
+                        thread, stop = watchers[conn]
+                        if conn not in self._idle_configs or not thread.is_alive():
+                            stop.set()
+                            del watchers[conn]
+                    for conn in self._idle_configs:
+                        if conn in watchers:
+                            continue
+                        stop = threading.Event()
+                        thread = threading.Thread(
+                            target=self._watch_mailbox_in_thread,
+                            args=(conn, stop, max_emails, dry_run, allowed_ext, poll_interval),
+                            name=f"imap-idle-{conn.user}",
+                            daemon=True,
+                        )
+                        thread.start()
+                        watchers[conn] = (thread, stop)
+                time.sleep(refresh)
+        finally:
+            for _thread, stop in watchers.values():
+                stop.set()
+            for thread, _stop in watchers.values():
+                thread.join(timeout=5)
+
+    def _watch_mailbox_in_thread(self, *args) -> None:
+        try:
+            self._watch_mailbox(*args)
+        finally:
+            connections.close_all()
+
+    def _watch_mailbox(
+        self,
+        mailbox_conn: MailboxConnection,
+        stop: threading.Event,
+        max_emails: int,
+        dry_run: bool,
+        allowed_ext: Set[str],
+        poll_interval: int,
+    ) -> None:
+        """Mantiene abierto un buzón: procesa lo nuevo, espera con IDLE (o sondeo) y reconecta con backoff."""
+        idle_seconds = float(getattr(settings, "ORBITA_IMAP_IDLE_SECONDS", 540))
+        max_backoff = float(getattr(settings, "ORBITA_IMAP_RECONNECT_MAX_SECONDS", 300))
+        label = f"{mailbox_conn.user} ({mailbox_conn.host})"
+        backoff = RECONNECT_MIN_SECONDS
+        while not stop.is_set():
+            mailbox = None
+            failed = False
+            try:
+                mailbox, uidvalidity = self._open(mailbox_conn)
+                use_idle = supports_idle(mailbox)
+                logger.info("imap_idle connected mailbox=%s idle=%s", label, use_idle)
+                while not stop.is_set():
+                    configs = self._idle_configs.get(mailbox_conn)
+                    if not configs:
+                        return
+                    close_old_connections()
+                    stats = MailboxStats(mailbox=label)
+                    started = time.monotonic()
+                    more = self._process_new_mail(
+                        mailbox, mailbox_conn, uidvalidity, configs, max_emails, dry_run, allowed_ext, stats
+                    )
+                    stats.seconds = time.monotonic() - started
+                    backoff = RECONNECT_MIN_SECONDS
+                    if stats.new or stats.errors:
+                        self._report(stats)
+                    if more:
+                        continue
+                    if use_idle:
+                        idle_wait(mailbox, idle_seconds, should_stop=stop.is_set)
+                    elif stop.wait(poll_interval):
+                        break
+            except Exception as exc:
+                failed = True
+                logger.warning("imap_idle error mailbox=%s retry_in=%.0fs: %s", label, backoff, exc)
+                self.stdout.write(self.style.ERROR(f"Buzón {label}: {exc} (reintento en {backoff:.0f}s)"))
+            finally:
+                if mailbox is not None:
+                    self._close(mailbox)
+            if failed:
+                stop.wait(backoff)
+                backoff = min(backoff * 2, max_backoff)
+
+    def _run_mailbox_in_thread(self, **job) -> MailboxStats:
+        try:
+            return self._run_mailbox(**job)
+        finally:
+            # Cada hilo del pool abre su propia conexión a la BD; no dejarla abierta entre ciclos.
+            connections.close_all()
 
-        for mailbox_conn, mailbox_configs in mailboxes.items():
+    def _run_mailbox(
+        self,
+        mailbox_conn: MailboxConnection,
+        configs: Sequence[ATSClientEmailConfig],
+        max_emails: int,
+        dry_run: bool,
+        allowed_ext: Set[str],
+    ) -> MailboxStats:
+        """Procesa un buzón aislando sus fallos: un error de conexión o de IMAP no afecta a los demás."""
+        stats = MailboxStats(mailbox=f"{mailbox_conn.user} ({mailbox_conn.host})")
+        started = time.monotonic()
+        try:
             self._process_mailbox(
                 mailbox_conn=mailbox_conn,
-                configs=mailbox_configs,
+                configs=configs,
                 max_emails=max_emails,
                 dry_run=dry_run,
                 allowed_ext=allowed_ext,
+                stats=stats,
             )
+        except Exception as exc:
+            logger.exception("Error procesando buzón %s: %s", stats.mailbox, exc)
+            stats.error = str(exc) or exc.__class__.__name__
+        stats.seconds = time.monotonic() - started
+        logger.info(
+            "imap_mailbox mailbox=%s new=%s fetched=%s downloaded_bytes=%s created=%s skipped=%s errors=%s "
+            "failed=%s seconds=%.2f stages=%s",
+            stats.mailbox, stats.new, stats.fetched, stats.downloaded_bytes, stats.created, stats.skipped,
+            stats.errors, bool(stats.error), stats.seconds, stats.stages_summary(),
+        )
+        return stats
 
     def _resolve_mailboxes(
         self,
@@ -323,6 +502,41 @@ class Command(BaseCommand):
 
         return groups
 
+    def _connect(self, mailbox_conn: MailboxConnection):
+        connect_timeout = float(getattr(settings, "ORBITA_IMAP_CONNECT_TIMEOUT_SECONDS", 15))
+        read_timeout = float(getattr(settings, "ORBITA_IMAP_READ_TIMEOUT_SECONDS", 60))
+        mailbox_cls = imaplib.IMAP4_SSL if mailbox_conn.use_ssl else imaplib.IMAP4
+        mailbox = mailbox_cls(mailbox_conn.host, mailbox_conn.port, timeout=connect_timeout)
+        # Tras el saludo, cada lectura tiene su propio límite: un servidor colgado no retiene el hilo.
+        sock = getattr(mailbox, "sock", None)
+        if sock is not None:
+            sock.settimeout(read_timeout)
+        return mailbox
+
+    def _open(self, mailbox_conn: MailboxConnection):
+        """Conecta, autentica y selecciona la carpeta. Retorna (conexión, UIDVALIDITY)."""
+        mailbox = self._connect(mailbox_conn)
+        try:
+            mailbox.login(mailbox_conn.user, mailbox_conn.password)
+            status, _data = mailbox.select(mailbox_conn.folder)
+            if status != "OK":
+                raise RuntimeError(f"No se pudo abrir la carpeta {mailbox_conn.folder}.")
+        except Exception:
+            self._close(mailbox)
+            raise
+        return mailbox, select_response(mailbox, "UIDVALIDITY") or 0
+
+    @staticmethod
+    def _close(mailbox) -> None:
+        try:
+            mailbox.close()
+        except Exception:
+            pass
+        try:
+            mailbox.logout()
+        except Exception:
+            pass
+
     def _process_mailbox(
         self,
         mailbox_conn: MailboxConnection,
@@ -330,147 +544,294 @@ class Command(BaseCommand):
         max_emails: int,
         dry_run: bool,
         allowed_ext: Set[str],
+        stats: Optional[MailboxStats] = None,
     ) -> None:
         if not configs:
             return
-        mailbox_cls = imaplib.IMAP4_SSL if mailbox_conn.use_ssl else imaplib.IMAP4
-        mailbox = mailbox_cls(mailbox_conn.host, mailbox_conn.port)
+        stats = stats or MailboxStats(mailbox=f"{mailbox_conn.user} ({mailbox_conn.host})")
+        mailbox, uidvalidity = self._open(mailbox_conn)
         try:
-            mailbox.login(mailbox_conn.user, mailbox_conn.password)
-            mailbox.select(mailbox_conn.folder)
+            self._process_new_mail(mailbox, mailbox_conn, uidvalidity, configs, max_emails, dry_run, allowed_ext, stats)
+        finally:
+            self._close(mailbox)
 
-            status, ids_data = mailbox.search(None, "UNSEEN")
-            if status != "OK":
-                self.stdout.write(
-                    self.style.WARNING(
-                        f"No se pudo consultar UNSEEN en {mailbox_conn.user}@{mailbox_conn.host}."
-                    )
+    def _process_new_mail(
+        self,
+        mailbox,
+        mailbox_conn: MailboxConnection,
+        uidvalidity: int,
+        configs: Sequence[ATSClientEmailConfig],
+        max_emails: int,
+        dry_run: bool,
+        allowed_ext: Set[str],
+        stats: MailboxStats,
+    ) -> bool:
+        """
+        Procesa los UID posteriores al checkpoint sobre una conexión ya abierta. Retorna
+        True si quedaron correos nuevos sin procesar por el límite de `max_emails`.
+        """
+        # Índice de ruteo vigente (se rearma solo si cambió alguna config, formulario o vacante).
+        routing = current_index()
+        scope = {config.pk for config in configs}
+        checkpoint = load_checkpoint(mailbox_conn)
+        same_folder = bool(checkpoint) and checkpoint.uidvalidity == uidvalidity
+        if same_folder and not checkpoint.bootstrapping:
+            last_uid = checkpoint.last_uid
+            # "n:*" siempre incluye el último UID aunque sea menor que n: filtrar.
+            with stats.stage("search"):
+                new_uids = [uid for uid in search_uids(mailbox, "UID", f"{last_uid + 1}:*") if uid > last_uid]
+            bootstrap = False
+        else:
+            # Primera lectura o el servidor renumeró la carpeta: se parte de los no leídos. Si
+            # un ciclo anterior no alcanzó a terminarlos, se sigue tras el último procesado.
+            if checkpoint and checkpoint.uidvalidity and not same_folder:
+                logger.warning(
+                    "UIDVALIDITY cambió en %s (%s -> %s); se relee desde UNSEEN",
+                    stats.mailbox, checkpoint.uidvalidity, uidvalidity,
                 )
-                return
-
-            raw_ids = ids_data[0].split() if ids_data and ids_data[0] else []
-            if not raw_ids:
-                self.stdout.write(f"Sin correos nuevos en {mailbox_conn.user}.")
-                return
-
-            ids = raw_ids[-max_emails:]
+            last_uid = checkpoint.last_uid if same_folder else 0
+            with stats.stage("search"):
+                new_uids = [uid for uid in search_uids(mailbox, "UNSEEN") if uid > last_uid]
+            bootstrap = True
+
+        stats.new = len(new_uids)
+        uids = new_uids[:max_emails]
+        if uids:
             self.stdout.write(
-                f"Mailbox {mailbox_conn.user} ({mailbox_conn.source}) UNSEEN={len(raw_ids)} | procesando={len(ids)}"
+                f"Mailbox {mailbox_conn.user} ({mailbox_conn.source}) nuevos={len(new_uids)} | procesando={len(uids)}"
             )
 
-            for msg_id in ids:
-                status, msg_data = mailbox.fetch(msg_id, "(RFC822)")
-                if status != "OK" or not msg_data or not msg_data[0]:
-                    continue
-                raw_email = msg_data[0][1]
-                msg = message_from_bytes(raw_email)
-
-                subject = _decode_mime(msg.get("Subject", "")).strip()
-                from_name, from_email = parseaddr(_decode_mime(msg.get("From", "")))
-                from_name = (from_name or "").strip()
-                from_email = (from_email or "").strip().lower()
-                recipients = _extract_emails_from_header_values(
-                    [
-                        msg.get("To", ""),
-                        msg.get("Cc", ""),
-                        msg.get("Delivered-To", ""),
-                        msg.get("X-Original-To", ""),
-                    ]
+        max_attempts = max(int(getattr(settings, "ORBITA_IMAP_MESSAGE_MAX_ATTEMPTS", 3)), 1)
+        with stats.stage("headers"):
+            batch = fetch_headers(mailbox, uids)
+        for fetched in batch:
+            try:
+                self._process_message(mailbox, mailbox_conn, fetched, routing, scope, dry_run, allowed_ext, stats)
+            except (imaplib.IMAP4.abort, OSError):
+                # Conexión perdida o timeout: el resto del buzón queda para el próximo ciclo.
+                raise
+            except Exception as exc:
+                stats.errors += 1
+                logger.exception("Error procesando correo UID %s en %s: %s", fetched.uid, stats.mailbox, exc)
+                if dry_run or record_failure(mailbox_conn, fetched.uid) < max_attempts:
+                    # El checkpoint no avanza: este correo y los siguientes se reintentan el próximo ciclo.
+                    return False
+                # Falla siempre: se omite para que no bloquee el resto del buzón.
+                logger.error(
+                    "Correo UID %s en %s omitido tras %s intentos fallidos", fetched.uid, stats.mailbox, max_attempts
                 )
-                body = _extract_plain_text(msg)
-                attachments = _extract_attachments(msg, allowed_ext=allowed_ext)
-
-                config = _match_config_for_email(subject, recipients, configs)
-                if not config:
-                    self.stdout.write(
-                        f"SKIP #{msg_id.decode()} mailbox={mailbox_conn.user} sin match de regex: {subject[:90]}"
-                    )
-                    if not dry_run:
-                        mailbox.store(msg_id, "+FLAGS", "\\Seen")
-                    continue
-
-                target_form = _pick_target_form(config.client, subject=subject, body=body)
-                if not target_form:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f"SKIP #{msg_id.decode()} cliente={config.client.company_name} sin formulario activo."
-                        )
-                    )
-                    if not dry_run:
-                        mailbox.store(msg_id, "+FLAGS", "\\Seen")
-                    continue
-
-                payload = {
-                    "Canal": "Correo entrante",
-                    "Asunto": subject,
-                    "Remitente": from_email or from_name or "desconocido",
-                    "Destinatarios": ", ".join(sorted(recipients)),
-                    "Mensaje": (body or "")[:10000],
-                }
-
                 self.stdout.write(
-                    f"MATCH #{msg_id.decode()} cliente={config.client.company_name} form={target_form.name} asunto={subject[:70]}"
-                )
-                if dry_run:
-                    continue
-
-                submission = ATSFormSubmission.objects.create(
-                    form=target_form,
-                    payload=payload,
-                    submitter_email=from_email,
+                    self.style.ERROR(f"UID {fetched.uid}: omitido tras {max_attempts} intentos fallidos.")
                 )
+            last_uid = fetched.uid
+            if not dry_run:
+                # Durante la primera lectura el checkpoint sigue en modo no leídos hasta agotarlos.
+                save_checkpoint(mailbox_conn, uidvalidity, last_uid, bootstrapping=bootstrap)
+
+        if bootstrap and len(uids) == len(new_uids) and not dry_run:
+            # Todo lo no leído quedó procesado: lo demás (ya leído) no se toma como nuevo.
+            uidnext = select_response(mailbox, "UIDNEXT")
+            highest = uidnext - 1 if uidnext else max(search_uids(mailbox, "UID", "*") or [0])
+            save_checkpoint(mailbox_conn, uidvalidity, max(last_uid, highest))
+        return len(new_uids) > len(uids)
+
+    def _download_attachments(
+        self,
+        mailbox,
+        uid: int,
+        parts: Sequence[MessagePart],
+        stats: MailboxStats,
+        spools: ExitStack,
+    ) -> List[ParsedAttachment]:
+        """
+        Descarga cada adjunto a un temporal registrado en `spools` (se cierran al salir del
+        correo). Los que superan ORBITA_FORM_PUBLIC_MAX_FILE_SIZE se omiten: los que el
+        BODYSTRUCTURE ya declara mayores, sin descargarlos; el resto, al pasar el tope
+        mientras se decodifican.
+        """
+        max_size = int(getattr(settings, "ORBITA_FORM_PUBLIC_MAX_FILE_SIZE", 10 * 1024 * 1024))
+        attachments: List[ParsedAttachment] = []
+        for part in parts:
+            name = part.filename or "adjunto.bin"
+            if part.estimated_size > max_size:
+                self._skip_attachment(uid, name, max_size)
+                continue
+            spool = spools.enter_context(tempfile.SpooledTemporaryFile(max_size=ATTACHMENT_SPOOL_MAX_MEMORY))
+            try:
+                sha256, size = fetch_part_to(mailbox, uid, part, spool, max_size)
+            except PartTooLarge:
+                self._skip_attachment(uid, name, max_size)
+                continue
+            stats.downloaded_bytes += size
+            if size:
+                spool.seek(0)
+                attachments.append(ParsedAttachment(name=name, file=spool, sha256=sha256, size=size))
+        return attachments
+
+    def _skip_attachment(self, uid: int, name: str, max_size: int) -> None:
+        logger.warning("Adjunto %s del UID %s supera %s bytes; se omite", name, uid, max_size)
+        self.stdout.write(
+            self.style.WARNING(f"UID {uid}: adjunto {name} omitido (supera {max_size // (1024 * 1024)} MB).")
+        )
 
-                for attachment in attachments:
-                    sub_file = ATSFormSubmissionFile(
-                        submission=submission,
-                        form_field=None,
-                        original_name=attachment.name,
-                    )
-                    sub_file.file.save(attachment.name, ContentFile(attachment.content), save=True)
-
-                candidate = None
-                if target_form.vacancy_id:
-                    candidate = _create_candidate_from_submission(submission, payload, from_email)
-                    if candidate:
-                        current_name = (candidate.name or "").strip()
-                        local_part = from_email.split("@", 1)[0] if "@" in from_email else ""
-                        if from_name and current_name.lower() in {"postulante", local_part.lower()}:
-                            candidate.name = _candidate_name_from_sender(from_name, from_email)
-                            candidate.save(update_fields=["name"])
-
-                if candidate:
-                    notify_orbita_client(
-                        config.client,
-                        ATSNotification.TYPE_CANDIDATE,
-                        "Nuevo candidato (correo entrante)",
-                        message=f"{candidate.name} — Correo «{subject[:120]}».",
-                        link=reverse("orbita_candidate_detail", args=[candidate.pk]),
-                    )
-                else:
-                    notify_orbita_client(
-                        config.client,
-                        ATSNotification.TYPE_SUBMISSION,
-                        "Nuevo envío (correo entrante)",
-                        message=f"Correo «{subject[:120]}».",
-                        link=reverse("orbita_form_submissions", args=[target_form.pk]),
-                    )
+    def _process_message(
+        self,
+        mailbox,
+        mailbox_conn: MailboxConnection,
+        fetched,
+        routing: RoutingIndex,
+        scope: Set[int],
+        dry_run: bool,
+        allowed_ext: Set[str],
+        stats: MailboxStats,
+    ) -> None:
+        uid = fetched.uid
+        msg = fetched.headers
+        stats.fetched += 1
+
+        subject = _decode_mime(msg.get("Subject", "")).strip()
+        from_name, from_email = parseaddr(_decode_mime(msg.get("From", "")))
+        from_name = (from_name or "").strip()
+        from_email = (from_email or "").strip().lower()
+        recipients = _extract_emails_from_header_values(
+            [
+                msg.get("To", ""),
+                msg.get("Cc", ""),
+                msg.get("Delivered-To", ""),
+                msg.get("X-Original-To", ""),
+            ]
+        )
 
-                mailbox.store(msg_id, "+FLAGS", "\\Seen")
+        with stats.stage("route"):
+            config = routing.match_config(subject, recipients, scope)
+        if not config:
+            self.stdout.write(
+                f"SKIP UID {uid} mailbox={mailbox_conn.user} sin match de regex: {subject[:90]}"
+            )
+            stats.skipped += 1
+            if not dry_run:
+                mailbox.uid("STORE", str(uid), "+FLAGS", "\\Seen")
+            return
 
-        finally:
-            try:
-                mailbox.close()
-            except Exception:
-                pass
-            try:
-                mailbox.logout()
-            except Exception:
-                pass
+        ledger_mailbox = email_ledger.mailbox_key(mailbox_conn)
+        digest = email_ledger.content_hash(fetched)
+        ledger_key = email_ledger.message_key(fetched, digest)
+        with stats.stage("ledger"):
+            processed = email_ledger.is_processed(ledger_mailbox, ledger_key)
+        if processed:
+            self.stdout.write(f"SKIP UID {uid} ya procesado ({ledger_key[:80]}).")
+            stats.skipped += 1
+            if not dry_run:
+                mailbox.uid("STORE", str(uid), "+FLAGS", "\\Seen")
+            return
 
+        # Solo los correos que coinciden descargan el texto y los adjuntos permitidos.
+        text_parts = _text_parts(fetched.parts)
+        with stats.stage("text"):
+            content = fetch_parts(mailbox, uid, text_parts, max_bytes=TEXT_FETCH_MAX_BYTES)
+        stats.downloaded_bytes += sum(len(value) for value in content.values())
+        body = "\n".join(_decode_text(p, content[p.section]) for p in text_parts if p.section in content).strip()
 
+        with stats.stage("route"):
+            target_form = routing.pick_form(config.client_id, subject, body)
+        if not target_form:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"SKIP UID {uid} cliente={config.client.company_name} sin formulario activo."
+                )
+            )
+            stats.skipped += 1
+            if not dry_run:
+                mailbox.uid("STORE", str(uid), "+FLAGS", "\\Seen")
+            return
 
+        payload = {
+            "Canal": "Correo entrante",
+            "Asunto": subject,
+            "Remitente": from_email or from_name or "desconocido",
+            "Destinatarios": ", ".join(sorted(recipients)),
+            "Mensaje": (body or "")[:10000],
+        }
 
+        self.stdout.write(
+            f"MATCH UID {uid} cliente={config.client.company_name} form={target_form.name} asunto={subject[:70]}"
+        )
+        if dry_run:
+            return
 
+        with ExitStack() as spools:
+            with stats.stage("attachments"):
+                attachments = self._download_attachments(
+                    mailbox, uid, _attachment_parts(fetched.parts, allowed_ext), stats, spools
+                )
+            try:
+                # Envío, archivos, candidato y ledger se guardan juntos: una caída antes del
+                # \Seen deja el correo registrado y la próxima lectura no lo duplica.
+                with stats.stage("store"), transaction.atomic():
+                    submission, duplicate_submission = create_submission_once(target_form, payload, from_email)
+                    candidate = None
+                    if not duplicate_submission:
+                        for attachment in attachments:
+                            blob = store_file(
+                                File(attachment.file, name=attachment.name), attachment.name, attachment.sha256, attachment.size
+                            )
+                            attach_to_submission(submission, blob, None, attachment.name)
+                        if target_form.vacancy_id:
+                            candidate = _create_candidate_from_submission(submission, payload, from_email, analyze=False)
+                            if candidate:
+                                current_name = (candidate.name or "").strip()
+                                local_part = from_email.split("@", 1)[0] if "@" in from_email else ""
+                                if from_name and current_name.lower() in {"postulante", local_part.lower()}:
+                                    candidate.name = _candidate_name_from_sender(from_name, from_email)
+                                    candidate.save(update_fields=["name"])
+                    email_ledger.record(
+                        ledger_mailbox,
+                        ledger_key,
+                        digest,
+                        uid,
+                        ProcessedIncomingEmail.OUTCOME_DUPLICATE if duplicate_submission else ProcessedIncomingEmail.OUTCOME_CREATED,
+                        submission=submission,
+                        subject=subject,
+                        from_email=from_email,
+                    )
+            except IntegrityError:
+                # Otro worker registró el mismo correo primero; esta transacción se revirtió entera.
+                if not email_ledger.is_processed(ledger_mailbox, ledger_key):
+                    raise
+                self.stdout.write(f"SKIP UID {uid} ya procesado por otro worker.")
+                stats.skipped += 1
+                mailbox.uid("STORE", str(uid), "+FLAGS", "\\Seen")
+                return
 
+        if duplicate_submission:
+            self.stdout.write(
+                f"SKIP UID {uid} form={target_form.name} ya tiene un envío de {from_email}."
+            )
+            stats.skipped += 1
+            mailbox.uid("STORE", str(uid), "+FLAGS", "\\Seen")
+            return
 
+        if candidate:
+            # El análisis llama a la IA: fuera de la transacción.
+            with stats.stage("analysis"):
+                _auto_analyze_candidate_if_applicable(candidate)
+        with stats.stage("notify"):
+            if candidate:
+                notify_orbita_client(
+                    config.client,
+                    ATSNotification.TYPE_CANDIDATE,
+                    "Nuevo candidato (correo entrante)",
+                    message=f"{candidate.name} — Correo «{subject[:120]}».",
+                    link=reverse("orbita_candidate_detail", args=[candidate.public_id]),
+                )
+            else:
+                notify_orbita_client(
+                    config.client,
+                    ATSNotification.TYPE_SUBMISSION,
+                    "Nuevo envío (correo entrante)",
+                    message=f"Correo «{subject[:120]}».",
+                    link=reverse("orbita_form_submissions", args=[target_form.pk]),
+                )
+        stats.created += 1
 
+        mailbox.uid("STORE", str(uid), "+FLAGS", "\\Seen")
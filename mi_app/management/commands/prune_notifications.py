@@ -0,0 +1,48 @@
+"""
+Retención de notificaciones Órbita: deja solo las más recientes por cliente, borrando por lotes.
+Reemplaza la limpieza que antes corría en cada notificación. También borra los eventos
+del stream en vivo (OrbitaEvent) con más de un día.
+
+Uso:
+  python manage.py prune_notifications --once
+  python manage.py prune_notifications --loop --interval 3600
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from mi_app.orbita_notifications import NOTIFICATIONS_MAX_PER_CLIENT, prune_notifications
+from mi_app.services.live_events import prune_events
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Borra por lotes las notificaciones que exceden el máximo por cliente."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Ejecuta una sola pasada y termina.")
+        parser.add_argument("--loop", action="store_true", help="Ejecuta en bucle continuo.")
+        parser.add_argument("--interval", type=int, default=3600, help="Segundos entre pasadas cuando se usa --loop.")
+        parser.add_argument("--keep", type=int, default=NOTIFICATIONS_MAX_PER_CLIENT, help="Notificaciones a conservar por cliente.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Filas por DELETE.")
+
+    def handle(self, *args, **options):
+        run_loop = bool(options.get("loop"))
+        interval = max(int(options.get("interval") or 3600), 60)
+        keep = max(int(options.get("keep") or NOTIFICATIONS_MAX_PER_CLIENT), 1)
+        batch_size = max(int(options.get("batch_size") or 1000), 1)
+
+        while True:
+            try:
+                deleted = prune_notifications(keep=keep, batch_size=batch_size)
+                self.stdout.write(f"Notificaciones borradas: {deleted}")
+                self.stdout.write(f"Eventos en vivo borrados: {prune_events(batch_size=batch_size)}")
+            except Exception as exc:
+                logger.exception("Error en retención de notificaciones: %s", exc)
+                self.stdout.write(self.style.ERROR(f"Error: {exc}"))
+
+            if not run_loop:
+                break
+            time.sleep(interval)
@@ -0,0 +1,35 @@
+"""
+Borra blobs de archivos sin referencias (ej. CVs subidos en un chat que nunca se envió).
+Los blobs referenciados se liberan solos al borrar su última referencia.
+Antes borra las subidas por partes que nadie adjuntó en ORBITA_FORM_UPLOAD_EXPIRY_HOURS
+(con sus partes), para que sus blobs también se limpien.
+
+Uso:
+  python manage.py purge_orphan_blobs
+  python manage.py purge_orphan_blobs --hours 48 --dry-run
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mi_app.services.blob_store import collect_orphan_blobs
+from mi_app.services.chunked_uploads import expire_stale_uploads
+
+
+class Command(BaseCommand):
+    help = "Borra blobs de archivos sin referencias más antiguos que --hours."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=24, help="Antigüedad mínima del blob sin referencias.")
+        parser.add_argument("--dry-run", action="store_true", help="Solo cuenta, no borra.")
+
+    def handle(self, *args, **options):
+        hours = max(int(options.get("hours") or 24), 1)
+        dry_run = bool(options.get("dry_run"))
+        verb = "se borrarían" if dry_run else "borrados"
+        upload_hours = max(int(getattr(settings, "ORBITA_FORM_UPLOAD_EXPIRY_HOURS", 24)), 1)
+        expired = expire_stale_uploads(older_than=timedelta(hours=upload_hours), dry_run=dry_run)
+        self.stdout.write(self.style.SUCCESS(f"Subidas sin adjuntar {verb}: {expired}"))
+        removed = collect_orphan_blobs(older_than=timedelta(hours=hours), dry_run=dry_run)
+        self.stdout.write(self.style.SUCCESS(f"Blobs sin referencias {verb}: {removed}"))
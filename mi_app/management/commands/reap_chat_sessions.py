@@ -0,0 +1,57 @@
+"""
+Mantenimiento de sesiones de chat: expira las incompletas abandonadas (borrando sus CV
+sin referencias) y archiva las completadas antiguas en FormChatSessionArchive.
+
+Uso:
+  python manage.py reap_chat_sessions --once
+  python manage.py reap_chat_sessions --once --dry-run
+  python manage.py reap_chat_sessions --loop --interval 3600
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from mi_app.services.chat_session_reaper import reap_chat_sessions
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Expira sesiones de chat incompletas y archiva las completadas antiguas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Ejecuta una sola pasada y termina.")
+        parser.add_argument("--loop", action="store_true", help="Ejecuta en bucle continuo.")
+        parser.add_argument("--interval", type=int, default=3600, help="Segundos entre pasadas cuando se usa --loop.")
+        parser.add_argument("--ttl-hours", type=int, default=None, help="Horas sin actividad para expirar (ORBITA_CHAT_SESSION_TTL_HOURS).")
+        parser.add_argument("--archive-days", type=int, default=None, help="Días tras completarse para archivar (ORBITA_CHAT_SESSION_ARCHIVE_DAYS).")
+        parser.add_argument("--batch-size", type=int, default=500, help="Sesiones por lote.")
+        parser.add_argument("--dry-run", action="store_true", help="Solo cuenta, no borra ni archiva.")
+
+    def handle(self, *args, **options):
+        run_loop = bool(options.get("loop"))
+        interval = max(int(options.get("interval") or 3600), 60)
+        batch_size = max(int(options.get("batch_size") or 500), 1)
+        dry_run = bool(options.get("dry_run"))
+
+        while True:
+            try:
+                stats = reap_chat_sessions(
+                    ttl_hours=options.get("ttl_hours"),
+                    archive_days=options.get("archive_days"),
+                    batch_size=batch_size,
+                    dry_run=dry_run,
+                )
+                prefix = "[dry-run] " if dry_run else ""
+                self.stdout.write(
+                    f"{prefix}Sesiones expiradas: {stats['expired']}, archivadas: {stats['archived']}, "
+                    f"filas liberadas: {stats['rows']}, archivos: {stats['files']} ({stats['bytes']} bytes)"
+                )
+            except Exception as exc:
+                logger.exception("Error en mantenimiento de sesiones de chat: %s", exc)
+                self.stdout.write(self.style.ERROR(f"Error: {exc}"))
+
+            if not run_loop:
+                break
+            time.sleep(interval)
@@ -0,0 +1,89 @@
+"""
+Reprocesa los correos entrantes recibidos en un rango de fechas (fecha interna del servidor
+IMAP), leídos o no, sin mover el checkpoint de cada buzón.
+
+Es seguro repetirlo: los correos ya convertidos en postulación están en el ledger
+(`ProcessedIncomingEmail`) y se omiten sin crear nada. Sirve para recuperar correos tras
+corregir una regex o un formulario, o tras una caída del worker.
+
+Uso:
+  python manage.py replay_incoming_emails --since 2026-10-01 --until 2026-10-15
+  python manage.py replay_incoming_emails --since 2026-10-01 --mailbox empleos@empresa.com --dry-run
+"""
+from __future__ import annotations
+
+import imaplib
+import logging
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import CommandError
+
+from mi_app.management.commands.process_incoming_emails import (
+    Command as IncomingEmailCommand,
+    MailboxStats,
+    _allowed_extensions,
+)
+from mi_app.services.email_routing import current_index
+from mi_app.services.imap_fetch import fetch_headers, search_uids
+
+logger = logging.getLogger(__name__)
+
+
+def _imap_date(value: date) -> str:
+    # Formato de fecha de IMAP SEARCH (RFC 3501), independiente del locale: 01-Oct-2026.
+    return f"{value.day:02d}-{imaplib.Months[value.month]}-{value.year}"
+
+
+class Command(IncomingEmailCommand):
+    help = "Reprocesa los correos entrantes de un rango de fechas; los ya procesados se omiten."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, required=True, help="Desde (AAAA-MM-DD, incluido).")
+        parser.add_argument("--until", type=date.fromisoformat, default=None, help="Hasta (AAAA-MM-DD, incluido). Por defecto hoy.")
+        parser.add_argument("--mailbox", default="", help="Solo el buzón con este usuario IMAP.")
+        parser.add_argument("--dry-run", action="store_true", help="No guarda en BD ni marca correos como leídos.")
+
+    def handle(self, *args, **options):
+        since = options["since"]
+        until = options.get("until") or date.today()
+        if until < since:
+            raise CommandError("--until no puede ser anterior a --since.")
+        only_user = (options.get("mailbox") or "").strip().lower()
+        dry_run = bool(options.get("dry_run"))
+
+        mailboxes = self._resolve_mailboxes(self._load_configs())
+        if only_user:
+            mailboxes = {conn: configs for conn, configs in mailboxes.items() if conn.user.lower() == only_user}
+        if not mailboxes:
+            raise CommandError("No hay buzones IMAP que coincidan.")
+
+        for conn, configs in mailboxes.items():
+            stats = MailboxStats(mailbox=f"{conn.user} ({conn.host})")
+            started = time.monotonic()
+            try:
+                self._replay_mailbox(conn, configs, since, until, dry_run, _allowed_extensions(), stats)
+            except Exception as exc:
+                logger.exception("Error en replay del buzón %s: %s", stats.mailbox, exc)
+                stats.error = str(exc) or exc.__class__.__name__
+            stats.seconds = time.monotonic() - started
+            self._report(stats)
+
+    def _replay_mailbox(self, mailbox_conn, configs, since, until, dry_run, allowed_ext, stats) -> None:
+        mailbox, _uidvalidity = self._open(mailbox_conn)
+        try:
+            routing = current_index()
+            scope = {config.pk for config in configs}
+            uids = search_uids(mailbox, "SINCE", _imap_date(since), "BEFORE", _imap_date(until + timedelta(days=1)))
+            stats.new = len(uids)
+            for fetched in fetch_headers(mailbox, uids):
+                try:
+                    self._process_message(mailbox, mailbox_conn, fetched, routing, scope, dry_run, allowed_ext, stats)
+                except (imaplib.IMAP4.abort, OSError):
+                    raise
+                except Exception as exc:
+                    # En el replay un correo fallido no frena el resto del rango.
+                    stats.errors += 1
+                    logger.exception("Error en replay UID %s en %s: %s", fetched.uid, stats.mailbox, exc)
+        finally:
+            self._close(mailbox)
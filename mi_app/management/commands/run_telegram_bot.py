@@ -3,12 +3,17 @@ Management command para iniciar el bot de Telegram de Órbita.
 
 Uso:
     python manage.py run_telegram_bot
+    python manage.py run_telegram_bot --webhook --replica 0 --replicas 2
+
+Sin --webhook usa long polling (un solo proceso). Con --webhook procesa la cola que
+llena /orbita/telegram/webhook/; cada réplica atiende solo los chats de su partición.
+En ambos modos el estado de las conversaciones se guarda en la BD.
 """
 import asyncio
 import logging
 import sys
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 logger = logging.getLogger(__name__)
 
@@ -16,22 +21,59 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = "Inicia el bot de Telegram de Órbita para postulaciones conversacionales."
 
+    def add_arguments(self, parser):
+        parser.add_argument("--webhook", action="store_true", help="Procesa los updates recibidos por webhook.")
+        parser.add_argument("--replica", type=int, default=0, help="Índice de esta réplica (0..replicas-1).")
+        parser.add_argument("--replicas", type=int, default=1, help="Total de réplicas del bot en modo webhook.")
+        parser.add_argument("--batch-size", type=int, default=100, help="Updates por lote en modo webhook.")
+        parser.add_argument(
+            "--no-set-webhook", action="store_true", help="No registrar ORBITA_TELEGRAM_WEBHOOK_URL al iniciar."
+        )
+
     def handle(self, *args, **options):
         if sys.platform == "win32":
             asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
+        webhook = bool(options.get("webhook"))
+        replicas = max(int(options.get("replicas") or 1), 1)
+        replica = int(options.get("replica") or 0)
+        if not 0 <= replica < replicas:
+            raise CommandError("--replica debe estar entre 0 y --replicas - 1.")
+        if replicas > 1 and not webhook:
+            raise CommandError("Varias réplicas solo son posibles con --webhook.")
+
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
 
-        from mi_app.telegram_bot import build_application
+        from mi_app.services.telegram_persistence import DjangoPersistence
+        from mi_app.telegram_bot import build_application, consume_webhook_updates
 
         self.stdout.write(self.style.SUCCESS("🤖 Iniciando bot de Telegram de Órbita..."))
-        logger.info("telegram_bot: starting polling")
+        app = build_application(persistence=DjangoPersistence(replica=replica, replicas=replicas))
 
-        app = build_application()
+        if not webhook:
+            logger.info("telegram_bot: starting polling")
+            self.stdout.write(self.style.SUCCESS(
+                "✅ Bot activo. Esperando mensajes...\n"
+                "   Presiona Ctrl+C para detener."
+            ))
+            app.run_polling(drop_pending_updates=True)
+            return
 
+        logger.info("telegram_bot: starting webhook worker replica=%s/%s", replica, replicas)
         self.stdout.write(self.style.SUCCESS(
-            "✅ Bot activo. Esperando mensajes...\n"
+            f"✅ Worker de webhook activo (réplica {replica + 1} de {replicas}).\n"
             "   Presiona Ctrl+C para detener."
         ))
-        app.run_polling(drop_pending_updates=True)
+        try:
+            loop.run_until_complete(consume_webhook_updates(
+                app,
+                replica=replica,
+                replicas=replicas,
+                batch_size=max(int(options.get("batch_size") or 100), 1),
+                register_webhook=not options.get("no_set_webhook"),
+            ))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            loop.close()
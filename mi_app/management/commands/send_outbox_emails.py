@@ -0,0 +1,51 @@
+"""
+Envía los correos en cola (OutboundEmail) reutilizando una conexión SMTP por servidor.
+
+Uso:
+  python manage.py send_outbox_emails --once
+  python manage.py send_outbox_emails --loop --interval 10
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from mi_app.services.email_outbox import drain_outbox
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Envía los correos pendientes del outbox con reintentos y límite por cliente."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Procesa la cola hasta vaciarla y termina.")
+        parser.add_argument("--loop", action="store_true", help="Ejecuta en bucle continuo.")
+        parser.add_argument("--interval", type=int, default=10, help="Segundos entre ciclos cuando se usa --loop.")
+        parser.add_argument("--batch-size", type=int, default=50, help="Máximo de correos por lote.")
+
+    def handle(self, *args, **options):
+        run_loop = bool(options.get("loop"))
+        interval = max(int(options.get("interval") or 10), 1)
+        batch_size = max(int(options.get("batch_size") or 50), 1)
+
+        self.stdout.write(self.style.SUCCESS("Worker de outbox de correos iniciado."))
+        while True:
+            try:
+                while True:
+                    stats = drain_outbox(batch_size=batch_size)
+                    if any(stats.values()):
+                        self.stdout.write(
+                            f"Outbox: enviados={stats['sent']} reintento={stats['retry']} "
+                            f"fallidos={stats['failed']} pospuestos={stats['deferred']}"
+                        )
+                    # Lote incompleto: no queda nada vencido por ahora.
+                    if sum(stats.values()) < batch_size:
+                        break
+            except Exception as exc:
+                logger.exception("Error en ciclo de outbox: %s", exc)
+                self.stdout.write(self.style.ERROR(f"Error en ciclo: {exc}"))
+
+            if not run_loop:
+                break
+            time.sleep(interval)
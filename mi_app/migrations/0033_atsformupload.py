@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-18 22:08
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0032_vacancydashboardconfig'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ATSFormUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='Token')),
+                ('original_name', models.CharField(max_length=255, verbose_name='Nombre original')),
+                ('total_size', models.PositiveBigIntegerField(verbose_name='Tamaño total (bytes)')),
+                ('received_size', models.PositiveBigIntegerField(default=0, verbose_name='Bytes recibidos')),
+                ('parts', models.JSONField(blank=True, default=list, verbose_name='Partes en storage')),
+                ('storage_name', models.CharField(blank=True, max_length=500, verbose_name='Archivo en storage')),
+                ('status', models.CharField(choices=[('uploading', 'Subiendo'), ('completed', 'Completada'), ('attached', 'Adjuntada')], default='uploading', max_length=20, verbose_name='Estado')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='mi_app.atsform')),
+            ],
+            options={
+                'verbose_name': 'Subida de archivo',
+                'verbose_name_plural': 'Subidas de archivos',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 22:14
+
+from django.db import migrations, models
+
+
+def populate_normalized_emails(apps, schema_editor):
+    """Rellena el correo normalizado; los duplicados previos quedan vacíos para no romper la unicidad."""
+    ATSFormSubmission = apps.get_model("mi_app", "ATSFormSubmission")
+    seen = set()
+    submissions = ATSFormSubmission.objects.exclude(submitter_email="").order_by("submitted_at", "id")
+    for submission in submissions.only("id", "form_id", "submitter_email").iterator():
+        normalized = (submission.submitter_email or "").strip().lower()
+        key = (submission.form_id, normalized)
+        if not normalized or key in seen:
+            continue
+        seen.add(key)
+        ATSFormSubmission.objects.filter(pk=submission.pk).update(normalized_email=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0034_storedblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='atsformsubmission',
+            name='normalized_email',
+            field=models.CharField(blank=True, editable=False, max_length=254, verbose_name='Correo normalizado'),
+        ),
+        migrations.RunPython(populate_normalized_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='atsformsubmission',
+            constraint=models.UniqueConstraint(condition=models.Q(('normalized_email', ''), _negated=True), fields=('form', 'normalized_email'), name='unique_form_submission_email'),
+        ),
+    ]
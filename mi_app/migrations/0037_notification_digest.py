@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 22:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0036_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='atsclientemailconfig',
+            name='notification_digest_minutes',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Inmediato'), (5, 'Resumen cada 5 minutos'), (60, 'Resumen cada hora')], default=0, help_text='Agrupa nuevos envíos y candidatos en un solo aviso y un solo correo por ventana.', verbose_name='Frecuencia de avisos'),
+        ),
+        migrations.AddField(
+            model_name='atsnotification',
+            name='count',
+            field=models.PositiveIntegerField(default=1, verbose_name='Eventos agrupados'),
+        ),
+        migrations.AddField(
+            model_name='atsnotification',
+            name='digest_email',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='mi_app.outboundemail', verbose_name='Correo del resumen'),
+        ),
+        migrations.AddField(
+            model_name='atsnotification',
+            name='digest_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Resumen abierto hasta'),
+        ),
+    ]
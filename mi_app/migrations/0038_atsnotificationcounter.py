@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 22:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0037_notification_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ATSNotificationCounter',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to='mi_app.atsclient')),
+                ('unread', models.PositiveIntegerField(default=0, verbose_name='Sin leer')),
+            ],
+            options={
+                'verbose_name': 'Contador de notificaciones',
+                'verbose_name_plural': 'Contadores de notificaciones',
+            },
+        ),
+    ]
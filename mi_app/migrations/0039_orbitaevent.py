@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0038_atsnotificationcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrbitaEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('notification', 'Notificación'), ('chat_session', 'Sesión de chat')], max_length=30, verbose_name='Tipo')),
+                ('payload', models.JSONField(default=dict, verbose_name='Datos')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='live_events', to='mi_app.atsclient')),
+            ],
+            options={
+                'verbose_name': 'Evento en vivo',
+                'verbose_name_plural': 'Eventos en vivo',
+                'indexes': [models.Index(fields=['client', 'id'], name='orbita_event_client_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0039_orbitaevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='formchatsession',
+            index=models.Index(fields=['form', 'updated_at'], name='chat_form_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0040_formchatsession_form_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormChatAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step_id', models.CharField(max_length=64, verbose_name='Paso')),
+                ('value', models.JSONField(blank=True, null=True, verbose_name='Valor')),
+                ('attachment', models.JSONField(blank=True, null=True, verbose_name='Archivo')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_events', to='mi_app.formchatsession')),
+            ],
+            options={
+                'verbose_name': 'Respuesta de chat',
+                'verbose_name_plural': 'Respuestas de chat',
+                'indexes': [models.Index(fields=['session', 'id'], name='chat_answer_session_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 12:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0041_formchatanswer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormChatSessionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_uuid', models.UUIDField(unique=True, verbose_name='UUID de sesión')),
+                ('source', models.CharField(choices=[('web', 'Web'), ('telegram', 'Telegram')], max_length=20, verbose_name='Origen')),
+                ('telegram_user_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID de usuario en Telegram')),
+                ('candidate_name', models.CharField(blank=True, max_length=200, verbose_name='Nombre del candidato')),
+                ('candidate_email', models.EmailField(blank=True, max_length=254, verbose_name='Email del candidato')),
+                ('total_steps', models.PositiveSmallIntegerField(default=0, verbose_name='Total de pasos')),
+                ('answers', models.JSONField(default=dict, verbose_name='Respuestas')),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP')),
+                ('started_at', models.DateTimeField(verbose_name='Inicio')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Completada')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archivada')),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_chat_sessions', to='mi_app.atsform')),
+                ('submission', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_chat_session', to='mi_app.atsformsubmission')),
+            ],
+            options={
+                'verbose_name': 'Sesión de chat archivada',
+                'verbose_name_plural': 'Sesiones de chat archivadas',
+                'indexes': [models.Index(fields=['form', 'source', 'telegram_user_id'], name='chat_arch_form_src_tg_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 22:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0042_formchatsessionarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramBotState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'Datos de usuario'), ('conversation', 'Conversación')], max_length=20, verbose_name='Tipo')),
+                ('key', models.CharField(max_length=200, verbose_name='Clave')),
+                ('partition_key', models.BigIntegerField(default=0, verbose_name='Clave de partición')),
+                ('data', models.JSONField(blank=True, null=True, verbose_name='Datos')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estado del bot de Telegram',
+                'verbose_name_plural': 'Estados del bot de Telegram',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='unique_telegram_bot_state')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TelegramUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('update_id', models.BigIntegerField(unique=True, verbose_name='Update ID')),
+                ('partition_key', models.BigIntegerField(default=0, verbose_name='Clave de partición')),
+                ('payload', models.JSONField(default=dict, verbose_name='Update')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('processing', 'Procesando'), ('done', 'Procesado')], default='pending', max_length=20, verbose_name='Estado')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Reservado hasta')),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Procesado')),
+            ],
+            options={
+                'verbose_name': 'Update de Telegram',
+                'verbose_name_plural': 'Updates de Telegram',
+                'indexes': [models.Index(fields=['status', 'update_id'], name='tg_update_status_idx')],
+            },
+        ),
+    ]
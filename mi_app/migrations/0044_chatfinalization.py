@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 22:58
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0043_telegram_webhook_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatFinalization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_uuid', models.UUIDField(unique=True, verbose_name='Sesión')),
+                ('source', models.CharField(default='web', max_length=20, verbose_name='Origen')),
+                ('data', models.JSONField(blank=True, default=dict, verbose_name='Datos')),
+                ('stage', models.CharField(choices=[('files', 'Adjuntar archivos'), ('candidate', 'Crear candidato'), ('analysis', 'Análisis de CV'), ('notify', 'Notificar'), ('done', 'Completado')], default='files', max_length=20, verbose_name='Etapa')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('done', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=20, verbose_name='Estado')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próximo intento')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Completado')),
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='chat_finalization', to='mi_app.atsformsubmission')),
+            ],
+            options={
+                'verbose_name': 'Cierre de chat',
+                'verbose_name_plural': 'Cierres de chat',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='chat_final_status_next_idx')],
+            },
+        ),
+    ]
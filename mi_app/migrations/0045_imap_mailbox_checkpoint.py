@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0044_chatfinalization'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IMAPMailboxCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=255, verbose_name='Servidor')),
+                ('port', models.PositiveIntegerField(default=993, verbose_name='Puerto')),
+                ('user', models.CharField(max_length=255, verbose_name='Usuario')),
+                ('folder', models.CharField(default='INBOX', max_length=120, verbose_name='Carpeta')),
+                ('uidvalidity', models.BigIntegerField(verbose_name='UIDVALIDITY')),
+                ('last_uid', models.BigIntegerField(default=0, verbose_name='Último UID')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Checkpoint de buzón IMAP',
+                'verbose_name_plural': 'Checkpoints de buzones IMAP',
+                'constraints': [models.UniqueConstraint(fields=('host', 'port', 'user', 'folder'), name='unique_imap_checkpoint')],
+            },
+        ),
+    ]
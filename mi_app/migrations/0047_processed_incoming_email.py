@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0046_vacancy_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedIncomingEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mailbox', models.CharField(max_length=400, verbose_name='Buzón')),
+                ('message_key', models.CharField(max_length=255, verbose_name='Clave del mensaje')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='Hash de contenido')),
+                ('uid', models.BigIntegerField(blank=True, null=True, verbose_name='UID')),
+                ('subject', models.CharField(blank=True, max_length=255, verbose_name='Asunto')),
+                ('from_email', models.CharField(blank=True, max_length=254, verbose_name='Remitente')),
+                ('outcome', models.CharField(choices=[('created', 'Envío creado'), ('duplicate', 'Postulante repetido')], max_length=20, verbose_name='Resultado')),
+                ('processed_at', models.DateTimeField(auto_now_add=True, verbose_name='Procesado')),
+                ('submission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='incoming_emails', to='mi_app.atsformsubmission')),
+            ],
+            options={
+                'verbose_name': 'Correo entrante procesado',
+                'verbose_name_plural': 'Correos entrantes procesados',
+                'ordering': ['-processed_at'],
+                'constraints': [models.UniqueConstraint(fields=('mailbox', 'message_key'), name='unique_processed_email')],
+            },
+        ),
+    ]
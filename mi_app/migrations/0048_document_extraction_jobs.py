@@ -0,0 +1,74 @@
+# Generated by Django 6.0 on 2026-10-18 23:52
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0047_processed_incoming_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentExtractionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('public_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='ID público')),
+                ('total', models.PositiveSmallIntegerField(default=0, verbose_name='Documentos')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Lote de extracción de documentos',
+                'verbose_name_plural': 'Lotes de extracción de documentos',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DocumentExtractionResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('document_type', models.CharField(max_length=30, verbose_name='Tipo de documento')),
+                ('prompt_version', models.CharField(max_length=32, verbose_name='Versión de prompt')),
+                ('data', models.JSONField(verbose_name='Datos extraídos')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='Reutilizado')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Resultado de extracción en caché',
+                'verbose_name_plural': 'Resultados de extracción en caché',
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(fields=('sha256', 'document_type', 'prompt_version'), name='unique_document_extraction_result')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DocumentExtractionItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0, verbose_name='Posición')),
+                ('document_type', models.CharField(max_length=30, verbose_name='Tipo de documento')),
+                ('filename', models.CharField(max_length=255, verbose_name='Nombre original')),
+                ('content_type', models.CharField(blank=True, max_length=100, verbose_name='Tipo MIME')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('storage_name', models.CharField(blank=True, max_length=500, verbose_name='Archivo en storage')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('done', 'Listo'), ('failed', 'Fallido')], default='pending', max_length=20, verbose_name='Estado')),
+                ('cached', models.BooleanField(default=False, verbose_name='Desde caché')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Datos extraídos')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próximo intento')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminado')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='mi_app.documentextractionjob')),
+            ],
+            options={
+                'verbose_name': 'Documento de lote',
+                'verbose_name_plural': 'Documentos de lotes',
+                'ordering': ['job', 'position'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='docitem_status_next_idx')],
+            },
+        ),
+    ]
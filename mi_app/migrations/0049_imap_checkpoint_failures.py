@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0048_document_extraction_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imapmailboxcheckpoint',
+            name='failed_attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Intentos fallidos'),
+        ),
+        migrations.AddField(
+            model_name='imapmailboxcheckpoint',
+            name='failed_uid',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='UID con error'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+def empty_to_null(apps, schema_editor):
+    """Sin correo pasa de "" a NULL: los NULL no chocan en la restricción única (tampoco en MySQL)."""
+    ATSFormSubmission = apps.get_model("mi_app", "ATSFormSubmission")
+    ATSFormSubmission.objects.filter(normalized_email="").update(normalized_email=None)
+
+
+def null_to_empty(apps, schema_editor):
+    ATSFormSubmission = apps.get_model("mi_app", "ATSFormSubmission")
+    ATSFormSubmission.objects.filter(normalized_email__isnull=True).update(normalized_email="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0049_imap_checkpoint_failures'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='atsformsubmission',
+            name='unique_form_submission_email',
+        ),
+        migrations.AlterField(
+            model_name='atsformsubmission',
+            name='normalized_email',
+            field=models.CharField(blank=True, editable=False, max_length=254, null=True, verbose_name='Correo normalizado'),
+        ),
+        migrations.RunPython(empty_to_null, null_to_empty),
+        migrations.AddConstraint(
+            model_name='atsformsubmission',
+            constraint=models.UniqueConstraint(fields=('form', 'normalized_email'), name='unique_form_submission_email'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0050_submission_normalized_email_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='atsnotificationcounter',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Versión'),
+        ),
+    ]
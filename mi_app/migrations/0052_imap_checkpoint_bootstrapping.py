@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0051_notification_counter_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imapmailboxcheckpoint',
+            name='bootstrapping',
+            field=models.BooleanField(default=False, verbose_name='Leyendo no leídos'),
+        ),
+    ]
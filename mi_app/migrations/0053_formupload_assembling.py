@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mi_app', '0052_imap_checkpoint_bootstrapping'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='atsformupload',
+            name='status',
+            field=models.CharField(choices=[('uploading', 'Subiendo'), ('assembling', 'Ensamblando'), ('completed', 'Completada'), ('attached', 'Adjuntada')], default='uploading', max_length=20, verbose_name='Estado'),
+        ),
+    ]
@@ -95,6 +95,20 @@ class ATSClientEmailConfig(models.Model):
         blank=True,
         help_text="Recibirás avisos de formularios, candidatos y, cuando esté activo el análisis de CVs con IA, notificaciones de resultados.",
     )
+    DIGEST_IMMEDIATE = 0
+    DIGEST_5_MINUTES = 5
+    DIGEST_HOURLY = 60
+    DIGEST_CHOICES = [
+        (DIGEST_IMMEDIATE, "Inmediato"),
+        (DIGEST_5_MINUTES, "Resumen cada 5 minutos"),
+        (DIGEST_HOURLY, "Resumen cada hora"),
+    ]
+    notification_digest_minutes = models.PositiveSmallIntegerField(
+        "Frecuencia de avisos",
+        choices=DIGEST_CHOICES,
+        default=DIGEST_IMMEDIATE,
+        help_text="Agrupa nuevos envíos y candidatos en un solo aviso y un solo correo por ventana.",
+    )
     incoming_subject_regex = models.CharField(
         "Filtro de asunto (regex)",
         max_length=255,
@@ -167,6 +181,17 @@ class ATSNotification(models.Model):
     link = models.CharField("Enlace", max_length=500, blank=True, help_text="URL a la que lleva la notificación")
     read = models.BooleanField("Leída", default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Resumen (digest): cuántos eventos agrupa esta notificación y hasta cuándo acepta más.
+    count = models.PositiveIntegerField("Eventos agrupados", default=1)
+    digest_until = models.DateTimeField("Resumen abierto hasta", null=True, blank=True)
+    digest_email = models.ForeignKey(
+        "OutboundEmail",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Correo del resumen",
+    )
 
     class Meta:
         verbose_name = "Notificación Órbita"
@@ -177,6 +202,109 @@ class ATSNotification(models.Model):
         return f"{self.title} — {self.client.company_name}"
 
 
+class ATSNotificationCounter(models.Model):
+    """
+    Contador de notificaciones sin leer por cliente. Se mantiene al crear o marcar
+    como leídas para no contar filas en cada página; `recount_unread` lo reconcilia.
+    `version` sube con cada cambio de la campana e invalida su caché en todos los procesos.
+    """
+    client = models.OneToOneField(
+        ATSClient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="notification_counter",
+    )
+    unread = models.PositiveIntegerField("Sin leer", default=0)
+    version = models.PositiveBigIntegerField("Versión", default=0)
+
+    class Meta:
+        verbose_name = "Contador de notificaciones"
+        verbose_name_plural = "Contadores de notificaciones"
+
+    def __str__(self):
+        return f"{self.client.company_name}: {self.unread} sin leer"
+
+
+class OrbitaEvent(models.Model):
+    """
+    Evento en vivo para el stream SSE del cliente (notificaciones y progreso de chats).
+    El id autoincremental es el `Last-Event-ID` con el que el navegador retoma el stream;
+    los eventos viejos los borra `prune_notifications`.
+    """
+    KIND_NOTIFICATION = "notification"
+    KIND_CHAT_SESSION = "chat_session"
+    KIND_CHOICES = [
+        (KIND_NOTIFICATION, "Notificación"),
+        (KIND_CHAT_SESSION, "Sesión de chat"),
+    ]
+    client = models.ForeignKey(
+        ATSClient,
+        on_delete=models.CASCADE,
+        related_name="live_events",
+    )
+    kind = models.CharField("Tipo", max_length=30, choices=KIND_CHOICES)
+    payload = models.JSONField("Datos", default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Evento en vivo"
+        verbose_name_plural = "Eventos en vivo"
+        indexes = [
+            models.Index(fields=["client", "id"], name="orbita_event_client_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.client_id})"
+
+
+class OutboundEmail(models.Model):
+    """
+    Correo en cola (outbox). Se crea en la misma transacción que el cambio que lo
+    origina y lo envía el worker `send_outbox_emails`, fuera del request o del bot.
+    """
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pendiente"),
+        (STATUS_SENT, "Enviado"),
+        (STATUS_FAILED, "Fallido"),
+    ]
+    client = models.ForeignKey(
+        ATSClient,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="outbound_emails",
+    )
+    # True = enviar con el SMTP propio del cliente (ATSClientEmailConfig); False = SMTP global.
+    use_client_smtp = models.BooleanField("Usar SMTP del cliente", default=False)
+    subject = models.CharField("Asunto", max_length=255)
+    body = models.TextField("Cuerpo (texto)")
+    html_body = models.TextField("Cuerpo (HTML)", blank=True)
+    from_email = models.CharField("Remitente", max_length=320, blank=True)
+    to = models.JSONField("Destinatarios", default=list)
+    reply_to = models.JSONField("Responder a", default=list, blank=True)
+    status = models.CharField("Estado", max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField("Intentos", default=0)
+    next_attempt_at = models.DateTimeField("Próximo intento", default=timezone.now)
+    last_error = models.TextField("Último error", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField("Enviado", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Correo en cola"
+        verbose_name_plural = "Correos en cola"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_status_next_idx"),
+            models.Index(fields=["client", "sent_at"], name="outbox_client_sent_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.to)} ({self.get_status_display()})"
+
+
 # --- Planes y facturación ---
 
 class Subscription(models.Model):
@@ -316,6 +444,8 @@ class Vacancy(models.Model):
         help_text="Indica si el análisis de CV con IA está activado para esta vacante.",
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # El índice de ruteo del correo entrante detecta cambios de título por esta fecha.
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Vacante"
@@ -616,6 +746,14 @@ class Candidate(models.Model):
         help_text="Por qué es apto / no apto en lenguaje humano.",
     )
     cv_file = models.FileField("Archivo CV", upload_to=candidate_cv_upload_to, blank=True, null=True)
+    cv_blob = models.ForeignKey(
+        "StoredBlob",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Blob del CV",
+    )
     public_id = models.UUIDField("ID público", default=uuid_lib.uuid4, unique=True, editable=False)
     raw_text = models.TextField("Texto extraído del CV (OCR)", blank=True)
 
@@ -826,16 +964,31 @@ class ATSFormSubmission(models.Model):
     # Datos enviados: {"field_label_or_id": "value", ...}; archivos por FieldFile ref o path
     payload = models.JSONField("Datos enviados", default=dict)
     submitter_email = models.EmailField("Correo del remitente", blank=True)
+    # Correo en minúsculas y sin espacios; NULL = sin correo (los NULL no chocan en la unicidad,
+    # así la restricción no necesita ser parcial y aplica también en MySQL).
+    normalized_email = models.CharField("Correo normalizado", max_length=254, null=True, blank=True, editable=False)
     submitted_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = "Envío de formulario"
         verbose_name_plural = "Envíos de formularios"
         ordering = ["-submitted_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["form", "normalized_email"], name="unique_form_submission_email"),
+        ]
 
     def __str__(self):
         return f"{self.form.name} — {self.submitter_email or 'Anónimo'} ({self.submitted_at.date()})"
 
+    def save(self, *args, **kwargs):
+        # Solo al crear o al cambiar el correo: los duplicados históricos conservan normalized_email NULL.
+        update_fields = kwargs.get("update_fields")
+        if self._state.adding or (update_fields is not None and "submitter_email" in update_fields):
+            self.normalized_email = (self.submitter_email or "").strip().lower() or None
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "normalized_email"}
+        super().save(*args, **kwargs)
+
 
 class ATSFormSubmissionFile(models.Model):
     """Archivo adjunto en un envío de formulario (ej. CV subido por el candidato)."""
@@ -853,12 +1006,94 @@ class ATSFormSubmissionFile(models.Model):
     )
     file = models.FileField("Archivo", upload_to=submission_file_upload_to)
     original_name = models.CharField("Nombre original", max_length=255, blank=True)
+    blob = models.ForeignKey(
+        "StoredBlob",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Blob",
+    )
 
     class Meta:
         verbose_name = "Archivo de envío"
         verbose_name_plural = "Archivos de envíos"
 
 
+class ATSFormUpload(models.Model):
+    """
+    Subida por partes (reanudable) de un archivo para un formulario público.
+    El navegador envía el archivo en chunks directo a storage y el POST del
+    formulario solo entrega el token de la subida completada.
+    """
+    STATUS_UPLOADING = "uploading"
+    STATUS_ASSEMBLING = "assembling"
+    STATUS_COMPLETED = "completed"
+    STATUS_ATTACHED = "attached"
+    STATUS_CHOICES = [
+        (STATUS_UPLOADING, "Subiendo"),
+        (STATUS_ASSEMBLING, "Ensamblando"),
+        (STATUS_COMPLETED, "Completada"),
+        (STATUS_ATTACHED, "Adjuntada"),
+    ]
+    form = models.ForeignKey(
+        ATSForm,
+        on_delete=models.CASCADE,
+        related_name="uploads",
+    )
+    token = models.UUIDField("Token", default=uuid_lib.uuid4, unique=True, editable=False)
+    original_name = models.CharField("Nombre original", max_length=255)
+    total_size = models.PositiveBigIntegerField("Tamaño total (bytes)")
+    received_size = models.PositiveBigIntegerField("Bytes recibidos", default=0)
+    parts = models.JSONField("Partes en storage", default=list, blank=True)
+    storage_name = models.CharField("Archivo en storage", max_length=500, blank=True)
+    blob = models.ForeignKey(
+        "StoredBlob",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Blob",
+    )
+    status = models.CharField("Estado", max_length=20, choices=STATUS_CHOICES, default=STATUS_UPLOADING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Subida de archivo"
+        verbose_name_plural = "Subidas de archivos"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.original_name} ({self.received_size}/{self.total_size}) — {self.get_status_display()}"
+
+    @property
+    def is_complete(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_ATTACHED)
+
+
+class StoredBlob(models.Model):
+    """
+    Contenido de archivo guardado una sola vez, identificado por su SHA-256.
+    Adjuntos de envíos, subidas del chat y CVs de candidatos apuntan al mismo
+    objeto en storage; `ref_count` cuenta las filas que lo referencian y el
+    archivo se borra cuando se elimina la última.
+    """
+    sha256 = models.CharField("SHA-256", max_length=64, unique=True)
+    storage_name = models.CharField("Archivo en storage", max_length=500)
+    size = models.PositiveBigIntegerField("Tamaño (bytes)", default=0)
+    ref_count = models.PositiveIntegerField("Referencias", default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Blob de archivo"
+        verbose_name_plural = "Blobs de archivos"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} — {self.storage_name} ({self.ref_count} ref.)"
+
+
 class ATSFormCriterion(models.Model):
     """Criterio de evaluación manual del formulario (ej. 'Experiencia en Python', 'Inglés B2')."""
     form = models.ForeignKey(
@@ -948,6 +1183,7 @@ class FormChatSession(models.Model):
         ordering = ["-updated_at"]
         indexes = [
             models.Index(fields=["form", "source", "telegram_user_id"], name="chat_form_src_tg_idx"),
+            models.Index(fields=["form", "updated_at"], name="chat_form_updated_idx"),
         ]
 
     def __str__(self):
@@ -960,6 +1196,358 @@ class FormChatSession(models.Model):
         super().save(*args, **kwargs)
 
 
+class FormChatSessionArchive(models.Model):
+    """
+    Sesión de chat completada y archivada por `reap_chat_sessions`: solo el snapshot de
+    respuestas y los datos que muestran el detalle del candidato y el control de
+    duplicados de Telegram. Expone los mismos atributos de lectura que FormChatSession.
+    """
+    form = models.ForeignKey(
+        ATSForm,
+        on_delete=models.CASCADE,
+        related_name="archived_chat_sessions",
+    )
+    session_uuid = models.UUIDField("UUID de sesión", unique=True)
+    source = models.CharField("Origen", max_length=20, choices=FormChatSession.SOURCE_CHOICES)
+    telegram_user_id = models.BigIntegerField("ID de usuario en Telegram", null=True, blank=True)
+    candidate_name = models.CharField("Nombre del candidato", max_length=200, blank=True)
+    candidate_email = models.EmailField("Email del candidato", blank=True)
+    total_steps = models.PositiveSmallIntegerField("Total de pasos", default=0)
+    answers = models.JSONField("Respuestas", default=dict)
+    ip_address = models.GenericIPAddressField("IP", null=True, blank=True)
+    submission = models.OneToOneField(
+        ATSFormSubmission,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_chat_session",
+    )
+    started_at = models.DateTimeField("Inicio")
+    completed_at = models.DateTimeField("Completada", null=True, blank=True)
+    archived_at = models.DateTimeField("Archivada", auto_now_add=True)
+
+    status = FormChatSession.STATUS_COMPLETED
+
+    class Meta:
+        verbose_name = "Sesión de chat archivada"
+        verbose_name_plural = "Sesiones de chat archivadas"
+        indexes = [
+            models.Index(fields=["form", "source", "telegram_user_id"], name="chat_arch_form_src_tg_idx"),
+        ]
+
+    def __str__(self):
+        return f"Chat archivado {self.session_uuid!s:.8} — {self.form_id}"
+
+    @property
+    def current_step(self):
+        return self.total_steps
+
+    @property
+    def updated_at(self):
+        return self.completed_at
+
+    def get_status_display(self):
+        return dict(FormChatSession.STATUS_CHOICES)[FormChatSession.STATUS_COMPLETED]
+
+
+class FormChatAnswer(models.Model):
+    """
+    Respuesta de un paso del chat (web o Telegram), solo de inserción.
+    Cada paso es un INSERT en vez de reescribir `FormChatSession.answers`; al finalizar
+    se materializa el snapshot en `answers` (ver mi_app.services.chat_answers).
+    """
+    session = models.ForeignKey(
+        FormChatSession,
+        on_delete=models.CASCADE,
+        related_name="answer_events",
+    )
+    step_id = models.CharField("Paso", max_length=64)
+    value = models.JSONField("Valor", null=True, blank=True)
+    # Archivo subido en el paso: {"path", "name", "blob"} (antes answers["_pending_files"]).
+    attachment = models.JSONField("Archivo", null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Respuesta de chat"
+        verbose_name_plural = "Respuestas de chat"
+        indexes = [
+            models.Index(fields=["session", "id"], name="chat_answer_session_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.step_id} ({self.session_id})"
+
+
+class ChatFinalization(models.Model):
+    """
+    Cierre diferido de una sesión de chat (web o Telegram). Al completar el chat solo se
+    crea el envío y esta fila; el worker `process_chat_finalizations` adjunta archivos,
+    crea el candidato, corre el análisis y notifica, etapa por etapa. Única por sesión:
+    un reintento o una caída a mitad de camino retoma la etapa pendiente sin duplicar.
+    """
+    STAGE_FILES = "files"
+    STAGE_CANDIDATE = "candidate"
+    STAGE_ANALYSIS = "analysis"
+    STAGE_NOTIFY = "notify"
+    STAGE_DONE = "done"
+    STAGE_CHOICES = [
+        (STAGE_FILES, "Adjuntar archivos"),
+        (STAGE_CANDIDATE, "Crear candidato"),
+        (STAGE_ANALYSIS, "Análisis de CV"),
+        (STAGE_NOTIFY, "Notificar"),
+        (STAGE_DONE, "Completado"),
+    ]
+    STATUS_PENDING = "pending"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pendiente"),
+        (STATUS_DONE, "Completado"),
+        (STATUS_FAILED, "Fallido"),
+    ]
+    session_uuid = models.UUIDField("Sesión", unique=True)
+    submission = models.OneToOneField(
+        ATSFormSubmission,
+        on_delete=models.CASCADE,
+        related_name="chat_finalization",
+    )
+    source = models.CharField("Origen", max_length=20, default="web")
+    # payload, correo, archivos pendientes y nombre de Telegram tomados al confirmar el envío.
+    data = models.JSONField("Datos", default=dict, blank=True)
+    stage = models.CharField("Etapa", max_length=20, choices=STAGE_CHOICES, default=STAGE_FILES)
+    status = models.CharField("Estado", max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField("Intentos", default=0)
+    next_attempt_at = models.DateTimeField("Próximo intento", default=timezone.now)
+    last_error = models.TextField("Último error", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField("Completado", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Cierre de chat"
+        verbose_name_plural = "Cierres de chat"
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="chat_final_status_next_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.session_uuid} ({self.get_stage_display()})"
+
+
+class TelegramUpdate(models.Model):
+    """
+    Update de Telegram recibido por webhook, pendiente de procesar por un worker del bot.
+    `partition_key` (id del chat) decide qué réplica lo procesa, así los updates de un
+    chat se atienden en orden y nunca en dos réplicas a la vez.
+    """
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_DONE = "done"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pendiente"),
+        (STATUS_PROCESSING, "Procesando"),
+        (STATUS_DONE, "Procesado"),
+    ]
+    update_id = models.BigIntegerField("Update ID", unique=True)
+    partition_key = models.BigIntegerField("Clave de partición", default=0)
+    payload = models.JSONField("Update", default=dict)
+    status = models.CharField("Estado", max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    locked_until = models.DateTimeField("Reservado hasta", null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField("Procesado", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Update de Telegram"
+        verbose_name_plural = "Updates de Telegram"
+        indexes = [
+            models.Index(fields=["status", "update_id"], name="tg_update_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.update_id} ({self.get_status_display()})"
+
+
+class TelegramBotState(models.Model):
+    """Persistencia del bot (user_data y estados de ConversationHandler) para reinicios y webhook."""
+    KIND_USER = "user"
+    KIND_CONVERSATION = "conversation"
+    KIND_CHOICES = [
+        (KIND_USER, "Datos de usuario"),
+        (KIND_CONVERSATION, "Conversación"),
+    ]
+    kind = models.CharField("Tipo", max_length=20, choices=KIND_CHOICES)
+    # Conversaciones: "<nombre>:<chat_id>:<user_id>"; usuarios: "<user_id>".
+    key = models.CharField("Clave", max_length=200)
+    partition_key = models.BigIntegerField("Clave de partición", default=0)
+    data = models.JSONField("Datos", null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Estado del bot de Telegram"
+        verbose_name_plural = "Estados del bot de Telegram"
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "key"], name="unique_telegram_bot_state"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.key}"
+
+
+class IMAPMailboxCheckpoint(models.Model):
+    """
+    Último UID procesado de un buzón IMAP (worker process_incoming_emails). Si el servidor
+    cambia UIDVALIDITY los UID anteriores dejan de valer y el buzón se vuelve a leer desde
+    los no leídos. Mientras esa primera lectura no termina (más no leídos que --max-emails)
+    `bootstrapping` sigue activo y el siguiente ciclo continúa con los no leídos posteriores
+    a `last_uid`, sin tomar como nuevos los ya leídos. Un correo que falla en cada intento
+    se cuenta en `failed_uid` / `failed_attempts` y, al llegar a
+    ORBITA_IMAP_MESSAGE_MAX_ATTEMPTS, se omite para no bloquear el resto del buzón.
+    """
+    host = models.CharField("Servidor", max_length=255)
+    port = models.PositiveIntegerField("Puerto", default=993)
+    user = models.CharField("Usuario", max_length=255)
+    folder = models.CharField("Carpeta", max_length=120, default="INBOX")
+    uidvalidity = models.BigIntegerField("UIDVALIDITY")
+    last_uid = models.BigIntegerField("Último UID", default=0)
+    failed_uid = models.BigIntegerField("UID con error", null=True, blank=True)
+    failed_attempts = models.PositiveIntegerField("Intentos fallidos", default=0)
+    bootstrapping = models.BooleanField("Leyendo no leídos", default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Checkpoint de buzón IMAP"
+        verbose_name_plural = "Checkpoints de buzones IMAP"
+        constraints = [
+            models.UniqueConstraint(fields=["host", "port", "user", "folder"], name="unique_imap_checkpoint"),
+        ]
+
+    def __str__(self):
+        return f"{self.user}@{self.host}/{self.folder} ({self.last_uid})"
+
+
+class ProcessedIncomingEmail(models.Model):
+    """
+    Ledger de correos entrantes ya convertidos en postulación (worker process_incoming_emails).
+    Se guarda en la misma transacción que el envío: si el worker cae antes de marcar el
+    correo como leído, la siguiente lectura (o un replay) lo reconoce y no lo duplica.
+    """
+    OUTCOME_CREATED = "created"
+    OUTCOME_DUPLICATE = "duplicate"
+    OUTCOME_CHOICES = [
+        (OUTCOME_CREATED, "Envío creado"),
+        (OUTCOME_DUPLICATE, "Postulante repetido"),
+    ]
+    mailbox = models.CharField("Buzón", max_length=400)
+    # Message-ID del correo; si no trae, "sha256:<content_hash>".
+    message_key = models.CharField("Clave del mensaje", max_length=255)
+    content_hash = models.CharField("Hash de contenido", max_length=64)
+    uid = models.BigIntegerField("UID", null=True, blank=True)
+    subject = models.CharField("Asunto", max_length=255, blank=True)
+    from_email = models.CharField("Remitente", max_length=254, blank=True)
+    outcome = models.CharField("Resultado", max_length=20, choices=OUTCOME_CHOICES)
+    submission = models.ForeignKey(
+        "ATSFormSubmission",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="incoming_emails",
+    )
+    processed_at = models.DateTimeField("Procesado", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Correo entrante procesado"
+        verbose_name_plural = "Correos entrantes procesados"
+        ordering = ["-processed_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["mailbox", "message_key"], name="unique_processed_email"),
+        ]
+
+    def __str__(self):
+        return f"{self.mailbox} {self.message_key}"
+
+
+class DocumentExtractionJob(models.Model):
+    """
+    Lote de documentos enviado a POST /api/documents/extract/batch/. El cliente consulta
+    el avance con `public_id`; los archivos los procesa el worker `process_document_jobs`.
+    """
+    public_id = models.UUIDField("ID público", default=uuid_lib.uuid4, unique=True, editable=False)
+    total = models.PositiveSmallIntegerField("Documentos", default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Lote de extracción de documentos"
+        verbose_name_plural = "Lotes de extracción de documentos"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Lote {self.public_id!s:.8} ({self.total} documentos)"
+
+
+class DocumentExtractionItem(models.Model):
+    """Documento de un lote. El archivo vive en storage solo hasta que se procesa."""
+    STATUS_PENDING = "pending"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pendiente"),
+        (STATUS_DONE, "Listo"),
+        (STATUS_FAILED, "Fallido"),
+    ]
+    job = models.ForeignKey(DocumentExtractionJob, on_delete=models.CASCADE, related_name="items")
+    position = models.PositiveSmallIntegerField("Posición", default=0)
+    document_type = models.CharField("Tipo de documento", max_length=30)
+    filename = models.CharField("Nombre original", max_length=255)
+    content_type = models.CharField("Tipo MIME", max_length=100, blank=True)
+    sha256 = models.CharField("SHA-256", max_length=64)
+    storage_name = models.CharField("Archivo en storage", max_length=500, blank=True)
+    status = models.CharField("Estado", max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # True si el resultado salió de la caché de resultados sin llamar a Vision.
+    cached = models.BooleanField("Desde caché", default=False)
+    result = models.JSONField("Datos extraídos", null=True, blank=True)
+    error = models.TextField("Error", blank=True)
+    attempts = models.PositiveIntegerField("Intentos", default=0)
+    next_attempt_at = models.DateTimeField("Próximo intento", default=timezone.now)
+    finished_at = models.DateTimeField("Terminado", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Documento de lote"
+        verbose_name_plural = "Documentos de lotes"
+        ordering = ["job", "position"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="docitem_status_next_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.get_status_display()})"
+
+
+class DocumentExtractionResult(models.Model):
+    """
+    Caché de resultados de Vision por (SHA-256 del archivo, tipo de documento, versión de
+    prompt): el mismo documento reenviado se responde sin volver a gastar tokens.
+    """
+    sha256 = models.CharField("SHA-256", max_length=64)
+    document_type = models.CharField("Tipo de documento", max_length=30)
+    prompt_version = models.CharField("Versión de prompt", max_length=32)
+    data = models.JSONField("Datos extraídos")
+    hits = models.PositiveIntegerField("Reutilizado", default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Resultado de extracción en caché"
+        verbose_name_plural = "Resultados de extracción en caché"
+        ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["sha256", "document_type", "prompt_version"],
+                name="unique_document_extraction_result",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.document_type} {self.sha256[:12]} v{self.prompt_version}"
+
+
 class ATSCandidateCriterionResponse(models.Model):
     """Respuesta manual: si el candidato cumple o no cumple cada criterio (para calcular score)."""
     candidate = models.ForeignKey(
@@ -1,23 +1,102 @@
 """
 Helper para crear notificaciones ATS (in-app) y enviar email al correo de notificaciones.
+Los correos se encolan en el outbox (mi_app.services.email_outbox) y los envía el
+worker `send_outbox_emails`; aquí nunca se abre una conexión SMTP.
 """
 import html
 import logging
+from datetime import timedelta
+
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
 from django.urls import reverse
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
-# Máximo de notificaciones por cliente; las más antiguas se eliminan para no inflar el conteo
+# Máximo de notificaciones por cliente; las más antiguas las elimina el comando prune_notifications
 NOTIFICATIONS_MAX_PER_CLIENT = 200
 
 
-def notify_orbita_client(client, notification_type, title, message="", link="", request=None):
+# Tipos que se agrupan en un resumen cuando el cliente eligió una ventana (digest).
+DIGEST_LABELS = {
+    "candidate": ("Nuevo candidato", "nuevos candidatos"),
+    "submission": ("Nuevo envío", "nuevos envíos"),
+}
+# Líneas máximas por correo de resumen; el asunto siempre lleva el total.
+DIGEST_MAX_LINES = 50
+
+# Datos de la campana (context processor): una entrada de caché por cliente y versión.
+# La versión vive en la fila de ATSNotificationCounter (BD), no en la caché: la caché es
+# local a cada proceso (LocMem) y así un cambio hecho por un worker u otro proceso web
+# invalida la campana en todos. Cada cambio sube la versión en la misma transacción y la
+# entrada anterior simplemente deja de leerse.
+NOTIFICATION_CONTEXT_SIZE = 10
+NOTIFICATION_CONTEXT_TIMEOUT = 60 * 60
+
+
+def bump_notification_version(client_id):
+    """Invalida los datos de la campana del cliente (en la transacción en curso)."""
+    from mi_app.models import ATSNotificationCounter
+
+    if not ATSNotificationCounter.objects.filter(client_id=client_id).update(version=F("version") + 1):
+        recount_unread(client_id)
+
+
+def _counter_state(client_id):
+    """(no leídas, versión) del contador del cliente; lo crea si aún no existe."""
+    from mi_app.models import ATSNotificationCounter
+
+    rows = ATSNotificationCounter.objects.filter(client_id=client_id).values_list("unread", "version")
+    state = rows.first()
+    if state is None:
+        recount_unread(client_id)
+        state = rows.first() or (0, 0)
+    return state
+
+
+def get_notification_context(client, subscription=None):
+    """
+    Últimas notificaciones, no leídas y módulos del cliente. Una consulta al contador por
+    request (no leídas + versión); lo demás sale de la caché mientras la versión no cambie.
+    """
+    from mi_app.models import ATSNotification
+    from mi_app.orbita_plans import get_subscription_module_flags
+
+    unread, version = _counter_state(client.pk)
+    key = f"orbita_notif_ctx:{client.pk}:{version}"
+    data = cache.get(key)
+    if data is None:
+        data = {
+            "notifications": list(ATSNotification.objects.filter(client=client)[:NOTIFICATION_CONTEXT_SIZE]),
+            "modules": get_subscription_module_flags(subscription),
+        }
+        cache.set(key, data, NOTIFICATION_CONTEXT_TIMEOUT)
+    return {**data, "unread_count": unread}
+
+
+def get_admin_plan_requests_context():
+    """Solicitudes de cambio de plan pendientes (campana de staff). Sin caché: solo la ve staff."""
+    from mi_app.models import PlanChangeRequest
+
+    pending = PlanChangeRequest.objects.filter(status=PlanChangeRequest.STATUS_PENDING)
+    return {
+        "notifications": list(pending.select_related("client").order_by("-created_at")[:NOTIFICATION_CONTEXT_SIZE]),
+        "unread_count": pending.count(),
+    }
+
+
+def notify_orbita_client(client, notification_type, title, message="", link="", request=None, base_url=""):
     """
     Crea una notificación in-app para el cliente y, si tiene notification_email
-    configurado, envía un correo.
-    Mantiene solo las últimas NOTIFICATIONS_MAX_PER_CLIENT por cliente (borra las más viejas).
+    configurado, encola un correo en la misma transacción.
+    Si el cliente eligió resumen (notification_digest_minutes), los envíos y candidatos
+    de la misma ventana se agrupan en una sola notificación "N nuevos candidatos" y un
+    solo correo programado al cierre de la ventana.
+    La retención (últimas NOTIFICATIONS_MAX_PER_CLIENT por cliente) corre aparte en prune_notifications.
 
     - client: Orbita client
     - notification_type: ATSNotification.TYPE_* (submission, candidate, plan, cvs_limit)
@@ -25,47 +104,49 @@ def notify_orbita_client(client, notification_type, title, message="", link="",
     - message: str (opcional)
     - link: str (URL absoluta o path; si es path se puede construir con request)
     - request: HttpRequest opcional, para construir URL absoluta en el email
+    - base_url: origen absoluto (https://dominio) para el email cuando no hay request, p. ej.
+      desde un worker; si falta se usa ORBITA_SITE_URL
     """
-    from mi_app.models import ATSNotification, ATSClientEmailConfig
+    from mi_app.models import ATSClientEmailConfig
 
-    notification = ATSNotification.objects.create(
-        client=client,
-        type=notification_type,
-        title=title,
-        message=message or "",
-        link=link or "",
-        read=False,
-    )
-
-    # Limpieza: mantener solo las últimas N por cliente para que el conteo no explote
-    ids_to_keep = list(
-        ATSNotification.objects.filter(client=client)
-        .order_by("-created_at")
-        .values_list("pk", flat=True)[:NOTIFICATIONS_MAX_PER_CLIENT]
-    )
-    if len(ids_to_keep) >= NOTIFICATIONS_MAX_PER_CLIENT:
-        ATSNotification.objects.filter(client=client).exclude(pk__in=ids_to_keep).delete()
-
-    try:
+    with transaction.atomic():
         config = getattr(client, "email_config", None)
         if not config:
             config = ATSClientEmailConfig.objects.filter(client=client).first()
-        if not config or not getattr(config, "notification_email", None):
+        to_email = (getattr(config, "notification_email", "") or "").strip() if config else ""
+        window = int(getattr(config, "notification_digest_minutes", 0) or 0) if config else 0
+
+        if window and notification_type in DIGEST_LABELS:
+            notification = _add_to_open_digest(client, notification_type, title, message, link)
+            if notification:
+                return notification
+
+        notification = _create_notification(client, notification_type, title, message, link)
+        if window and notification_type in DIGEST_LABELS:
+            notification.digest_until = timezone.now() + timedelta(minutes=window)
+            if to_email:
+                notification.digest_email = _enqueue_notification_email(
+                    client, to_email, title, _digest_line(title, message), send_at=notification.digest_until
+                )
+            notification.save(update_fields=["digest_until", "digest_email"])
             return notification
-
-        to_email = config.notification_email.strip()
         if not to_email:
             return notification
 
         # Construir URL absoluta para el enlace en el correo
+        base_url = (base_url or getattr(settings, "ORBITA_SITE_URL", "") or "").rstrip("/")
         if link and request and not link.startswith("http"):
             full_url = request.build_absolute_uri(link)
+        elif link and base_url and not link.startswith("http"):
+            full_url = base_url + link
         elif link:
             full_url = link
         else:
             full_url = ""
         if full_url and request:
             dashboard = request.build_absolute_uri(reverse("orbita_dashboard"))
+        elif full_url and base_url:
+            dashboard = base_url + reverse("orbita_dashboard")
         else:
             dashboard = ""
 
@@ -76,17 +157,203 @@ def notify_orbita_client(client, notification_type, title, message="", link="",
             email_body += f"Ver: {full_url}\n"
         elif dashboard:
             email_body += f"Panel ATS: {dashboard}\n"
+        _enqueue_notification_email(client, to_email, title, email_body)
+
+    return notification
 
-        send_mail(
-            subject=f"[ATS] {title}",
-            message=email_body,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[to_email],
-            fail_silently=True,
-        )
-    except Exception as e:
-        logger.warning("Orbita notify email failed: %s", e)
 
+def _create_notification(client, notification_type, title, message, link):
+    """Un INSERT más el ajuste del contador por PK; la retención la hace `prune_notifications`."""
+    from mi_app.models import ATSNotification
+
+    notification = ATSNotification.objects.create(
+        client=client,
+        type=notification_type,
+        title=title,
+        message=message or "",
+        link=link or "",
+        read=False,
+    )
+    _bump_unread(client.pk, 1)
+    bump_notification_version(client.pk)
+    _publish_notification(client.pk, notification)
+    return notification
+
+
+def _bump_unread(client_id, delta):
+    from mi_app.models import ATSNotificationCounter
+
+    updated = ATSNotificationCounter.objects.filter(client_id=client_id).update(
+        unread=Greatest(F("unread") + delta, 0)
+    )
+    if not updated:
+        recount_unread(client_id)
+
+
+def recount_unread(client_id):
+    """Recalcula el contador de no leídas desde la tabla (creación perezosa y reconciliación)."""
+    from mi_app.models import ATSNotification, ATSNotificationCounter
+
+    unread = ATSNotification.objects.filter(client_id=client_id, read=False).count()
+    try:
+        with transaction.atomic():
+            ATSNotificationCounter.objects.update_or_create(client_id=client_id, defaults={"unread": unread})
+    except IntegrityError:
+        ATSNotificationCounter.objects.filter(client_id=client_id).update(unread=unread)
+    return unread
+
+
+def get_unread_count(client):
+    from mi_app.models import ATSNotificationCounter
+
+    unread = ATSNotificationCounter.objects.filter(client=client).values_list("unread", flat=True).first()
+    if unread is None:
+        return recount_unread(client.pk)
+    return unread
+
+
+def mark_notification_read(notification):
+    """Marca una notificación como leída y descuenta el contador si estaba sin leer."""
+    from mi_app.models import ATSNotification
+
+    if ATSNotification.objects.filter(pk=notification.pk, read=False).update(read=True):
+        _bump_unread(notification.client_id, -1)
+        bump_notification_version(notification.client_id)
+        _publish_notification(notification.client_id)
+    notification.read = True
+
+
+def mark_all_notifications_read(client):
+    from mi_app.models import ATSNotification, ATSNotificationCounter
+
+    with transaction.atomic():
+        ATSNotification.objects.filter(client=client, read=False).update(read=True)
+        ATSNotificationCounter.objects.update_or_create(client=client, defaults={"unread": 0})
+        bump_notification_version(client.pk)
+        _publish_notification(client.pk)
+
+
+def _publish_notification(client_id, notification=None):
+    """Evento SSE con el contador actual y, si aplica, la notificación nueva o actualizada."""
+    from mi_app.models import ATSNotificationCounter, OrbitaEvent
+    from mi_app.services.live_events import publish_event
+
+    payload = {
+        "unread_count": ATSNotificationCounter.objects.filter(client_id=client_id)
+        .values_list("unread", flat=True)
+        .first() or 0,
+    }
+    if notification is not None:
+        payload["notification"] = {
+            "id": notification.pk,
+            "type": notification.type,
+            "title": notification.title,
+            "message": notification.message,
+            "link": notification.link,
+            "count": notification.count,
+        }
+    publish_event(client_id, OrbitaEvent.KIND_NOTIFICATION, payload)
+
+
+def prune_notifications(keep=NOTIFICATIONS_MAX_PER_CLIENT, batch_size=1000):
+    """
+    Retención por lotes: deja solo las `keep` notificaciones más recientes por cliente.
+    Solo visita clientes que exceden el límite y reconcilia su contador al final.
+    Retorna cuántas filas se borraron.
+    """
+    from mi_app.models import ATSNotification
+
+    over_limit = (
+        ATSNotification.objects.order_by()
+        .values("client_id")
+        .annotate(total=Count("id"))
+        .filter(total__gt=keep)
+        .values_list("client_id", flat=True)
+    )
+    deleted_total = 0
+    for client_id in list(over_limit):
+        newest = ATSNotification.objects.filter(client_id=client_id).order_by("-pk").values_list("pk", flat=True)
+        cutoff = next(iter(newest[keep:keep + 1]), None)
+        if cutoff is None:
+            continue
+        while True:
+            ids = list(
+                ATSNotification.objects.filter(client_id=client_id, pk__lte=cutoff)
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            deleted, _ = ATSNotification.objects.filter(pk__in=ids).delete()
+            deleted_total += deleted
+        recount_unread(client_id)
+        bump_notification_version(client_id)
+    return deleted_total
+
+
+def _enqueue_notification_email(client, to_email, title, body, send_at=None):
+    from mi_app.services.email_outbox import enqueue_email
+
+    return enqueue_email(
+        subject=f"[ATS] {title}",
+        body=body,
+        to=[to_email],
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        client=client,
+        send_at=send_at,
+    )
+
+
+def _digest_line(title, message):
+    return f"- {title}: {message}\n" if message else f"- {title}\n"
+
+
+def _add_to_open_digest(client, notification_type, title, message, link):
+    """
+    Suma el evento a la notificación de resumen abierta (misma ventana, sin leer).
+    Retorna la notificación o None si no hay ventana abierta.
+    """
+    from mi_app.models import ATSNotification, OutboundEmail
+
+    now = timezone.now()
+    notification = (
+        ATSNotification.objects.select_for_update()
+        .filter(client=client, type=notification_type, read=False, digest_until__gt=now)
+        .order_by("-created_at")
+        .first()
+    )
+    if not notification:
+        return None
+
+    count = notification.count + 1
+    summary = f"{count} {DIGEST_LABELS[notification_type][1]}"
+    if notification.digest_email_id:
+        email = OutboundEmail.objects.filter(pk=notification.digest_email_id).first()
+        body = email.body if email else ""
+        if count <= DIGEST_MAX_LINES:
+            body += _digest_line(title, message)
+        elif count == DIGEST_MAX_LINES + 1:
+            body += f"(Se muestran los primeros {DIGEST_MAX_LINES}; revisa el panel para ver todos.)\n"
+        # Solo se edita mientras el worker no lo haya tomado; si ya salió, se abre una ventana nueva.
+        updated = OutboundEmail.objects.filter(
+            pk=notification.digest_email_id,
+            status=OutboundEmail.STATUS_PENDING,
+            next_attempt_at=notification.digest_until,
+        ).update(subject=f"[ATS] {summary}", body=body)
+        if not updated:
+            notification.digest_until = now
+            notification.save(update_fields=["digest_until"])
+            return None
+
+    notification.count = count
+    notification.title = summary[:200]
+    notification.message = message or ""
+    if notification_type == ATSNotification.TYPE_CANDIDATE:
+        notification.link = reverse("orbita_dashboard")
+    else:
+        notification.link = link or notification.link
+    notification.save(update_fields=["count", "title", "message", "link"])
+    bump_notification_version(client.pk)
+    _publish_notification(client.pk, notification)
     return notification
 
 
@@ -178,14 +445,15 @@ Plan solicitado: {new_name} ({new_plan_id})
 </body>
 </html>
 """
+    from mi_app.services.email_outbox import enqueue_email
+
     try:
-        send_mail(
+        enqueue_email(
             subject=subject,
-            message=body_plain,
+            body=body_plain,
+            to=[to_email],
             from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[to_email],
-            html_message=body_html,
-            fail_silently=True,
+            html_body=body_html,
         )
     except Exception as e:
         logger.warning("Orbita notify_support_plan_change failed: %s", e)
@@ -222,14 +490,15 @@ Proceder con la baja/eliminación desde el administrador si corresponde.
 </table>
 <p style="margin-top: 20px; color: #666;">Proceder con la baja/eliminación desde el administrador si corresponde.</p>
 </body></html>"""
+    from mi_app.services.email_outbox import enqueue_email
+
     try:
-        send_mail(
+        enqueue_email(
             subject=subject,
-            message=body_plain,
+            body=body_plain,
+            to=[to_email],
             from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[to_email],
-            html_message=body_html,
-            fail_silently=True,
+            html_body=body_html,
         )
     except Exception as e:
         logger.warning("Orbita notify_support_account_deletion_request failed: %s", e)
@@ -237,12 +506,12 @@ Proceder con la baja/eliminación desde el administrador si corresponde.
 
 def send_email_to_candidate(client, candidate, email_type, custom_message=None):
     """
-    Envía un correo al candidato: "apto para reclutar" o "no seleccionado" (rechazo).
+    Encola un correo al candidato: "apto para reclutar" o "no seleccionado" (rechazo).
     - client: Orbita client (para from_email desde config)
     - candidate: Candidate (debe tener email)
     - email_type: "apto" o "rechazo"
     - custom_message: str opcional para personalizar el cuerpo.
-    Retorna True si se envió, False si no (sin email, sin SMTP, etc.).
+    Retorna True si quedó en cola, False si no (sin email, sin SMTP, etc.).
     """
     to_email = (candidate.email or "").strip()
     if not to_email or "@" not in to_email:
@@ -258,8 +527,6 @@ def send_email_to_candidate(client, candidate, email_type, custom_message=None):
     smtp_host = (getattr(config, "smtp_host", "") or "").strip()
     smtp_user = (getattr(config, "smtp_user", "") or "").strip()
     smtp_password = (getattr(config, "smtp_password_encrypted", "") or "").strip()
-    smtp_port = int(getattr(config, "smtp_port", 587) or 587)
-    smtp_use_tls = bool(getattr(config, "smtp_use_tls", True))
     if not smtp_host or not smtp_user or not smtp_password:
         logger.warning(
             "send_email_to_candidate: SMTP incompleto para client=%s (host/user/password requeridos)",
@@ -327,25 +594,18 @@ def send_email_to_candidate(client, candidate, email_type, custom_message=None):
   </div>
 </body>
 </html>"""
+    from mi_app.services.email_outbox import enqueue_email
+
     try:
-        from django.core.mail.backends.smtp import EmailBackend
-        connection = EmailBackend(
-            host=smtp_host,
-            port=smtp_port,
-            username=smtp_user,
-            password=smtp_password,
-            use_tls=smtp_use_tls,
-            timeout=getattr(settings, "EMAIL_TIMEOUT", 10),
-            fail_silently=False,
-        )
-        send_mail(
+        # Se envía con el SMTP del cliente desde el worker del outbox.
+        enqueue_email(
             subject=f"[{from_name}] {subject}",
-            message=body,
+            body=body,
+            to=[to_email],
             from_email=from_header,
-            recipient_list=[to_email],
-            html_message=email_body_html,
-            fail_silently=False,
-            connection=connection,
+            html_body=email_body_html,
+            client=client,
+            use_client_smtp=True,
         )
         return True
     except Exception as e:
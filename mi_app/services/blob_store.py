@@ -0,0 +1,253 @@
+"""
+Almacén de archivos direccionado por contenido (SHA-256) con conteo de referencias.
+
+Un mismo CV llega por formulario, chat web, Telegram o correo y luego se liga al
+candidato. En vez de copiarlo en cada paso, el contenido se guarda una sola vez
+como `StoredBlob` y las filas (`ATSFormSubmissionFile.blob`, `Candidate.cv_blob`)
+apuntan a la misma ruta en storage. Cada fila que lo referencia suma una
+referencia; al borrar la última (ver `mi_app.signals`) se elimina el archivo.
+
+La ruta solo depende del hash (`ats/blobs/<sha256>.<ext>`): el mismo contenido puede
+venir de clientes distintos, así que el nombre original vive en cada fila que lo
+referencia (`original_name`) y las descargas usan ese nombre, no el de la ruta.
+
+Las subidas aún sin adjuntar (respuestas del chat, subidas por partes completadas)
+no suman referencias pero cuentan como pendientes: `release` y la limpieza no borran
+un blob que alguna de ellas espera adjuntar. Los blobs sin referencias ni pendientes
+(subidas del chat que nunca se enviaron) se limpian con `collect_orphan_blobs` /
+`manage.py purge_orphan_blobs`.
+"""
+import hashlib
+import logging
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from mi_app.models import (
+    ATSFormSubmissionFile,
+    ATSFormUpload,
+    Candidate,
+    ChatFinalization,
+    FormChatAnswer,
+    FormChatSession,
+    StoredBlob,
+)
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def blob_storage_name(sha256, original_name):
+    """Ruta en storage de un blob: solo el hash y la extensión (sin el nombre de quien lo subió)."""
+    ext = os.path.splitext(original_name or "")[1].lower()
+    if not ext[1:].isalnum() or len(ext) > 10:
+        ext = ""
+    return f"ats/blobs/{sha256[:2]}/{sha256}{ext}"
+
+
+def hash_file(content):
+    """Retorna (sha256, tamaño) leyendo el archivo por bloques."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _hash_stored(storage_name):
+    with default_storage.open(storage_name, "rb") as fh:
+        return hash_file(fh)
+
+
+def _delete_storage(storage_name):
+    try:
+        default_storage.delete(storage_name)
+    except Exception as exc:
+        logger.warning("blob_store: no se pudo borrar %s: %s", storage_name, exc)
+
+
+def _register(sha256, size, storage_name):
+    """Crea la fila del blob. Si otro proceso registró el mismo contenido primero, retorna esa fila."""
+    try:
+        with transaction.atomic():
+            return StoredBlob.objects.create(sha256=sha256, size=size, storage_name=storage_name), True
+    except IntegrityError:
+        return StoredBlob.objects.get(sha256=sha256), False
+
+
+def store_file(content, name=None, sha256=None, size=None):
+    """
+    Guarda `content` en storage salvo que ya exista un blob con el mismo SHA-256.
+    Si el hash ya se calculó al recibir el archivo (p. ej. descarga por streaming), se
+    pasa en `sha256`/`size` y no se vuelve a leer. No suma referencias: usar
+    `attach_to_submission` / `set_candidate_cv`, o guardarlo como subida pendiente
+    (respuesta de chat), que lo protege de la limpieza hasta adjuntarse.
+    """
+    name = name or getattr(content, "name", "") or "archivo"
+    if sha256 is None:
+        sha256, size = hash_file(content)
+    blob = StoredBlob.objects.filter(sha256=sha256).first()
+    if blob:
+        logger.info("blob_store dedup sha256=%s name=%s", sha256[:12], name)
+        return blob
+    saved_name = default_storage.save(blob_storage_name(sha256, name), content)
+    blob, created = _register(sha256, size, saved_name)
+    if not created:
+        _delete_storage(saved_name)
+    return blob
+
+
+def adopt_stored(storage_name, sha256=None, size=None, discard_duplicate=True):
+    """
+    Registra como blob un archivo que ya está en storage, sin copiarlo.
+    Si el contenido ya existía, retorna el blob previo y (por defecto) borra la copia.
+    """
+    if sha256 is None:
+        sha256, size = _hash_stored(storage_name)
+    blob = StoredBlob.objects.filter(sha256=sha256).first()
+    if blob is None:
+        blob, created = _register(sha256, size or 0, storage_name)
+        if created:
+            return blob
+    if discard_duplicate and blob.storage_name != storage_name:
+        _delete_storage(storage_name)
+    return blob
+
+
+def acquire(blob):
+    """Suma una referencia al blob."""
+    updated = StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+    if not updated:
+        raise StoredBlob.DoesNotExist(f"Blob {blob.pk} ya no existe.")
+
+
+def _live_references(blob_id):
+    return (
+        ATSFormSubmissionFile.objects.filter(blob_id=blob_id).count()
+        + Candidate.objects.filter(cv_blob_id=blob_id).count()
+    )
+
+
+def _has_pending_references(blob_id):
+    """
+    True si una subida aún no adjuntada espera este blob: subida por partes completada sin
+    reclamar, o respuesta de chat de una sesión en curso o cuyo cierre no adjuntó archivos.
+    """
+    if ATSFormUpload.objects.filter(blob_id=blob_id, status=ATSFormUpload.STATUS_COMPLETED).exists():
+        return True
+    finalizing = ChatFinalization.objects.filter(stage=ChatFinalization.STAGE_FILES).values("session_uuid")
+    return (
+        FormChatAnswer.objects.filter(attachment__blob=blob_id)
+        .filter(~Q(session__status=FormChatSession.STATUS_COMPLETED) | Q(session__session_uuid__in=finalizing))
+        .exists()
+    )
+
+
+def release(blob_id):
+    """Resta una referencia; al llegar a cero borra la fila y el archivo (tras el commit)."""
+    with transaction.atomic():
+        blob = StoredBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            blob.ref_count -= 1
+            blob.save(update_fields=["ref_count"])
+            return
+        # Si el contador quedó desfasado, se corrige con las referencias reales en vez de borrar.
+        live = _live_references(blob.pk)
+        if live or _has_pending_references(blob.pk):
+            # Una subida pendiente lo adjuntará (y sumará su referencia) al finalizar.
+            blob.ref_count = live
+            blob.save(update_fields=["ref_count"])
+            return
+        storage_name = blob.storage_name
+        blob.delete()
+        transaction.on_commit(lambda: _delete_storage(storage_name))
+    logger.info("blob_store gc sha256=%s path=%s", blob.sha256[:12], storage_name)
+
+
+def attach_to_submission(submission, blob, form_field=None, original_name=""):
+    """Crea el adjunto del envío apuntando al blob (sin copiar el archivo)."""
+    with transaction.atomic():
+        acquire(blob)
+        return ATSFormSubmissionFile.objects.create(
+            submission=submission,
+            form_field=form_field,
+            file=blob.storage_name,
+            original_name=original_name,
+            blob=blob,
+        )
+
+
+def attach_pending_file(submission, file_info, form_field=None):
+    """Adjunta un archivo pendiente del chat (`{"path", "name", "blob"}`) al envío."""
+    blob = None
+    if file_info.get("blob"):
+        blob = StoredBlob.objects.filter(pk=file_info["blob"]).first()
+    if blob is None:
+        # Sesiones iniciadas antes del almacén de blobs: adoptar el archivo ya subido.
+        blob = adopt_stored(file_info["path"])
+    return attach_to_submission(submission, blob, form_field, file_info.get("name", ""))
+
+
+def blob_for_submission_file(sub_file):
+    """Blob del adjunto; a los adjuntos previos al almacén les registra uno sin copiar el archivo."""
+    if sub_file.blob_id:
+        return sub_file.blob
+    legacy_name = sub_file.file.name
+    blob = adopt_stored(legacy_name, discard_duplicate=False)
+    with transaction.atomic():
+        acquire(blob)
+        ATSFormSubmissionFile.objects.filter(pk=sub_file.pk).update(blob=blob, file=blob.storage_name)
+    if blob.storage_name != legacy_name:
+        _delete_storage(legacy_name)
+    sub_file.blob = blob
+    sub_file.file.name = blob.storage_name
+    return blob
+
+
+def set_candidate_cv(candidate, blob):
+    """Liga el blob como CV del candidato y libera el CV anterior."""
+    previous_blob_id = candidate.cv_blob_id
+    if previous_blob_id == blob.pk:
+        return
+    legacy_file = candidate.cv_file if candidate.cv_file and not previous_blob_id else None
+    with transaction.atomic():
+        acquire(blob)
+        if legacy_file:
+            legacy_file.delete(save=False)
+        candidate.cv_file = blob.storage_name
+        candidate.cv_blob = blob
+        candidate.save(update_fields=["cv_file", "cv_blob"])
+        if previous_blob_id:
+            release(previous_blob_id)
+
+
+def delete_if_unreferenced(blob):
+    """Borra el blob (fila y archivo) si nadie lo referencia. Retorna True si se borró."""
+    if blob.ref_count or _live_references(blob.pk) or _has_pending_references(blob.pk):
+        return False
+    with transaction.atomic():
+        deleted, _ = StoredBlob.objects.filter(pk=blob.pk, ref_count=0).delete()
+    if not deleted:
+        return False
+    _delete_storage(blob.storage_name)
+    return True
+
+
+def collect_orphan_blobs(older_than=timedelta(hours=24), dry_run=False):
+    """Borra blobs sin referencias más antiguos que `older_than`. Retorna cuántos se borraron."""
+    cutoff = timezone.now() - older_than
+    removed = 0
+    for blob in StoredBlob.objects.filter(ref_count=0, created_at__lt=cutoff).iterator():
+        if dry_run:
+            removed += not (_live_references(blob.pk) or _has_pending_references(blob.pk))
+        elif delete_if_unreferenced(blob):
+            removed += 1
+    return removed
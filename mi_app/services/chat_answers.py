@@ -0,0 +1,110 @@
+"""
+Respuestas del chat conversacional (web y Telegram) como eventos de solo inserción.
+
+Antes cada paso cargaba la sesión, reescribía todo el JSON `answers` y guardaba todas
+las columnas; dos pasos concurrentes (p. ej. una subida de archivo y una respuesta de
+texto) podían pisarse. Ahora cada paso es un INSERT en `FormChatAnswer` más un UPDATE
+atómico de las columnas de progreso. Las respuestas se leen combinando el JSON previo
+(sesiones antiguas, metadatos `_telegram`) con los eventos, y al finalizar se
+materializa el snapshot en `FormChatSession.answers`.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from mi_app.models import FormChatAnswer, FormChatSession
+from mi_app.services.live_events import publish_session_progress
+
+PENDING_FILES_KEY = "_pending_files"
+
+
+def record_answer(session, step_id, value, attachment=None, candidate_email="", candidate_name=""):
+    """
+    Registra la respuesta del paso y avanza el progreso. Actualiza en `session` los
+    campos de progreso. Retorna True si este paso completó la sesión; con pasos
+    concurrentes solo una llamada obtiene True (y finaliza).
+    """
+    now = timezone.now()
+    updates = {
+        "current_step": Least(F("current_step") + 1, F("total_steps")),
+        "status": FormChatSession.STATUS_IN_PROGRESS,
+        "updated_at": now,
+    }
+    if candidate_email:
+        updates["candidate_email"] = candidate_email
+    if candidate_name:
+        updates["candidate_name"] = candidate_name[:200]
+
+    with transaction.atomic():
+        FormChatAnswer.objects.create(session_id=session.pk, step_id=step_id, value=value, attachment=attachment)
+        FormChatSession.objects.filter(pk=session.pk).exclude(status=FormChatSession.STATUS_COMPLETED).update(**updates)
+        _refresh_progress(session)
+        completed = session.current_step >= session.total_steps and _complete(session, now)
+        _publish(session)
+    return completed
+
+
+def mark_completed(session):
+    """Cierra la sesión (p. ej. correo duplicado). Retorna False si ya estaba completada."""
+    with transaction.atomic():
+        completed = _complete(session, timezone.now())
+        if completed:
+            _publish(session)
+    return completed
+
+
+def _complete(session, now):
+    updated = (
+        FormChatSession.objects.filter(pk=session.pk)
+        .exclude(status=FormChatSession.STATUS_COMPLETED)
+        .update(status=FormChatSession.STATUS_COMPLETED, completed_at=now, updated_at=now)
+    )
+    if updated:
+        session.status = FormChatSession.STATUS_COMPLETED
+        session.completed_at = session.updated_at = now
+    return bool(updated)
+
+
+def _refresh_progress(session):
+    row = FormChatSession.objects.filter(pk=session.pk).values(
+        "current_step", "total_steps", "status", "candidate_email", "candidate_name", "updated_at"
+    ).get()
+    for field, value in row.items():
+        setattr(session, field, value)
+
+
+def _publish(session):
+    client_id = session.form.client_id if FormChatSession.form.is_cached(session) else None
+    publish_session_progress(session, client_id=client_id)
+
+
+def session_answers(session):
+    """Respuestas actuales: JSON de la sesión con los eventos aplicados en orden (el último gana)."""
+    return answers_for_sessions([session])[session.pk]
+
+
+def answers_for_sessions(sessions):
+    """Como `session_answers` para un lote de sesiones, con una sola consulta de eventos. Retorna {pk: answers}."""
+    result = {}
+    pending = {}
+    for session in sessions:
+        result[session.pk] = dict(session.answers or {})
+        pending[session.pk] = dict(result[session.pk].get(PENDING_FILES_KEY) or {})
+    events = FormChatAnswer.objects.filter(session_id__in=list(result)).order_by("id")
+    for session_id, step_id, value, attachment in events.values_list("session_id", "step_id", "value", "attachment"):
+        result[session_id][step_id] = value
+        if attachment:
+            pending[session_id][step_id] = attachment
+    for session_id, files in pending.items():
+        if files:
+            result[session_id][PENDING_FILES_KEY] = files
+    return result
+
+
+def materialize_answers(session):
+    """Guarda el snapshot de respuestas en `session.answers` (al finalizar). Retorna una copia."""
+    answers = session_answers(session)
+    FormChatSession.objects.filter(pk=session.pk).update(answers=answers)
+    session.answers = answers
+    return dict(answers)
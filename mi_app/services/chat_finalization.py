@@ -0,0 +1,250 @@
+"""
+Cierre de sesiones de chat (web y Telegram) en dos partes.
+
+1. `commit_submission` (en el request o en el bot): materializa las respuestas, crea el
+   `ATSFormSubmission` y encola un `ChatFinalization` en la misma transacción. El
+   postulante recibe la confirmación sin esperar archivos, IA ni correos.
+2. `process_finalizations` (worker `manage.py process_chat_finalizations`): avanza cada
+   cierre por etapas — archivos, candidato, análisis de CV, notificación — guardando la
+   etapa al terminar cada una. Tras una caída se retoma la etapa pendiente: el envío, el
+   candidato y la notificación se crean una sola vez (el análisis puede repetirse y
+   reemplaza el resultado anterior).
+
+La clave de idempotencia es el UUID de la sesión.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from mi_app.models import (
+    ATSFormField,
+    ATSNotification,
+    ChatFinalization,
+    FormChatSession,
+)
+from mi_app.services.chat_answers import PENDING_FILES_KEY, materialize_answers
+from mi_app.services.form_submissions import create_submission_once, normalize_submitter_email
+from mi_app.services.work_queue import claim_due, retry_delay
+
+logger = logging.getLogger(__name__)
+
+# Mientras un worker procesa un lote, los cierres quedan reservados este tiempo.
+LEASE_SECONDS = 600
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+# Origen → (etiqueta del título, etiqueta del mensaje) de la notificación al reclutador.
+SOURCE_LABELS = {FormChatSession.SOURCE_TELEGRAM: ("Telegram", "Telegram")}
+DEFAULT_LABELS = ("chat", "Chat")
+
+
+def candidate_name_is_generic(name, email=""):
+    clean = (str(name or "").strip()).lower()
+    if not clean:
+        return True
+    if clean in {"postulante", "candidato", "candidate", "applicant"}:
+        return True
+    if email:
+        local_part = (email.split("@")[0] if "@" in email else "").strip().lower()
+        if local_part and clean == local_part:
+            return True
+    return False
+
+
+def _payload(steps, answers, candidate_email):
+    payload = {}
+    submitter_email = normalize_submitter_email(candidate_email or "")
+    for step in steps:
+        val = answers.get(step["id"], "")
+        if val:
+            payload[step["label"]] = val
+        if step["type"] == "email" and val and not submitter_email:
+            submitter_email = normalize_submitter_email(val)
+    return payload, submitter_email
+
+
+def commit_submission(orbita_form, session, steps, base_url=""):
+    """
+    Parte rápida del cierre. Retorna (submission, duplicate). Si la sesión ya tenía envío
+    (reintento del mismo cierre) retorna ese envío sin crear otro.
+    `base_url` (origen del request web) se guarda para que el correo del worker lleve
+    enlaces absolutos; sin él (Telegram) se usa ORBITA_SITE_URL.
+    """
+    with transaction.atomic():
+        locked = FormChatSession.objects.select_for_update().get(pk=session.pk)
+        if locked.submission_id:
+            return locked.submission, False
+
+        answers = materialize_answers(session)
+        pending_files = answers.pop(PENDING_FILES_KEY, {})
+        payload, submitter_email = _payload(steps, answers, session.candidate_email)
+
+        submission, duplicate = create_submission_once(orbita_form, payload, submitter_email)
+        if duplicate:
+            logger.info(
+                "chat_finalization duplicate form=%s session=%s email=%s",
+                orbita_form.pk, session.session_uuid, submitter_email,
+            )
+            return None, True
+
+        session.submission = submission
+        session.save(update_fields=["submission"])
+        tg_meta = answers.get("_telegram") if isinstance(answers.get("_telegram"), dict) else {}
+        ChatFinalization.objects.create(
+            session_uuid=session.session_uuid,
+            submission=submission,
+            source=session.source,
+            data={
+                "payload": payload,
+                "submitter_email": submitter_email,
+                "pending_files": pending_files,
+                "telegram_name": (tg_meta.get("display_name") or "").strip(),
+                "base_url": (base_url or "").rstrip("/"),
+            },
+        )
+    logger.info("chat_finalization committed form=%s session=%s", orbita_form.pk, session.session_uuid)
+    return submission, False
+
+
+# ──────────────────────────── Etapas ────────────────────────────
+
+def _attach_files(job):
+    from mi_app.services.blob_store import attach_pending_file
+
+    fields = {
+        f"field_{field.pk}": field
+        for field in ATSFormField.objects.filter(form_id=job.submission.form_id)
+    }
+    for step_id, file_info in (job.data.get("pending_files") or {}).items():
+        try:
+            attach_pending_file(job.submission, file_info, fields.get(step_id))
+        except Exception as exc:
+            logger.warning("chat_finalization: could not attach file %s: %s", file_info.get("path"), exc)
+
+
+def _create_candidate(job):
+    from mi_app.views.orbita.orbita_views import _create_candidate_from_submission
+
+    submission = job.submission
+    if submission.candidate_id or not submission.form.vacancy_id:
+        return
+    email = job.data.get("submitter_email", "")
+    candidate = _create_candidate_from_submission(submission, job.data.get("payload") or {}, email, analyze=False)
+    tg_name = job.data.get("telegram_name", "")
+    if candidate and tg_name and candidate_name_is_generic(candidate.name, email):
+        candidate.name = tg_name[:255]
+        candidate.save(update_fields=["name"])
+
+
+def _analyze(job):
+    from mi_app.views.orbita.orbita_views import _auto_analyze_candidate_if_applicable
+
+    if job.submission.candidate_id:
+        _auto_analyze_candidate_if_applicable(job.submission.candidate)
+
+
+def _notify(job):
+    from mi_app.orbita_notifications import notify_orbita_client
+
+    submission = job.submission
+    orbita_form = submission.form
+    title_label, label = SOURCE_LABELS.get(job.source, DEFAULT_LABELS)
+    if orbita_form.vacancy_id:
+        if not submission.candidate_id:
+            return
+        notify_orbita_client(
+            orbita_form.client,
+            ATSNotification.TYPE_CANDIDATE,
+            f"Nuevo candidato ({title_label})",
+            message=f"{submission.candidate.name} — {label} «{orbita_form.name}».",
+            link=reverse("orbita_candidate_detail", args=[submission.candidate.public_id]),
+            base_url=job.data.get("base_url", ""),
+        )
+    else:
+        notify_orbita_client(
+            orbita_form.client,
+            ATSNotification.TYPE_SUBMISSION,
+            f"Nuevo envío ({title_label})",
+            message=f"{label} «{orbita_form.name}»: {job.data.get('submitter_email') or 'Sin correo'}.",
+            link=reverse("orbita_form_submissions", args=[orbita_form.pk]),
+            base_url=job.data.get("base_url", ""),
+        )
+
+
+# Etapa → (función, siguiente etapa, transaccional). El análisis llama a la IA y no
+# se envuelve en la transacción; las demás guardan su efecto junto con el avance.
+STAGES = {
+    ChatFinalization.STAGE_FILES: (_attach_files, ChatFinalization.STAGE_CANDIDATE, True),
+    ChatFinalization.STAGE_CANDIDATE: (_create_candidate, ChatFinalization.STAGE_ANALYSIS, True),
+    ChatFinalization.STAGE_ANALYSIS: (_analyze, ChatFinalization.STAGE_NOTIFY, False),
+    ChatFinalization.STAGE_NOTIFY: (_notify, ChatFinalization.STAGE_DONE, True),
+}
+
+
+def _set_stage(job, stage):
+    job.stage = stage
+    fields = ["stage"]
+    if stage == ChatFinalization.STAGE_DONE:
+        job.status = ChatFinalization.STATUS_DONE
+        job.completed_at = timezone.now()
+        fields += ["status", "completed_at"]
+    job.save(update_fields=fields)
+
+
+def run_finalization(job):
+    """Avanza el cierre desde su etapa actual hasta terminar; una excepción deja la etapa pendiente."""
+    while job.stage != ChatFinalization.STAGE_DONE:
+        step, next_stage, atomic = STAGES[job.stage]
+        if atomic:
+            with transaction.atomic():
+                step(job)
+                _set_stage(job, next_stage)
+        else:
+            step(job)
+            _set_stage(job, next_stage)
+    logger.info("chat_finalization done session=%s submission=%s", job.session_uuid, job.submission_id)
+
+
+def _mark_failure(job, error):
+    job.attempts += 1
+    job.last_error = str(error)[:2000]
+    max_attempts = int(getattr(settings, "ORBITA_CHAT_FINALIZATION_MAX_ATTEMPTS", 5))
+    if job.attempts >= max_attempts:
+        job.status = ChatFinalization.STATUS_FAILED
+    else:
+        job.next_attempt_at = timezone.now() + retry_delay(
+            job.attempts, getattr(settings, "ORBITA_CHAT_FINALIZATION_RETRY_BASE_SECONDS", 30), MAX_RETRY_DELAY
+        )
+    job.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+    logger.warning(
+        "chat_finalization failed session=%s stage=%s attempts=%s error=%s",
+        job.session_uuid, job.stage, job.attempts, error,
+    )
+    return job.status == ChatFinalization.STATUS_FAILED
+
+
+def _claim_batch(batch_size):
+    """Reserva hasta `batch_size` cierres vencidos; otro worker no los toma mientras dure el lease."""
+    ids = claim_due(ChatFinalization.objects.filter(status=ChatFinalization.STATUS_PENDING), batch_size, LEASE_SECONDS)
+    return list(
+        ChatFinalization.objects.filter(pk__in=ids)
+        .select_related("submission__form__client", "submission__form__vacancy", "submission__candidate")
+        .order_by("id")
+    )
+
+
+def process_finalizations(batch_size=20):
+    """Procesa un lote de cierres pendientes. Retorna contadores done/retry/failed."""
+    stats = {"done": 0, "retry": 0, "failed": 0}
+    for job in _claim_batch(batch_size):
+        try:
+            run_finalization(job)
+        except Exception as exc:
+            logger.exception("chat_finalization error session=%s", job.session_uuid)
+            stats["failed" if _mark_failure(job, exc) else "retry"] += 1
+            continue
+        stats["done"] += 1
+    return stats
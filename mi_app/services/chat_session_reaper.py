@@ -0,0 +1,169 @@
+"""
+Mantenimiento de sesiones de chat (web y Telegram).
+
+- Expira sesiones incompletas sin actividad en ORBITA_CHAT_SESSION_TTL_HOURS: borra la
+  sesión, sus respuestas y los archivos subidos que ningún envío ni otra sesión usa.
+- Archiva sesiones completadas con más de ORBITA_CHAT_SESSION_ARCHIVE_DAYS en
+  `FormChatSessionArchive` (solo snapshot de respuestas) y borra la fila viva.
+
+Todo se procesa por lotes de pk para no bloquear la tabla. Ver `manage.py reap_chat_sessions`.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from mi_app.models import (
+    ATSFormSubmissionFile,
+    Candidate,
+    FormChatAnswer,
+    FormChatSession,
+    FormChatSessionArchive,
+    StoredBlob,
+)
+from mi_app.services.blob_store import delete_if_unreferenced
+from mi_app.services.chat_answers import PENDING_FILES_KEY, answers_for_sessions
+
+logger = logging.getLogger(__name__)
+
+
+def _new_stats():
+    return {"expired": 0, "archived": 0, "rows": 0, "files": 0, "bytes": 0}
+
+
+def _batches(queryset, batch_size):
+    """Lotes ordenados por pk; avanza por cursor, así un dry-run no repite el mismo lote."""
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by("pk")[:batch_size])
+        if not batch:
+            return
+        last_pk = batch[-1].pk
+        yield batch
+
+
+def _attachments(sessions):
+    files = []
+    for answers in answers_for_sessions(sessions).values():
+        files.extend(info for info in (answers.get(PENDING_FILES_KEY) or {}).values() if isinstance(info, dict))
+    return files
+
+
+def _discard_blob(blob_id):
+    """Retorna los bytes liberados o None si el blob no se borró."""
+    blob = StoredBlob.objects.filter(pk=blob_id).first()
+    if blob is None:
+        return None
+    # El mismo CV (mismo hash) puede estar pendiente en otra sesión aún viva.
+    if FormChatAnswer.objects.filter(attachment__blob=blob.pk).exists():
+        return None
+    return blob.size if delete_if_unreferenced(blob) else None
+
+
+def _discard_legacy_file(path):
+    """Archivos de `orbita/chat_uploads/` previos al almacén de blobs."""
+    in_use = (
+        ATSFormSubmissionFile.objects.filter(file=path).exists()
+        or Candidate.objects.filter(cv_file=path).exists()
+        or StoredBlob.objects.filter(storage_name=path).exists()
+    )
+    if in_use or not default_storage.exists(path):
+        return None
+    try:
+        size = default_storage.size(path)
+    except Exception:
+        size = 0
+    default_storage.delete(path)
+    return size
+
+
+def _discard_files(files, stats):
+    for info in files:
+        try:
+            if info.get("blob"):
+                freed = _discard_blob(info["blob"])
+            elif info.get("path"):
+                freed = _discard_legacy_file(info["path"])
+            else:
+                continue
+        except Exception as exc:
+            logger.warning("chat_session_reaper: no se pudo borrar %s: %s", info.get("path"), exc)
+            continue
+        if freed is not None:
+            stats["files"] += 1
+            stats["bytes"] += freed or 0
+
+
+def expire_incomplete_sessions(ttl, batch_size=500, dry_run=False, stats=None):
+    stats = stats if stats is not None else _new_stats()
+    cutoff = timezone.now() - ttl
+    stale = FormChatSession.objects.filter(updated_at__lt=cutoff).exclude(status=FormChatSession.STATUS_COMPLETED)
+    for batch in _batches(stale.only("pk", "answers"), batch_size):
+        ids = [s.pk for s in batch]
+        files = _attachments(batch)
+        if dry_run:
+            stats["expired"] += len(ids)
+            stats["rows"] += len(ids) + FormChatAnswer.objects.filter(session_id__in=ids).count()
+            stats["files"] += len(files)
+            continue
+        with transaction.atomic():
+            # Se vuelve a filtrar: una sesión retomada entre la lectura y el borrado se conserva.
+            deleted, per_model = stale.filter(pk__in=ids).delete()
+        stats["expired"] += per_model.get(FormChatSession._meta.label, 0)
+        stats["rows"] += deleted
+        _discard_files(files, stats)
+    return stats
+
+
+def _archive_row(session, answers):
+    answers.pop(PENDING_FILES_KEY, None)
+    return FormChatSessionArchive(
+        form_id=session.form_id,
+        session_uuid=session.session_uuid,
+        source=session.source,
+        telegram_user_id=session.telegram_user_id,
+        candidate_name=session.candidate_name,
+        candidate_email=session.candidate_email,
+        total_steps=session.total_steps,
+        answers=answers,
+        ip_address=session.ip_address,
+        submission_id=session.submission_id,
+        started_at=session.started_at,
+        completed_at=session.completed_at or session.updated_at,
+    )
+
+
+def archive_completed_sessions(older_than, batch_size=500, dry_run=False, stats=None):
+    stats = stats if stats is not None else _new_stats()
+    cutoff = timezone.now() - older_than
+    old = FormChatSession.objects.filter(status=FormChatSession.STATUS_COMPLETED).filter(
+        Q(completed_at__lt=cutoff) | Q(completed_at__isnull=True, updated_at__lt=cutoff)
+    )
+    for batch in _batches(old, batch_size):
+        if dry_run:
+            stats["archived"] += len(batch)
+            continue
+        answers = answers_for_sessions(batch)
+        rows = [_archive_row(session, answers[session.pk]) for session in batch]
+        with transaction.atomic():
+            FormChatSessionArchive.objects.bulk_create(rows, ignore_conflicts=True)
+            deleted, _ = FormChatSession.objects.filter(pk__in=[s.pk for s in batch]).delete()
+        stats["archived"] += len(batch)
+        # Cada sesión archivada deja una fila compacta en lugar de la sesión y sus respuestas.
+        stats["rows"] += deleted - len(batch)
+    return stats
+
+
+def reap_chat_sessions(ttl_hours=None, archive_days=None, batch_size=500, dry_run=False):
+    """Ejecuta expiración y archivado. Retorna sesiones expiradas/archivadas, filas, archivos y bytes liberados."""
+    ttl_hours = ttl_hours or int(getattr(settings, "ORBITA_CHAT_SESSION_TTL_HOURS", 72))
+    archive_days = archive_days or int(getattr(settings, "ORBITA_CHAT_SESSION_ARCHIVE_DAYS", 90))
+    stats = _new_stats()
+    expire_incomplete_sessions(timedelta(hours=ttl_hours), batch_size, dry_run, stats)
+    archive_completed_sessions(timedelta(days=archive_days), batch_size, dry_run, stats)
+    logger.info("chat_session_reaper %s", stats)
+    return stats
@@ -0,0 +1,325 @@
+"""
+Subidas por partes (reanudables) para formularios públicos y chat web.
+
+El navegador envía el archivo en chunks pequeños; cada chunk se escribe directo
+en default_storage como una parte, de modo que ningún worker queda bloqueado
+durante toda la subida de una conexión lenta. Al recibir el último byte la
+subida pasa a "ensamblando" y, ya confirmada la transacción (sin el bloqueo de la
+fila), las partes se copian a la ruta final de `form_uploads`, el archivo se
+registra en el almacén de blobs (deduplicado por SHA-256, ver `blob_store`) y el
+POST del formulario solo entrega el token de la subida completada.
+
+Tamaño y extensión se validan con los metadatos del primer chunk, antes de
+escribir nada en storage.
+
+Las subidas que nadie adjunta (abandonadas a medias o completadas sin enviar el
+formulario) las borra `expire_stale_uploads` junto con sus partes, desde
+`manage.py purge_orphan_blobs`.
+"""
+import hashlib
+import io
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from mi_app.models import ATSFormSubmission, ATSFormSubmissionFile, ATSFormUpload
+from mi_app.services.blob_store import adopt_stored
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+UPLOADS_PREFIX = "orbita/uploads"
+
+
+def get_chunk_size():
+    return int(getattr(settings, "ORBITA_FORM_UPLOAD_CHUNK_SIZE", DEFAULT_CHUNK_SIZE) or DEFAULT_CHUNK_SIZE)
+
+
+def validate_upload_metadata(name, size):
+    """Valida nombre y tamaño declarados. Retorna mensaje de error o None."""
+    max_size = getattr(settings, "ORBITA_FORM_PUBLIC_MAX_FILE_SIZE", 10 * 1024 * 1024)
+    allowed_ext = getattr(settings, "ORBITA_FORM_PUBLIC_ALLOWED_EXTENSIONS", ["pdf", "doc", "docx"])
+    name = (name or "").strip()
+    if not name:
+        return "Falta el nombre del archivo."
+    if size is None or size <= 0:
+        return "Tamaño de archivo inválido."
+    if size > max_size:
+        return f"El archivo {name} supera el tamaño máximo permitido ({max_size // (1024*1024)} MB)."
+    ext = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+    if ext and allowed_ext and ext not in allowed_ext:
+        return f"Solo se permiten archivos: {', '.join(allowed_ext)}."
+    return None
+
+
+def _part_name(upload, offset):
+    return f"{UPLOADS_PREFIX}/{upload.token}/{offset:012d}.part"
+
+
+def _final_name(orbita_form, original_name):
+    """
+    Ruta definitiva en form_uploads, igual a la que usaría ATSFormSubmissionFile. El archivo
+    puede terminar compartido como blob con otros envíos: la ruta no lleva el nombre de quien
+    lo subió, solo la extensión (el nombre queda en `original_name`).
+    """
+    ext = os.path.splitext(original_name or "")[1].lower()
+    placeholder = ATSFormSubmissionFile(submission=ATSFormSubmission(form=orbita_form))
+    return ATSFormSubmissionFile._meta.get_field("file").generate_filename(placeholder, f"archivo{ext}")
+
+
+class _PartsReader(io.RawIOBase):
+    """
+    Lee las partes en orden como un solo stream, sin cargar el archivo completo en memoria.
+    Calcula el SHA-256 mientras se lee para registrar el blob sin una segunda lectura.
+    """
+
+    def __init__(self, storage, names):
+        super().__init__()
+        self._storage = storage
+        self._names = list(names)
+        self._index = 0
+        self._current = None
+        self.digest = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._index < len(self._names):
+            if self._current is None:
+                self._current = self._storage.open(self._names[self._index], "rb")
+            data = self._current.read(len(buffer))
+            if data:
+                size = len(data)
+                buffer[:size] = data
+                self.digest.update(data)
+                return size
+            self._current.close()
+            self._current = None
+            self._index += 1
+        return 0
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Los backends de storage rebobinan antes de subir; solo se soporta volver al inicio.
+        if offset != 0 or whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("seek")
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        self._index = 0
+        self.digest = hashlib.sha256()
+        return 0
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        super().close()
+
+
+def _delete_parts(names):
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except Exception as exc:
+            logger.warning("chunked_upload: no se pudo borrar parte %s: %s", name, exc)
+
+
+def _assemble(upload):
+    reader = _PartsReader(default_storage, upload.parts)
+    content = File(reader, name=upload.original_name)
+    content.size = upload.total_size
+    try:
+        saved_name = default_storage.save(_final_name(upload.form, upload.original_name), content)
+        sha256 = reader.digest.hexdigest()
+    finally:
+        reader.close()
+    _delete_parts(upload.parts)
+    return adopt_stored(saved_name, sha256=sha256, size=upload.total_size)
+
+
+def _store_chunk(upload, offset, data):
+    """Escribe un chunk en storage y avanza la subida. Debe llamarse con la fila bloqueada."""
+    if offset != upload.received_size:
+        return {
+            "ok": False,
+            "error": "El chunk no corresponde al siguiente byte esperado.",
+            "status": 409,
+            "upload": upload,
+        }
+    if not data:
+        return {"ok": False, "error": "Chunk vacío.", "status": 400, "upload": upload}
+    if len(data) > get_chunk_size():
+        return {"ok": False, "error": "Chunk demasiado grande.", "status": 413, "upload": upload}
+    if upload.received_size + len(data) > upload.total_size:
+        return {"ok": False, "error": "El archivo excede el tamaño declarado.", "status": 400, "upload": upload}
+
+    part = default_storage.save(_part_name(upload, offset), File(io.BytesIO(data), name="chunk"))
+    upload.parts = [*upload.parts, part]
+    upload.received_size += len(data)
+    update_fields = ["parts", "received_size", "updated_at"]
+    assemble = upload.received_size == upload.total_size
+    if assemble:
+        # El ensamblado copia el archivo completo: lo hace `_complete` fuera de la transacción.
+        upload.status = ATSFormUpload.STATUS_ASSEMBLING
+        update_fields.append("status")
+    upload.save(update_fields=update_fields)
+    return {"ok": True, "upload": upload, "assemble": assemble, "offset": offset}
+
+
+def _complete(result):
+    """
+    Ensambla la subida que recibió su último chunk, ya sin la fila bloqueada. Si falla se
+    descarta ese chunk y la subida vuelve a "subiendo": el reintento del cliente lo reenvía.
+    """
+    if not result.get("assemble"):
+        return result
+    upload = result["upload"]
+    try:
+        blob = _assemble(upload)
+    except Exception:
+        last_part = upload.parts[-1:]
+        ATSFormUpload.objects.filter(pk=upload.pk, status=ATSFormUpload.STATUS_ASSEMBLING).update(
+            status=ATSFormUpload.STATUS_UPLOADING,
+            received_size=result["offset"],
+            parts=upload.parts[:-1],
+            updated_at=timezone.now(),
+        )
+        _delete_parts(last_part)
+        raise
+    upload.blob = blob
+    upload.storage_name = blob.storage_name
+    upload.parts = []
+    upload.status = ATSFormUpload.STATUS_COMPLETED
+    upload.save(update_fields=["blob", "storage_name", "parts", "status", "updated_at"])
+    logger.info(
+        "chunked_upload completed token=%s form=%s size=%d path=%s",
+        upload.token,
+        upload.form_id,
+        upload.total_size,
+        upload.storage_name,
+    )
+    return result
+
+
+def start_upload(orbita_form, name, size, first_chunk):
+    """Crea la subida validando metadatos antes de aceptar el primer chunk."""
+    error = validate_upload_metadata(name, size)
+    if error:
+        return {"ok": False, "error": error, "status": 400}
+    upload = ATSFormUpload.objects.create(
+        form=orbita_form,
+        original_name=name.strip()[:255],
+        total_size=size,
+    )
+    with transaction.atomic():
+        upload = ATSFormUpload.objects.select_for_update().select_related("form").get(pk=upload.pk)
+        result = _store_chunk(upload, 0, first_chunk)
+    if not result["ok"]:
+        upload.delete()
+        result.pop("upload", None)
+        return result
+    return _complete(result)
+
+
+def append_chunk(orbita_form, token, offset, data):
+    """Agrega un chunk a una subida existente; idempotente ante reintentos del mismo offset."""
+    with transaction.atomic():
+        try:
+            upload = (
+                ATSFormUpload.objects.select_for_update()
+                .select_related("form")
+                .get(token=token, form=orbita_form)
+            )
+        except (ATSFormUpload.DoesNotExist, ValueError):
+            return {"ok": False, "error": "Subida no encontrada.", "status": 404}
+        if upload.status != ATSFormUpload.STATUS_UPLOADING:
+            return {"ok": True, "upload": upload}
+        result = _store_chunk(upload, offset, data)
+    return _complete(result) if result["ok"] else result
+
+
+def get_upload(orbita_form, token):
+    try:
+        return ATSFormUpload.objects.get(token=token, form=orbita_form)
+    except (ATSFormUpload.DoesNotExist, ValueError):
+        return None
+
+
+def get_completed_upload(orbita_form, token):
+    """Devuelve la subida completada y aún no adjuntada para este formulario, o None."""
+    token = (token or "").strip()
+    if not token:
+        return None
+    try:
+        return ATSFormUpload.objects.get(token=token, form=orbita_form, status=ATSFormUpload.STATUS_COMPLETED)
+    except (ATSFormUpload.DoesNotExist, ValueError):
+        return None
+
+
+def claim_upload(upload):
+    """Marca la subida como adjuntada. Retorna False si otro envío ya la usó."""
+    updated = ATSFormUpload.objects.filter(
+        pk=upload.pk,
+        status=ATSFormUpload.STATUS_COMPLETED,
+    ).update(status=ATSFormUpload.STATUS_ATTACHED)
+    return bool(updated)
+
+
+def _upload_files(upload):
+    names = list(upload.parts or [])
+    if upload.storage_name and not upload.blob_id and upload.status != ATSFormUpload.STATUS_ATTACHED:
+        names.append(upload.storage_name)
+    return names
+
+
+def _stray_parts(upload):
+    """Partes en la carpeta de la subida que no quedaron en `parts` (chunk guardado en un intento revertido)."""
+    folder = f"{UPLOADS_PREFIX}/{upload.token}"
+    try:
+        _dirs, files = default_storage.listdir(folder)
+    except (NotImplementedError, OSError):
+        return []
+    return [f"{folder}/{name}" for name in files if f"{folder}/{name}" not in (upload.parts or [])]
+
+
+def discard_upload(upload):
+    """
+    Borra las partes de una subida que no llegó a adjuntarse. El archivo ensamblado
+    es un blob compartido: si queda sin referencias lo limpia `collect_orphan_blobs`.
+    """
+    _delete_parts(_upload_files(upload))
+    upload.delete()
+
+
+def expire_stale_uploads(older_than=timedelta(hours=24), dry_run=False):
+    """
+    Borra las subidas sin adjuntar y sin actividad en `older_than`, con sus partes. El blob de
+    una completada deja de contar como pendiente y lo borra `collect_orphan_blobs`.
+    Retorna cuántas se borraron (o se borrarían con `dry_run`).
+    """
+    stale = ATSFormUpload.objects.filter(
+        status__in=[ATSFormUpload.STATUS_UPLOADING, ATSFormUpload.STATUS_ASSEMBLING, ATSFormUpload.STATUS_COMPLETED],
+        updated_at__lt=timezone.now() - older_than,
+    )
+    if dry_run:
+        return stale.count()
+    removed = 0
+    for upload in stale.iterator():
+        # Condicional al estado: si otro request la adjuntó o le agregó un chunk, se conserva.
+        deleted, _ = ATSFormUpload.objects.filter(
+            pk=upload.pk, status=upload.status, received_size=upload.received_size
+        ).delete()
+        if not deleted:
+            continue
+        _delete_parts(_upload_files(upload) + _stray_parts(upload))
+        removed += 1
+    if removed:
+        logger.info("chunked_upload expired=%d", removed)
+    return removed
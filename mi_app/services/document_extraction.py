@@ -1,15 +1,26 @@
 """
 Servicio para extraer información de documentos (INE, Comprobante de domicilio)
 usando imágenes o PDF convertidos a base64 y OpenAI Vision.
+
+Los resultados correctos se guardan en `DocumentExtractionResult` por (SHA-256 del archivo,
+tipo, versión de prompt): reenviar el mismo documento no vuelve a llamar a Vision.
 """
 import base64
-import io
+import hashlib
 import json
 import logging
 import re
+import time
+from datetime import timedelta
 from typing import Optional
 
 from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from mi_app.models import DocumentExtractionResult
+from mi_app.services.document_images import prepare_image
+from mi_app.services.document_pdf import render_pdf_pages
 
 logger = logging.getLogger(__name__)
 
@@ -22,11 +33,19 @@ MAX_FILE_SIZE = 5 * 1024 * 1024
 ALLOWED_IMAGE_EXT = (".jpg", ".jpeg", ".png", ".gif", ".webp")
 ALLOWED_EXT = ALLOWED_IMAGE_EXT + (".pdf",)
 
+# Subir al cambiar algo que altere lo extraído sin tocar el texto del prompt ni el modelo
+# (p. ej. el preprocesamiento); invalida la caché de resultados.
+PROMPT_VERSION = "1"
 
-def _file_to_base64_image(file_content: bytes, filename: str, content_type: str) -> tuple[str, str] | None:
+
+def _file_to_base64_images(
+    file_content: bytes, filename: str, content_type: str, doc_type: str = ""
+) -> list[tuple[str, str]]:
     """
     Convierte archivo (imagen o PDF) a base64 para enviar a OpenAI Vision.
-    Retorna (base64_string, mime_type) o None si falla.
+    La imagen se orienta, recorta y reduce a la resolución que usa el modelo (document_images);
+    de un PDF se envían las páginas relevantes para `doc_type` (document_pdf).
+    Retorna [(base64_string, mime_type), ...] en orden; lista vacía si falla.
     """
     ext = (filename or "").lower()
     if "." in ext:
@@ -36,58 +55,35 @@ def _file_to_base64_image(file_content: bytes, filename: str, content_type: str)
 
     # Imagen directa
     if ext in ALLOWED_IMAGE_EXT or (content_type or "").startswith("image/"):
+        try:
+            prepared = prepare_image(file_content)
+        except Exception as e:
+            # Formato que Pillow no lee: se envía tal cual y que Vision decida.
+            logger.warning("document_extraction image preprocessing failed, sending original: %s", e)
+        else:
+            return [(base64.b64encode(prepared.data).decode("utf-8"), prepared.mime)]
         b64 = base64.b64encode(file_content).decode("utf-8")
         mime = content_type or "image/jpeg"
         if mime not in ("image/jpeg", "image/png", "image/gif", "image/webp"):
             mime = "image/jpeg"
-        return b64, mime
+        return [(b64, mime)]
 
-    # PDF -> primera página como imagen
+    # PDF -> páginas relevantes como imágenes
     if ext == ".pdf" or (content_type or "").lower() == "application/pdf":
         try:
-            import fitz  # PyMuPDF
-        except ImportError:
-            try:
-                import pypdfium2 as pdfium
-                return _pdf_to_base64_pypdfium2(file_content)
-            except ImportError:
-                logger.warning("Ni PyMuPDF ni pypdfium2 disponibles para convertir PDF a imagen.")
-                return None
-        doc = fitz.open(stream=file_content, filetype="pdf")
-        if len(doc) == 0:
-            doc.close()
-            return None
-        page = doc[0]
-        mat = fitz.Matrix(2, 2)  # scale 2x para mejor lectura
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-        png_bytes = pix.tobytes("png")
-        doc.close()
-        b64 = base64.b64encode(png_bytes).decode("utf-8")
-        return b64, "image/png"
-
-    return None
-
-
-def _pdf_to_base64_pypdfium2(file_content: bytes) -> tuple[str, str] | None:
-    """Fallback: convertir PDF con pypdfium2 si PyMuPDF no está."""
-    try:
-        import pypdfium2 as pdfium
-        doc = pdfium.PdfDocument(file_content)
-        if doc.get_page_count() == 0:
-            doc.close()
-            return None
-        page = doc.get_page(0)
-        pil_image = page.render_topil(scale=2)
-        page.close()
-        doc.close()
-        buf = io.BytesIO()
-        pil_image.save(buf, format="PNG")
-        buf.seek(0)
-        b64 = base64.b64encode(buf.read()).decode("utf-8")
-        return b64, "image/png"
-    except Exception as e:
-        logger.warning("pypdfium2 PDF conversion failed: %s", e)
-        return None
+            pages = render_pdf_pages(file_content, doc_type)
+        except Exception as e:
+            logger.warning("document_extraction PDF conversion failed: %s", e)
+            return []
+        return [(base64.b64encode(page.data).decode("utf-8"), page.mime) for page in pages]
+
+    return []
+
+
+def _file_to_base64_image(file_content: bytes, filename: str, content_type: str) -> tuple[str, str] | None:
+    """Primera imagen de `_file_to_base64_images`; retorna (base64_string, mime_type) o None."""
+    images = _file_to_base64_images(file_content, filename, content_type)
+    return images[0] if images else None
 
 
 def _build_prompt(doc_type: str) -> str:
@@ -131,6 +127,62 @@ Devuelve ÚNICAMENTE un objeto JSON válido, sin markdown ni texto adicional, co
     return "Extrae la información visible en este documento y devuélvela como JSON."
 
 
+def _vision_model() -> str:
+    # Para visión usar gpt-4o o gpt-4o-mini (ambos tienen visión)
+    model = getattr(settings, "OPENAI_MODEL", "gpt-4o-mini")
+    return "gpt-4o-mini" if "gpt-4" in model else "gpt-4o-mini"
+
+
+def prompt_version(doc_type: str) -> str:
+    """Versión para la caché de resultados: cambia con el prompt, el modelo o PROMPT_VERSION."""
+    raw = f"{PROMPT_VERSION}|{_vision_model()}|{_build_prompt(doc_type)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _result_cache_days() -> int:
+    return int(getattr(settings, "ORBITA_DOCUMENTS_RESULT_CACHE_DAYS", 30))
+
+
+def cached_result(sha256: str, doc_type: str) -> dict | None:
+    """Datos ya extraídos de este archivo y tipo con el prompt vigente, o None."""
+    days = _result_cache_days()
+    if days <= 0:
+        return None
+    entry = (
+        DocumentExtractionResult.objects.filter(
+            sha256=sha256,
+            document_type=doc_type,
+            prompt_version=prompt_version(doc_type),
+            created_at__gte=timezone.now() - timedelta(days=days),
+        )
+        .only("pk", "data")
+        .first()
+    )
+    if entry is None:
+        return None
+    DocumentExtractionResult.objects.filter(pk=entry.pk).update(hits=F("hits") + 1)
+    return entry.data
+
+
+def store_result(sha256: str, doc_type: str, data: dict) -> None:
+    if _result_cache_days() <= 0:
+        return
+    DocumentExtractionResult.objects.update_or_create(
+        sha256=sha256,
+        document_type=doc_type,
+        prompt_version=prompt_version(doc_type),
+        defaults={"data": data, "created_at": timezone.now()},
+    )
+
+
+def safe_store_result(sha256: str, doc_type: str, data: dict) -> None:
+    try:
+        store_result(sha256, doc_type, data)
+    except Exception as e:
+        # Sin caché el resultado sigue siendo válido; solo se perderá el ahorro en un reenvío.
+        logger.warning("document_extraction could not cache result sha256=%s: %s", sha256[:12], e)
+
+
 def _parse_json_from_response(content: str) -> dict | None:
     """Intenta extraer JSON del contenido de la respuesta (puede venir envuelto en ```json)."""
     content = (content or "").strip()
@@ -154,6 +206,7 @@ def extract_document_info(
     filename: str,
     content_type: str,
     doc_type: str,
+    use_cache: bool = True,
 ) -> dict:
     """
     Extrae información del documento usando OpenAI Vision.
@@ -161,8 +214,11 @@ def extract_document_info(
     - filename: nombre original (para detectar tipo)
     - content_type: MIME type
     - doc_type: "ine" o "comprobante_domicilio"
+    - use_cache: False para no leer ni guardar la caché de resultados (el llamador la maneja)
 
-    Retorna {"ok": True, "data": {...}} o {"ok": False, "error": "mensaje"}
+    Retorna {"ok": True, "data": {...}} (con "cached": True si salió de la caché de
+    resultados) o {"ok": False, "error": "mensaje"}; "retryable": True si falló la llamada
+    a OpenAI y vale la pena reintentar.
     """
     if doc_type not in DOC_TYPES:
         return {"ok": False, "error": f"Tipo de documento inválido. Use: {', '.join(DOC_TYPES)}"}
@@ -171,36 +227,45 @@ def extract_document_info(
         logger.warning("document_extraction file too large: %d bytes (max %d)", len(file_content), MAX_FILE_SIZE)
         return {"ok": False, "error": f"Archivo demasiado grande. Máximo {MAX_FILE_SIZE // (1024*1024)} MB"}
 
+    digest = hashlib.sha256(file_content).hexdigest()
+    cached = cached_result(digest, doc_type) if use_cache else None
+    if cached is not None:
+        logger.info("document_extraction cache hit filename=%s doc_type=%s sha256=%s", filename, doc_type, digest[:12])
+        return {"ok": True, "data": cached, "cached": True}
+
     logger.info("document_extraction converting to base64 filename=%s doc_type=%s", filename, doc_type)
-    result = _file_to_base64_image(file_content, filename, content_type)
-    if not result:
+    images = _file_to_base64_images(file_content, filename, content_type, doc_type)
+    if not images:
         logger.warning("document_extraction could not convert file to image: %s", filename)
         return {"ok": False, "error": "No se pudo procesar el archivo. Use imagen (JPG, PNG) o PDF."}
 
-    b64, mime = result
     api_key = getattr(settings, "OPENAI_API_KEY_DOCUMENTS", None) or getattr(settings, "OPENAI_API_KEY", None) or ""
     if not api_key.strip():
         return {"ok": False, "error": "OpenAI API no configurada."}
 
     prompt = _build_prompt(doc_type)
-    model = getattr(settings, "OPENAI_MODEL", "gpt-4o-mini")
-    # Para visión usar gpt-4o o gpt-4o-mini (ambos tienen visión)
-    vision_model = "gpt-4o-mini" if "gpt-4" in model else "gpt-4o-mini"
+    if len(images) > 1:
+        prompt += (
+            f"\nEl documento tiene varias páginas; se adjuntan {len(images)} imágenes en orden. "
+            "Combina la información de todas (p. ej. frente y reverso) en un solo objeto JSON.\n"
+        )
+    vision_model = _vision_model()
 
     try:
         from openai import OpenAI
+        started = time.perf_counter()
         client = OpenAI(api_key=api_key)
         response = client.chat.completions.create(
             model=vision_model,
             messages=[
                 {
                     "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
+                    "content": [{"type": "text", "text": prompt}] + [
                         {
                             "type": "image_url",
                             "image_url": {"url": f"data:{mime};base64,{b64}"},
-                        },
+                        }
+                        for b64, mime in images
                     ],
                 }
             ],
@@ -211,8 +276,14 @@ def extract_document_info(
         if data is None:
             logger.warning("document_extraction OpenAI response not valid JSON, raw_len=%d", len(content))
             return {"ok": False, "error": "No se pudo interpretar la respuesta como JSON.", "raw": content[:500]}
-        logger.info("document_extraction success filename=%s doc_type=%s", filename, doc_type)
-        return {"ok": True, "data": data}
+        logger.info(
+            "document_extraction success filename=%s doc_type=%s images=%d payload=%d bytes vision=%.0f ms",
+            filename, doc_type, len(images), sum(len(b64) for b64, _mime in images),
+            (time.perf_counter() - started) * 1000,
+        )
     except Exception as e:
         logger.exception("document_extraction OpenAI call failed: %s", e)
-        return {"ok": False, "error": str(e)}
+        return {"ok": False, "error": str(e), "retryable": True}
+    if use_cache:
+        safe_store_result(digest, doc_type, data)
+    return {"ok": True, "data": data}
@@ -0,0 +1,187 @@
+"""
+Preprocesamiento de imágenes para la extracción de documentos con OpenAI Vision.
+
+Mandar la foto tal cual sale del teléfono es caro: una foto de 12 MP de una INE pesa ~5 MB,
+viaja como data URL de ~7 MB y el modelo de todos modos la reduce antes de verla (en
+`detail=high` la ajusta a 2048x2048 y luego el lado corto a 768 px). Aquí hacemos ese
+trabajo antes de subirla:
+1. orientación según EXIF (las fotos de teléfono suelen venir de lado);
+2. recorte de márgenes de color uniforme (escaneos con bordes blancos o negros);
+3. reducción a la resolución que usa el modelo, nunca ampliación;
+4. recodificación en JPEG (o WebP) a la calidad configurada.
+
+Para JPEG se usa `Image.draft`, que decodifica directo a una escala reducida y evita
+descomprimir los 12 MP completos. Si la recodificación no ahorra nada y la imagen no cambió
+de geometría, se envían los bytes originales.
+
+Configuración: ORBITA_DOCUMENTS_IMAGE_FORMAT (jpeg|webp) y ORBITA_DOCUMENTS_IMAGE_QUALITY.
+"""
+import io
+import logging
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from PIL import ExifTags, Image, ImageFilter, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# Resolución efectiva de Vision en detail=high.
+VISION_MAX_LONG_SIDE = 2048
+VISION_MAX_SHORT_SIDE = 768
+
+# Recorte de márgenes: se analiza una miniatura; diferencias menores a la tolerancia
+# (escala de grises 0-255) cuentan como fondo.
+TRIM_PROBE_SIDE = 256
+TRIM_TOLERANCE = 24
+# Si lo que queda tras recortar es menos de esta fracción del área, el "fondo" era parte del
+# documento (p. ej. una credencial casi blanca) y no se recorta.
+TRIM_MIN_AREA = 0.2
+
+PASSTHROUGH_MIMES = ("image/jpeg", "image/png", "image/webp")
+
+# Los PDF se rasterizan a la escala que llena la resolución de Vision, con un margen extra
+# para que el recorte de márgenes no deje el texto por debajo de ella.
+PDF_OVERSAMPLE = 1.5
+PDF_MAX_SCALE = 4.0
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime: str
+    original_size: tuple[int, int]
+    size: tuple[int, int]
+    original_bytes: int
+    seconds: float
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - len(self.data)
+
+
+def vision_size(width: int, height: int) -> tuple[int, int]:
+    """Tamaño al que Vision reduciría la imagen (sin ampliar)."""
+    long_side, short_side = max(width, height), min(width, height)
+    scale = min(1.0, VISION_MAX_LONG_SIDE / long_side, VISION_MAX_SHORT_SIDE / short_side)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def pdf_render_scale(width_pt: float, height_pt: float) -> float:
+    """Escala de rasterizado (1.0 = 72 dpi) para una página de `width_pt` x `height_pt` puntos."""
+    long_side, short_side = max(width_pt, height_pt, 1.0), max(min(width_pt, height_pt), 1.0)
+    fit = min(VISION_MAX_LONG_SIDE / long_side, VISION_MAX_SHORT_SIDE / short_side)
+    return min(PDF_MAX_SCALE, fit * PDF_OVERSAMPLE)
+
+
+def _output_format():
+    fmt = (getattr(settings, "ORBITA_DOCUMENTS_IMAGE_FORMAT", "jpeg") or "jpeg").strip().lower()
+    if fmt == "webp" and features.check("webp"):
+        return "WEBP", "image/webp"
+    return "JPEG", "image/jpeg"
+
+
+def _to_rgb(image):
+    if image.mode in ("RGBA", "LA", "P"):
+        # Transparencias sobre blanco, como se verían impresas.
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    if image.mode not in ("RGB", "L"):
+        # Los escaneos en escala de grises se quedan así: el JPEG de un canal pesa menos.
+        return image.convert("RGB")
+    return image
+
+
+def trim_borders(image):
+    """Recorta márgenes de color uniforme; devuelve la imagen sin cambios si no hay."""
+    probe = image.convert("L")
+    probe.thumbnail((TRIM_PROBE_SIDE, TRIM_PROBE_SIDE))
+    width, height = probe.size
+    corners = sorted(probe.getpixel(p) for p in ((0, 0), (width - 1, 0), (0, height - 1), (width - 1, height - 1)))
+    if corners[-1] - corners[0] > TRIM_TOLERANCE:
+        # Esquinas distintas: no hay un fondo uniforme (p. ej. foto sobre una mesa).
+        return image
+    background = (corners[1] + corners[2]) // 2
+    mask = probe.point([255 if abs(v - background) > TRIM_TOLERANCE else 0 for v in range(256)])
+    # El filtro de mediana quita motas de ruido del escaneo que impedirían recortar.
+    box = mask.filter(ImageFilter.MedianFilter(3)).getbbox()
+    if not box:
+        return image
+    left, top, right, bottom = box
+    area = (right - left) * (bottom - top) / float(width * height)
+    if area >= 0.98 or area < TRIM_MIN_AREA:
+        return image
+    # Coordenadas de la miniatura -> imagen completa, con un pixel de margen.
+    sx, sy = image.width / width, image.height / height
+    return image.crop((
+        max(0, int((left - 1) * sx)),
+        max(0, int((top - 1) * sy)),
+        min(image.width, int((right + 1) * sx)),
+        min(image.height, int((bottom + 1) * sy)),
+    ))
+
+
+def prepare_pil_image(image, original_bytes, started=None, original=None, original_mime="", original_size=None):
+    """
+    Orienta, recorta, reduce y recodifica una imagen ya abierta.
+    `original`/`original_mime` permiten devolver los bytes de entrada si no hay ahorro.
+    """
+    started = time.perf_counter() if started is None else started
+    original_size = original_size or image.size
+    rotated = image.getexif().get(ExifTags.Base.Orientation, 1) != 1
+    if rotated:
+        image = ImageOps.exif_transpose(image)
+    rgb = trim_borders(_to_rgb(image))
+    target = vision_size(*rgb.size)
+    if target != rgb.size:
+        rgb = rgb.resize(target, Image.Resampling.LANCZOS)
+
+    fmt, mime = _output_format()
+    quality = int(getattr(settings, "ORBITA_DOCUMENTS_IMAGE_QUALITY", 85))
+    out = io.BytesIO()
+    if fmt == "WEBP":
+        rgb.save(out, format=fmt, quality=quality, method=4)
+    else:
+        rgb.save(out, format=fmt, quality=quality, optimize=True)
+    data = out.getvalue()
+
+    unchanged = not rotated and rgb.size == original_size
+    if original is not None and unchanged and original_mime in PASSTHROUGH_MIMES and len(original) <= len(data):
+        data, mime = original, original_mime
+
+    prepared = PreparedImage(
+        data=data,
+        mime=mime,
+        original_size=original_size,
+        size=rgb.size,
+        original_bytes=original_bytes,
+        seconds=time.perf_counter() - started,
+    )
+    logger.info(
+        "document_image prepared %dx%d -> %dx%d %s bytes=%d->%d saved=%d in %.0f ms",
+        original_size[0], original_size[1], prepared.size[0], prepared.size[1], prepared.mime,
+        original_bytes, len(prepared.data), prepared.saved_bytes, prepared.seconds * 1000,
+    )
+    return prepared
+
+
+def prepare_image(content: bytes) -> PreparedImage:
+    """Prepara los bytes de una imagen subida. Lanza OSError si Pillow no puede leerla."""
+    started = time.perf_counter()
+    image = Image.open(io.BytesIO(content))
+    original_mime = Image.MIME.get(image.format or "", "")
+    original_size = image.size
+    if image.format == "JPEG":
+        # Decodifica ya reducida (escala 1/2, 1/4 u 1/8), sin bajar de lo que usa Vision.
+        image.draft("RGB", vision_size(*image.size))
+    image.load()
+    return prepare_pil_image(
+        image,
+        len(content),
+        started=started,
+        original=content,
+        original_mime=original_mime,
+        original_size=original_size,
+    )
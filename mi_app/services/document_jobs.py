@@ -0,0 +1,246 @@
+"""
+Lotes de extracción de documentos (POST /api/documents/extract/batch/).
+
+El endpoint síncrono procesa un archivo por request; aquí el cliente sube muchos, recibe
+el ID del lote en el acto y consulta el avance en GET /api/documents/jobs/<id>/.
+
+- `create_job` guarda cada archivo en storage (`documents/jobs/<lote>/`) como
+  `DocumentExtractionItem` pendiente. Los que ya están en la caché de resultados
+  (sha256, tipo, versión de prompt) quedan listos sin escribir el archivo ni llamar a Vision.
+- `drain_jobs` (worker `manage.py process_document_jobs`) reserva pendientes con lease
+  (`work_queue.claim_due`, como el outbox de correos); agrupa los repetidos por (sha256, tipo) para llamar a Vision
+  una vez por contenido y extrae los grupos en paralelo en un pool de hilos
+  (ORBITA_DOCUMENTS_JOB_WORKERS): la espera es de red hacia OpenAI. Los hilos solo leen
+  el archivo y llaman a Vision; la caché de resultados y el guardado de cada documento
+  corren en el hilo principal, así la BD (incluido SQLite) no recibe escrituras concurrentes.
+- El archivo se borra de storage en cuanto el documento termina, bien o mal. Los fallos
+  de la llamada a OpenAI se reintentan con backoff hasta ORBITA_DOCUMENTS_JOB_MAX_ATTEMPTS.
+- `prune_jobs` borra lotes (y sus datos extraídos) pasadas
+  ORBITA_DOCUMENTS_JOB_RETENTION_HOURS y la caché vencida.
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from mi_app.models import DocumentExtractionItem, DocumentExtractionJob, DocumentExtractionResult
+from mi_app.services.document_extraction import cached_result, extract_document_info, safe_store_result
+from mi_app.services.work_queue import claim_due, retry_delay
+
+logger = logging.getLogger(__name__)
+
+# Mientras un worker extrae un lote, las filas quedan reservadas este tiempo.
+LEASE_SECONDS = 300
+MAX_RETRY_DELAY = timedelta(hours=1)
+STORAGE_PREFIX = "documents/jobs"
+
+
+def _delete_storage(storage_name):
+    if not storage_name:
+        return
+    try:
+        default_storage.delete(storage_name)
+    except Exception as exc:
+        logger.warning("document_jobs: no se pudo borrar %s: %s", storage_name, exc)
+
+
+def create_job(documents):
+    """
+    Crea el lote. `documents`: [(file_content, filename, content_type, doc_type)], ya validados.
+    Retorna el DocumentExtractionJob.
+    """
+    job = DocumentExtractionJob(total=len(documents))
+    now = timezone.now()
+    items = []
+    try:
+        for position, (content, filename, content_type, doc_type) in enumerate(documents):
+            item = DocumentExtractionItem(
+                job=job,
+                position=position,
+                document_type=doc_type,
+                filename=(filename or "document")[:255],
+                content_type=(content_type or "")[:100],
+                sha256=hashlib.sha256(content).hexdigest(),
+            )
+            data = cached_result(item.sha256, doc_type)
+            if data is not None:
+                item.status = DocumentExtractionItem.STATUS_DONE
+                item.cached = True
+                item.result = data
+                item.finished_at = now
+            else:
+                ext = os.path.splitext(item.filename)[1].lower()[:10]
+                item.storage_name = default_storage.save(
+                    f"{STORAGE_PREFIX}/{job.public_id}/{position}{ext}", ContentFile(content)
+                )
+            items.append(item)
+        with transaction.atomic():
+            job.save()
+            DocumentExtractionItem.objects.bulk_create(items)
+    except Exception:
+        for item in items:
+            _delete_storage(item.storage_name)
+        raise
+    logger.info(
+        "document_jobs created job=%s documents=%d cached=%d",
+        job.public_id, len(items), sum(1 for item in items if item.cached),
+    )
+    return job
+
+
+def job_status(job):
+    """Representación del lote para la API de consulta."""
+    documents = []
+    counts = dict.fromkeys(
+        (DocumentExtractionItem.STATUS_PENDING, DocumentExtractionItem.STATUS_DONE, DocumentExtractionItem.STATUS_FAILED), 0
+    )
+    for item in job.items.order_by("position"):
+        counts[item.status] += 1
+        entry = {
+            "index": item.position,
+            "filename": item.filename,
+            "document_type": item.document_type,
+            "status": item.status,
+        }
+        if item.status == DocumentExtractionItem.STATUS_DONE:
+            entry.update(ok=True, data=item.result, cached=item.cached)
+        elif item.status == DocumentExtractionItem.STATUS_FAILED:
+            entry.update(ok=False, error=item.error)
+        documents.append(entry)
+    pending = counts[DocumentExtractionItem.STATUS_PENDING]
+    return {
+        "ok": True,
+        "job_id": str(job.public_id),
+        "status": "processing" if pending else "done",
+        "total": job.total,
+        "pending": pending,
+        "done": counts[DocumentExtractionItem.STATUS_DONE],
+        "failed": counts[DocumentExtractionItem.STATUS_FAILED],
+        "created_at": job.created_at.isoformat(),
+        "documents": documents,
+    }
+
+
+def _claim_batch(batch_size):
+    """Reserva hasta `batch_size` documentos vencidos; otro worker no los toma mientras dure el lease."""
+    ids = claim_due(
+        DocumentExtractionItem.objects.filter(status=DocumentExtractionItem.STATUS_PENDING), batch_size, LEASE_SECONDS
+    )
+    return list(DocumentExtractionItem.objects.filter(pk__in=ids).order_by("id"))
+
+
+def _extract(item):
+    """Lee el archivo y llama a Vision sin tocar la BD: la caché la maneja `drain_jobs`."""
+    with default_storage.open(item.storage_name, "rb") as fh:
+        content = fh.read()
+    return extract_document_info(content, item.filename, item.content_type, item.document_type, use_cache=False)
+
+
+def _finish(item, result, stats):
+    """Guarda el resultado del documento; reintenta más tarde si el fallo fue transitorio."""
+    item.attempts += 1
+    fields = ["attempts", "status", "result", "error", "cached", "next_attempt_at", "finished_at", "storage_name"]
+    if result.get("ok"):
+        item.status = DocumentExtractionItem.STATUS_DONE
+        item.result = result.get("data")
+        item.cached = bool(result.get("cached"))
+        item.error = ""
+        stats["cached" if item.cached else "done"] += 1
+    else:
+        item.error = str(result.get("error") or "Error desconocido")[:2000]
+        max_attempts = int(getattr(settings, "ORBITA_DOCUMENTS_JOB_MAX_ATTEMPTS", 3))
+        if result.get("retryable") and item.attempts < max_attempts:
+            item.next_attempt_at = timezone.now() + retry_delay(
+                item.attempts, getattr(settings, "ORBITA_DOCUMENTS_JOB_RETRY_BASE_SECONDS", 30), MAX_RETRY_DELAY
+            )
+            item.save(update_fields=fields)
+            stats["retry"] += 1
+            logger.warning("document_jobs retry item=%s attempts=%s error=%s", item.pk, item.attempts, item.error)
+            return
+        item.status = DocumentExtractionItem.STATUS_FAILED
+        stats["failed"] += 1
+        logger.warning("document_jobs failed item=%s attempts=%s error=%s", item.pk, item.attempts, item.error)
+    storage_name, item.storage_name = item.storage_name, ""
+    item.finished_at = timezone.now()
+    item.save(update_fields=fields)
+    _delete_storage(storage_name)
+
+
+def drain_jobs(batch_size=20):
+    """Extrae un lote de documentos pendientes. Retorna contadores done/cached/retry/failed."""
+    stats = {"done": 0, "cached": 0, "retry": 0, "failed": 0}
+    items = _claim_batch(batch_size)
+    if not items:
+        return stats
+
+    groups = {}
+    for item in items:
+        groups.setdefault((item.sha256, item.document_type), []).append(item)
+
+    def finish_group(group, result):
+        if result.get("ok") and not result.get("cached"):
+            safe_store_result(group[0].sha256, group[0].document_type, result.get("data"))
+        _finish(group[0], result, stats)
+        for duplicate in group[1:]:
+            # Mismo contenido y tipo: el resultado de Vision vale para todos.
+            _finish(duplicate, dict(result, cached=True) if result.get("ok") else result, stats)
+
+    def failure(exc):
+        # Archivo ilegible o borrado de storage: no tiene caso reintentar.
+        return {"ok": False, "error": str(exc) or exc.__class__.__name__}
+
+    for key, group in list(groups.items()):
+        # Otro lote pudo extraer el mismo contenido mientras este esperaba.
+        data = cached_result(*key)
+        if data is not None:
+            finish_group(group, {"ok": True, "data": data, "cached": True})
+            del groups[key]
+    if not groups:
+        return stats
+
+    workers = min(max(int(getattr(settings, "ORBITA_DOCUMENTS_JOB_WORKERS", 4)), 1), len(groups))
+    if workers == 1:
+        for group in groups.values():
+            try:
+                result = _extract(group[0])
+            except Exception as exc:
+                logger.exception("document_jobs error item=%s: %s", group[0].pk, exc)
+                result = failure(exc)
+            finish_group(group, result)
+        return stats
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="documents") as pool:
+        futures = {pool.submit(_extract, group[0]): group for group in groups.values()}
+        for future in as_completed(futures):
+            group = futures[future]
+            try:
+                result = future.result()
+            except Exception as exc:
+                logger.exception("document_jobs error item=%s: %s", group[0].pk, exc)
+                result = failure(exc)
+            finish_group(group, result)
+    return stats
+
+
+def prune_jobs():
+    """Borra lotes vencidos (con sus archivos pendientes) y la caché de resultados vencida."""
+    hours = int(getattr(settings, "ORBITA_DOCUMENTS_JOB_RETENTION_HOURS", 72))
+    expired = DocumentExtractionJob.objects.filter(created_at__lt=timezone.now() - timedelta(hours=hours))
+    for storage_name in DocumentExtractionItem.objects.filter(job__in=expired).exclude(storage_name="").values_list(
+        "storage_name", flat=True
+    ):
+        _delete_storage(storage_name)
+    _total, deleted = expired.delete()
+    jobs = deleted.get(DocumentExtractionJob._meta.label, 0)
+    results = 0
+    days = int(getattr(settings, "ORBITA_DOCUMENTS_RESULT_CACHE_DAYS", 30))
+    if days > 0:
+        results, _ = DocumentExtractionResult.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return jobs, results
@@ -0,0 +1,300 @@
+"""
+PDF -> imágenes para la extracción de documentos con OpenAI Vision.
+
+Antes solo se rasterizaba la página 0: un comprobante con el domicilio en la hoja 2, o una
+INE escaneada con frente y reverso en páginas separadas, fallaban. Aquí:
+
+1. Selección de páginas. Se revisa el texto de las primeras ORBITA_DOCUMENTS_PDF_SCAN_PAGES
+   páginas (barato, sin rasterizar) y se puntúa cada una por palabras clave del tipo de
+   documento y densidad de texto. Las páginas sin texto pero con contenido (escaneos)
+   cuentan como candidatas; las vacías, y las sin palabras clave cuando otras sí las
+   tienen, se descartan. Se envían las mejores, en su orden
+   original: hasta 2 para una INE (frente y reverso) y hasta ORBITA_DOCUMENTS_PDF_MAX_PAGES
+   para un comprobante.
+2. Rasterizado en paralelo. PyMuPDF y pdfium retienen el GIL y no son seguros entre hilos,
+   así que cada página se renderiza en un pool de procesos (ORBITA_DOCUMENTS_PDF_WORKERS;
+   0 = en el proceso, una tras otra). La escala sale del tamaño de la página
+   (`pdf_render_scale`) y el recorte/reducción/JPEG se hace aquí mientras el resto sigue
+   renderizando.
+3. Tiempo acotado. Si el render no termina en ORBITA_DOCUMENTS_PDF_RENDER_SECONDS se
+   envían las páginas listas; el pool se recicla para no dejar un proceso colgado.
+4. Caché parcial. Cada página preparada se guarda por (sha256 del PDF, página, escala,
+   formato) en la caché `documents_pdf`: en disco, compartida por los procesos del servidor
+   y con tope de páginas (ORBITA_DOCUMENTS_PDF_CACHE_MAX_PAGES), no en la memoria de cada
+   worker. Un reintento del mismo PDF (o el de una página que no alcanzó a renderizarse)
+   solo rasteriza lo que falta.
+
+Backend: PyMuPDF y, si no está, pypdfium2.
+"""
+import hashlib
+import importlib.util
+import logging
+import multiprocessing
+import threading
+import time
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import caches
+
+from mi_app.services.document_images import PreparedImage, pdf_render_scale, prepare_pil_image
+
+logger = logging.getLogger(__name__)
+
+BACKEND_PYMUPDF = "pymupdf"
+BACKEND_PDFIUM = "pdfium"
+
+CACHE_PREFIX = "orbita:docpdf:v1"
+PAGE_CACHE_ALIAS = "documents_pdf"
+
+# Palabras clave (sin acentos, en minúsculas) por tipo de documento.
+PAGE_KEYWORDS = {
+    "ine": (
+        "instituto nacional electoral", "credencial para votar", "clave de elector", "curp",
+        "domicilio", "seccion", "vigencia", "fecha de nacimiento", "emision", "idmex",
+    ),
+    "comprobante_domicilio": (
+        "domicilio", "direccion", "colonia", "col.", "c.p.", "codigo postal", "titular",
+        "total a pagar", "periodo", "servicio", "municipio", "alcaldia",
+    ),
+}
+# Máximo de páginas que se envían por tipo (además del tope global).
+MAX_PAGES_BY_TYPE = {"ine": 2}
+
+# Por debajo de estos caracteres una página se trata como escaneada (sin capa de texto).
+MIN_TEXT_CHARS = 20
+# Caracteres a partir de los cuales la densidad de texto ya no suma puntos.
+DENSITY_CHARS = 3000
+# Puntaje de una página escaneada: por encima de una con poco texto y sin palabras clave,
+# por debajo de cualquiera con una palabra clave.
+SCANNED_PAGE_SCORE = 1.0
+KEYWORD_SCORE = 3.0
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pdf_backend():
+    if importlib.util.find_spec("fitz"):  # PyMuPDF
+        return BACKEND_PYMUPDF
+    if importlib.util.find_spec("pypdfium2"):
+        return BACKEND_PDFIUM
+    return None
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def score_page(text, doc_type, has_content=True):
+    """Puntaje de relevancia de una página según su texto."""
+    text = _normalize(text)
+    if len(text.strip()) < MIN_TEXT_CHARS:
+        return SCANNED_PAGE_SCORE if has_content else 0.0
+    hits = sum(1 for keyword in PAGE_KEYWORDS.get(doc_type, ()) if keyword in text)
+    return KEYWORD_SCORE * hits + min(len(text), DENSITY_CHARS) / DENSITY_CHARS
+
+
+def pick_pages(scores, doc_type):
+    """
+    Índices de las páginas a enviar, en orden del documento. Si alguna página tiene palabras
+    clave, las que no tienen ninguna (portadas, avisos legales) no se envían.
+    """
+    limit = max(int(getattr(settings, "ORBITA_DOCUMENTS_PDF_MAX_PAGES", 3)), 1)
+    limit = min(limit, MAX_PAGES_BY_TYPE.get(doc_type, limit))
+    floor = KEYWORD_SCORE if scores and max(scores) >= KEYWORD_SCORE else 0.0
+    ranked = sorted((i for i, score in enumerate(scores) if score > 0 and score >= floor), key=lambda i: (-scores[i], i))
+    if not ranked:
+        return [0] if scores else []
+    return sorted(ranked[:limit])
+
+
+def _inspect(content, backend):
+    """
+    Total de páginas y, de las primeras, tamaño en puntos, texto y si tienen contenido:
+    (total, [(width, height, text, has_content)]).
+    """
+    scan_pages = max(int(getattr(settings, "ORBITA_DOCUMENTS_PDF_SCAN_PAGES", 10)), 1)
+    pages = []
+    if backend == BACKEND_PYMUPDF:
+        import fitz
+
+        doc = fitz.open(stream=content, filetype="pdf")
+        try:
+            total = len(doc)
+            for page in doc.pages(0, min(total, scan_pages)):
+                text = page.get_text()
+                has_content = bool(text.strip() or page.get_images() or page.get_drawings())
+                pages.append((page.rect.width, page.rect.height, text, has_content))
+        finally:
+            doc.close()
+        return total, pages
+
+    import pypdfium2 as pdfium
+
+    doc = pdfium.PdfDocument(content)
+    try:
+        total = len(doc)
+        for index in range(min(total, scan_pages)):
+            page = doc[index]
+            width, height = page.get_size()
+            textpage = page.get_textpage()
+            text = textpage.get_text_bounded()
+            has_content = bool(text.strip()) or any(True for _ in page.get_objects(max_depth=1))
+            textpage.close()
+            page.close()
+            pages.append((width, height, text, has_content))
+    finally:
+        doc.close()
+    return total, pages
+
+
+def _render_page(content, index, scale, backend):
+    """Rasteriza una página a RGB. Corre en el pool de procesos: sin Django ni estado global."""
+    if backend == BACKEND_PYMUPDF:
+        import fitz
+
+        doc = fitz.open(stream=content, filetype="pdf")
+        try:
+            pix = doc[index].get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+            return index, pix.width, pix.height, bytes(pix.samples)
+        finally:
+            doc.close()
+
+    import pypdfium2 as pdfium
+
+    doc = pdfium.PdfDocument(content)
+    try:
+        page = doc[index]
+        image = page.render(scale=scale).to_pil().convert("RGB")
+        page.close()
+        return index, image.width, image.height, image.tobytes()
+    finally:
+        doc.close()
+
+
+def _get_pool():
+    global _pool
+    workers = int(getattr(settings, "ORBITA_DOCUMENTS_PDF_WORKERS", 2))
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: el proceso web tiene hilos y conexiones abiertas que no deben heredarse.
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool():
+    """Descarta el pool (tras un timeout o si se rompió) terminando procesos colgados."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is None:
+        return
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def _page_cache():
+    return caches[PAGE_CACHE_ALIAS]
+
+
+def _cache_key(digest, index, scale):
+    fmt = getattr(settings, "ORBITA_DOCUMENTS_IMAGE_FORMAT", "jpeg")
+    quality = getattr(settings, "ORBITA_DOCUMENTS_IMAGE_QUALITY", 85)
+    return f"{CACHE_PREFIX}:{digest}:{index}:{scale:.3f}:{fmt}:{quality}"
+
+
+def _prepare_rendered(rendered, content_size, started):
+    from PIL import Image
+
+    _index, width, height, samples = rendered
+    image = Image.frombytes("RGB", (width, height), samples)
+    return prepare_pil_image(image, content_size, started=started)
+
+
+def _render_all(content, jobs, backend, deadline):
+    """Renderiza {índice: escala} y devuelve {índice: PreparedImage} con lo que termine a tiempo."""
+    done = {}
+    started = time.perf_counter()
+    pool = _get_pool() if len(jobs) > 1 else None
+    if pool is not None:
+        try:
+            futures = {pool.submit(_render_page, content, index, scale, backend): index for index, scale in jobs.items()}
+            pending = set(futures)
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                finished, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = futures[future]
+                    try:
+                        done[index] = _prepare_rendered(future.result(), len(content), started)
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as exc:
+                        logger.warning("document_pdf no se pudo renderizar la página %d: %s", index + 1, exc)
+            if pending:
+                logger.warning("document_pdf render timeout: %d/%d páginas listas", len(done), len(jobs))
+                _reset_pool()
+            return done
+        except BrokenProcessPool:
+            logger.warning("document_pdf pool de render roto; se renderiza en el proceso")
+            _reset_pool()
+
+    for index, scale in jobs.items():
+        if index in done:
+            continue
+        if time.monotonic() >= deadline:
+            logger.warning("document_pdf render timeout: %d/%d páginas listas", len(done), len(jobs))
+            break
+        try:
+            done[index] = _prepare_rendered(_render_page(content, index, scale, backend), len(content), started)
+        except Exception as exc:
+            logger.warning("document_pdf no se pudo renderizar la página %d: %s", index + 1, exc)
+    return done
+
+
+def render_pdf_pages(content: bytes, doc_type: str) -> list[PreparedImage]:
+    """Páginas relevantes del PDF, preparadas para Vision y en orden. Lista vacía si no se puede."""
+    backend = pdf_backend()
+    if backend is None:
+        logger.warning("Ni PyMuPDF ni pypdfium2 disponibles para convertir PDF a imagen.")
+        return []
+    started = time.monotonic()
+    deadline = started + float(getattr(settings, "ORBITA_DOCUMENTS_PDF_RENDER_SECONDS", 20))
+
+    total, pages = _inspect(content, backend)
+    if not pages:
+        return []
+    scores = [score_page(text, doc_type, has_content) for _w, _h, text, has_content in pages]
+    selected = pick_pages(scores, doc_type)
+
+    digest = hashlib.sha256(content).hexdigest()
+    page_cache = _page_cache()
+    scales = {index: pdf_render_scale(pages[index][0], pages[index][1]) for index in selected}
+    keys = {index: _cache_key(digest, index, scales[index]) for index in selected}
+    hits = page_cache.get_many(list(keys.values()))
+    prepared = {index: hits[key] for index, key in keys.items() if key in hits}
+
+    missing = {index: scales[index] for index in selected if index not in prepared}
+    if missing:
+        rendered = _render_all(content, missing, backend, deadline)
+        page_cache.set_many({keys[index]: image for index, image in rendered.items()})
+        prepared.update(rendered)
+
+    result = [prepared[index] for index in selected if index in prepared]
+    logger.info(
+        "document_pdf pages=%d inspected=%d selected=%s rendered=%d cached=%d sent=%d in %.0f ms",
+        total, len(pages), [i + 1 for i in selected], len(missing), len(selected) - len(missing),
+        len(result), (time.monotonic() - started) * 1000,
+    )
+    return result
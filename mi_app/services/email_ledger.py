@@ -0,0 +1,59 @@
+"""
+Ledger de idempotencia del correo entrante (`ProcessedIncomingEmail`).
+
+El worker crea envío, archivos y candidato y recién después marca el correo `\\Seen`; si
+cae en medio, la siguiente lectura vería el mismo correo como nuevo. Por eso cada correo
+convertido se registra con clave (buzón, Message-ID) en la misma transacción que el envío:
+- si el registro existe, reprocesar el correo es una consulta y un `\\Seen`, sin crear nada
+  ni volver a analizar el CV;
+- si dos workers lo toman a la vez, la restricción única rechaza al segundo y su
+  transacción (envío incluido) se revierte.
+
+Sin Message-ID la clave es un hash de encabezados y estructura del correo, estable aunque
+el servidor renumere los UID. Los correos que no coinciden con ningún cliente no se
+registran: un replay posterior (p. ej. tras agregar una regex) sí los procesa.
+"""
+import hashlib
+
+from mi_app.models import ProcessedIncomingEmail
+
+# Encabezados que entran en el hash de contenido.
+HASH_HEADERS = ("Message-ID", "From", "To", "Cc", "Subject", "Date")
+
+
+def mailbox_key(mailbox_conn):
+    return f"{mailbox_conn.user}@{mailbox_conn.host}:{mailbox_conn.port}/{mailbox_conn.folder}"[:400]
+
+
+def content_hash(fetched):
+    digest = hashlib.sha256()
+    for name in HASH_HEADERS:
+        digest.update(f"{name}:{fetched.headers.get(name, '')}\n".encode("utf-8", errors="replace"))
+    for part in fetched.parts:
+        digest.update(f"{part.section}:{part.content_type}:{part.size}:{part.filename}\n".encode("utf-8", errors="replace"))
+    return digest.hexdigest()
+
+
+def message_key(fetched, digest):
+    message_id = str(fetched.headers.get("Message-ID", "") or "").strip()
+    if message_id:
+        return message_id[:255]
+    return f"sha256:{digest}"
+
+
+def is_processed(mailbox, key):
+    return ProcessedIncomingEmail.objects.filter(mailbox=mailbox, message_key=key).exists()
+
+
+def record(mailbox, key, digest, uid, outcome, submission=None, subject="", from_email=""):
+    """Registra el correo; llamar dentro de la transacción que crea el envío."""
+    return ProcessedIncomingEmail.objects.create(
+        mailbox=mailbox,
+        message_key=key,
+        content_hash=digest,
+        uid=uid,
+        outcome=outcome,
+        submission=submission,
+        subject=subject[:255],
+        from_email=from_email[:254],
+    )
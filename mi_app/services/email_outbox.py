@@ -0,0 +1,195 @@
+"""
+Outbox de correos salientes (notificaciones, soporte, candidatos y contacto).
+
+Los helpers de notificación ya no abren SMTP dentro del request o del bot:
+`enqueue_email` guarda un `OutboundEmail` en la transacción activa y el worker
+`manage.py send_outbox_emails` lo envía. Cada ciclo agrupa los correos por
+servidor (host, usuario) y reutiliza una sola conexión SMTP por grupo.
+
+- Reintentos con backoff exponencial (ORBITA_EMAIL_OUTBOX_RETRY_BASE_SECONDS) hasta
+  ORBITA_EMAIL_OUTBOX_MAX_ATTEMPTS; después queda como fallido.
+- Límite por cliente (ORBITA_EMAIL_OUTBOX_CLIENT_RATE_PER_MINUTE): lo que excede
+  se pospone al siguiente minuto sin contar como intento.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Count
+from django.utils import timezone
+
+from mi_app.models import ATSClientEmailConfig, OutboundEmail
+from mi_app.services.work_queue import claim_due, retry_delay
+
+logger = logging.getLogger(__name__)
+
+# Mientras un worker envía un lote, las filas quedan reservadas este tiempo.
+LEASE_SECONDS = 300
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+def enqueue_email(
+    subject, body, to, from_email=None, html_body="", reply_to=None, client=None, use_client_smtp=False, send_at=None
+):
+    """Encola un correo (opcionalmente programado en `send_at`). Retorna el OutboundEmail o None si no hay destinatarios."""
+    recipients = [str(e).strip() for e in (to or []) if e and str(e).strip()]
+    if not recipients:
+        return None
+    return OutboundEmail.objects.create(
+        client=client,
+        use_client_smtp=use_client_smtp,
+        subject=(subject or "")[:255],
+        body=body or "",
+        html_body=html_body or "",
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL or "",
+        to=recipients,
+        reply_to=[str(e).strip() for e in (reply_to or []) if e],
+        next_attempt_at=send_at or timezone.now(),
+    )
+
+
+def _claim_batch(batch_size):
+    """Reserva hasta `batch_size` correos vencidos; otro worker no los toma mientras dure el lease."""
+    ids = claim_due(OutboundEmail.objects.filter(status=OutboundEmail.STATUS_PENDING), batch_size, LEASE_SECONDS)
+    return list(OutboundEmail.objects.filter(pk__in=ids).select_related("client").order_by("id"))
+
+
+def _client_budgets(emails):
+    """Cuántos correos puede enviar aún cada cliente en el minuto actual."""
+    limit = int(getattr(settings, "ORBITA_EMAIL_OUTBOX_CLIENT_RATE_PER_MINUTE", 30))
+    client_ids = {e.client_id for e in emails if e.client_id}
+    if not client_ids or limit <= 0:
+        return {}
+    recent = dict(
+        OutboundEmail.objects.filter(
+            client_id__in=client_ids,
+            status=OutboundEmail.STATUS_SENT,
+            sent_at__gte=timezone.now() - timedelta(minutes=1),
+        )
+        .values_list("client_id")
+        .annotate(n=Count("id"))
+    )
+    return {client_id: limit - recent.get(client_id, 0) for client_id in client_ids}
+
+
+def _connection_for(email, configs):
+    """Retorna (clave, kwargs de get_connection) o (None, error) si el SMTP del cliente está incompleto."""
+    if not email.use_client_smtp:
+        return ("global", settings.EMAIL_HOST, settings.EMAIL_HOST_USER), {}
+    config = configs.get(email.client_id)
+    host = (getattr(config, "smtp_host", "") or "").strip()
+    user = (getattr(config, "smtp_user", "") or "").strip()
+    password = (getattr(config, "smtp_password_encrypted", "") or "").strip()
+    if not host or not user or not password:
+        return None, "SMTP del cliente incompleto (host/usuario/contraseña)."
+    return ("client", host, user), {
+        "host": host,
+        "port": int(config.smtp_port or 587),
+        "username": user,
+        "password": password,
+        "use_tls": bool(config.smtp_use_tls),
+        "timeout": getattr(settings, "EMAIL_TIMEOUT", 10),
+    }
+
+
+def _build_message(email, connection):
+    msg = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,
+        to=email.to,
+        reply_to=email.reply_to or None,
+        connection=connection,
+    )
+    if email.html_body:
+        msg.attach_alternative(email.html_body, "text/html")
+    return msg
+
+
+def _mark_sent(email):
+    email.status = OutboundEmail.STATUS_SENT
+    email.sent_at = timezone.now()
+    email.attempts += 1
+    email.last_error = ""
+    email.save(update_fields=["status", "sent_at", "attempts", "last_error"])
+
+
+def _mark_failure(email, error, permanent=False):
+    email.attempts += 1
+    email.last_error = str(error)[:2000]
+    max_attempts = int(getattr(settings, "ORBITA_EMAIL_OUTBOX_MAX_ATTEMPTS", 5))
+    if permanent or email.attempts >= max_attempts:
+        email.status = OutboundEmail.STATUS_FAILED
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(
+            email.attempts, getattr(settings, "ORBITA_EMAIL_OUTBOX_RETRY_BASE_SECONDS", 60), MAX_RETRY_DELAY
+        )
+    email.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+    logger.warning("email_outbox failed id=%s attempts=%s error=%s", email.pk, email.attempts, error)
+    return email.status == OutboundEmail.STATUS_FAILED
+
+
+def _send_group(params, emails, stats):
+    """Envía un grupo de correos por una sola conexión SMTP."""
+    connection = get_connection(fail_silently=False, **params)
+    try:
+        connection.open()
+    except Exception as exc:
+        for email in emails:
+            stats["failed" if _mark_failure(email, exc) else "retry"] += 1
+        return
+    try:
+        for email in emails:
+            try:
+                if connection.send_messages([_build_message(email, connection)]):
+                    _mark_sent(email)
+                    stats["sent"] += 1
+                    continue
+                error = "El backend no envió el mensaje."
+            except Exception as exc:
+                error = exc
+            stats["failed" if _mark_failure(email, error) else "retry"] += 1
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def drain_outbox(batch_size=50):
+    """Envía un lote de correos pendientes. Retorna contadores sent/retry/failed/deferred."""
+    stats = {"sent": 0, "retry": 0, "failed": 0, "deferred": 0}
+    emails = _claim_batch(batch_size)
+    if not emails:
+        return stats
+
+    budgets = _client_budgets(emails)
+    configs = {
+        config.client_id: config
+        for config in ATSClientEmailConfig.objects.filter(
+            client_id__in={e.client_id for e in emails if e.use_client_smtp and e.client_id}
+        )
+    }
+    groups = {}
+    deferred_ids = []
+    for email in emails:
+        if email.client_id in budgets:
+            if budgets[email.client_id] <= 0:
+                deferred_ids.append(email.pk)
+                continue
+            budgets[email.client_id] -= 1
+        key, params = _connection_for(email, configs)
+        if key is None:
+            _mark_failure(email, params, permanent=True)
+            stats["failed"] += 1
+            continue
+        groups.setdefault(key, (params, []))[1].append(email)
+
+    if deferred_ids:
+        OutboundEmail.objects.filter(pk__in=deferred_ids).update(next_attempt_at=timezone.now() + timedelta(minutes=1))
+        stats["deferred"] = len(deferred_ids)
+
+    for params, group in groups.values():
+        _send_group(params, group, stats)
+    return stats
@@ -0,0 +1,199 @@
+"""
+Índice de ruteo del correo entrante: correo → configuración de cliente → formulario.
+
+Se arma una sola vez con dos consultas (configuraciones y formularios activos) y se
+reutiliza mientras no cambie ninguna configuración de correo, formulario o vacante:
+`current_index` compara una huella barata (cantidad y última modificación de cada tabla)
+antes de cada ronda de un buzón y solo reconstruye si difiere.
+
+Rutear un correo no toca la BD:
+- las regex de asunto están precompiladas (una regex inválida se registra una vez al
+  armar el índice, no en cada correo);
+- un diccionario dirección de inbox → reglas resuelve de inmediato las configuraciones a
+  las que iba dirigido el correo, que tienen prioridad;
+- por cliente, un autómata Aho-Corasick sobre los títulos de vacante encuentra en una
+  sola pasada por asunto + cuerpo qué vacantes se mencionan.
+
+Las reglas de elección son las de siempre: entre las configuraciones cuya regex coincide
+gana la dirigida al inbox y, a igualdad, la de mayor id; el formulario es el activo más
+reciente cuya vacante aparece en el texto, si no el más reciente con vacante, si no el
+más reciente.
+"""
+import logging
+import re
+import threading
+from collections import deque
+
+from django.db.models import Count, Max
+
+from mi_app.models import ATSClientEmailConfig, ATSForm, Vacancy
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_cache = {"fingerprint": None, "index": None}
+
+
+def inbox_addresses(config):
+    values = [
+        config.company_from_email,
+        config.notification_email,
+        config.smtp_user,
+        config.imap_user,
+    ]
+    return {v for v in ((value or "").strip().lower() for value in values) if v and "@" in v}
+
+
+class TitleMatcher:
+    """Autómata Aho-Corasick: `find` retorna los índices de los patrones presentes en el texto."""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][char] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = child
+            self._out[node] += (index,)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] += self._out[self._fail[child]]
+
+    def find(self, text):
+        found = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+class ClientForms:
+    """Formularios activos de un cliente, del más reciente al más antiguo."""
+
+    def __init__(self, forms):
+        self.forms = forms
+        self._title_forms = []
+        titles = []
+        seen = set()
+        for form in forms:
+            title = (getattr(form.vacancy, "title", "") or "").strip().lower()
+            if title and title not in seen:
+                # El índice del patrón sigue el orden de los formularios: el menor gana.
+                seen.add(title)
+                titles.append(title)
+                self._title_forms.append(form)
+        self._matcher = TitleMatcher(titles) if titles else None
+        self._fallback = next((form for form in forms if form.vacancy_id), forms[0])
+
+    def pick(self, text):
+        if self._matcher is not None:
+            found = self._matcher.find(text.lower())
+            if found:
+                return self._title_forms[min(found)]
+        return self._fallback
+
+
+class RoutingIndex:
+    def __init__(self, configs, forms):
+        self.configs = configs
+        # (config, regex) de mayor a menor id: la primera que coincide es la que gana.
+        self._rules = []
+        self._by_address = {}
+        for config in sorted(configs, key=lambda c: c.pk, reverse=True):
+            pattern = (config.incoming_subject_regex or "").strip()
+            if not pattern:
+                continue
+            try:
+                rule = (config, re.compile(pattern))
+            except re.error:
+                logger.warning("Regex inválida en config %s: %s", config.pk, pattern)
+                continue
+            self._rules.append(rule)
+            for address in inbox_addresses(config):
+                self._by_address.setdefault(address, []).append(rule)
+
+        by_client = {}
+        for form in forms:
+            by_client.setdefault(form.client_id, []).append(form)
+        self._forms = {client_id: ClientForms(client_forms) for client_id, client_forms in by_client.items()}
+
+    def match_config(self, subject, recipients, scope=None):
+        """
+        Configuración que recibe el correo, o None. `scope` limita a los ids de las
+        configuraciones leídas por el buzón actual.
+        """
+        subject = subject or ""
+        best = None
+        for address in recipients:
+            for config, regex in self._by_address.get(address, ()):
+                if best is not None and config.pk <= best.pk:
+                    break
+                if (scope is None or config.pk in scope) and regex.search(subject):
+                    best = config
+                    break
+        if best is not None:
+            return best
+        for config, regex in self._rules:
+            if (scope is None or config.pk in scope) and regex.search(subject):
+                return config
+        return None
+
+    def pick_form(self, client_id, subject, body):
+        client_forms = self._forms.get(client_id)
+        if client_forms is None:
+            return None
+        return client_forms.pick(f"{subject}\n{body}")
+
+
+def build_index():
+    configs = list(
+        ATSClientEmailConfig.objects.select_related("client", "client__user")
+        .exclude(incoming_subject_regex="")
+        .order_by("id")
+    )
+    forms = list(
+        ATSForm.objects.filter(client_id__in={c.client_id for c in configs}, is_active=True)
+        .select_related("client", "vacancy")
+        .order_by("-updated_at", "-id")
+    )
+    return RoutingIndex(configs, forms)
+
+
+def routing_fingerprint():
+    """Huella de las tablas que afectan el ruteo; cambia con cualquier alta, baja o edición."""
+    return tuple(
+        tuple(model.objects.aggregate(total=Count("id"), last=Max("updated_at")).values())
+        for model in (ATSClientEmailConfig, ATSForm, Vacancy)
+    )
+
+
+def current_index():
+    """Índice vigente, compartido entre hilos; se reconstruye solo si cambió la huella."""
+    fingerprint = routing_fingerprint()
+    with _lock:
+        if _cache["index"] is None or _cache["fingerprint"] != fingerprint:
+            _cache["index"] = build_index()
+            _cache["fingerprint"] = fingerprint
+            logger.info("email_routing rebuilt configs=%s", len(_cache["index"].configs))
+        return _cache["index"]
@@ -1,3 +1,5 @@
+from django.db import IntegrityError, transaction
+
 from mi_app.models import ATSFormSubmission
 
 
@@ -14,17 +16,27 @@ def has_existing_submission_for_email(orbita_form, email):
         return False
     return ATSFormSubmission.objects.filter(
         form=orbita_form,
-        submitter_email__iexact=normalized_email,
+        normalized_email=normalized_email,
     ).exists()
 
 
 def create_submission_once(orbita_form, payload, submitter_email):
+    """
+    Inserta el envío y detecta el duplicado en el mismo INSERT: la restricción única
+    (form, normalized_email) rechaza el segundo envío aunque lleguen a la vez. Los envíos
+    sin correo guardan normalized_email NULL y no chocan entre sí.
+    Compartido por formulario web, chat web, Telegram e IMAP.
+    """
     normalized_email = normalize_submitter_email(submitter_email)
-    if has_existing_submission_for_email(orbita_form, normalized_email):
+    try:
+        with transaction.atomic():
+            submission = ATSFormSubmission.objects.create(
+                form=orbita_form,
+                payload=payload,
+                submitter_email=normalized_email,
+            )
+    except IntegrityError:
+        if not has_existing_submission_for_email(orbita_form, normalized_email):
+            raise
         return None, True
-    submission = ATSFormSubmission.objects.create(
-        form=orbita_form,
-        payload=payload,
-        submitter_email=normalized_email,
-    )
     return submission, False
@@ -0,0 +1,508 @@
+"""
+Lectura incremental de buzones IMAP para el worker `process_incoming_emails`.
+
+- Checkpoint por buzón (`IMAPMailboxCheckpoint`: UIDVALIDITY + último UID): cada ciclo
+  busca solo los UID nuevos (`UID SEARCH UID n:*`) en lugar de todo lo no leído.
+- Un `UID FETCH` por lote trae solo encabezados y BODYSTRUCTURE; con eso se decide el
+  ruteo. El cuerpo de texto y los adjuntos permitidos se descargan después, por parte
+  (`BODY.PEEK[sección]`), y solo para los correos que coinciden con un cliente. Un correo
+  que no coincide cuesta un fetch pequeño de encabezados.
+- Del texto se pide solo el comienzo (`BODY.PEEK[1]<0.n>`). Cada adjunto va en su propio
+  FETCH y se decodifica por bloques hacia un archivo temporal, calculando el SHA-256 y
+  cortando apenas supera el tamaño máximo: nunca conviven en memoria el correo entero y
+  sus adjuntos decodificados.
+- `idle_wait` implementa IMAP IDLE (RFC 2177) sobre imaplib para el modo `--idle`.
+"""
+import binascii
+import hashlib
+import imaplib
+import io
+import itertools
+import logging
+import quopri
+import re
+import select
+import ssl
+import time
+from dataclasses import dataclass, field
+from email import message_from_bytes
+from email.header import decode_header, make_header
+from urllib.parse import unquote
+
+from mi_app.models import IMAPMailboxCheckpoint
+
+logger = logging.getLogger(__name__)
+
+# Encabezados que necesita el ruteo (y el ledger por Message-ID).
+HEADER_FIELDS = ("SUBJECT", "FROM", "TO", "CC", "DELIVERED-TO", "X-ORIGINAL-TO", "MESSAGE-ID", "DATE")
+HEADER_FETCH_BATCH = 100
+
+_LITERAL_RE = re.compile(rb"\{(\d+)\}$")
+_NON_BASE64_RE = re.compile(rb"[^A-Za-z0-9+/=]")
+# Bloque de decodificación (múltiplo de 4 para base64).
+DECODE_CHUNK_SIZE = 64 * 1024
+_OPEN, _CLOSE = object(), object()
+
+
+@dataclass
+class MessagePart:
+    """Hoja del BODYSTRUCTURE: una parte descargable por `BODY.PEEK[section]`."""
+    section: str
+    content_type: str
+    params: dict = field(default_factory=dict)
+    encoding: str = "7bit"
+    size: int = 0
+    disposition: str = ""
+    filename: str = ""
+
+    @property
+    def charset(self):
+        return self.params.get("charset") or "utf-8"
+
+    @property
+    def estimated_size(self):
+        """Tamaño decodificado aproximado según BODYSTRUCTURE (base64: líneas de 76 + CRLF)."""
+        if self.encoding == "base64":
+            return self.size * 57 // 78
+        return self.size
+
+
+@dataclass
+class FetchedHeaders:
+    uid: int
+    headers: object
+    parts: list
+
+
+# ──────────────────────────── Respuestas IMAP ────────────────────────────
+
+class _Literal(bytes):
+    """Contenido de un literal `{n}` (siempre bytes, nunca átomo)."""
+
+
+def _segments(data):
+    """Aplana la respuesta de imaplib: texto y literales en orden, sin los marcadores `{n}`."""
+    for item in data:
+        if isinstance(item, tuple):
+            prefix, literal = item[0], item[1]
+            yield _LITERAL_RE.sub(b"", prefix)
+            yield _Literal(literal)
+        elif item:
+            yield item
+
+
+def _tokens(data):
+    for segment in _segments(data):
+        if isinstance(segment, _Literal):
+            yield segment
+            continue
+        i, n = 0, len(segment)
+        while i < n:
+            c = segment[i:i + 1]
+            if c in (b" ", b"\r", b"\n"):
+                i += 1
+            elif c in (b"(", b")"):
+                yield _OPEN if c == b"(" else _CLOSE
+                i += 1
+            elif c == b'"':
+                i += 1
+                out = bytearray()
+                while i < n and segment[i:i + 1] != b'"':
+                    if segment[i:i + 1] == b"\\":
+                        i += 1
+                    out += segment[i:i + 1]
+                    i += 1
+                i += 1
+                yield bytes(out).decode("utf-8", errors="replace")
+            else:
+                start = i
+                depth = 0
+                # Los átomos tipo BODY[HEADER.FIELDS (SUBJECT)] incluyen espacios y paréntesis.
+                while i < n:
+                    c = segment[i:i + 1]
+                    if c == b"[":
+                        depth += 1
+                    elif c == b"]":
+                        depth -= 1
+                    elif depth == 0 and c in (b" ", b"(", b")", b"\r", b"\n"):
+                        break
+                    i += 1
+                atom = segment[start:i].decode("latin-1")
+                yield None if atom.upper() == "NIL" else atom
+
+
+def parse_response(data):
+    """Convierte la respuesta de imaplib en listas anidadas (una lista por elemento de nivel superior)."""
+    stack = [[]]
+    for token in _tokens(data):
+        if token is _OPEN:
+            stack.append([])
+        elif token is _CLOSE:
+            if len(stack) > 1:
+                done = stack.pop()
+                stack[-1].append(done)
+        else:
+            stack[-1].append(token)
+    while len(stack) > 1:
+        done = stack.pop()
+        stack[-1].append(done)
+    return stack[0]
+
+
+def fetch_items(data):
+    """Respuesta de `UID FETCH` → lista de dicts {atributo en mayúsculas: valor}."""
+    items = []
+    for value in parse_response(data):
+        if not isinstance(value, list):
+            continue
+        attrs = {}
+        for i in range(0, len(value) - 1, 2):
+            key = value[i]
+            if isinstance(key, str):
+                attrs[key.upper()] = value[i + 1]
+        if attrs:
+            items.append(attrs)
+    return items
+
+
+# ──────────────────────────── BODYSTRUCTURE ────────────────────────────
+
+def _decode_mime(value):
+    if not value:
+        return ""
+    try:
+        return str(make_header(decode_header(value)))
+    except Exception:
+        return value
+
+
+def _params(raw):
+    """Lista plana de parámetros → dict, resolviendo RFC 2231 (filename*=utf-8''...)."""
+    if not isinstance(raw, list):
+        return {}
+    pairs = [(str(raw[i] or "").lower(), raw[i + 1]) for i in range(0, len(raw) - 1, 2)]
+    params = {}
+    for key, value in pairs:
+        if value is None:
+            continue
+        value = value.decode("latin-1") if isinstance(value, bytes) else str(value)
+        if key.endswith("*"):
+            charset, _lang, text = value.split("'", 2) if value.count("'") >= 2 else ("", "", value)
+            try:
+                value = unquote(text, encoding=charset or "utf-8", errors="replace")
+            except LookupError:
+                value = unquote(text)
+            key = key.rstrip("*")
+        params[key] = value
+    return params
+
+
+def _as_str(value):
+    if isinstance(value, bytes):
+        return value.decode("latin-1")
+    return str(value) if value is not None else ""
+
+
+def _leaf(struct, section):
+    content_type = f"{_as_str(struct[0])}/{_as_str(struct[1])}".lower()
+    params = _params(struct[2] if len(struct) > 2 else None)
+    encoding = _as_str(struct[5] if len(struct) > 5 else "").lower() or "7bit"
+    try:
+        size = int(struct[6]) if len(struct) > 6 and struct[6] is not None else 0
+    except (TypeError, ValueError):
+        size = 0
+    # Datos de extensión: tras los 7 campos básicos, text/* agrega "lines" y message/rfc822
+    # agrega envelope, body y lines; luego vienen md5 y disposition.
+    if content_type.startswith("text/"):
+        disp_index = 9
+    elif content_type == "message/rfc822":
+        disp_index = 11
+    else:
+        disp_index = 8
+    disposition, disp_params = "", {}
+    raw_disp = struct[disp_index] if len(struct) > disp_index else None
+    if isinstance(raw_disp, list) and raw_disp:
+        disposition = _as_str(raw_disp[0]).lower()
+        disp_params = _params(raw_disp[1] if len(raw_disp) > 1 else None)
+    filename = _decode_mime(disp_params.get("filename") or params.get("name") or "").strip()
+    return MessagePart(
+        section=section,
+        content_type=content_type,
+        params=params,
+        encoding=encoding,
+        size=size,
+        disposition=disposition,
+        filename=filename,
+    )
+
+
+def parse_bodystructure(struct, prefix=""):
+    """Hojas del BODYSTRUCTURE con su número de sección IMAP (p. ej. "1", "2.1")."""
+    if not isinstance(struct, list) or not struct:
+        return []
+    if isinstance(struct[0], list):
+        parts = []
+        for idx, child in enumerate(_multipart_children(struct), start=1):
+            section = f"{prefix}.{idx}" if prefix else str(idx)
+            parts.extend(parse_bodystructure(child, section))
+        return parts
+    return [_leaf(struct, prefix or "1")]
+
+
+def _multipart_children(struct):
+    """En un multipart los hijos son las listas iniciales; el primer string es el subtipo."""
+    children = []
+    for item in struct:
+        if not isinstance(item, list):
+            break
+        children.append(item)
+    return children
+
+
+# ──────────────────────────── Descarga ────────────────────────────
+
+def search_uids(mailbox, *criteria):
+    status, data = mailbox.uid("SEARCH", None, *criteria)
+    if status != "OK":
+        raise RuntimeError(f"UID SEARCH falló: {data!r}")
+    raw = data[0] if data and data[0] else b""
+    return sorted({int(uid) for uid in raw.split() if uid.isdigit()})
+
+
+def select_response(mailbox, name):
+    """Valor numérico de un código de respuesta del SELECT (UIDVALIDITY, UIDNEXT); None si no vino."""
+    _typ, data = mailbox.response(name)
+    for value in data or []:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def fetch_headers(mailbox, uids, batch_size=HEADER_FETCH_BATCH):
+    """Encabezados y partes de cada UID, en orden de UID, con un `UID FETCH` por lote."""
+    query = f"(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({' '.join(HEADER_FIELDS)})])"
+    fetched = {}
+    for start in range(0, len(uids), batch_size):
+        batch = uids[start:start + batch_size]
+        status, data = mailbox.uid("FETCH", ",".join(str(uid) for uid in batch), query)
+        if status != "OK":
+            raise RuntimeError(f"UID FETCH falló: {data!r}")
+        for attrs in fetch_items(data):
+            try:
+                uid = int(attrs.get("UID"))
+            except (TypeError, ValueError):
+                continue
+            header_bytes = next(
+                (value for key, value in attrs.items() if key.startswith("BODY[HEADER") and isinstance(value, bytes)),
+                b"",
+            )
+            fetched[uid] = FetchedHeaders(
+                uid=uid,
+                headers=message_from_bytes(header_bytes),
+                parts=parse_bodystructure(attrs.get("BODYSTRUCTURE")),
+            )
+    return [fetched[uid] for uid in uids if uid in fetched]
+
+
+class PartTooLarge(Exception):
+    """La parte decodificada supera el tamaño máximo permitido."""
+
+
+class _CappedWriter:
+    """Escribe en `out` calculando SHA-256 y corta en cuanto se pasa de `max_bytes`."""
+
+    def __init__(self, out, max_bytes=None):
+        self.out = out
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise PartTooLarge(f"más de {self.max_bytes} bytes")
+        self.digest.update(data)
+        self.out.write(data)
+        return len(data)
+
+
+def decode_part_to(part, raw, out, max_bytes=None):
+    """
+    Decodifica `raw` (Content-Transfer-Encoding de `part`) hacia `out` por bloques, sin
+    armar una segunda copia completa en memoria. Retorna (sha256, tamaño) de lo decodificado;
+    lanza `PartTooLarge` al pasar `max_bytes`.
+    """
+    writer = _CappedWriter(out, max_bytes)
+    view = memoryview(raw)
+    if part.encoding == "base64":
+        carry = b""
+        for start in range(0, len(view), DECODE_CHUNK_SIZE):
+            chunk = carry + _NON_BASE64_RE.sub(b"", view[start:start + DECODE_CHUNK_SIZE].tobytes())
+            cut = len(chunk) - len(chunk) % 4
+            writer.write(binascii.a2b_base64(chunk[:cut]))
+            carry = chunk[cut:]
+        tail = carry.rstrip(b"=")
+        if len(tail) % 4 > 1:
+            # Base64 truncado (fetch parcial o sin relleno): se completa el último bloque.
+            writer.write(binascii.a2b_base64(tail + b"=" * (-len(tail) % 4)))
+    elif part.encoding == "quoted-printable":
+        quopri.decode(io.BytesIO(raw), writer)
+    else:
+        for start in range(0, len(view), DECODE_CHUNK_SIZE):
+            writer.write(view[start:start + DECODE_CHUNK_SIZE].tobytes())
+    return writer.digest.hexdigest(), writer.size
+
+
+def decode_part(part, raw):
+    """Decodifica el contenido de una parte según su Content-Transfer-Encoding."""
+    out = io.BytesIO()
+    decode_part_to(part, raw, out)
+    return out.getvalue()
+
+
+def _fetch_sections(mailbox, uid, parts, max_bytes=None):
+    """`UID FETCH` de las secciones indicadas → {sección: bytes sin decodificar}."""
+    # Con max_bytes se pide solo el comienzo de cada parte (BODY.PEEK[1]<0.n>).
+    partial = f"<0.{max_bytes}>" if max_bytes else ""
+    query = "(" + " ".join(f"BODY.PEEK[{part.section}]{partial}" for part in parts) + ")"
+    status, data = mailbox.uid("FETCH", str(uid), query)
+    if status != "OK":
+        raise RuntimeError(f"UID FETCH falló: {data!r}")
+    sections = {part.section for part in parts}
+    raw = {}
+    for attrs in fetch_items(data):
+        for key, value in attrs.items():
+            match = re.match(r"BODY\[([\d.]+)\]", key)
+            if match and match.group(1) in sections:
+                raw[match.group(1)] = value if isinstance(value, bytes) else _as_str(value).encode("utf-8")
+    return raw
+
+
+def fetch_parts(mailbox, uid, parts, max_bytes=None):
+    """
+    Descarga (sin marcar como leído) las partes indicadas de un correo, hasta `max_bytes`
+    de cada una. Retorna {sección: bytes decodificados}. Pensado para partes de texto.
+    """
+    if not parts:
+        return {}
+    by_section = {part.section: part for part in parts}
+    raw = _fetch_sections(mailbox, uid, parts, max_bytes)
+    return {section: decode_part(by_section[section], value) for section, value in raw.items()}
+
+
+def fetch_part_to(mailbox, uid, part, out, max_bytes=None):
+    """
+    Descarga una sola parte (un FETCH por adjunto: en memoria queda a lo sumo el literal
+    de esa parte) y la decodifica por bloques hacia `out`. Retorna (sha256, tamaño);
+    lanza `PartTooLarge` al pasar `max_bytes`, antes de terminar de decodificar.
+    """
+    raw = _fetch_sections(mailbox, uid, [part]).pop(part.section, b"")
+    return decode_part_to(part, raw, out, max_bytes)
+
+
+# ──────────────────────────── IDLE ────────────────────────────
+
+_idle_tags = itertools.count(1)
+_NEW_MAIL_RE = re.compile(rb"^\* \d+ (EXISTS|RECENT)", re.IGNORECASE)
+
+
+def supports_idle(mailbox):
+    return "IDLE" in {str(c).upper() for c in getattr(mailbox, "capabilities", ())}
+
+
+def _readable(mailbox, wait):
+    """True si hay datos para leer sin bloquear: en el buffer de imaplib, en TLS o en el socket."""
+    sock = mailbox.sock
+    if isinstance(sock, ssl.SSLSocket) and sock.pending():
+        return True
+    previous = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        if mailbox.file.peek(1):
+            return True
+    except (BlockingIOError, ssl.SSLWantReadError, InterruptedError):
+        pass
+    finally:
+        sock.settimeout(previous)
+    readable, _w, _x = select.select([sock], [], [], wait)
+    return bool(readable)
+
+
+def idle_wait(mailbox, timeout, should_stop=None, tick=1.0):
+    """
+    Envía IDLE y espera hasta que el servidor anuncie correo nuevo (EXISTS/RECENT), pase
+    `timeout` o `should_stop()` sea verdadero; luego cierra con DONE. Retorna True si
+    llegó correo. Un BYE o una conexión cortada levantan `imaplib.IMAP4.abort`.
+    """
+    tag = f"IDLE{next(_idle_tags)}".encode()
+    mailbox.send(tag + b" IDLE\r\n")
+    line = mailbox.readline()
+    if not line.startswith(b"+"):
+        raise imaplib.IMAP4.error(f"El servidor rechazó IDLE: {line!r}")
+
+    new_mail = False
+    deadline = time.monotonic() + timeout
+    while not new_mail:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or (should_stop and should_stop()):
+            break
+        if not _readable(mailbox, min(tick, remaining)):
+            continue
+        line = mailbox.readline()
+        if not line or line.startswith(b"* BYE"):
+            raise imaplib.IMAP4.abort(f"Conexión cerrada durante IDLE: {line!r}")
+        new_mail = bool(_NEW_MAIL_RE.match(line))
+
+    mailbox.send(b"DONE\r\n")
+    while True:
+        line = mailbox.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Conexión cerrada al terminar IDLE")
+        if line.startswith(tag + b" "):
+            if not line[len(tag) + 1:].upper().startswith(b"OK"):
+                raise imaplib.IMAP4.error(f"IDLE terminó con error: {line!r}")
+            return new_mail
+
+
+# ──────────────────────────── Checkpoints ────────────────────────────
+
+def load_checkpoint(mailbox_conn):
+    return IMAPMailboxCheckpoint.objects.filter(
+        host=mailbox_conn.host, port=mailbox_conn.port, user=mailbox_conn.user, folder=mailbox_conn.folder
+    ).first()
+
+
+def save_checkpoint(mailbox_conn, uidvalidity, last_uid, bootstrapping=False):
+    IMAPMailboxCheckpoint.objects.update_or_create(
+        host=mailbox_conn.host,
+        port=mailbox_conn.port,
+        user=mailbox_conn.user,
+        folder=mailbox_conn.folder,
+        defaults={
+            "uidvalidity": uidvalidity,
+            "last_uid": last_uid,
+            "failed_uid": None,
+            "failed_attempts": 0,
+            "bootstrapping": bootstrapping,
+        },
+    )
+
+
+def record_failure(mailbox_conn, uid):
+    """
+    Cuenta un fallo del correo `uid` (el siguiente al checkpoint) y retorna los intentos
+    acumulados. Si aún no hay checkpoint se crea con UIDVALIDITY 0: el próximo ciclo sigue
+    leyendo desde los no leídos.
+    """
+    checkpoint, _created = IMAPMailboxCheckpoint.objects.get_or_create(
+        host=mailbox_conn.host,
+        port=mailbox_conn.port,
+        user=mailbox_conn.user,
+        folder=mailbox_conn.folder,
+        defaults={"uidvalidity": 0, "last_uid": 0},
+    )
+    attempts = checkpoint.failed_attempts + 1 if checkpoint.failed_uid == uid else 1
+    IMAPMailboxCheckpoint.objects.filter(pk=checkpoint.pk).update(failed_uid=uid, failed_attempts=attempts)
+    return attempts
@@ -0,0 +1,183 @@
+"""
+Eventos en vivo por cliente (notificaciones y progreso de sesiones de chat) para el stream SSE.
+
+Pub-sub local sin broker: `publish_event` inserta un `OrbitaEvent` en la transacción
+activa y, tras el commit, despierta a los streams abiertos del mismo proceso. Los eventos
+que publican otros procesos (bot de Telegram, lector IMAP, workers) llegan por la
+consulta periódica `id > último` sobre el índice (client, id). El id del evento es el
+`Last-Event-ID` con el que el navegador retoma tras reconectar.
+
+Los eventos solo se registran con ORBITA_SSE_ENABLED (servidor ASGI): bajo WSGI nadie los
+lee. El id se asigna al insertar, no al confirmar: un evento de una transacción más lenta
+puede hacerse visible después de otro con id mayor. Por eso cada consulta relee también los
+eventos de los últimos EVENTS_OVERLAP_SECONDS y descarta los ya enviados en la conexión;
+al reanudar, esa ventana puede repetir algún evento (los consumidores solo recargan datos).
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from mi_app.models import OrbitaEvent
+
+logger = logging.getLogger(__name__)
+
+# Máximo de eventos por consulta; si hay más, el siguiente ciclo continúa sin esperar.
+EVENTS_BATCH_SIZE = 100
+# Ventana que se relee en cada consulta para no saltar eventos confirmados fuera de orden.
+EVENTS_OVERLAP_SECONDS = 10
+
+_subscribers = {}
+_subscribers_lock = threading.Lock()
+
+
+def live_events_enabled():
+    return bool(getattr(settings, "ORBITA_SSE_ENABLED", False))
+
+
+def publish_event(client_id, kind, payload):
+    """Registra un evento para el cliente y avisa a los streams locales al confirmar la transacción."""
+    if not client_id or not live_events_enabled():
+        return None
+    event = OrbitaEvent.objects.create(client_id=client_id, kind=kind, payload=payload)
+    transaction.on_commit(lambda: _wake(client_id))
+    return event
+
+
+def publish_session_progress(session, client_id=None, deleted=False):
+    """Evento de progreso de una sesión de chat (web o Telegram)."""
+    if client_id is None:
+        from mi_app.models import ATSForm
+
+        client_id = ATSForm.objects.filter(pk=session.form_id).values_list("client_id", flat=True).first()
+    return publish_event(client_id, OrbitaEvent.KIND_CHAT_SESSION, {
+        "session_uuid": str(session.session_uuid),
+        "form_id": session.form_id,
+        "status": "deleted" if deleted else session.status,
+        "current_step": session.current_step,
+        "total_steps": session.total_steps,
+        "updated_at": session.updated_at.isoformat() if session.updated_at else None,
+    })
+
+
+def _subscribe(client_id):
+    waiter = (asyncio.get_running_loop(), asyncio.Event())
+    with _subscribers_lock:
+        _subscribers.setdefault(client_id, set()).add(waiter)
+    return waiter
+
+
+def _unsubscribe(client_id, waiter):
+    with _subscribers_lock:
+        waiters = _subscribers.get(client_id)
+        if waiters:
+            waiters.discard(waiter)
+            if not waiters:
+                del _subscribers[client_id]
+
+
+def _wake(client_id):
+    with _subscribers_lock:
+        waiters = list(_subscribers.get(client_id, ()))
+    for loop, event in waiters:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # El loop del stream ya cerró; se limpia al salir del generador.
+            pass
+
+
+def latest_event_id(client_id):
+    return OrbitaEvent.objects.filter(client_id=client_id).order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def events_since(client_id, last_id, limit=EVENTS_BATCH_SIZE, exclude=()):
+    """
+    Eventos con id mayor a `last_id` más los creados en la ventana de solape (salvo los ids
+    de `exclude`, ya enviados), en orden de id.
+    """
+    recent = timezone.now() - timedelta(seconds=EVENTS_OVERLAP_SECONDS)
+    return list(
+        OrbitaEvent.objects.filter(client_id=client_id)
+        .filter(Q(id__gt=last_id) | Q(created_at__gte=recent))
+        .exclude(id__in=list(exclude))
+        .order_by("id")
+        .values("id", "kind", "payload")[:limit]
+    )
+
+
+def _db_call(func, *args):
+    """Consulta desde el stream: conexión del hilo de sync_to_async, cerrada si quedó vieja."""
+    close_old_connections()
+    return func(*args)
+
+
+def format_sse(event_id, kind, payload):
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def stream_events(client_id, last_event_id=None):
+    """
+    Generador SSE: eventos nuevos del cliente, latidos (comentarios) y cierre tras
+    ORBITA_SSE_MAX_SECONDS; el navegador reconecta solo con `Last-Event-ID`.
+    """
+    heartbeat = max(int(getattr(settings, "ORBITA_SSE_HEARTBEAT_SECONDS", 15)), 1)
+    poll = max(int(getattr(settings, "ORBITA_SSE_POLL_SECONDS", 5)), 1)
+    max_seconds = int(getattr(settings, "ORBITA_SSE_MAX_SECONDS", 600))
+
+    if last_event_id is None:
+        # Conexión nueva: solo lo que ocurra desde ahora (el estado inicial lo trae la página).
+        last_event_id = await sync_to_async(_db_call)(latest_event_id, client_id)
+    waiter = _subscribe(client_id)
+    _, wake = waiter
+    started = last_beat = time.monotonic()
+    # Ids enviados en esta conexión que aún caen en la ventana de solape: {id: momento de envío}.
+    sent = {}
+    try:
+        yield f"retry: 3000\n: conectado {last_event_id}\n\n"
+        while True:
+            wake.clear()
+            horizon = time.monotonic() - EVENTS_OVERLAP_SECONDS
+            sent = {event_id: at for event_id, at in sent.items() if at >= horizon}
+            events = await sync_to_async(_db_call)(events_since, client_id, last_event_id, EVENTS_BATCH_SIZE, sent)
+            for event in events:
+                last_event_id = max(last_event_id, event["id"])
+                sent[event["id"]] = time.monotonic()
+                yield format_sse(event["id"], event["kind"], event["payload"])
+            if events:
+                last_beat = time.monotonic()
+                if len(events) == EVENTS_BATCH_SIZE:
+                    continue
+            now = time.monotonic()
+            if max_seconds and now - started >= max_seconds:
+                return
+            if now - last_beat >= heartbeat:
+                yield ": ping\n\n"
+                last_beat = now
+            timeout = min(poll, max(heartbeat - (now - last_beat), 0.1))
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _unsubscribe(client_id, waiter)
+
+
+def prune_events(older_than=timedelta(days=1), batch_size=1000):
+    """Borra eventos viejos por lotes (ya no sirven para reanudar). Retorna cuántos se borraron."""
+    cutoff = timezone.now() - older_than
+    deleted_total = 0
+    while True:
+        ids = list(OrbitaEvent.objects.filter(created_at__lt=cutoff).values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted_total
+        deleted, _ = OrbitaEvent.objects.filter(pk__in=ids).delete()
+        deleted_total += deleted
@@ -0,0 +1,110 @@
+"""
+Persistencia del bot de Telegram en la BD (`TelegramBotState`).
+
+Guarda `user_data` (estado de la sesión del chat, ver telegram_repository) y los estados
+del ConversationHandler, así un reinicio no corta las postulaciones en curso. Con
+varias réplicas cada una carga solo las claves de su partición (`partition_key %
+réplicas`): es la única que recibe updates de esos chats, por eso no hace falta
+refrescar desde la BD antes de cada update.
+"""
+import json
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Mod
+from telegram.ext import BasePersistence, PersistenceInput
+
+from mi_app.models import TelegramBotState
+from mi_app.services.telegram_repository import run_db
+
+logger = logging.getLogger(__name__)
+
+
+def _conversation_key(name, key):
+    return f"{name}:{json.dumps(list(key))}"
+
+
+def _load(kind, replica, replicas, prefix=""):
+    rows = TelegramBotState.objects.filter(kind=kind)
+    if prefix:
+        rows = rows.filter(key__startswith=prefix)
+    if replicas > 1:
+        rows = rows.alias(partition=Mod(F("partition_key"), replicas)).filter(partition=replica)
+    return list(rows.values_list("key", "data"))
+
+
+def _save(kind, key, partition_key, data):
+    if data in (None, {}):
+        TelegramBotState.objects.filter(kind=kind, key=key).delete()
+        return
+    with transaction.atomic():
+        TelegramBotState.objects.update_or_create(
+            kind=kind, key=key, defaults={"data": data, "partition_key": abs(int(partition_key))}
+        )
+
+
+class DjangoPersistence(BasePersistence):
+    """`BasePersistence` sobre `TelegramBotState`; solo persiste user_data y conversaciones."""
+
+    def __init__(self, replica=0, replicas=1, update_interval=60):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.replica = replica
+        self.replicas = max(replicas, 1)
+
+    async def get_user_data(self):
+        rows = await run_db(_load, TelegramBotState.KIND_USER, self.replica, self.replicas)
+        return {int(key): data or {} for key, data in rows}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        prefix = f"{name}:"
+        rows = await run_db(_load, TelegramBotState.KIND_CONVERSATION, self.replica, self.replicas, prefix)
+        return {tuple(json.loads(key[len(prefix):])): data for key, data in rows}
+
+    async def update_conversation(self, name, key, new_state):
+        # El primer elemento de la clave es el chat (per_chat=True).
+        await run_db(
+            _save, TelegramBotState.KIND_CONVERSATION, _conversation_key(name, key), key[0], new_state
+        )
+
+    async def update_user_data(self, user_id, data):
+        await run_db(_save, TelegramBotState.KIND_USER, str(user_id), user_id, dict(data))
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def drop_user_data(self, user_id):
+        await run_db(_save, TelegramBotState.KIND_USER, str(user_id), user_id, None)
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        pass
@@ -0,0 +1,290 @@
+"""
+Acceso a datos del bot de Telegram, pensado para handlers async.
+
+Antes cada handler pasaba por `sync_to_async` (un único hilo compartido para todo el
+bot), llamaba a `close_old_connections()` y recargaba sesión y formulario en cada
+respuesta. Aquí:
+
+- Las consultas corren en un pool acotado (ORBITA_TELEGRAM_DB_WORKERS) cuyos hilos
+  conservan su conexión; solo se revisa cada ORBITA_TELEGRAM_DB_CHECK_SECONDS o tras un
+  error de conexión (con un reintento).
+- Formulario y pasos se cachean en el proceso por versión (`ATSForm.updated_at`),
+  revalidando como mucho cada ORBITA_TELEGRAM_FORM_CACHE_SECONDS.
+- El estado de la sesión vive en `context.user_data`; las respuestas se escriben detrás
+  (write-behind) en orden por sesión, sin bloquear la respuesta al postulante. Las que
+  fallan quedan en `state["unsaved"]` y se reintentan en la siguiente escritura o en `flush`.
+"""
+import asyncio
+import functools
+import logging
+import threading
+import time
+import uuid as _uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+from django.db.utils import InterfaceError, OperationalError
+
+from mi_app.models import ATSForm, FormChatSession, FormChatSessionArchive
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_thread_state = threading.local()
+
+_forms = {}
+_forms_lock = threading.Lock()
+
+_writers = {}
+
+
+# ──────────────────────────── Pool de BD ────────────────────────────
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = max(int(getattr(settings, "ORBITA_TELEGRAM_DB_WORKERS", 8)), 1)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="telegram-db")
+        return _executor
+
+
+def _check_connection():
+    """`close_old_connections` a lo sumo cada N segundos por hilo (respeta CONN_MAX_AGE sin un ping por consulta)."""
+    interval = int(getattr(settings, "ORBITA_TELEGRAM_DB_CHECK_SECONDS", 30))
+    now = time.monotonic()
+    if now - getattr(_thread_state, "checked_at", 0) >= interval:
+        close_old_connections()
+        _thread_state.checked_at = now
+
+
+def _call(fn, args, kwargs):
+    _check_connection()
+    try:
+        return fn(*args, **kwargs)
+    except (InterfaceError, OperationalError):
+        logger.warning("telegram_repository: conexión caída en %s, reintentando una vez", fn.__name__)
+        close_old_connections()
+        _thread_state.checked_at = time.monotonic()
+        return fn(*args, **kwargs)
+
+
+async def run_db(fn, *args, **kwargs):
+    """Ejecuta `fn` (código ORM síncrono) en el pool del bot."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(_call, fn, args, kwargs))
+
+
+# ──────────────────────────── Formularios ────────────────────────────
+
+def _build_steps(orbita_form):
+    from mi_app.views.orbita.form_chat_views import _build_steps as _bs
+    return _bs(orbita_form)
+
+
+def _load_form(form_uuid):
+    """Retorna (form, steps) desde la caché del proceso o None si no existe / no está activo."""
+    key = str(form_uuid)
+    now = time.monotonic()
+    ttl = int(getattr(settings, "ORBITA_TELEGRAM_FORM_CACHE_SECONDS", 30))
+    cached = _forms.get(key)
+    if cached and now - cached[0] < ttl:
+        return cached[2], cached[3]
+    try:
+        version = ATSForm.objects.filter(uuid=key, is_active=True).values_list("updated_at", flat=True).first()
+    except (ValidationError, ValueError):
+        version = None
+    if version is None:
+        with _forms_lock:
+            _forms.pop(key, None)
+        return None
+    if cached and cached[1] == version:
+        form, steps = cached[2], cached[3]
+    else:
+        form = ATSForm.objects.select_related("vacancy", "client").get(uuid=key)
+        steps = _build_steps(form)
+        version = form.updated_at
+    with _forms_lock:
+        _forms[key] = (now, version, form, steps)
+    return form, steps
+
+
+async def get_form(form_uuid):
+    """Formulario activo y sus pasos; (None, None) si no está disponible."""
+    if not form_uuid:
+        return None, None
+    return await run_db(_load_form, form_uuid) or (None, None)
+
+
+def clear_form_cache():
+    with _forms_lock:
+        _forms.clear()
+
+
+# ──────────────────────────── Sesiones ────────────────────────────
+
+def _create_session(orbita_form, steps, telegram_user_id, telegram_display_name="", telegram_username=""):
+    session = FormChatSession.objects.create(
+        form=orbita_form,
+        session_uuid=_uuid.uuid4(),
+        status=FormChatSession.STATUS_STARTED,
+        current_step=0,
+        total_steps=len(steps),
+        answers={
+            "_telegram": {
+                "id": telegram_user_id,
+                "username": telegram_username or "",
+                "display_name": telegram_display_name or "",
+            }
+        },
+        candidate_name=(telegram_display_name or "")[:200],
+        telegram_user_id=telegram_user_id,
+        source=FormChatSession.SOURCE_TELEGRAM,
+        ip_address=None,
+    )
+    return {
+        "id": session.pk,
+        "uuid": str(session.session_uuid),
+        "form_id": orbita_form.pk,
+        "form_uuid": str(orbita_form.uuid),
+        "total_steps": session.total_steps,
+        "candidate_name": session.candidate_name,
+        "candidate_email": "",
+        "display_name": telegram_display_name or "",
+        "completed": False,
+        "unsaved": [],
+    }
+
+
+async def create_session(orbita_form, steps, telegram_user_id, telegram_display_name="", telegram_username=""):
+    """Crea la sesión y retorna su estado (dict serializable) para guardar en `context.user_data`."""
+    return await run_db(
+        _create_session, orbita_form, steps, telegram_user_id, telegram_display_name, telegram_username
+    )
+
+
+def _user_already_completed(orbita_form, telegram_user_id):
+    filters = {
+        "form": orbita_form,
+        "source": FormChatSession.SOURCE_TELEGRAM,
+        "telegram_user_id": telegram_user_id,
+        "submission__isnull": False,
+    }
+    return (
+        FormChatSession.objects.filter(**filters).exists()
+        or FormChatSessionArchive.objects.filter(**filters).exists()
+    )
+
+
+async def user_already_completed(orbita_form, telegram_user_id):
+    return await run_db(_user_already_completed, orbita_form, telegram_user_id)
+
+
+def _session_stub(state):
+    """Sesión sin consulta: `record_answer` solo necesita el pk y recarga el progreso."""
+    session = FormChatSession(
+        pk=state["id"],
+        form_id=state["form_id"],
+        session_uuid=state["uuid"],
+        total_steps=state["total_steps"],
+    )
+    cached = _forms.get(state.get("form_uuid") or "")
+    if cached:
+        session.form = cached[2]
+    return session
+
+
+def _record(state, write):
+    from mi_app.services.chat_answers import record_answer
+
+    return record_answer(
+        _session_stub(state),
+        write["step_id"],
+        write["value"],
+        attachment=write.get("attachment"),
+        candidate_email=write.get("candidate_email", ""),
+        candidate_name=write.get("candidate_name", ""),
+    )
+
+
+async def _drain(state, previous):
+    if previous is not None:
+        await asyncio.wait([previous])
+    unsaved = state.setdefault("unsaved", [])
+    while unsaved:
+        try:
+            completed = await run_db(_record, state, unsaved[0])
+        except Exception:
+            logger.exception("telegram_repository: no se pudo guardar la respuesta de la sesión %s", state["id"])
+            return False
+        unsaved.pop(0)
+        if completed:
+            state["completed"] = True
+    return True
+
+
+def _schedule(state):
+    session_id = state["id"]
+    task = asyncio.ensure_future(_drain(state, _writers.get(session_id)))
+    _writers[session_id] = task
+
+    def _forget(done):
+        if _writers.get(session_id) is done:
+            del _writers[session_id]
+
+    task.add_done_callback(_forget)
+    return task
+
+
+def queue_answer(state, step_id, value, attachment=None, candidate_email="", candidate_name=""):
+    """Encola la respuesta (write-behind). Actualiza en `state` el correo y nombre detectados."""
+    if candidate_email:
+        state["candidate_email"] = candidate_email
+    if candidate_name:
+        state["candidate_name"] = candidate_name[:200]
+    state.setdefault("unsaved", []).append({
+        "step_id": step_id,
+        "value": value,
+        "attachment": attachment,
+        "candidate_email": candidate_email,
+        "candidate_name": candidate_name,
+    })
+    return _schedule(state)
+
+
+async def flush(state):
+    """Espera las escrituras pendientes de la sesión (reintenta una vez). Retorna True si todo quedó guardado."""
+    pending = _writers.get(state["id"])
+    if pending is not None:
+        await asyncio.wait([pending])
+    if state.get("unsaved"):
+        await _schedule(state)
+    return not state.get("unsaved")
+
+
+async def flush_all():
+    """Espera todas las escrituras en curso (antes de persistir `user_data` o de apagar el bot)."""
+    pending = list(_writers.values())
+    if pending:
+        await asyncio.wait(pending)
+
+
+def _mark_duplicate(state, orbita_form):
+    from mi_app.services.chat_answers import mark_completed
+    from mi_app.services.form_submissions import has_existing_submission_for_email
+
+    if not has_existing_submission_for_email(orbita_form, state["candidate_email"]):
+        return False
+    mark_completed(FormChatSession.objects.get(pk=state["id"]))
+    return True
+
+
+async def mark_duplicate_if_needed(state, orbita_form):
+    """Si el correo de la sesión ya tiene un envío en el formulario, cierra la sesión y retorna True."""
+    if not state.get("candidate_email") or orbita_form is None:
+        return False
+    await flush(state)
+    return await run_db(_mark_duplicate, state, orbita_form)
@@ -0,0 +1,104 @@
+"""
+Cola de updates de Telegram para el modo webhook.
+
+El webhook (`TelegramWebhookView`, servido por la app ASGI/WSGI existente) solo guarda
+el update y responde 200; los workers `run_telegram_bot --webhook` lo procesan. Cada
+update va a la partición de su chat (`partition_key % réplicas`), así varias réplicas
+trabajan a la vez sin que dos atiendan el mismo chat. Los reintentos de Telegram no
+duplican trabajo: `update_id` es único.
+"""
+import logging
+from datetime import timedelta
+
+from django.db.models import F
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from mi_app.models import TelegramUpdate
+from mi_app.services.work_queue import claim_due
+
+logger = logging.getLogger(__name__)
+
+# Mientras un worker procesa un lote, los updates quedan reservados este tiempo.
+LEASE_SECONDS = 300
+
+
+def _partition_key(payload):
+    """Id del chat del update (o del usuario si no hay chat); updates sin ninguno van a la partición 0."""
+    for kind in ("message", "edited_message", "callback_query", "my_chat_member", "chat_member"):
+        item = payload.get(kind)
+        if not isinstance(item, dict):
+            continue
+        chat = item.get("chat") or (item.get("message") or {}).get("chat") or {}
+        if chat.get("id") is not None:
+            return abs(int(chat["id"]))
+        sender = item.get("from") or {}
+        if sender.get("id") is not None:
+            return abs(int(sender["id"]))
+    return 0
+
+
+def enqueue_update(payload):
+    """Guarda el update. Retorna False si no es válido; un reintento de Telegram se ignora."""
+    try:
+        update_id = int(payload["update_id"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    TelegramUpdate.objects.bulk_create(
+        [TelegramUpdate(update_id=update_id, partition_key=_partition_key(payload), payload=payload)],
+        ignore_conflicts=True,
+    )
+    return True
+
+
+def _owned(queryset, replica, replicas):
+    if replicas <= 1:
+        return queryset
+    return queryset.alias(partition=Mod(F("partition_key"), replicas)).filter(partition=replica)
+
+
+def claim_updates(replica=0, replicas=1, batch_size=100):
+    """
+    Reserva los próximos updates de la partición en orden de `update_id`. Incluye los que
+    quedaron en proceso con el lease vencido (worker caído a mitad de lote).
+    """
+    pending = _owned(TelegramUpdate.objects, replica, replicas).filter(
+        status__in=[TelegramUpdate.STATUS_PENDING, TelegramUpdate.STATUS_PROCESSING],
+    )
+    ids = claim_due(
+        pending,
+        batch_size,
+        LEASE_SECONDS,
+        lease_field="locked_until",
+        order_by=("update_id",),
+        status=TelegramUpdate.STATUS_PROCESSING,
+    )
+    return list(TelegramUpdate.objects.filter(pk__in=ids).order_by("update_id").values_list("pk", "payload"))
+
+
+def release_claims(replica=0, replicas=1):
+    """Al arrancar una réplica: sus updates en proceso vuelven a pendientes sin esperar el lease."""
+    return _owned(TelegramUpdate.objects.filter(status=TelegramUpdate.STATUS_PROCESSING), replica, replicas).update(
+        status=TelegramUpdate.STATUS_PENDING, locked_until=None
+    )
+
+
+def mark_done(ids):
+    if ids:
+        TelegramUpdate.objects.filter(pk__in=ids).update(
+            status=TelegramUpdate.STATUS_DONE, locked_until=None, processed_at=timezone.now()
+        )
+
+
+def prune_updates(older_than=timedelta(days=1), batch_size=1000):
+    """Borra por lotes los updates procesados. Retorna cuántos se borraron."""
+    cutoff = timezone.now() - older_than
+    total = 0
+    while True:
+        ids = list(
+            TelegramUpdate.objects.filter(status=TelegramUpdate.STATUS_DONE, processed_at__lt=cutoff)
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += TelegramUpdate.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,39 @@
+"""
+Reserva de filas y backoff para los workers que leen su cola de la BD (outbox de correos,
+cierres de chat, updates de Telegram, lotes de documentos).
+
+Todos siguen el mismo patrón: `SELECT ... FOR UPDATE SKIP LOCKED` de las filas pendientes
+cuyo lease ya venció y un `UPDATE` que las reserva por `lease` segundos. Varios workers
+pueden correr a la vez sin tomar la misma fila, y si uno se cae a mitad de lote sus filas
+vuelven a estar disponibles al vencer el lease.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+
+def claim_due(queryset, batch_size, lease, lease_field="next_attempt_at", order_by=("next_attempt_at", "id"), **claim):
+    """
+    Reserva hasta `batch_size` filas de `queryset` (ya filtrado a las pendientes) cuyo
+    `lease_field` es nulo o ya pasó, y lo mueve a ahora + `lease` segundos junto con los
+    campos extra de `claim` (p. ej. `status`). Retorna los pks reservados en orden.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            queryset.select_for_update(skip_locked=True)
+            .exclude(**{f"{lease_field}__gt": now})
+            .order_by(*order_by)
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if ids:
+            queryset.model.objects.filter(pk__in=ids).update(
+                **{lease_field: now + timedelta(seconds=lease)}, **claim
+            )
+    return ids
+
+
+def retry_delay(attempts, base, cap):
+    """Espera antes del siguiente intento: `base` segundos duplicados por intento, hasta `cap` (timedelta)."""
+    return min(timedelta(seconds=int(base) * 2 ** max(attempts - 1, 0)), cap)
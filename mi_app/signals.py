@@ -0,0 +1,67 @@
+"""
+Señales de mi_app: liberar referencias de blobs al borrar adjuntos y candidatos.
+Se usan señales (y no `delete()` del modelo) para cubrir también los borrados en cascada.
+También invalidan la caché de la campana cuando cambian las suscripciones (incluidas las
+ediciones desde el admin de Django) y publican el progreso de las sesiones
+de chat en el stream en vivo, venga del chat web o del bot de Telegram. Editar campos
+de un formulario actualiza `ATSForm.updated_at`, que versiona la caché de pasos del bot.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from mi_app.models import (
+    ATSClient,
+    ATSForm,
+    ATSFormField,
+    ATSFormSubmissionFile,
+    Candidate,
+    FormChatSession,
+    Subscription,
+)
+from mi_app.orbita_notifications import bump_notification_version
+from mi_app.services.blob_store import release
+from mi_app.services.live_events import live_events_enabled, publish_session_progress
+
+
+@receiver(post_delete, sender=ATSFormSubmissionFile)
+def release_submission_file_blob(sender, instance, **kwargs):
+    if instance.blob_id:
+        release(instance.blob_id)
+
+
+@receiver(post_delete, sender=Candidate)
+def release_candidate_cv_blob(sender, instance, **kwargs):
+    if instance.cv_blob_id:
+        release(instance.cv_blob_id)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_client_modules(sender, instance, **kwargs):
+    client_id = ATSClient.objects.filter(user_id=instance.user_id).values_list("pk", flat=True).first()
+    if client_id:
+        bump_notification_version(client_id)
+
+
+
+# Campos cuyo cambio es progreso visible para el reclutador.
+CHAT_PROGRESS_FIELDS = {"status", "current_step", "total_steps"}
+
+
+@receiver(post_save, sender=FormChatSession)
+def publish_chat_session_progress(sender, instance, created=False, update_fields=None, **kwargs):
+    # Las respuestas y el cierre publican desde chat_answers; aquí solo la creación y los
+    # guardados que tocan el avance (p. ej. admin), no los internos (`update_fields=["submission"]`).
+    if not live_events_enabled():
+        return
+    if not created and update_fields is not None and not CHAT_PROGRESS_FIELDS & set(update_fields):
+        return
+    client_id = instance.form.client_id if FormChatSession.form.is_cached(instance) else None
+    publish_session_progress(instance, client_id=client_id)
+
+
+@receiver(post_save, sender=ATSFormField)
+@receiver(post_delete, sender=ATSFormField)
+def touch_form_version(sender, instance, **kwargs):
+    ATSForm.objects.filter(pk=instance.form_id).update(updated_at=timezone.now())
@@ -0,0 +1,106 @@
+/*
+ * Subida por partes (reanudable) para formularios públicos y chat de Órbita.
+ * Envía el archivo en chunks a /orbita/f/<uuid>/api/uploads/ y devuelve el token
+ * de la subida completada. Si la conexión se corta, consulta el estado y continúa
+ * desde el último byte recibido.
+ */
+(function (window) {
+  "use strict";
+
+  var MAX_RETRIES = 4;
+
+  function delay(ms) {
+    return new Promise(function (resolve) { setTimeout(resolve, ms); });
+  }
+
+  async function readJson(res) {
+    try {
+      return await res.json();
+    } catch (e) {
+      return { ok: false, error: "Respuesta inválida del servidor." };
+    }
+  }
+
+  function OrbitaChunkedUpload(options) {
+    this.startUrl = options.startUrl;
+    this.chunkUrlTemplate = options.chunkUrlTemplate;
+    this.chunkSize = options.chunkSize || 1024 * 1024;
+    this.csrf = options.csrf || "";
+    this.onProgress = options.onProgress || function () {};
+    this._tokens = {};
+  }
+
+  OrbitaChunkedUpload.prototype._chunkUrl = function (token) {
+    return this.chunkUrlTemplate.replace("00000000-0000-0000-0000-000000000000", token);
+  };
+
+  OrbitaChunkedUpload.prototype._fileKey = function (file) {
+    return [file.name, file.size, file.lastModified].join(":");
+  };
+
+  OrbitaChunkedUpload.prototype._send = async function (url, blob) {
+    var res = await fetch(url, {
+      method: "POST",
+      headers: { "X-CSRFToken": this.csrf, "Content-Type": "application/octet-stream" },
+      body: blob,
+    });
+    var data = await readJson(res);
+    data.status = res.status;
+    return data;
+  };
+
+  OrbitaChunkedUpload.prototype._status = async function (token) {
+    var res = await fetch(this._chunkUrl(token), { method: "GET" });
+    return readJson(res);
+  };
+
+  OrbitaChunkedUpload.prototype.upload = async function (file) {
+    var key = this._fileKey(file);
+    var token = this._tokens[key] || null;
+    var offset = 0;
+    var retries = 0;
+
+    if (token) {
+      var state = await this._status(token);
+      if (state.ok) {
+        if (state.complete) return token;
+        offset = state.received;
+      } else {
+        token = null;
+      }
+    }
+
+    while (offset < file.size) {
+      var chunk = file.slice(offset, offset + this.chunkSize);
+      var url = token
+        ? this._chunkUrl(token) + "?offset=" + offset
+        : this.startUrl + "?name=" + encodeURIComponent(file.name) + "&size=" + file.size;
+      var data;
+      try {
+        data = await this._send(url, chunk);
+      } catch (e) {
+        if (++retries > MAX_RETRIES) throw new Error("Error de conexión al subir el archivo. Intenta de nuevo.");
+        await delay(500 * retries);
+        if (token) {
+          var current = await this._status(token).catch(function () { return {}; });
+          if (current.ok) offset = current.received;
+        }
+        continue;
+      }
+      if (data.status === 409 && data.token) {
+        // Otro intento ya guardó este chunk: continuar desde lo que tiene el servidor.
+        offset = data.received;
+        continue;
+      }
+      if (!data.ok) throw new Error(data.error || "No se pudo subir el archivo.");
+      token = data.token;
+      this._tokens[key] = token;
+      offset = data.received;
+      retries = 0;
+      this.onProgress(file, offset, file.size);
+    }
+    return token;
+  };
+
+  window.OrbitaChunkedUpload = OrbitaChunkedUpload;
+})(window);
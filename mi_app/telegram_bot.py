@@ -3,27 +3,28 @@ Bot de Telegram para Órbita — postulación conversacional.
 
 Flujo:
   /start <form_uuid>  → muestra la vacante y pregunta si quiere postularse
-  "Sí, iniciar"       → crea FormChatSession, pregunta campo por campo
-  Cada respuesta       → guarda en session.answers, avanza paso
+  "Sí, iniciar"       → crea FormChatSession, pregunta campo por campo (estado en user_data)
+  Cada respuesta       → encola un FormChatAnswer (write-behind, ver telegram_repository), avanza paso
   Al terminar          → crea ATSFormSubmission + Candidate (si aplica)
 """
+import asyncio
+import hashlib
 import logging
-import uuid as _uuid
+import tempfile
 
-from asgiref.sync import sync_to_async
+import httpx
 from django.conf import settings
-from django.db import close_old_connections
 from django.db.utils import InterfaceError, OperationalError
-from django.urls import reverse
-from django.utils import timezone
 
 from telegram import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
     Update,
 )
+from telegram.error import TelegramError
 from telegram.ext import (
     Application,
+    BaseUpdateProcessor,
     CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
@@ -31,11 +32,10 @@ from telegram.ext import (
     MessageHandler,
     filters,
 )
-from mi_app.services.form_submissions import (
-    create_submission_once,
-    has_existing_submission_for_email,
-    normalize_submitter_email,
-)
+from mi_app.services import telegram_repository as repository
+from mi_app.services.chat_finalization import candidate_name_is_generic as _candidate_name_is_generic
+from mi_app.services.chat_finalization import commit_submission
+from mi_app.services.form_submissions import normalize_submitter_email
 
 logger = logging.getLogger(__name__)
 
@@ -56,26 +56,11 @@ def _telegram_display_name(user):
     return ""
 
 
-def _candidate_name_is_generic(name, email=""):
-    clean = (str(name or "").strip()).lower()
-    if not clean:
-        return True
-    if clean in {"postulante", "candidato", "candidate", "applicant"}:
-        return True
-    if email:
-        local_part = (email.split("@")[0] if "@" in email else "").strip().lower()
-        if local_part and clean == local_part:
-            return True
-    return False
-
-
-def _thanks_name(session):
-    direct_name = (session.candidate_name or "").strip()
-    if direct_name and not _candidate_name_is_generic(direct_name, session.candidate_email or ""):
+def _thanks_name(state):
+    direct_name = (state.get("candidate_name") or "").strip()
+    if direct_name and not _candidate_name_is_generic(direct_name, state.get("candidate_email") or ""):
         return direct_name
-    answers = session.answers or {}
-    tg_meta = answers.get("_telegram", {}) if isinstance(answers, dict) else {}
-    tg_name = (tg_meta.get("display_name") or "").strip() if isinstance(tg_meta, dict) else ""
+    tg_name = (state.get("display_name") or "").strip()
     if tg_name:
         return tg_name
     if direct_name:
@@ -83,230 +68,57 @@ def _thanks_name(session):
     return ""
 
 
-def _get_form(uuid_str):
-    from mi_app.models import ATSForm
-    close_old_connections()
-    try:
-        return ATSForm.objects.select_related("vacancy", "client").get(
-            uuid=uuid_str, is_active=True
-        )
-    except (InterfaceError, OperationalError):
-        logger.warning("telegram_bot: DB connection stale while loading form, retrying once")
-        close_old_connections()
-        try:
-            return ATSForm.objects.select_related("vacancy", "client").get(
-                uuid=uuid_str, is_active=True
-            )
-        except (ATSForm.DoesNotExist, ValueError):
-            return None
-        except (InterfaceError, OperationalError):
-            logger.exception("telegram_bot: DB unavailable while loading form")
-            return None
-    except (ATSForm.DoesNotExist, ValueError):
-        return None
-
-
-def _build_steps(orbita_form):
-    from mi_app.views.orbita.form_chat_views import _build_steps as _bs
-    return _bs(orbita_form)
-
-
-def _create_session(orbita_form, steps, telegram_user_id, telegram_display_name="", telegram_username=""):
-    from mi_app.models import FormChatSession
-    close_old_connections()
-    answers = {
-        "_telegram": {
-            "id": telegram_user_id,
-            "username": telegram_username or "",
-            "display_name": telegram_display_name or "",
-        }
-    }
-    session = FormChatSession(
-        form=orbita_form,
-        session_uuid=_uuid.uuid4(),
-        status=FormChatSession.STATUS_STARTED,
-        current_step=0,
-        total_steps=len(steps),
-        answers=answers,
-        candidate_name=(telegram_display_name or "")[:200],
-        telegram_user_id=telegram_user_id,
-        source=FormChatSession.SOURCE_TELEGRAM,
-        ip_address=None,
-    )
-    session.save()
-    return session
-
-
-def _get_session(session_id):
-    from mi_app.models import FormChatSession
-    close_old_connections()
-    try:
-        return FormChatSession.objects.get(pk=session_id)
-    except (InterfaceError, OperationalError):
-        logger.warning("telegram_bot: DB connection stale while loading session, retrying once")
-        close_old_connections()
-        try:
-            return FormChatSession.objects.get(pk=session_id)
-        except (FormChatSession.DoesNotExist, InterfaceError, OperationalError):
-            logger.exception("telegram_bot: failed to load chat session")
-            return None
-    except FormChatSession.DoesNotExist:
-        return None
+NAME_KEYWORDS = {
+    "nombre",
+    "name",
+    "nombre completo",
+    "full name",
+    "nombre y apellidos",
+    "apellidos",
+}
 
 
-def _save_answer(session, step, value, orbita_form):
-    from mi_app.models import FormChatSession
-
-    close_old_connections()
-    answers = session.answers or {}
-    answers[step["id"]] = value
-    session.answers = answers
-    session.current_step = min(session.current_step + 1, session.total_steps)
-    session.status = FormChatSession.STATUS_IN_PROGRESS
-
+def _identity_from_answer(step, value):
+    """Correo y nombre del candidato que aporta la respuesta del paso (vacíos si no aplica)."""
     val_str = str(value).strip()
+    candidate_email = ""
     if step["id"] == "submitter_email" or (
         step["type"] == "email" and val_str and "@" in val_str
     ):
-        session.candidate_email = normalize_submitter_email(val_str)
-
-    name_keywords = {
-        "nombre",
-        "name",
-        "nombre completo",
-        "full name",
-        "nombre y apellidos",
-        "apellidos",
-    }
+        candidate_email = normalize_submitter_email(val_str)
+
     label_lower = (step.get("label") or "").lower()
+    candidate_name = ""
     if (
         val_str
         and step["type"] in ("text", "textarea")
-        and any(kw in label_lower for kw in name_keywords)
+        and any(kw in label_lower for kw in NAME_KEYWORDS)
         and "@" not in val_str
     ):
-        session.candidate_name = val_str[:200]
+        candidate_name = val_str[:200]
+    return candidate_email, candidate_name
 
-    is_last = session.current_step >= session.total_steps
-    if is_last:
-        session.status = FormChatSession.STATUS_COMPLETED
-        session.completed_at = timezone.now()
 
-    session.save()
-    return is_last
-
-
-def _mark_duplicate_if_needed(orbita_form, session_id):
+def _finalize(orbita_form, steps, session_id):
+    """
+    Confirma el envío de la sesión (corre en el pool de BD). Archivos, candidato, análisis
+    y notificación quedan para el worker `process_chat_finalizations`.
+    """
     from mi_app.models import FormChatSession
 
-    close_old_connections()
     session = FormChatSession.objects.get(pk=session_id)
-    if not session.candidate_email:
-        return False
-    if not has_existing_submission_for_email(orbita_form, session.candidate_email):
-        return False
-    session.status = FormChatSession.STATUS_COMPLETED
-    session.completed_at = timezone.now()
-    session.save(update_fields=["status", "completed_at", "updated_at"])
-    return True
-
-
-def _telegram_user_already_completed(orbita_form, telegram_user_id):
-    from mi_app.models import FormChatSession
-
-    close_old_connections()
-    return FormChatSession.objects.filter(
-        form=orbita_form,
-        source=FormChatSession.SOURCE_TELEGRAM,
-        telegram_user_id=telegram_user_id,
-        submission__isnull=False,
-    ).exists()
+    _submission, duplicate_submission = commit_submission(orbita_form or session.form, session, steps)
+    return duplicate_submission
 
 
-def _finalize(orbita_form, session):
-    """Replica la lógica de FormChatAnswerAPI._finalize_submission sin request."""
-    from mi_app.models import (
-        ATSFormSubmission, ATSFormSubmissionFile, ATSFormField,
-        ATSNotification, FormChatSession,
-    )
-    from mi_app.orbita_notifications import notify_orbita_client
-
-    close_old_connections()
-    session = FormChatSession.objects.get(pk=session.pk)
-    answers = session.answers or {}
-    pending_files = answers.pop("_pending_files", {})
-    logger.info("telegram_bot _finalize: pending_files=%s", list(pending_files.keys()))
-    steps = _build_steps(orbita_form)
-
-    payload = {}
-    submitter_email = normalize_submitter_email(session.candidate_email or "")
-    for step in steps:
-        val = answers.get(step["id"], "")
-        if val and step["type"] != "file":
-            payload[step["label"]] = val
-        elif val and step["type"] == "file":
-            payload[step["label"]] = val
-        if step["type"] == "email" and val and not submitter_email:
-            submitter_email = normalize_submitter_email(val)
-
-    submission, duplicate_submission = create_submission_once(orbita_form, payload, submitter_email)
-    if duplicate_submission:
-        logger.info("telegram_bot: duplicate submission form=%s session=%s email=%s", orbita_form.pk, session.session_uuid, submitter_email)
-        return True
-    session.submission = submission
-    session.save(update_fields=["submission"])
-
-    from django.core.files.storage import default_storage
-    from django.core.files import File
-    for step_id, file_info in pending_files.items():
-        field_obj = None
-        if step_id.startswith("field_"):
-            try:
-                field_obj = ATSFormField.objects.get(pk=int(step_id.replace("field_", "")))
-            except (ATSFormField.DoesNotExist, ValueError):
-                pass
-        try:
-            saved_file = default_storage.open(file_info["path"])
-            sub_file = ATSFormSubmissionFile(
-                submission=submission,
-                form_field=field_obj,
-                original_name=file_info["name"],
-            )
-            sub_file.file.save(file_info["name"], File(saved_file), save=True)
-            saved_file.close()
-            logger.info("telegram_bot: attached file %s to submission %s", file_info["name"], submission.pk)
-        except Exception as e:
-            logger.warning("telegram_bot: could not attach file %s: %s", file_info.get("path"), e)
-
-    if orbita_form.vacancy_id:
-        from mi_app.views.orbita.orbita_views import _create_candidate_from_submission
-        _create_candidate_from_submission(submission, payload, submitter_email)
-        if submission.candidate_id:
-            tg_meta = (session.answers or {}).get("_telegram", {})
-            tg_name = (tg_meta.get("display_name") or "").strip() if isinstance(tg_meta, dict) else ""
-            if tg_name and _candidate_name_is_generic(submission.candidate.name, submitter_email):
-                submission.candidate.name = tg_name[:255]
-                submission.candidate.save(update_fields=["name"])
-            notify_orbita_client(
-                orbita_form.client,
-                ATSNotification.TYPE_CANDIDATE,
-                "Nuevo candidato (Telegram)",
-                message=f"{submission.candidate.name} — Telegram «{orbita_form.name}».",
-                link=reverse("orbita_candidate_detail", args=[submission.candidate.public_id]),
-            )
-    else:
-        notify_orbita_client(
-            orbita_form.client,
-            ATSNotification.TYPE_SUBMISSION,
-            "Nuevo envío (Telegram)",
-            message=f"Telegram «{orbita_form.name}»: {submitter_email or 'Sin correo'}.",
-            link=reverse("orbita_form_submissions", args=[orbita_form.pk]),
-        )
-    logger.info("telegram_bot: session completed form=%s session=%s", orbita_form.pk, session.session_uuid)
-    return False
+# ──────────────────────────── Handlers ────────────────────────────
 
+TEMPORARY_PROBLEM_TEXT = "⚠️ Tuvimos un problema temporal de conexión. Intenta de nuevo en unos segundos."
+DUPLICATE_TEXT = (
+    "Ya registramos una respuesta con este correo para este formulario.\n\n"
+    "No necesitas enviar otra postulación."
+)
 
-# ──────────────────────────── Handlers ────────────────────────────
 
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     args = context.args
@@ -319,7 +131,7 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
 
     form_uuid = args[0]
-    orbita_form = await sync_to_async(_get_form)(form_uuid)
+    orbita_form, _steps = await repository.get_form(form_uuid)
     if not orbita_form:
         await update.message.reply_text(
             "❌ No encontré esa vacante o el formulario no está activo.\n"
@@ -365,12 +177,11 @@ async def apply_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
 
     form_uuid = context.user_data.get("form_uuid")
-    orbita_form = await sync_to_async(_get_form)(form_uuid)
+    orbita_form, steps = await repository.get_form(form_uuid)
     if not orbita_form:
         await query.edit_message_text("❌ Formulario no disponible.")
         return ConversationHandler.END
 
-    steps = await sync_to_async(_build_steps)(orbita_form)
     if not steps:
         await query.edit_message_text("⚠️ Este formulario no tiene campos configurados.")
         return ConversationHandler.END
@@ -378,14 +189,14 @@ async def apply_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     tg_user = update.effective_user
     tg_display_name = _telegram_display_name(tg_user)
     tg_username = (getattr(tg_user, "username", "") or "").strip()
-    already_completed = await sync_to_async(_telegram_user_already_completed)(orbita_form, update.effective_user.id)
+    already_completed = await repository.user_already_completed(orbita_form, update.effective_user.id)
     if already_completed:
         await query.edit_message_text(
             "Ya registramos una respuesta tuya para este formulario.\n\n"
             "No necesitas enviar otra postulación."
         )
         return ConversationHandler.END
-    session = await sync_to_async(_create_session)(
+    state = await repository.create_session(
         orbita_form,
         steps,
         update.effective_user.id,
@@ -393,7 +204,8 @@ async def apply_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         tg_username,
     )
 
-    context.user_data["session_id"] = session.pk
+    context.user_data["session"] = state
+    context.user_data["session_id"] = state["id"]
     context.user_data["steps"] = steps
     context.user_data["current_step"] = 0
 
@@ -438,13 +250,62 @@ def _format_question(step, num, total):
     )
 
 
-async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
+def _active_step(context):
+    """(state, steps, idx) de la sesión en curso; state es None si no hay sesión activa."""
     steps = context.user_data.get("steps", [])
     idx = context.user_data.get("current_step", 0)
-    session_id = context.user_data.get("session_id")
-    form_uuid = context.user_data.get("form_uuid")
+    state = context.user_data.get("session")
+    if idx >= len(steps) or not state:
+        return None, steps, idx
+    return state, steps, idx
+
+
+async def _after_answer(update, context, state, steps, idx, saved_text):
+    """Avanza al siguiente paso o, en el último, espera las escrituras y finaliza."""
+    if idx + 1 < len(steps):
+        next_idx = idx + 1
+        context.user_data["current_step"] = next_idx
+
+        pct = round((next_idx / len(steps)) * 100)
+        bar_filled = round(pct / 10)
+        bar = "▓" * bar_filled + "░" * (10 - bar_filled)
+
+        next_step = steps[next_idx]
+        msg = (
+            f"{saved_text}\n"
+            f"Progreso: `[{bar}]` {pct}%\n\n"
+            + _format_question(next_step, next_idx + 1, len(steps))
+        )
+        await update.message.reply_text(msg, parse_mode="Markdown")
+        return ANSWERING
+
+    saved = await repository.flush(state)
+    if not saved or not state.get("completed"):
+        # Las respuestas no guardadas siguen en `state["unsaved"]`; repetir el último paso las reintenta.
+        await update.message.reply_text(TEMPORARY_PROBLEM_TEXT)
+        return ANSWERING
 
-    if idx >= len(steps) or not session_id:
+    # Si el formulario se desactivó durante la conversación, `_finalize` lo carga por pk.
+    orbita_form, _steps = await repository.get_form(state["form_uuid"])
+    duplicate_submission = await repository.run_db(_finalize, orbita_form, steps, state["id"])
+    # La sesión terminó: no dejar su estado en user_data (ni en la persistencia del bot).
+    context.user_data.clear()
+    if duplicate_submission:
+        await update.message.reply_text(DUPLICATE_TEXT)
+        return ConversationHandler.END
+    name = _thanks_name(state)
+    intro = f"Gracias, {name}. " if name else "Gracias. "
+    await update.message.reply_text(
+        "Postulación completada.\n\n"
+        f"{intro}Tu información ya fue enviada al equipo de reclutamiento.\n\n"
+        "Si tu perfil avanza, te van a contactar por este medio o por correo."
+    )
+    return ConversationHandler.END
+
+
+async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    state, steps, idx = _active_step(context)
+    if state is None:
         await update.message.reply_text("⚠️ No hay una sesión activa. Usa /start para comenzar.")
         return ConversationHandler.END
 
@@ -469,110 +330,118 @@ async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⚠️ Este campo es obligatorio. Por favor, responde.")
         return ANSWERING
 
-    session = await sync_to_async(_get_session)(session_id)
-    if not session:
-        await update.message.reply_text(
-            "⚠️ Tuvimos un problema temporal de conexión. Intenta de nuevo en unos segundos."
-        )
-        return ConversationHandler.END
+    candidate_email, candidate_name = _identity_from_answer(step, value)
+    repository.queue_answer(
+        state, step["id"], value, candidate_email=candidate_email, candidate_name=candidate_name
+    )
+    if candidate_email:
+        orbita_form, _steps = await repository.get_form(state["form_uuid"])
+        if await repository.mark_duplicate_if_needed(state, orbita_form):
+            context.user_data.clear()
+            await update.message.reply_text(DUPLICATE_TEXT)
+            return ConversationHandler.END
 
-    orbita_form = await sync_to_async(_get_form)(form_uuid)
-    is_last = await sync_to_async(_save_answer)(session, step, value, orbita_form)
-    duplicate_submission = await sync_to_async(_mark_duplicate_if_needed)(orbita_form, session_id)
-    if duplicate_submission:
-        await update.message.reply_text(
-            "Ya registramos una respuesta con este correo para este formulario.\n\n"
-            "No necesitas enviar otra postulación."
-        )
-        return ConversationHandler.END
+    return await _after_answer(update, context, state, steps, idx, "✅ Respuesta guardada.")
 
-    if is_last:
-        duplicate_submission = await sync_to_async(_finalize)(orbita_form, session)
-        if duplicate_submission:
-            await update.message.reply_text(
-                "Ya registramos una respuesta con este correo para este formulario.\n\n"
-                "No necesitas enviar otra postulación."
-            )
-            return ConversationHandler.END
-        session = await sync_to_async(_get_session)(session_id)
-        if not session:
-            await update.message.reply_text(
-                "Tu postulación se envió, pero no pude refrescar el estado. Si quieres, vuelve a abrir el enlace."
-            )
-            return ConversationHandler.END
-        name = _thanks_name(session)
-        intro = f"Gracias, {name}. " if name else "Gracias. "
-        await update.message.reply_text(
-            "Postulación completada.\n\n"
-            f"{intro}Tu información ya fue enviada al equipo de reclutamiento.\n\n"
-            "Si tu perfil avanza, te van a contactar por este medio o por correo."
-        )
-        return ConversationHandler.END
 
-    next_idx = idx + 1
-    context.user_data["current_step"] = next_idx
+# Documentos de hasta este tamaño quedan en memoria; los mayores pasan a un temporal en disco.
+DOWNLOAD_SPOOL_MAX_MEMORY = 1024 * 1024
 
-    pct = round((next_idx / len(steps)) * 100)
-    bar_filled = round(pct / 10)
-    bar = "▓" * bar_filled + "░" * (10 - bar_filled)
+_download_slots = None
 
-    next_step = steps[next_idx]
-    msg = (
-        f"✅ Respuesta guardada.\n"
-        f"Progreso: `[{bar}]` {pct}%\n\n"
-        + _format_question(next_step, next_idx + 1, len(steps))
-    )
-    await update.message.reply_text(msg, parse_mode="Markdown")
-    return ANSWERING
 
+def _download_semaphore():
+    global _download_slots
+    if _download_slots is None:
+        limit = max(int(getattr(settings, "ORBITA_TELEGRAM_MAX_CONCURRENT_DOWNLOADS", 4)), 1)
+        _download_slots = asyncio.Semaphore(limit)
+    return _download_slots
 
-async def _download_and_store_file(update, context, session, step_id):
-    """Descarga el archivo de Telegram y lo guarda en default_storage."""
-    from django.core.files.base import ContentFile
-    from django.core.files.storage import default_storage
-    from mi_app.models import FormChatSession
 
-    doc = update.message.document
-    if not doc:
-        return None, None
+class _DownloadTooLarge(Exception):
+    pass
 
-    file_name = doc.file_name or "archivo"
-    logger.info("telegram_bot: downloading file %s (size=%s)", file_name, doc.file_size)
 
-    tg_file = await context.bot.get_file(doc.file_id)
-    file_bytes = await tg_file.download_as_bytearray()
-    logger.info("telegram_bot: downloaded %d bytes", len(file_bytes))
+def _document_error(doc):
+    """Valida extensión y tamaño declarados por Telegram antes de descargar. Retorna el mensaje o None."""
+    from mi_app.services.chunked_uploads import validate_upload_metadata
 
-    save_dir = f"orbita/chat_uploads/{session.session_uuid}"
-    saved_path = await sync_to_async(default_storage.save)(
-        f"{save_dir}/{file_name}",
-        ContentFile(bytes(file_bytes)),
-    )
-    logger.info("telegram_bot: file saved to %s", saved_path)
+    # Sin tamaño declarado se valida la extensión aquí y el tamaño durante la descarga.
+    return validate_upload_metadata(doc.file_name or "archivo", doc.file_size or 1)
+
+
+async def _stream_to(tg_file, out, max_size):
+    """Copia el archivo de Telegram a `out` por bloques. Retorna (sha256, tamaño)."""
+    from mi_app.services.blob_store import HASH_CHUNK_SIZE
 
-    session = await sync_to_async(
-        lambda: FormChatSession.objects.get(pk=session.pk)
-    )()
-    answers = session.answers or {}
-    pending_files = answers.get("_pending_files", {})
-    pending_files[step_id] = {"path": saved_path, "name": file_name}
-    answers["_pending_files"] = pending_files
-    answers[step_id] = file_name
-    session.answers = answers
-    await sync_to_async(session.save)(update_fields=["answers"])
-    logger.info("telegram_bot: pending_files keys=%s", list(answers.get("_pending_files", {}).keys()))
+    digest = hashlib.sha256()
+    size = 0
+    if not str(tg_file.file_path or "").startswith(("http://", "https://")):
+        # Bot API local: `file_path` es una ruta del disco, la copia PTB.
+        await tg_file.download_to_memory(out)
+        out.seek(0)
+        for chunk in iter(lambda: out.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+        if size > max_size:
+            raise _DownloadTooLarge()
+        return digest.hexdigest(), size
 
-    return file_name, saved_path
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as client:
+        async with client.stream("GET", tg_file.file_path) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(HASH_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise _DownloadTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+    return digest.hexdigest(), size
+
+
+async def _download_and_store_file(update, context):
+    """
+    Descarga el documento de Telegram por bloques y lo guarda en el almacén de blobs
+    (deduplicado). Retorna (file_name, blob, error); con `error` no hay blob.
+    """
+    from django.core.files import File
+    from mi_app.services.blob_store import store_file
+
+    doc = update.message.document
+    if not doc:
+        return None, None, "⚠️ No pude recibir el archivo. Intenta de nuevo."
+
+    file_name = doc.file_name or "archivo"
+    error = _document_error(doc)
+    if error:
+        logger.info("telegram_bot: rejected file %s (size=%s): %s", file_name, doc.file_size, error)
+        return file_name, None, f"⚠️ {error}"
+
+    max_size = getattr(settings, "ORBITA_FORM_PUBLIC_MAX_FILE_SIZE", 10 * 1024 * 1024)
+    logger.info("telegram_bot: downloading file %s (size=%s)", file_name, doc.file_size)
+    async with _download_semaphore():
+        with tempfile.SpooledTemporaryFile(max_size=DOWNLOAD_SPOOL_MAX_MEMORY) as spool:
+            try:
+                tg_file = await context.bot.get_file(doc.file_id)
+                sha256, size = await _stream_to(tg_file, spool, max_size)
+            except _DownloadTooLarge:
+                return file_name, None, (
+                    f"⚠️ El archivo {file_name} supera el tamaño máximo permitido ({max_size // (1024*1024)} MB)."
+                )
+            except (TelegramError, httpx.HTTPError) as exc:
+                logger.warning("telegram_bot: download failed for %s: %s", file_name, exc)
+                return file_name, None, "⚠️ No pude recibir el archivo. Intenta de nuevo."
+            logger.info("telegram_bot: downloaded %d bytes", size)
+            spool.seek(0)
+            blob = await repository.run_db(store_file, File(spool, name=file_name), file_name, sha256, size)
+    logger.info("telegram_bot: file saved to %s", blob.storage_name)
+    return file_name, blob, None
 
 
 async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle file uploads for file-type steps."""
-    steps = context.user_data.get("steps", [])
-    idx = context.user_data.get("current_step", 0)
-    session_id = context.user_data.get("session_id")
-    form_uuid = context.user_data.get("form_uuid")
-
-    if idx >= len(steps) or not session_id:
+    state, steps, idx = _active_step(context)
+    if state is None:
         await update.message.reply_text("⚠️ No hay una sesión activa.")
         return ConversationHandler.END
 
@@ -584,77 +453,30 @@ async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return ANSWERING
 
-    session = await sync_to_async(_get_session)(session_id)
-    if not session:
-        await update.message.reply_text(
-            "⚠️ Tuvimos un problema temporal de conexión. Intenta de nuevo en unos segundos."
-        )
-        return ConversationHandler.END
-    orbita_form = await sync_to_async(_get_form)(form_uuid)
-
-    file_name, saved_path = await _download_and_store_file(
-        update, context, session, step["id"]
-    )
-    if not file_name:
-        await update.message.reply_text("⚠️ No pude recibir el archivo. Intenta de nuevo.")
+    try:
+        file_name, blob, error = await _download_and_store_file(update, context)
+    except (InterfaceError, OperationalError):
+        logger.exception("telegram_bot: DB unavailable while storing file")
+        await update.message.reply_text(TEMPORARY_PROBLEM_TEXT)
+        return ANSWERING
+    if error:
+        await update.message.reply_text(error)
         return ANSWERING
 
-    session = await sync_to_async(_get_session)(session_id)
-    if not session:
-        await update.message.reply_text(
-            "Tu archivo se recibió, pero no pude continuar por un problema temporal. Intenta nuevamente."
-        )
-        return ConversationHandler.END
-    session.current_step = min(session.current_step + 1, session.total_steps)
-    session.status = FormChatSession.STATUS_IN_PROGRESS
-
-    is_last = session.current_step >= session.total_steps
-    if is_last:
-        session.status = FormChatSession.STATUS_COMPLETED
-        session.completed_at = timezone.now()
-    await sync_to_async(session.save)()
-
-    if is_last:
-        duplicate_submission = await sync_to_async(_finalize)(orbita_form, session)
-        if duplicate_submission:
-            await update.message.reply_text(
-                "Ya registramos una respuesta con este correo para este formulario.\n\n"
-                "No necesitas enviar otra postulación."
-            )
-            return ConversationHandler.END
-        session = await sync_to_async(_get_session)(session_id)
-        if not session:
-            await update.message.reply_text(
-                "Tu postulación se envió, pero no pude refrescar el estado. Si quieres, vuelve a abrir el enlace."
-            )
-            return ConversationHandler.END
-        name = _thanks_name(session)
-        intro = f"Gracias, {name}. " if name else "Gracias. "
-        await update.message.reply_text(
-            "Postulación completada.\n\n"
-            f"{intro}Tu información ya fue enviada al equipo de reclutamiento.\n\n"
-            "Si tu perfil avanza, te van a contactar por este medio o por correo."
-        )
-        return ConversationHandler.END
-
-    next_idx = idx + 1
-    context.user_data["current_step"] = next_idx
-
-    pct = round((next_idx / len(steps)) * 100)
-    bar_filled = round(pct / 10)
-    bar = "▓" * bar_filled + "░" * (10 - bar_filled)
-
-    next_step = steps[next_idx]
-    msg = (
-        f"✅ Archivo recibido: _{file_name}_\n"
-        f"Progreso: `[{bar}]` {pct}%\n\n"
-        + _format_question(next_step, next_idx + 1, len(steps))
+    repository.queue_answer(
+        state,
+        step["id"],
+        file_name,
+        attachment={"path": blob.storage_name, "name": file_name, "blob": blob.pk},
     )
-    await update.message.reply_text(msg, parse_mode="Markdown")
-    return ANSWERING
+    return await _after_answer(update, context, state, steps, idx, f"✅ Archivo recibido: _{file_name}_")
 
 
 async def cmd_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    state = context.user_data.get("session")
+    if state:
+        # Lo ya respondido queda guardado; el reaper expira la sesión incompleta.
+        await repository.flush(state)
     context.user_data.clear()
     await update.message.reply_text(
         "Postulación cancelada.\n"
@@ -663,13 +485,61 @@ async def cmd_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
-def build_application():
-    """Construye la aplicación de Telegram con todos los handlers."""
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Procesa updates de chats distintos en paralelo y los de un mismo chat en orden,
+    así el ConversationHandler ve cada conversación de forma secuencial.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}
+
+    async def do_process_update(self, update, coroutine):
+        chat = getattr(update, "effective_chat", None)
+        key = chat.id if chat else None
+        if key is None:
+            await coroutine
+            return
+        lock, waiters = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, waiters + 1)
+        try:
+            async with lock:
+                await coroutine
+        finally:
+            lock, waiters = self._locks[key]
+            if waiters <= 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, waiters - 1)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+def build_application(persistence=None):
+    """
+    Construye la aplicación de Telegram con todos los handlers. Con `persistence`
+    (DjangoPersistence) el estado de las conversaciones sobrevive a reinicios.
+    """
     token = getattr(settings, "TELEGRAM_BOT_TOKEN", "")
     if not token:
         raise ValueError("TELEGRAM_BOT_TOKEN no configurado en settings/env.")
 
-    app = Application.builder().token(token).build()
+    concurrent_updates = max(int(getattr(settings, "ORBITA_TELEGRAM_CONCURRENT_UPDATES", 256)), 1)
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(PerChatUpdateProcessor(concurrent_updates))
+    )
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    app = builder.build()
 
     async def _on_error(update, context):
         logger.exception("telegram_bot: unhandled error", exc_info=context.error)
@@ -688,12 +558,71 @@ def build_application():
         fallbacks=[CommandHandler("cancel", cmd_cancel)],
         per_user=True,
         per_chat=True,
+        name="postulacion",
+        persistent=persistence is not None,
     )
 
     app.add_handler(conv_handler)
     return app
 
 
+async def _set_webhook(app):
+    url = getattr(settings, "ORBITA_TELEGRAM_WEBHOOK_URL", "")
+    if not url:
+        logger.warning("telegram_bot: ORBITA_TELEGRAM_WEBHOOK_URL vacío; el webhook no se registra")
+        return
+    await app.bot.set_webhook(
+        url=url,
+        secret_token=getattr(settings, "TELEGRAM_WEBHOOK_SECRET", "") or None,
+        allowed_updates=Update.ALL_TYPES,
+    )
+    logger.info("telegram_bot: webhook registrado en %s", url)
 
 
-
+async def _process_batch(app, rows):
+    updates = []
+    for _pk, payload in rows:
+        try:
+            updates.append(Update.de_json(payload, app.bot))
+        except Exception:
+            logger.exception("telegram_bot: update inválido %s", (payload or {}).get("update_id"))
+    # Se crean en orden de update_id: el lock por chat de PerChatUpdateProcessor conserva ese orden.
+    await asyncio.gather(*(
+        app.update_processor.process_update(update, app.process_update(update)) for update in updates
+    ))
+
+
+async def consume_webhook_updates(app, replica=0, replicas=1, batch_size=100, register_webhook=True):
+    """
+    Procesa la cola de updates del webhook (TelegramUpdate) de la partición `replica`.
+    Un lote se marca procesado después de guardar las respuestas y la persistencia del
+    bot; si el worker cae antes, el lote se reintenta al vencer su reserva.
+    """
+    from mi_app.services.telegram_updates import claim_updates, mark_done, prune_updates, release_claims
+
+    poll_seconds = float(getattr(settings, "ORBITA_TELEGRAM_QUEUE_POLL_SECONDS", 1))
+    prune_every = 3600
+    last_prune = 0.0
+    loop = asyncio.get_running_loop()
+    async with app:
+        await app.start()
+        try:
+            if register_webhook and replica == 0:
+                await _set_webhook(app)
+            await repository.run_db(release_claims, replica, replicas)
+            while True:
+                rows = await repository.run_db(claim_updates, replica, replicas, batch_size)
+                if rows:
+                    await _process_batch(app, rows)
+                    await repository.flush_all()
+                    await app.update_persistence()
+                    await repository.run_db(mark_done, [pk for pk, _payload in rows])
+                    if len(rows) >= batch_size:
+                        continue
+                elif replica == 0 and loop.time() - last_prune >= prune_every:
+                    last_prune = loop.time()
+                    await repository.run_db(prune_updates)
+                await asyncio.sleep(poll_seconds)
+        finally:
+            await repository.flush_all()
+            await app.stop()
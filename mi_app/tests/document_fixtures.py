@@ -0,0 +1,179 @@
+"""
+Set de documentos sintéticos para los tests y el benchmark de extracción de documentos.
+
+No versionamos fotos reales de INE ni comprobantes (datos personales y varios MB cada
+una): se generan de forma determinista con Pillow imitando lo que sube un cliente:
+- foto de teléfono de 12 MP de una credencial sobre una mesa, con orientación EXIF;
+- escaneo a 300 dpi de un recibo con márgenes blancos;
+- captura pequeña ya comprimida (no debe empeorar);
+- PDF de una página y PDF de varias (recibo con el domicilio en la hoja 2, INE escaneada
+  con frente y reverso en hojas separadas); requieren PyMuPDF.
+"""
+import io
+import random
+from dataclasses import dataclass
+
+from PIL import Image, ImageDraw, ImageFont
+
+PHONE_SIZE = (4032, 3024)
+LETTER_300DPI = (2550, 3300)
+
+
+@dataclass
+class DocumentFixture:
+    name: str
+    doc_type: str
+    filename: str
+    content_type: str
+    content: bytes
+
+
+def _font(size):
+    return ImageFont.load_default(size=size)
+
+
+def _noise(image, rng, sigma):
+    # Ruido de sensor: sin él el JPEG sale irrealmente pequeño.
+    noise = Image.effect_noise(image.size, sigma).convert("RGB")
+    return Image.blend(image, noise, 0.08 + rng.random() * 0.02)
+
+
+def _jpeg(image, quality=92, orientation=None):
+    out = io.BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    image.save(out, format="JPEG", quality=quality, exif=exif.tobytes())
+    return out.getvalue()
+
+
+def ine_photo(seed=1, orientation=6):
+    """
+    Foto de una credencial sobre una mesa. Con orientation=6 los pixeles quedan acostados
+    (como los guarda el sensor) y la EXIF pide girar 90°.
+    """
+    rng = random.Random(seed)
+    width, height = PHONE_SIZE
+    image = Image.new("RGB", (width, height), (120 + rng.randint(0, 30), 90, 60))
+    draw = ImageDraw.Draw(image)
+    for y in range(0, height, 24):
+        # Vetas de la mesa: las esquinas no son de un color uniforme.
+        draw.line([(0, y), (width, y + rng.randint(-40, 40))], fill=(100 + rng.randint(0, 40), 75, 50), width=6)
+    card = (600, 500, 3400, 2300)
+    draw.rounded_rectangle(card, radius=120, fill=(226, 214, 230), outline=(150, 120, 160), width=8)
+    draw.rectangle((760, 800, 1500, 1800), fill=(180, 170, 175))
+    draw.text((760, 580), "INSTITUTO NACIONAL ELECTORAL", fill=(60, 30, 80), font=_font(110))
+    lines = ("NOMBRE", "PÉREZ", "GÓMEZ", "MARÍA JOSÉ", "DOMICILIO", "AV. REFORMA 123 COL. CENTRO", "CLAVE DE ELECTOR PRGZMR90010109M100")
+    for idx, text in enumerate(lines):
+        draw.text((1620, 820 + idx * 150), text, fill=(20, 20, 20), font=_font(90))
+    image = _noise(image, rng, 40)
+    if orientation == 6:
+        # El sensor guarda la foto girada; el visor la endereza con la EXIF.
+        image = image.transpose(Image.Transpose.ROTATE_90)
+    return _jpeg(image, orientation=orientation)
+
+
+def comprobante_scan(seed=2):
+    """Recibo de luz escaneado a 300 dpi: hoja carta blanca con el recibo en el centro."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", LETTER_300DPI, (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    box = (350, 400, 2200, 2500)
+    draw.rectangle(box, outline=(0, 120, 60), width=10)
+    draw.text((420, 460), "COMISIÓN FEDERAL DE ELECTRICIDAD", fill=(0, 120, 60), font=_font(80))
+    lines = (
+        "TITULAR: MARÍA JOSÉ PÉREZ GÓMEZ",
+        "AV. REFORMA 123, COL. CENTRO, C.P. 06000",
+        "CUAUHTÉMOC, CIUDAD DE MÉXICO",
+        "SERVICIO: 123456789012  PERIODO: 01 AGO - 30 SEP 2026",
+        "TOTAL A PAGAR: $ 845.00",
+    )
+    for idx, text in enumerate(lines):
+        draw.text((420, 700 + idx * 130), text, fill=(10, 10, 10), font=_font(60))
+    for row in range(8):
+        draw.line([(420, 1500 + row * 110), (2120, 1500 + row * 110)], fill=(180, 180, 180), width=3)
+    # Motas sueltas del escáner sobre el margen.
+    for _ in range(40):
+        x, y = rng.randint(0, LETTER_300DPI[0] - 1), rng.randint(0, LETTER_300DPI[1] - 1)
+        draw.point((x, y), fill=(rng.randint(200, 240),) * 3)
+    return _jpeg(image, quality=90)
+
+
+def small_screenshot():
+    """Captura ya pequeña y comprimida: recodificarla no ahorraría nada."""
+    image = Image.new("RGB", (480, 300), (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    draw.text((20, 20), "Comprobante digital", fill=(0, 0, 0), font=_font(28))
+    return _jpeg(image, quality=40)
+
+
+def pdf_from_pages(pages):
+    """
+    PDF carta con una hoja por elemento: texto (str), imagen escaneada (bytes) o None (en
+    blanco). Requiere PyMuPDF.
+    """
+    import fitz
+
+    doc = fitz.open()
+    for content in pages:
+        page = doc.new_page(width=612, height=792)
+        if isinstance(content, bytes):
+            page.insert_image(fitz.Rect(36, 36, 576, 440), stream=content)
+        elif content:
+            for idx, line in enumerate(content.splitlines()):
+                page.insert_text((72, 100 + idx * 18), line, fontsize=11)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def comprobante_pdf(pages=1):
+    """Recibo de `pages` hojas, todas con los datos del titular."""
+    return pdf_from_pages([
+        f"Recibo de servicio - hoja {number + 1}\nTitular: María José Pérez Gómez\nAv. Reforma 123, Col. Centro, C.P. 06000"
+        for number in range(pages)
+    ])
+
+
+def comprobante_pdf_address_on_page_2():
+    """Estado de cuenta: portada publicitaria, hoja con domicilio y anexo legal."""
+    return pdf_from_pages([
+        "Gracias por ser cliente.\nConoce nuestras nuevas promociones en línea.",
+        "Titular: María José Pérez Gómez\nDomicilio: Av. Reforma 123, Col. Centro\n"
+        "C.P. 06000, Alcaldía Cuauhtémoc\nPeriodo: agosto - septiembre 2026\nTotal a pagar: $845.00",
+        "Aviso de privacidad. " * 40,
+    ])
+
+
+def ine_scan_pdf():
+    """INE escaneada: frente y reverso en hojas sin capa de texto, más una hoja en blanco."""
+    front = Image.new("RGB", (856, 540), (226, 214, 230))
+    back = Image.new("RGB", (856, 540), (210, 205, 215))
+    ImageDraw.Draw(front).text((40, 40), "INSTITUTO NACIONAL ELECTORAL", fill=(60, 30, 80), font=_font(40))
+    ImageDraw.Draw(back).text((40, 40), "IDMEX1234567890", fill=(20, 20, 20), font=_font(40))
+    return pdf_from_pages([_jpeg(front), None, _jpeg(back)])
+
+
+def load_fixture_set():
+    """Set completo para el benchmark."""
+    fixtures = [
+        DocumentFixture("ine_foto_telefono", "ine", "ine.jpg", "image/jpeg", ine_photo()),
+        DocumentFixture("ine_foto_sin_exif", "ine", "ine2.jpg", "image/jpeg", ine_photo(seed=3, orientation=None)),
+        DocumentFixture("comprobante_escaneo", "comprobante_domicilio", "cfe.jpg", "image/jpeg", comprobante_scan()),
+        DocumentFixture("comprobante_captura", "comprobante_domicilio", "captura.jpg", "image/jpeg", small_screenshot()),
+    ]
+    try:
+        fixtures += [
+            DocumentFixture("comprobante_pdf", "comprobante_domicilio", "recibo.pdf", "application/pdf", comprobante_pdf()),
+            DocumentFixture(
+                "comprobante_pdf_3_hojas",
+                "comprobante_domicilio",
+                "estado.pdf",
+                "application/pdf",
+                comprobante_pdf_address_on_page_2(),
+            ),
+            DocumentFixture("ine_pdf_escaneada", "ine", "ine.pdf", "application/pdf", ine_scan_pdf()),
+        ]
+    except ImportError:
+        pass
+    return fixtures
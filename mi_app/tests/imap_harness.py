@@ -0,0 +1,415 @@
+"""
+Arnés IMAP para probar y medir `process_incoming_emails` sin buzones reales.
+
+- `FakeIMAP` / `FakeMailboxState`: doble en memoria de `imaplib.IMAP4_SSL` (se parchea la
+  clase); sirve para simular fallos de conexión, timeouts y concurrencia.
+- `FakeIMAPServer`: servidor IMAP4rev1 real en un hilo (127.0.0.1, sin TLS) con LOGIN,
+  SELECT, UID SEARCH (UNSEEN / UID n:* / SINCE / BEFORE), UID FETCH (BODYSTRUCTURE,
+  HEADER.FIELDS, BODY.PEEK[n]<o.n>), UID STORE e IDLE. El comando se conecta con
+  `imaplib.IMAP4` de verdad, así que se ejercita el protocolo completo (literales,
+  respuestas parciales, IDLE).
+- `load_corpus`: correos .eml de `fixtures/emails` para sembrar los buzones;
+  `personalize` genera copias con Message-ID y remitente únicos (benchmark).
+"""
+import imaplib
+import re
+import select
+import socketserver
+import threading
+from email import message_from_bytes
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+CORPUS_DIR = Path(__file__).resolve().parent / "fixtures" / "emails"
+
+
+def load_corpus(directory=CORPUS_DIR):
+    """Correos .eml del directorio, en orden de nombre."""
+    return [path.read_bytes() for path in sorted(Path(directory).glob("*.eml"))]
+
+
+def personalize(raw, index):
+    """Copia del correo con Message-ID y remitente únicos (evita el ledger y el envío duplicado)."""
+    msg = message_from_bytes(raw)
+    del msg["Message-ID"]
+    msg["Message-ID"] = f"<bench-{index}@corpus.test>"
+    msg.replace_header("From", f"Postulante {index} <postulante{index}@corpus.test>")
+    return msg.as_bytes()
+
+
+# ──────────────────────────── Respuestas IMAP ────────────────────────────
+
+def _quote(value):
+    if value is None:
+        return "NIL"
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _plist(pairs):
+    return "(" + " ".join(f"{_quote(k)} {_quote(v)}" for k, v in pairs) + ")" if pairs else "NIL"
+
+
+def _payload_bytes(part):
+    return part.get_payload().encode("utf-8", errors="surrogateescape")
+
+
+def bodystructure(part):
+    if part.is_multipart():
+        children = "".join(bodystructure(child) for child in part.get_payload())
+        return f"({children} {_quote(part.get_content_subtype().upper())})"
+    raw = _payload_bytes(part)
+    params = [(k, v) for k, v in (part.get_params() or [])[1:]]
+    fields = [
+        _quote(part.get_content_maintype().upper()),
+        _quote(part.get_content_subtype().upper()),
+        _plist(params),
+        "NIL",
+        "NIL",
+        _quote(part.get("Content-Transfer-Encoding", "7bit").upper()),
+        str(len(raw)),
+    ]
+    if part.get_content_maintype() == "text":
+        fields.append(str(raw.count(b"\n")))
+    fields.append("NIL")
+    disposition = part.get_content_disposition()
+    if disposition:
+        filename = part.get_filename()
+        fields.append(f"({_quote(disposition)} {_plist([('filename', filename)] if filename else [])})")
+    else:
+        fields.append("NIL")
+    return "(" + " ".join(fields) + ")"
+
+
+def section_bytes(msg, section):
+    part = msg
+    for idx in section.split("."):
+        if part.is_multipart():
+            part = part.get_payload()[int(idx) - 1]
+    return _payload_bytes(part)
+
+
+def header_fields(msg, names):
+    wanted = {name.upper() for name in names}
+    return ("".join(f"{k}: {v}\r\n" for k, v in msg.items() if k.upper() in wanted) + "\r\n").encode()
+
+
+# ──────────────────────────── Doble de imaplib ────────────────────────────
+
+class FakeMailboxState:
+    def __init__(self, messages=(), uidvalidity=1, login_error=None, wait=None, failed_logins=0):
+        self.messages = {}
+        self.failed_logins = failed_logins
+        self.logins = 0
+        self.seen = set()
+        self.uidvalidity = uidvalidity
+        self.login_error = login_error
+        self.wait = wait
+        self.timeout = None
+        self.fetches = []
+        for raw in messages:
+            self.add(raw)
+
+    def add(self, raw):
+        uid = max(self.messages, default=0) + 1
+        self.messages[uid] = raw
+        return uid
+
+
+class FakeIMAP:
+    """Servidor IMAP en memoria (subconjunto de imaplib.IMAP4 que usa el comando)."""
+
+    servers = {}
+    capabilities = ("IMAP4REV1",)
+
+    def __init__(self, host, port, timeout=None):
+        self.state = self.servers[host]
+        self.state.timeout = timeout
+        self.sock = None
+        self._responses = {}
+
+    def login(self, user, password):
+        self.state.logins += 1
+        if self.state.logins <= self.state.failed_logins:
+            raise ConnectionResetError("conexión reiniciada")
+        if self.state.login_error:
+            raise self.state.login_error
+
+    def select(self, folder):
+        self._responses = {
+            "UIDVALIDITY": [str(self.state.uidvalidity).encode()],
+            "UIDNEXT": [str(max(self.state.messages, default=0) + 1).encode()],
+        }
+        return "OK", [str(len(self.state.messages)).encode()]
+
+    def response(self, name):
+        return name, self._responses.get(name, [None])
+
+    def uid(self, command, *args):
+        return getattr(self, f"_uid_{command.lower()}")(*args)
+
+    def _uid_search(self, charset, *criteria):
+        if self.state.wait:
+            self.state.wait()
+        uids = sorted(self.state.messages)
+        if criteria[0] == "UNSEEN":
+            uids = [uid for uid in uids if uid not in self.state.seen]
+        elif criteria[0] == "UID":
+            start, _sep, end = criteria[1].partition(":")
+            first = uids[-1] if start == "*" else int(start)
+            uids = [uid for uid in uids if uid >= first] or uids[-1:]
+            if not end:
+                uids = uids[:1] if start != "*" else uids[-1:]
+        return "OK", [" ".join(str(uid) for uid in uids).encode()]
+
+    def _uid_fetch(self, uid_set, query):
+        self.state.fetches.append(query)
+        data = []
+        for seq, uid in enumerate(int(u) for u in uid_set.split(",")):
+            msg = message_from_bytes(self.state.messages[uid])
+            if "HEADER.FIELDS" in query:
+                names = re.search(r"HEADER\.FIELDS \(([^)]*)\)", query).group(1).split()
+                literal = header_fields(msg, names)
+                prefix = f"{seq + 1} (UID {uid} BODYSTRUCTURE {bodystructure(msg)} BODY[HEADER.FIELDS ({' '.join(names)})]"
+                data.append((f"{prefix} {{{len(literal)}}}".encode(), literal))
+                data.append(b")")
+                continue
+            prefix = f"{seq + 1} (UID {uid}"
+            for section in re.findall(r"BODY\.PEEK\[([\d.]+)\]", query):
+                content = section_bytes(msg, section)
+                data.append((f"{prefix} BODY[{section}] {{{len(content)}}}".encode(), content))
+                prefix = ""
+            data.append(b")")
+        return "OK", data
+
+    def _uid_store(self, uid, op, flags):
+        self.state.seen.add(int(uid))
+        return "OK", []
+
+    def close(self):
+        pass
+
+    def logout(self):
+        pass
+
+
+# ──────────────────────────── Servidor IMAP en proceso ────────────────────────────
+
+_FETCH_ITEM_RE = re.compile(r"BODY\.PEEK\[([^\]]*)\](?:<(\d+)\.(\d+)>)?")
+
+
+def _uid_set(spec, uids):
+    last = uids[-1] if uids else 0
+    selected = set()
+    for chunk in spec.split(","):
+        start, _sep, end = chunk.partition(":")
+        low = last if start == "*" else int(start)
+        high = low if not _sep else (last if end == "*" else int(end))
+        low, high = min(low, high), max(low, high)
+        selected.update(uid for uid in uids if low <= uid <= high)
+    return sorted(selected)
+
+
+def _imap_date(value):
+    day, month, year = value.split("-")
+    return int(year), imaplib.Mon2num[month.title().encode()], int(day)
+
+
+class _IMAPHandler(socketserver.StreamRequestHandler):
+    # Cada línea de respuesta sale sin esperar al ACK del cliente (sin Nagle).
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        self.imap = self.server.imap
+        self._send("* OK servidor IMAP de prueba listo")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, _sp, rest = line.rstrip(b"\r\n").decode("utf-8", errors="replace").partition(" ")
+            command, _sp, args = rest.partition(" ")
+            command = command.upper()
+            if command == "UID":
+                sub, _sp, args = args.partition(" ")
+                command = f"UID_{sub.upper()}"
+            method = getattr(self, f"_cmd_{command.lower()}", None)
+            if method is None:
+                self._send(f"{tag} BAD comando no soportado")
+            elif method(tag, args) is False:
+                return
+
+    def _send(self, text):
+        self.wfile.write((text + "\r\n").encode() if isinstance(text, str) else text)
+
+    def _cmd_capability(self, tag, args):
+        self._send(f"* CAPABILITY {' '.join(self.imap.capabilities)}")
+        self._send(f"{tag} OK CAPABILITY completado")
+
+    def _cmd_login(self, tag, args):
+        with self.imap.lock:
+            self.imap.logins += 1
+        self._send(f"{tag} OK LOGIN completado")
+
+    def _cmd_select(self, tag, args):
+        with self.imap.lock:
+            uids = sorted(self.imap.messages)
+        self._send(f"* {len(uids)} EXISTS")
+        self._send("* 0 RECENT")
+        self._send(f"* OK [UIDVALIDITY {self.imap.uidvalidity}] UIDs válidos")
+        self._send(f"* OK [UIDNEXT {(uids[-1] if uids else 0) + 1}] próximo UID")
+        self._send(f"{tag} OK [READ-WRITE] SELECT completado")
+
+    def _cmd_noop(self, tag, args):
+        self._send(f"{tag} OK NOOP completado")
+
+    def _cmd_close(self, tag, args):
+        self._send(f"{tag} OK CLOSE completado")
+
+    def _cmd_logout(self, tag, args):
+        self._send("* BYE hasta luego")
+        self._send(f"{tag} OK LOGOUT completado")
+        return False
+
+    def _cmd_uid_search(self, tag, args):
+        tokens = args.split()
+        with self.imap.lock:
+            uids = sorted(self.imap.messages)
+            seen = set(self.imap.seen)
+            dates = dict(self.imap.dates)
+        i = 0
+        while i < len(tokens):
+            token = tokens[i].upper()
+            if token == "UNSEEN":
+                uids = [uid for uid in uids if uid not in seen]
+            elif token == "UID":
+                i += 1
+                uids = _uid_set(tokens[i], uids)
+            elif token in ("SINCE", "BEFORE"):
+                i += 1
+                limit = _imap_date(tokens[i])
+                uids = [
+                    uid for uid in uids
+                    if dates.get(uid) is None or (dates[uid] >= limit if token == "SINCE" else dates[uid] < limit)
+                ]
+            i += 1
+        self._send("* SEARCH" + "".join(f" {uid}" for uid in uids))
+        self._send(f"{tag} OK SEARCH completado")
+
+    def _cmd_uid_fetch(self, tag, args):
+        spec, _sp, query = args.partition(" ")
+        with self.imap.lock:
+            self.imap.fetches.append(query)
+            all_uids = sorted(self.imap.messages)
+            messages = {uid: self.imap.messages[uid] for uid in _uid_set(spec, all_uids)}
+        for uid, raw in messages.items():
+            msg = message_from_bytes(raw)
+            out = f"* {all_uids.index(uid) + 1} FETCH (UID {uid}".encode()
+            if "BODYSTRUCTURE" in query:
+                out += f" BODYSTRUCTURE {bodystructure(msg)}".encode()
+            for section, origin, length in _FETCH_ITEM_RE.findall(query):
+                if section.upper().startswith("HEADER.FIELDS"):
+                    content = header_fields(msg, re.search(r"\(([^)]*)\)", section).group(1).split())
+                else:
+                    content = section_bytes(msg, section)
+                key = f"BODY[{section}]"
+                if origin:
+                    content = content[int(origin):int(origin) + int(length)]
+                    key += f"<{origin}>"
+                out += f" {key} {{{len(content)}}}\r\n".encode() + content
+                with self.imap.lock:
+                    self.imap.sent_bytes += len(content)
+            self._send(out + b")\r\n")
+        self._send(f"{tag} OK FETCH completado")
+
+    def _cmd_uid_store(self, tag, args):
+        uid = int(args.split()[0])
+        with self.imap.lock:
+            if "\\SEEN" in args.upper():
+                self.imap.seen.add(uid)
+            seq = sorted(self.imap.messages).index(uid) + 1
+        self._send(f"* {seq} FETCH (UID {uid} FLAGS (\\Seen))")
+        self._send(f"{tag} OK STORE completado")
+
+    def _cmd_idle(self, tag, args):
+        if "IDLE" not in self.imap.capabilities:
+            self._send(f"{tag} BAD IDLE no soportado")
+            return
+        self._send("+ esperando")
+        with self.imap.lock:
+            known = len(self.imap.messages)
+        while True:
+            with self.imap.lock:
+                count = len(self.imap.messages)
+            if count != known:
+                known = count
+                self._send(f"* {count} EXISTS")
+            readable, _w, _x = select.select([self.connection], [], [], 0.05)
+            if readable:
+                line = self.rfile.readline()
+                if not line:
+                    return False
+                if line.strip().upper() == b"DONE":
+                    self._send(f"{tag} OK IDLE terminado")
+                    return
+
+
+class FakeIMAPServer:
+    """
+    Servidor IMAP en un hilo sobre un buzón en memoria. Acepta cualquier usuario y
+    contraseña y una sola carpeta. Uso:
+
+        with FakeIMAPServer(load_corpus()) as server:
+            ... config.imap_host = server.host; config.imap_port = server.port ...
+    """
+
+    host = "127.0.0.1"
+
+    def __init__(self, messages=(), uidvalidity=1, idle=True):
+        self.lock = threading.Lock()
+        self.messages = {}
+        self.dates = {}
+        self.seen = set()
+        self.fetches = []
+        self.logins = 0
+        self.sent_bytes = 0
+        self.uidvalidity = uidvalidity
+        self.capabilities = ("IMAP4rev1", "IDLE") if idle else ("IMAP4rev1",)
+        self._server = None
+        for raw in messages:
+            self.add(raw)
+
+    def add(self, raw):
+        """Agrega un correo (lo anuncia a las conexiones en IDLE). Retorna su UID."""
+        msg_date = None
+        try:
+            parsed = parsedate_to_datetime(message_from_bytes(raw).get("Date", ""))
+            msg_date = (parsed.year, parsed.month, parsed.day)
+        except (TypeError, ValueError):
+            pass
+        with self.lock:
+            uid = max(self.messages, default=0) + 1
+            self.messages[uid] = raw
+            self.dates[uid] = msg_date
+        return uid
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._server = socketserver.ThreadingTCPServer((self.host, 0), _IMAPHandler)
+        self._server.daemon_threads = True
+        self._server.imap = self
+        threading.Thread(target=self._server.serve_forever, name="fake-imap", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,115 @@
+"""
+Tests para el almacén de blobs: deduplicación, adjunto sin copia y limpieza.
+"""
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from mi_app.models import (
+    ATSClient,
+    ATSForm,
+    ATSFormSubmission,
+    Candidate,
+    FormChatSession,
+    StoredBlob,
+    Subscription,
+    Vacancy,
+)
+from mi_app.services.blob_store import attach_pending_file, attach_to_submission, collect_orphan_blobs, store_file
+from mi_app.services.chat_answers import record_answer
+from mi_app.views.orbita.orbita_views import _create_candidate_from_submission
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class BlobStoreTests(TestCase):
+    """Un mismo CV se guarda una vez y se comparte entre envíos y candidato."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="b@test.com", email="b@test.com", password="x")
+        self.ats_client = ATSClient.objects.create(user=self.user, company_name="Test", contact_name="C")
+        Subscription.objects.create(user=self.user)
+        self.vacancy = Vacancy.objects.create(client=self.ats_client, title="Backend")
+        self.ats_form = ATSForm.objects.create(
+            client=self.ats_client, name="Form Blob", is_active=True, vacancy=self.vacancy
+        )
+
+    def _submission(self, email):
+        return ATSFormSubmission.objects.create(form=self.ats_form, payload={}, submitter_email=email)
+
+    def test_identical_content_is_stored_once(self):
+        first = store_file(ContentFile(b"%PDF-cv", name="Ana Pérez CV.pdf"))
+        second = store_file(ContentFile(b"%PDF-cv", name="otro.pdf"))
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(StoredBlob.objects.count(), 1)
+        # La ruta es solo el hash: no expone el nombre de quien lo subió primero.
+        self.assertTrue(first.storage_name.startswith(f"ats/blobs/{first.sha256[:2]}/{first.sha256}"))
+        self.assertNotIn("Ana", first.storage_name)
+
+    def test_candidate_shares_blob_with_submission_file(self):
+        submission = self._submission("a@example.com")
+        blob = store_file(ContentFile(b"%PDF-cv", name="cv.pdf"))
+        attach_to_submission(submission, blob, None, "cv.pdf")
+
+        candidate = _create_candidate_from_submission(submission, {}, "a@example.com")
+
+        blob.refresh_from_db()
+        self.assertEqual(candidate.cv_blob_id, blob.pk)
+        self.assertEqual(candidate.cv_file.name, blob.storage_name)
+        self.assertEqual(blob.ref_count, 2)
+
+    def test_last_reference_deletion_removes_blob(self):
+        submission = self._submission("a@example.com")
+        blob = store_file(ContentFile(b"%PDF-cv", name="cv.pdf"))
+        attach_to_submission(submission, blob, None, "cv.pdf")
+        candidate = _create_candidate_from_submission(submission, {}, "a@example.com")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Candidate.objects.filter(pk=candidate.pk).delete()
+        self.assertFalse(StoredBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(default_storage.exists(blob.storage_name))
+
+    def test_pending_chat_upload_keeps_blob_alive(self):
+        submission = self._submission("a@example.com")
+        blob = store_file(ContentFile(b"%PDF-cv", name="cv.pdf"))
+        attach_to_submission(submission, blob, None, "cv.pdf")
+        session = FormChatSession.objects.create(form=self.ats_form, total_steps=2)
+        record_answer(session, "cv_file", "mi_cv.pdf", attachment={"path": blob.storage_name, "name": "mi_cv.pdf", "blob": blob.pk})
+
+        # Se borra el único envío que lo referenciaba mientras el chat sigue en curso.
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.delete()
+        self.assertEqual(collect_orphan_blobs(older_than=timedelta(0)), 0)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+        self.assertTrue(default_storage.exists(blob.storage_name))
+
+        later = self._submission("b@example.com")
+        attached = attach_pending_file(later, {"path": blob.storage_name, "name": "mi_cv.pdf", "blob": blob.pk})
+        blob.refresh_from_db()
+        self.assertEqual((attached.blob_id, attached.original_name, blob.ref_count), (blob.pk, "mi_cv.pdf", 1))
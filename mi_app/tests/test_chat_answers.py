@@ -0,0 +1,52 @@
+"""
+Tests para las respuestas del chat como eventos de solo inserción.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from mi_app.models import ATSClient, ATSForm, FormChatAnswer, FormChatSession, Subscription
+from mi_app.services.chat_answers import materialize_answers, record_answer, session_answers
+
+User = get_user_model()
+
+
+class ChatAnswerEventsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="c@test.com", email="c@test.com", password="x")
+        self.ats_client = ATSClient.objects.create(user=self.user, company_name="Test", contact_name="C")
+        Subscription.objects.create(user=self.user)
+        self.ats_form = ATSForm.objects.create(client=self.ats_client, name="Chat", is_active=True)
+        self.session = FormChatSession.objects.create(
+            form=self.ats_form, total_steps=2, answers={"_telegram": {"display_name": "Ana"}}
+        )
+
+    def test_stale_copies_do_not_overwrite_each_other(self):
+        # Dos requests con la misma sesión cargada (subida de CV y respuesta de texto).
+        upload_copy = FormChatSession.objects.get(pk=self.session.pk)
+        text_copy = FormChatSession.objects.get(pk=self.session.pk)
+
+        first = record_answer(
+            upload_copy, "cv_file", "cv.pdf", attachment={"path": "ats/blobs/cv.pdf", "name": "cv.pdf", "blob": 1}
+        )
+        last = record_answer(text_copy, "field_1", "Ana López", candidate_name="Ana López")
+
+        self.assertFalse(first)
+        self.assertTrue(last)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.current_step, 2)
+        self.assertEqual(self.session.status, FormChatSession.STATUS_COMPLETED)
+        answers = session_answers(self.session)
+        self.assertEqual(answers["cv_file"], "cv.pdf")
+        self.assertEqual(answers["field_1"], "Ana López")
+        self.assertEqual(answers["_pending_files"]["cv_file"]["blob"], 1)
+
+    def test_finalize_materializes_snapshot(self):
+        record_answer(self.session, "field_1", "Ana")
+        record_answer(self.session, "field_1", "Ana María")
+
+        materialize_answers(self.session)
+
+        self.assertEqual(FormChatAnswer.objects.filter(session=self.session).count(), 2)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.answers["field_1"], "Ana María")
+        self.assertEqual(self.session.answers["_telegram"], {"display_name": "Ana"})
@@ -0,0 +1,112 @@
+"""
+Tests para el cierre diferido de chats (process_chat_finalizations).
+"""
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from mi_app.models import (
+    ATSClient,
+    ATSClientEmailConfig,
+    ATSForm,
+    ATSFormSubmission,
+    ATSNotification,
+    Candidate,
+    ChatFinalization,
+    FormChatSession,
+    OutboundEmail,
+    Subscription,
+    Vacancy,
+)
+from mi_app.services.chat_finalization import commit_submission, process_finalizations
+from mi_app.views.orbita.form_chat_views import _build_steps
+
+User = get_user_model()
+
+
+class ChatFinalizationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="f@test.com", email="f@test.com", password="x")
+        self.ats_client = ATSClient.objects.create(user=self.user, company_name="Test", contact_name="C")
+        Subscription.objects.create(user=self.user)
+        vacancy = Vacancy.objects.create(client=self.ats_client, title="Backend")
+        self.ats_form = ATSForm.objects.create(client=self.ats_client, name="Chat", vacancy=vacancy, is_active=True)
+        self.session = FormChatSession.objects.create(
+            form=self.ats_form, current_step=0, total_steps=1, status=FormChatSession.STATUS_STARTED
+        )
+
+    def _complete_chat(self):
+        return Client().post(
+            reverse("orbita_form_chat_answer", args=[self.ats_form.uuid]),
+            data=json.dumps({
+                "session_uuid": str(self.session.session_uuid),
+                "step_id": "submitter_email",
+                "value": "ana@example.com",
+            }),
+            content_type="application/json",
+        )
+
+    def test_reply_only_commits_submission_and_worker_finishes_once(self):
+        response = self._complete_chat()
+
+        self.assertTrue(response.json()["completed"])
+        job = ChatFinalization.objects.get()
+        self.assertEqual(job.session_uuid, self.session.session_uuid)
+        self.assertFalse(Candidate.objects.exists())
+        self.assertFalse(ATSNotification.objects.exists())
+
+        self.assertEqual(process_finalizations()["done"], 1)
+        job.refresh_from_db()
+        self.assertEqual((job.stage, job.status), (ChatFinalization.STAGE_DONE, ChatFinalization.STATUS_DONE))
+        self.assertEqual(ATSFormSubmission.objects.get().candidate.email, "ana@example.com")
+        self.assertEqual(ATSNotification.objects.get().title, "Nuevo candidato (chat)")
+
+        # Reintento del cierre y otra pasada del worker: nada se duplica.
+        self.session.refresh_from_db()
+        submission, duplicate = commit_submission(self.ats_form, self.session, _build_steps(self.ats_form))
+        self.assertFalse(duplicate)
+        self.assertEqual(submission.pk, job.submission_id)
+        self.assertEqual(process_finalizations(), {"done": 0, "retry": 0, "failed": 0})
+        self.assertEqual(
+            (ATSFormSubmission.objects.count(), Candidate.objects.count(), ATSNotification.objects.count()), (1, 1, 1)
+        )
+
+    def test_failed_stage_resumes_without_duplicating_candidate(self):
+        self._complete_chat()
+
+        with mock.patch("mi_app.orbita_notifications.notify_orbita_client", side_effect=RuntimeError("smtp")):
+            self.assertEqual(process_finalizations()["retry"], 1)
+        job = ChatFinalization.objects.get()
+        self.assertEqual((job.stage, job.attempts), (ChatFinalization.STAGE_NOTIFY, 1))
+        self.assertEqual(Candidate.objects.count(), 1)
+
+        ChatFinalization.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(process_finalizations()["done"], 1)
+        self.assertEqual((Candidate.objects.count(), ATSNotification.objects.count()), (1, 1))
+
+    @override_settings(ORBITA_SITE_URL="https://sitio.example")
+    def test_notification_email_links_are_absolute(self):
+        ATSClientEmailConfig.objects.create(client=self.ats_client, notification_email="rh@example.com")
+        self._complete_chat()
+
+        self.assertEqual(ChatFinalization.objects.get().data["base_url"], "http://testserver")
+        process_finalizations()
+
+        link = ATSNotification.objects.get().link
+        self.assertTrue(link.startswith("/"))
+        self.assertIn(f"Ver: http://testserver{link}", OutboundEmail.objects.get().body)
+
+        # Sin request (Telegram) se usa ORBITA_SITE_URL.
+        ChatFinalization.objects.update(
+            data={},
+            stage=ChatFinalization.STAGE_NOTIFY,
+            status=ChatFinalization.STATUS_PENDING,
+            next_attempt_at=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(process_finalizations()["done"], 1)
+        self.assertIn(f"Ver: https://sitio.example{link}", OutboundEmail.objects.latest("id").body)
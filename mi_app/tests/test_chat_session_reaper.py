@@ -0,0 +1,106 @@
+"""
+Tests para la expiración y el archivado de sesiones de chat (reap_chat_sessions).
+"""
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from mi_app.models import (
+    ATSClient,
+    ATSForm,
+    ATSFormSubmission,
+    FormChatAnswer,
+    FormChatSession,
+    FormChatSessionArchive,
+    StoredBlob,
+    Subscription,
+)
+from mi_app.services.blob_store import store_file
+from mi_app.services.chat_answers import record_answer
+from mi_app.services.chat_session_reaper import reap_chat_sessions
+from mi_app.services.telegram_repository import _user_already_completed
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class ChatSessionReaperTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="r@test.com", email="r@test.com", password="x")
+        self.ats_client = ATSClient.objects.create(user=self.user, company_name="Test", contact_name="C")
+        Subscription.objects.create(user=self.user)
+        self.ats_form = ATSForm.objects.create(client=self.ats_client, name="Chat", is_active=True)
+
+    def _age(self, session, **delta):
+        past = timezone.now() - timedelta(**delta)
+        FormChatSession.objects.filter(pk=session.pk).update(updated_at=past, completed_at=session.completed_at and past)
+
+    def test_abandoned_session_is_expired_with_its_upload(self):
+        session = FormChatSession.objects.create(form=self.ats_form, total_steps=3)
+        blob = store_file(ContentFile(b"%PDF-cv", name="cv.pdf"))
+        record_answer(session, "cv_file", "cv.pdf", attachment={"path": blob.storage_name, "name": "cv.pdf", "blob": blob.pk})
+        active = FormChatSession.objects.create(form=self.ats_form, total_steps=3)
+        self._age(session, hours=80)
+
+        dry = reap_chat_sessions(ttl_hours=72, dry_run=True)
+        self.assertEqual((dry["expired"], dry["files"]), (1, 1))
+        self.assertTrue(FormChatSession.objects.filter(pk=session.pk).exists())
+
+        stats = reap_chat_sessions(ttl_hours=72)
+
+        self.assertEqual(stats["expired"], 1)
+        self.assertEqual(stats["rows"], 2)
+        self.assertEqual((stats["files"], stats["bytes"]), (1, 7))
+        self.assertFalse(FormChatSession.objects.filter(pk=session.pk).exists())
+        self.assertFalse(FormChatAnswer.objects.exists())
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertFalse(default_storage.exists(blob.storage_name))
+        self.assertTrue(FormChatSession.objects.filter(pk=active.pk).exists())
+
+    def test_old_completed_session_is_archived(self):
+        submission = ATSFormSubmission.objects.create(form=self.ats_form, payload={}, submitter_email="a@b.com")
+        session = FormChatSession.objects.create(
+            form=self.ats_form,
+            total_steps=1,
+            source=FormChatSession.SOURCE_TELEGRAM,
+            telegram_user_id=42,
+            submission=submission,
+        )
+        record_answer(session, "field_1", "Ana")
+        self._age(session, days=100)
+
+        stats = reap_chat_sessions(archive_days=90)
+
+        self.assertEqual(stats["archived"], 1)
+        self.assertFalse(FormChatSession.objects.exists())
+        archived = FormChatSessionArchive.objects.get(session_uuid=session.session_uuid)
+        self.assertEqual(archived.answers, {"field_1": "Ana"})
+        self.assertEqual(submission.archived_chat_session, archived)
+        self.assertTrue(_user_already_completed(self.ats_form, 42))
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("orbita_candidate_chat_session_api", args=[session.session_uuid]))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["status"], data["current_step"]), (FormChatSession.STATUS_COMPLETED, 1))
+        self.assertIsNotNone(data["completed_at"])
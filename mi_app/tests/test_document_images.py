@@ -0,0 +1,101 @@
+"""
+Tests del preprocesamiento de imágenes para la extracción de documentos
+(services/document_images.py) sobre el set sintético de tests/document_fixtures.py.
+
+Benchmark (se omite salvo que se pida):
+  ORBITA_DOCUMENTS_BENCHMARK=1 python manage.py test mi_app.tests.test_document_images.DocumentImagesBenchmark
+"""
+import base64
+import io
+import os
+import time
+import unittest
+
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from mi_app.services.document_extraction import _file_to_base64_image
+from mi_app.services.document_images import prepare_image, vision_size
+from mi_app.tests.document_fixtures import comprobante_pdf, comprobante_scan, ine_photo, load_fixture_set
+
+
+def _decoded(result):
+    b64, mime = result
+    data = base64.b64decode(b64)
+    return data, mime, Image.open(io.BytesIO(data))
+
+
+class DocumentImagePreparationTests(TestCase):
+    def test_vision_size_fits_model_resolution_without_upscaling(self):
+        self.assertEqual(vision_size(4032, 3024), (1024, 768))
+        self.assertEqual(vision_size(1000, 6000), (341, 2048))
+        self.assertEqual(vision_size(400, 300), (400, 300))
+
+    def test_phone_photo_is_oriented_and_downsized(self):
+        content = ine_photo(orientation=6)
+        self.assertEqual(Image.open(io.BytesIO(content)).size, (3024, 4032))
+
+        prepared = prepare_image(content)
+
+        # La EXIF pide girarla: queda apaisada, como la credencial.
+        image = Image.open(io.BytesIO(prepared.data))
+        self.assertGreater(image.width, image.height)
+        self.assertEqual(min(image.size), 768)
+        self.assertEqual(prepared.mime, "image/jpeg")
+        self.assertLess(len(prepared.data), len(content) // 10)
+
+    def test_scan_margins_are_trimmed(self):
+        prepared = prepare_image(comprobante_scan())
+
+        # Solo queda el recibo (1850x2100 en la hoja carta), no la hoja completa.
+        width, height = prepared.size
+        self.assertEqual(width, 768)
+        self.assertAlmostEqual(height / width, 2100 / 1850, delta=0.03)
+
+    def test_small_already_compressed_image_is_sent_as_is(self):
+        noisy = Image.effect_noise((320, 240), 60).convert("RGB")
+        out = io.BytesIO()
+        noisy.save(out, format="JPEG", quality=30)
+        content = out.getvalue()
+
+        prepared = prepare_image(content)
+
+        self.assertEqual((prepared.data, prepared.mime), (content, "image/jpeg"))
+
+    @override_settings(ORBITA_DOCUMENTS_IMAGE_FORMAT="webp")
+    def test_webp_output(self):
+        data, mime, image = _decoded(_file_to_base64_image(comprobante_scan(), "cfe.jpg", "image/jpeg"))
+        self.assertEqual((mime, image.format), ("image/webp", "WEBP"))
+
+    def test_pdf_page_is_rendered_at_vision_resolution(self):
+        try:
+            content = comprobante_pdf()
+        except ImportError:
+            self.skipTest("PyMuPDF no instalado")
+
+        data, mime, image = _decoded(_file_to_base64_image(content, "recibo.pdf", "application/pdf"))
+
+        self.assertEqual((mime, min(image.size)), ("image/jpeg", 768))
+
+    def test_unreadable_image_falls_back_to_original_bytes(self):
+        b64, mime = _file_to_base64_image(b"no es una imagen", "foto.png", "image/png")
+        self.assertEqual((base64.b64decode(b64), mime), (b"no es una imagen", "image/png"))
+
+
+@unittest.skipUnless(os.environ.get("ORBITA_DOCUMENTS_BENCHMARK"), "ORBITA_DOCUMENTS_BENCHMARK=1 activa el benchmark")
+class DocumentImagesBenchmark(TestCase):
+    def test_payload_and_latency(self):
+        rounds = max(1, int(os.environ["ORBITA_DOCUMENTS_BENCHMARK"]))
+        lines = []
+        for fixture in load_fixture_set():
+            started = time.perf_counter()
+            for _ in range(rounds):
+                b64, mime = _file_to_base64_image(fixture.content, fixture.filename, fixture.content_type)
+            elapsed = (time.perf_counter() - started) / rounds
+            raw_b64 = len(base64.b64encode(fixture.content))
+            lines.append(
+                f"  {fixture.name:<22} {fixture.doc_type:<22} {len(fixture.content) / 1024:>8.0f} KB -> "
+                f"{len(b64) * 3 / 4 / 1024:>6.0f} KB {mime:<10} data URL {raw_b64 / 1024:>7.0f} -> "
+                f"{len(b64) / 1024:>5.0f} KB  {elapsed * 1000:>6.0f} ms"
+            )
+        print("\nBenchmark preprocesamiento de documentos:\n" + "\n".join(lines))
@@ -0,0 +1,167 @@
+"""
+Tests de los lotes de extracción de documentos (services/document_jobs.py, API batch/jobs)
+y de la caché de resultados por (sha256, tipo, versión de prompt).
+"""
+import io
+import shutil
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from mi_app.models import DocumentExtractionItem, DocumentExtractionResult
+from mi_app.services.document_jobs import drain_jobs
+
+MEDIA_ROOT = tempfile.mkdtemp()
+API_KEY = "clave-documentos"
+
+
+def _image(color):
+    out = io.BytesIO()
+    Image.new("RGB", (60, 40), color).save(out, format="PNG")
+    return out.getvalue()
+
+
+def _vision_reply(content='{"nombres": "MARIA"}'):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+document_settings = override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+    DOCUMENTS_API_KEY=API_KEY,
+    OPENAI_API_KEY_DOCUMENTS="sk-test",
+    ORBITA_DOCUMENTS_JOB_WORKERS=1,
+)
+
+
+class DocumentJobsTestMixin:
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("openai.OpenAI")
+        self.openai = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.create = self.openai.return_value.chat.completions.create
+        self.create.return_value = _vision_reply()
+
+    def _post_batch(self, files, document_type="ine"):
+        uploads = [SimpleUploadedFile(name, content, content_type="image/png") for name, content in files]
+        types = document_type if isinstance(document_type, list) else [document_type]
+        return self.client.post(
+            "/api/documents/extract/batch/",
+            {"files": uploads, "document_type": types},
+            HTTP_X_API_KEY=API_KEY,
+        )
+
+    def _status(self, job_id):
+        return self.client.get(f"/api/documents/jobs/{job_id}/", HTTP_X_API_KEY=API_KEY)
+
+
+@document_settings
+class DocumentBatchAPITests(DocumentJobsTestMixin, TestCase):
+    def test_batch_returns_job_and_results_after_worker(self):
+        red, blue = _image("red"), _image("blue")
+        response = self._post_batch(
+            [("frente.png", red), ("repetido.png", red), ("recibo.png", blue)],
+            document_type=["ine", "ine", "comprobante_domicilio"],
+        )
+
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+        self.assertEqual(response.json()["status"], "processing")
+        self.assertEqual(self._status(job_id).json()["pending"], 3)
+
+        self.assertEqual(drain_jobs(), {"done": 2, "cached": 1, "retry": 0, "failed": 0})
+
+        body = self._status(job_id).json()
+        self.assertEqual((body["status"], body["done"]), ("done", 3))
+        self.assertEqual([d["data"] for d in body["documents"]], [{"nombres": "MARIA"}] * 3)
+        # Los dos archivos iguales del mismo tipo comparten una sola llamada a Vision.
+        self.assertEqual(self.create.call_count, 2)
+        self.assertFalse(DocumentExtractionItem.objects.exclude(storage_name="").exists())
+
+    def test_resubmitted_document_is_answered_from_cache(self):
+        content = _image("green")
+        self._post_batch([("ine.png", content)])
+        drain_jobs()
+
+        response = self._post_batch([("reintento.png", content)])
+        (document,) = response.json()["documents"]
+        self.assertEqual((response.json()["status"], document["cached"]), ("done", True))
+
+        sync = self.client.post(
+            "/api/documents/extract/",
+            {"file": SimpleUploadedFile("otra.png", content, content_type="image/png"), "document_type": "ine"},
+            HTTP_X_API_KEY=API_KEY,
+        )
+        self.assertEqual(sync.json(), {"ok": True, "data": {"nombres": "MARIA"}, "cached": True})
+        self.assertEqual(self.create.call_count, 1)
+        self.assertEqual(DocumentExtractionResult.objects.get().hits, 2)
+
+    def test_prompt_version_change_invalidates_cache(self):
+        content = _image("yellow")
+        self._post_batch([("ine.png", content)])
+        drain_jobs()
+
+        with mock.patch("mi_app.services.document_extraction.PROMPT_VERSION", "2"):
+            self._post_batch([("ine.png", content)])
+            drain_jobs()
+
+        self.assertEqual(self.create.call_count, 2)
+
+    @override_settings(ORBITA_DOCUMENTS_JOB_MAX_ATTEMPTS=2, ORBITA_DOCUMENTS_JOB_RETRY_BASE_SECONDS=0)
+    def test_openai_errors_are_retried_then_fail(self):
+        self.create.side_effect = RuntimeError("timeout")
+        job_id = self._post_batch([("ine.png", _image("black"))]).json()["job_id"]
+
+        self.assertEqual(drain_jobs()["retry"], 1)
+        self.assertEqual(drain_jobs()["failed"], 1)
+
+        (document,) = self._status(job_id).json()["documents"]
+        self.assertEqual((document["status"], document["error"]), ("failed", "timeout"))
+
+    def test_invalid_batches_are_rejected(self):
+        self.assertEqual(self._post_batch([]).status_code, 400)
+        mismatched = self._post_batch([("a.png", _image("red")), ("b.png", _image("blue"))], ["ine"] * 3)
+        self.assertEqual(mismatched.status_code, 400)
+        self.assertEqual(self._status("00000000-0000-0000-0000-000000000000").status_code, 404)
+        self.assertFalse(DocumentExtractionItem.objects.exists())
+
+
+@document_settings
+class DocumentBatchConcurrencyTests(DocumentJobsTestMixin, TransactionTestCase):
+    @override_settings(ORBITA_DOCUMENTS_JOB_WORKERS=4)
+    def test_documents_are_extracted_in_parallel_threads(self):
+        colors = ["red", "green", "blue", "white"]
+        job_id = self._post_batch([(f"{c}.png", _image(c)) for c in colors]).json()["job_id"]
+        # Los hilos del pool solo llaman a Vision; las consultas a la BD van en el hilo principal.
+        db_threads = set()
+        vision_threads = set()
+        self.create.side_effect = lambda **kwargs: vision_threads.add(threading.current_thread()) or _vision_reply()
+        original_prepare = BaseDatabaseWrapper._prepare_cursor
+
+        def prepare_cursor(connection, cursor):
+            db_threads.add(threading.current_thread())
+            return original_prepare(connection, cursor)
+
+        with mock.patch.object(BaseDatabaseWrapper, "_prepare_cursor", autospec=True, side_effect=prepare_cursor):
+            self.assertEqual(drain_jobs()["done"], 4)
+
+        self.assertEqual(db_threads, {threading.main_thread()})
+        self.assertNotIn(threading.main_thread(), vision_threads)
+        self.assertEqual(self._status(job_id).json()["status"], "done")
+        self.assertEqual(DocumentExtractionResult.objects.count(), 4)
@@ -0,0 +1,109 @@
+"""
+Tests de la selección y el rasterizado de páginas de PDF para Vision (services/document_pdf.py).
+"""
+import hashlib
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from mi_app.services import document_pdf
+from mi_app.services.document_extraction import extract_document_info
+from mi_app.services.document_pdf import pick_pages, render_pdf_pages, score_page
+from mi_app.tests.document_fixtures import comprobante_pdf, comprobante_pdf_address_on_page_2, ine_scan_pdf
+
+try:
+    import fitz  # noqa: F401
+except ImportError:
+    fitz = None
+
+
+class PageSelectionTests(TestCase):
+    def test_keywords_beat_density_and_blank_pages_are_dropped(self):
+        scores = [
+            score_page("Conoce nuestras promociones " * 50, "comprobante_domicilio"),
+            score_page("Titular: Ana\nDomicilio: Calle 1, Col. Centro, C.P. 01000", "comprobante_domicilio"),
+            score_page("", "comprobante_domicilio", has_content=False),
+        ]
+        self.assertEqual(pick_pages(scores, "comprobante_domicilio"), [1])
+
+    def test_scanned_pages_are_taken_in_order_up_to_the_type_limit(self):
+        scores = [score_page("", "ine", has_content=True) for _ in range(4)]
+        self.assertEqual(pick_pages(scores, "ine"), [0, 1])
+        with override_settings(ORBITA_DOCUMENTS_PDF_MAX_PAGES=3):
+            self.assertEqual(pick_pages(scores, "comprobante_domicilio"), [0, 1, 2])
+
+
+# Caché de páginas propia de los tests: no se toca la de ORBITA_DOCUMENTS_PDF_CACHE_DIR.
+PAGE_CACHE_DIR = tempfile.mkdtemp()
+
+
+@unittest.skipIf(fitz is None, "PyMuPDF no instalado")
+@override_settings(
+    ORBITA_DOCUMENTS_PDF_WORKERS=0,
+    CACHES={**settings.CACHES, "documents_pdf": {**settings.CACHES["documents_pdf"], "LOCATION": PAGE_CACHE_DIR}},
+)
+class RenderPdfPagesTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PAGE_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        document_pdf._page_cache().clear()
+
+    def test_address_on_second_page_is_the_page_sent(self):
+        with self.assertLogs("mi_app.services.document_pdf", "INFO") as logs:
+            pages = render_pdf_pages(comprobante_pdf_address_on_page_2(), "comprobante_domicilio")
+
+        self.assertEqual(len(pages), 1)
+        self.assertIn("selected=[2]", logs.output[-1])
+
+    def test_ine_front_and_back_skip_the_blank_page(self):
+        with self.assertLogs("mi_app.services.document_pdf", "INFO") as logs:
+            pages = render_pdf_pages(ine_scan_pdf(), "ine")
+
+        self.assertEqual([page.mime for page in pages], ["image/jpeg", "image/jpeg"])
+        self.assertIn("selected=[1, 3]", logs.output[-1])
+
+    def test_rendered_pages_are_cached_and_only_missing_ones_rendered(self):
+        content = ine_scan_pdf()
+        first = render_pdf_pages(content, "ine")
+        # Como si la hoja 3 no hubiera alcanzado a renderizarse la primera vez.
+        digest = hashlib.sha256(content).hexdigest()
+        document_pdf._page_cache().delete(document_pdf._cache_key(digest, 2, document_pdf.pdf_render_scale(612, 792)))
+
+        with mock.patch.object(document_pdf, "_render_page", wraps=document_pdf._render_page) as render:
+            second = render_pdf_pages(content, "ine")
+
+        self.assertEqual([call.args[1] for call in render.call_args_list], [2])
+        self.assertEqual([page.data for page in second], [page.data for page in first])
+
+    @override_settings(ORBITA_DOCUMENTS_PDF_RENDER_SECONDS=0)
+    def test_render_time_is_bounded(self):
+        with self.assertLogs("mi_app.services.document_pdf", "WARNING"):
+            self.assertEqual(render_pdf_pages(ine_scan_pdf(), "ine"), [])
+
+    @override_settings(ORBITA_DOCUMENTS_PDF_WORKERS=2)
+    def test_pages_render_in_the_process_pool(self):
+        self.addCleanup(document_pdf._reset_pool)
+        pages = render_pdf_pages(comprobante_pdf(pages=3), "comprobante_domicilio")
+
+        self.assertEqual(len(pages), 3)
+        self.assertIsNotNone(document_pdf._pool)
+
+    @override_settings(OPENAI_API_KEY_DOCUMENTS="sk-test")
+    def test_selected_pages_go_in_one_vision_request(self):
+        response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='{"nombres": "MARIA"}'))])
+        with mock.patch("openai.OpenAI") as client:
+            client.return_value.chat.completions.create.return_value = response
+            result = extract_document_info(ine_scan_pdf(), "ine.pdf", "application/pdf", "ine")
+
+        self.assertEqual(result, {"ok": True, "data": {"nombres": "MARIA"}})
+        (message,) = client.return_value.chat.completions.create.call_args.kwargs["messages"]
+        self.assertEqual([part["type"] for part in message["content"]], ["text", "image_url", "image_url"])
+        self.assertIn("varias páginas", message["content"][0]["text"])
@@ -0,0 +1,99 @@
+"""
+Tests para el outbox de correos: encolado, envío por lotes, reintentos y límite por cliente.
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from mi_app.models import ATSClient, ATSClientEmailConfig, ATSNotification, OutboundEmail
+from mi_app.orbita_notifications import notify_orbita_client
+from mi_app.services.email_outbox import drain_outbox, enqueue_email
+
+User = get_user_model()
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="o@test.com", email="o@test.com", password="x")
+        self.ats_client = ATSClient.objects.create(user=self.user, company_name="Test", contact_name="C")
+        ATSClientEmailConfig.objects.create(client=self.ats_client, notification_email="avisos@test.com")
+
+    def test_notification_enqueues_email_without_sending(self):
+        notify_orbita_client(self.ats_client, ATSNotification.TYPE_SUBMISSION, "Nuevo envío")
+
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.to, ["avisos@test.com"])
+        self.assertEqual(queued.client, self.ats_client)
+
+        stats = drain_outbox()
+
+        self.assertEqual(stats["sent"], 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "[ATS] Nuevo envío")
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutboundEmail.STATUS_SENT)
+
+    @override_settings(ORBITA_EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_send_is_retried_with_backoff_then_marked_failed(self):
+        queued = enqueue_email("Hola", "Cuerpo", ["a@test.com"])
+
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("smtp caído")):
+            self.assertEqual(drain_outbox()["retry"], 1)
+            queued.refresh_from_db()
+            self.assertEqual(queued.status, OutboundEmail.STATUS_PENDING)
+            self.assertGreater(queued.next_attempt_at, timezone.now())
+
+            OutboundEmail.objects.filter(pk=queued.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(drain_outbox()["failed"], 1)
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutboundEmail.STATUS_FAILED)
+        self.assertIn("smtp caído", queued.last_error)
+
+    @override_settings(ORBITA_EMAIL_OUTBOX_CLIENT_RATE_PER_MINUTE=2)
+    def test_client_rate_limit_defers_excess(self):
+        for i in range(3):
+            enqueue_email(f"Correo {i}", "Cuerpo", ["a@test.com"], client=self.ats_client)
+
+        stats = drain_outbox()
+
+        self.assertEqual(stats["sent"], 2)
+        self.assertEqual(stats["deferred"], 1)
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.STATUS_PENDING).count(), 1)
+
+
+class NotificationDigestTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="d@test.com", email="d@test.com", password="x")
+        self.ats_client = ATSClient.objects.create(user=self.user, company_name="Test", contact_name="C")
+        ATSClientEmailConfig.objects.create(
+            client=self.ats_client,
+            notification_email="avisos@test.com",
+            notification_digest_minutes=ATSClientEmailConfig.DIGEST_5_MINUTES,
+        )
+
+    def test_burst_coalesces_into_one_notification_and_one_email(self):
+        for i in range(3):
+            notify_orbita_client(
+                self.ats_client, ATSNotification.TYPE_CANDIDATE, "Nuevo candidato", message=f"Postulante {i}"
+            )
+
+        notification = ATSNotification.objects.get(client=self.ats_client)
+        self.assertEqual(notification.count, 3)
+        self.assertEqual(notification.title, "3 nuevos candidatos")
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.subject, "[ATS] 3 nuevos candidatos")
+        self.assertIn("Postulante 2", email.body)
+        self.assertEqual(email.next_attempt_at, notification.digest_until)
+        self.assertEqual(drain_outbox()["sent"], 0)
+
+    def test_other_types_are_not_grouped(self):
+        notify_orbita_client(self.ats_client, ATSNotification.TYPE_PLAN, "Plan actualizado")
+        notify_orbita_client(self.ats_client, ATSNotification.TYPE_PLAN, "Plan actualizado")
+
+        self.assertEqual(ATSNotification.objects.filter(client=self.ats_client).count(), 2)
+        self.assertEqual(drain_outbox()["sent"], 2)
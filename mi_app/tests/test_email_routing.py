@@ -0,0 +1,69 @@
+"""
+Tests para el índice de ruteo del correo entrante (services/email_routing.py).
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from mi_app.models import ATSClient, ATSClientEmailConfig, ATSForm, Subscription, Vacancy
+from mi_app.services.email_routing import TitleMatcher, build_index, current_index
+
+User = get_user_model()
+
+
+class TitleMatcherTests(TestCase):
+    def test_finds_overlapping_and_nested_patterns(self):
+        matcher = TitleMatcher(["analista de datos", "datos", "analista", "sis"])
+        self.assertEqual(matcher.find("postulo a analista de datos senior"), {0, 1, 2})
+        self.assertEqual(matcher.find("ingeniero de sistemas"), {3})
+        self.assertEqual(matcher.find("sin coincidencias"), set())
+
+
+class RoutingIndexTests(TestCase):
+    def _client(self, idx, regex, inbox=""):
+        user = User.objects.create_user(username=f"r{idx}@test.com", email=f"r{idx}@test.com", password="x")
+        Subscription.objects.create(user=user)
+        ats_client = ATSClient.objects.create(user=user, company_name=f"Ruteo {idx}", contact_name="C")
+        config = ATSClientEmailConfig.objects.create(
+            client=ats_client,
+            incoming_subject_regex=regex,
+            company_from_email=inbox,
+        )
+        return ats_client, config
+
+    def test_inbox_recipient_wins_then_highest_id(self):
+        _client_a, addressed = self._client(1, "(?i)postulación", inbox="rrhh@empresa-a.com")
+        _client_b, newer = self._client(2, "(?i)postulación")
+        _client_c, _invalid = self._client(3, "(")
+        index = build_index()
+
+        self.assertEqual(index.match_config("Postulación", {"rrhh@empresa-a.com"}), addressed)
+        self.assertEqual(index.match_config("Postulación", {"otro@x.com"}), newer)
+        self.assertEqual(index.match_config("Postulación", {"otro@x.com"}, scope={addressed.pk}), addressed)
+        self.assertIsNone(index.match_config("Consulta", {"rrhh@empresa-a.com"}))
+
+    def test_pick_form_uses_vacancy_titles_without_queries(self):
+        ats_client, _config = self._client(1, "Postulación")
+        backend = Vacancy.objects.create(client=ats_client, title="Backend Python")
+        data = Vacancy.objects.create(client=ats_client, title="Analista de Datos")
+        backend_form = ATSForm.objects.create(client=ats_client, name="Backend", vacancy=backend, is_active=True)
+        data_form = ATSForm.objects.create(client=ats_client, name="Datos", vacancy=data, is_active=True)
+        ATSForm.objects.create(client=ats_client, name="General", is_active=True)
+        index = build_index()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(index.pick_form(ats_client.pk, "CV", "Me interesa Backend Python"), backend_form)
+            self.assertEqual(index.pick_form(ats_client.pk, "ANALISTA DE DATOS", ""), data_form)
+            # Sin vacante mencionada: el más reciente con vacante, no el general.
+            self.assertEqual(index.pick_form(ats_client.pk, "Hola", ""), data_form)
+            self.assertIsNone(index.pick_form(ats_client.pk + 100, "Hola", ""))
+
+    def test_current_index_is_reused_until_something_changes(self):
+        ats_client, _config = self._client(1, "Postulación")
+        first = current_index()
+        self.assertIs(current_index(), first)
+
+        vacancy = Vacancy.objects.create(client=ats_client, title="Soporte")
+        ATSForm.objects.create(client=ats_client, name="Soporte", vacancy=vacancy, is_active=True)
+        second = current_index()
+        self.assertIsNot(second, first)
+        self.assertEqual(second.pick_form(ats_client.pk, "soporte", "").name, "Soporte")
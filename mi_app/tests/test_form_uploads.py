@@ -0,0 +1,169 @@
+"""
+Tests para subidas por partes (reanudables) de formularios públicos.
+"""
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from uuid import UUID
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from mi_app.models import (
+    ATSClient,
+    ATSForm,
+    ATSFormSubmission,
+    ATSFormSubmissionFile,
+    ATSFormUpload,
+    StoredBlob,
+    Subscription,
+)
+from mi_app.services import chunked_uploads
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    ORBITA_FORM_UPLOAD_CHUNK_SIZE=4,
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class FormChunkedUploadTests(TestCase):
+    """Subida por partes: validación previa, reanudación y adjunto al enviar."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="u@test.com", email="u@test.com", password="x")
+        self.ats_client = ATSClient.objects.create(user=self.user, company_name="Test", contact_name="C")
+        Subscription.objects.create(user=self.user)
+        self.ats_form = ATSForm.objects.create(
+            client=self.ats_client, name="Form Upload", is_active=True, request_cv=True
+        )
+        self.start_url = reverse("orbita_form_upload_start", args=[self.ats_form.uuid])
+
+    def _post(self, url, data):
+        return self.client.post(url, data=data, content_type="application/octet-stream")
+
+    def _chunk_url(self, token, offset):
+        return reverse("orbita_form_upload_chunk", args=[self.ats_form.uuid, token]) + f"?offset={offset}"
+
+    def test_rejects_extension_before_storing(self):
+        response = self._post(f"{self.start_url}?name=malware.exe&size=8", b"MZ\x00\x00")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ATSFormUpload.objects.exists())
+
+    def test_rejects_chunk_larger_than_limit(self):
+        response = self._post(f"{self.start_url}?name=cv.pdf&size=8", b"%PDF-1")
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(ATSFormUpload.objects.exists())
+
+    def test_upload_resumes_and_completes(self):
+        start = self._post(f"{self.start_url}?name=cv.pdf&size=10", b"%PDF")
+        self.assertEqual(start.status_code, 201)
+        token = start.json()["token"]
+
+        # Offset desfasado: el servidor indica desde dónde continuar.
+        mismatch = self._post(self._chunk_url(token, 8), b"xx")
+        self.assertEqual(mismatch.status_code, 409)
+        self.assertEqual(mismatch.json()["received"], 4)
+
+        self.assertEqual(self._post(self._chunk_url(token, 4), b"-1.4").json()["received"], 8)
+        done = self._post(self._chunk_url(token, 8), b"\n%")
+        self.assertTrue(done.json()["complete"])
+
+        upload = ATSFormUpload.objects.get(token=token)
+        self.assertEqual(upload.status, ATSFormUpload.STATUS_COMPLETED)
+        self.assertEqual(upload.parts, [])
+        with default_storage.open(upload.storage_name, "rb") as fh:
+            self.assertEqual(fh.read(), b"%PDF-1.4\n%")
+
+    def test_last_chunk_is_assembled_outside_the_row_lock(self):
+        token = self._post(f"{self.start_url}?name=cv.pdf&size=8", b"%PDF").json()["token"]
+        depth = len(connection.atomic_blocks)
+        seen = []
+
+        def assemble(upload):
+            seen.append((len(connection.atomic_blocks), ATSFormUpload.objects.get(pk=upload.pk).status))
+            return original(upload)
+
+        original = chunked_uploads._assemble
+        with mock.patch.object(chunked_uploads, "_assemble", side_effect=assemble):
+            self.assertTrue(self._post(self._chunk_url(token, 4), b"-1.4").json()["complete"])
+
+        self.assertEqual(seen, [(depth, ATSFormUpload.STATUS_ASSEMBLING)])
+
+    def test_failed_assembly_drops_the_last_chunk_for_retry(self):
+        token = self._post(f"{self.start_url}?name=cv.pdf&size=8", b"%PDF").json()["token"]
+        client = Client(raise_request_exception=False)
+        with mock.patch.object(chunked_uploads, "_assemble", side_effect=OSError("storage caído")):
+            response = client.post(self._chunk_url(token, 4), data=b"-1.4", content_type="application/octet-stream")
+        self.assertEqual(response.status_code, 500)
+        upload = ATSFormUpload.objects.get(token=token)
+        self.assertEqual((upload.status, upload.received_size, len(upload.parts)), (ATSFormUpload.STATUS_UPLOADING, 4, 1))
+
+        self.assertTrue(self._post(self._chunk_url(token, 4), b"-1.4").json()["complete"])
+        self.assertEqual(ATSFormUpload.objects.get(token=token).status, ATSFormUpload.STATUS_COMPLETED)
+
+    def test_form_post_attaches_completed_upload(self):
+        token = self._post(f"{self.start_url}?name=cv.pdf&size=4", b"%PDF").json()["token"]
+
+        response = self.client.post(
+            reverse("orbita_form_public", args=[self.ats_form.uuid]),
+            {"submitter_email": "p@example.com", "cv_file_upload": token},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        submission = ATSFormSubmission.objects.get(form=self.ats_form)
+        attached = ATSFormSubmissionFile.objects.get(submission=submission)
+        upload = ATSFormUpload.objects.get(token=token)
+        self.assertEqual(attached.file.name, upload.storage_name)
+        self.assertEqual(attached.original_name, "cv.pdf")
+        self.assertEqual(upload.status, ATSFormUpload.STATUS_ATTACHED)
+
+    def test_reused_upload_token_rejects_the_whole_submission(self):
+        token = self._post(f"{self.start_url}?name=cv.pdf&size=4", b"%PDF").json()["token"]
+        # Otra petición ya adjuntó la subida entre la validación y el envío.
+        with mock.patch("mi_app.views.orbita.orbita_views.claim_upload", return_value=False):
+            response = self.client.post(
+                reverse("orbita_form_public", args=[self.ats_form.uuid]),
+                {"submitter_email": "p@example.com", "cv_file_upload": token},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ya se usó en otro envío", response.context["form_error"])
+        self.assertFalse(ATSFormSubmission.objects.exists())
+        self.assertEqual(ATSFormUpload.objects.get(token=token).status, ATSFormUpload.STATUS_COMPLETED)
+
+    def test_unclaimed_uploads_expire_with_their_parts_and_blob(self):
+        partial = self._post(f"{self.start_url}?name=cv.pdf&size=8", b"%PDF").json()["token"]
+        completed = self._post(f"{self.start_url}?name=otro.pdf&size=4", b"%PDF").json()["token"]
+        part = ATSFormUpload.objects.get(token=partial).parts[0]
+        blob = ATSFormUpload.objects.get(token=completed).blob
+        fresh = self._post(f"{self.start_url}?name=nuevo.pdf&size=8", b"%PDF").json()["token"]
+        ATSFormUpload.objects.exclude(token=fresh).update(updated_at=timezone.now() - timedelta(hours=25))
+
+        call_command("purge_orphan_blobs", "--hours", "1", stdout=StringIO())
+        self.assertEqual(list(ATSFormUpload.objects.values_list("token", flat=True)), [UUID(fresh)])
+        self.assertFalse(default_storage.exists(part))
+
+        StoredBlob.objects.filter(pk=blob.pk).update(created_at=timezone.now() - timedelta(hours=2))
+        call_command("purge_orphan_blobs", "--hours", "1", stdout=StringIO())
+        self.assertFalse(StoredBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(default_storage.exists(blob.storage_name))
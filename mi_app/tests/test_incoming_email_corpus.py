@@ -0,0 +1,180 @@
+"""
+Tests de extremo a extremo de process_incoming_emails contra el servidor IMAP en proceso
+(tests/imap_harness.py) sembrado con el corpus de fixtures/emails.
+
+Benchmark (se omite salvo que se pida):
+  ORBITA_IMAP_BENCHMARK=500 python manage.py test mi_app.tests.test_incoming_email_corpus.IncomingEmailBenchmark
+"""
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from mi_app.management.commands.process_incoming_emails import Command
+from mi_app.models import (
+    ATSClient,
+    ATSClientEmailConfig,
+    ATSForm,
+    ATSFormSubmission,
+    IMAPMailboxCheckpoint,
+    ProcessedIncomingEmail,
+    Subscription,
+    Vacancy,
+)
+from mi_app.tests.imap_harness import FakeIMAPServer, load_corpus, personalize
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+ALLOWED_EXT = {"pdf", "doc", "docx"}
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class CorpusMailboxTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def _mailbox(self, messages):
+        """Cliente con dos vacantes y un formulario general, leyendo del servidor IMAP de prueba."""
+        self.server = FakeIMAPServer(messages).start()
+        self.addCleanup(self.server.stop)
+        user = User.objects.create_user(username="corpus@test.com", email="corpus@test.com", password="x")
+        Subscription.objects.create(user=user)
+        self.ats_client = ATSClient.objects.create(user=user, company_name="Corpus", contact_name="C")
+        self.general = ATSForm.objects.create(client=self.ats_client, name="General", is_active=True)
+        self.backend = ATSForm.objects.create(
+            client=self.ats_client,
+            name="Backend",
+            vacancy=Vacancy.objects.create(client=self.ats_client, title="Backend Python"),
+            is_active=True,
+        )
+        self.datos = ATSForm.objects.create(
+            client=self.ats_client,
+            name="Datos",
+            vacancy=Vacancy.objects.create(client=self.ats_client, title="Analista de Datos"),
+            is_active=True,
+        )
+        ATSClientEmailConfig.objects.create(
+            client=self.ats_client,
+            incoming_subject_regex="(?i)postulaci",
+            imap_enabled=True,
+            imap_host=self.server.host,
+            imap_port=self.server.port,
+            imap_user="empleos@corpus.test",
+            imap_password_encrypted="secreto",
+            imap_use_ssl=False,
+        )
+        self.command = Command(stdout=io.StringIO())
+        self.command.workers = 1
+
+    def _cycle(self, max_emails=20, dry_run=False):
+        (stats,) = self.command._run_cycle(max_emails=max_emails, dry_run=dry_run, allowed_ext=ALLOWED_EXT)
+        return stats
+
+
+class IncomingEmailCorpusTests(CorpusMailboxTestCase):
+    def setUp(self):
+        self._mailbox(load_corpus())
+
+    def test_corpus_is_routed_by_vacancy_with_allowed_attachments(self):
+        stats = self._cycle()
+
+        self.assertEqual((stats.error, stats.fetched, stats.created, stats.skipped), ("", 5, 4, 1))
+        routed = {
+            s.submitter_email: (s.form.name, sorted(f.original_name for f in s.files.all()))
+            for s in ATSFormSubmission.objects.select_related("form")
+        }
+        self.assertEqual(routed, {
+            "maria.perez@correo.test": ("Backend", ["cv_maria_perez.pdf"]),
+            "jorge.rios@correo.test": ("Datos", ["CV Jorge Ríos.docx"]),
+            # Sin vacante en el texto: el formulario más reciente con vacante.
+            "lucia.gomez@correo.test": ("Datos", []),
+            # El .exe no está permitido y ni se descarga.
+            "pedro.diaz@correo.test": ("Backend", ["cv_pedro.pdf"]),
+        })
+        self.assertEqual(self.server.seen, {1, 2, 3, 4, 5})
+        # Un fetch de encabezados; el boletín no baja nada más.
+        self.assertEqual(len(self.server.fetches), 1 + 4 + 3)
+        self.assertEqual(ProcessedIncomingEmail.objects.count(), 4)
+
+        # Segunda pasada: nada nuevo.
+        stats = self._cycle()
+        self.assertEqual((stats.new, ATSFormSubmission.objects.count()), (0, 4))
+
+    def test_dry_run_reports_matches_without_side_effects(self):
+        stats = self._cycle(dry_run=True)
+
+        output = self.command.stdout.getvalue()
+        self.assertEqual((stats.fetched, stats.skipped), (5, 1))
+        self.assertIn("MATCH UID 1 cliente=Corpus form=Backend", output)
+        self.assertIn("MATCH UID 2 cliente=Corpus form=Datos", output)
+        self.assertFalse(ATSFormSubmission.objects.exists())
+        self.assertFalse(IMAPMailboxCheckpoint.objects.exists())
+        self.assertFalse(ProcessedIncomingEmail.objects.exists())
+        self.assertEqual(self.server.seen, set())
+
+
+class IncomingEmailCorpusIdleTests(CorpusMailboxTestCase):
+    def setUp(self):
+        self._mailbox([])
+
+    def test_idle_watcher_ingests_mail_delivered_while_waiting(self):
+        stop = threading.Event()
+        corpus = load_corpus()
+
+        def deliver_and_stop():
+            time.sleep(0.3)
+            self.server.add(corpus[0])
+            deadline = time.monotonic() + 10
+            while 1 not in self.server.seen and time.monotonic() < deadline:
+                time.sleep(0.05)
+            stop.set()
+
+        self.command._idle_configs = self.command._resolve_mailboxes(self.command._load_configs())
+        (conn,) = self.command._idle_configs
+        threading.Thread(target=deliver_and_stop, daemon=True).start()
+        self.command._watch_mailbox(conn, stop, 10, False, ALLOWED_EXT, 60)
+
+        self.assertEqual(ATSFormSubmission.objects.get().form, self.backend)
+        self.assertEqual(self.server.logins, 1)
+
+
+@unittest.skipUnless(os.environ.get("ORBITA_IMAP_BENCHMARK"), "ORBITA_IMAP_BENCHMARK=<correos> activa el benchmark")
+class IncomingEmailBenchmark(CorpusMailboxTestCase):
+    def test_throughput(self):
+        total = int(os.environ["ORBITA_IMAP_BENCHMARK"])
+        corpus = load_corpus()
+        self._mailbox([personalize(corpus[i % len(corpus)], i) for i in range(total)])
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        stats = self._cycle(max_emails=total)
+        elapsed = time.perf_counter() - started
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in sorted(stats.stages.items()))
+        print(
+            f"\nBenchmark correo entrante: {stats.fetched} correos en {elapsed:.2f}s "
+            f"({stats.fetched / elapsed:.1f} correos/s)\n"
+            f"  creados={stats.created} omitidos={stats.skipped} errores={stats.errors} "
+            f"descargado={stats.downloaded_bytes / 1024:.0f} KB\n"
+            f"  memoria pico (tracemalloc): {peak / (1024 * 1024):.1f} MB\n"
+            f"  etapas: {stages}"
+        )
+        self.assertEqual((stats.error, stats.errors, stats.fetched), ("", 0, total))
@@ -0,0 +1,353 @@
+"""
+Tests para el procesamiento de correo entrante (process_incoming_emails).
+"""
+import base64
+import hashlib
+import imaplib
+import io
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from email.message import EmailMessage
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from mi_app.management.commands import process_incoming_emails
+from mi_app.management.commands.process_incoming_emails import Command
+from mi_app.models import (
+    ATSClient,
+    ATSClientEmailConfig,
+    ATSForm,
+    ATSFormSubmission,
+    IMAPMailboxCheckpoint,
+    ProcessedIncomingEmail,
+    Subscription,
+)
+from mi_app.services.imap_fetch import (
+    MessagePart,
+    PartTooLarge,
+    decode_part,
+    decode_part_to,
+    idle_wait,
+    supports_idle,
+)
+from mi_app.tests.imap_harness import FakeIMAP, FakeIMAPServer, FakeMailboxState
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def _raw_email(subject, sender="ana@example.com", attachment=None, message_id=None):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    if message_id:
+        msg["Message-ID"] = message_id
+    msg["From"] = f"Ana <{sender}>"
+    msg["To"] = "empleos@test.com"
+    msg.set_content("Adjunto mi CV.")
+    if attachment:
+        name, content = attachment
+        msg.add_attachment(content, maintype="application", subtype="pdf", filename=name)
+    return msg.as_bytes()
+
+
+class IncomingEmailTestsMixin:
+    hosts = ["lento.example", "ok.example"]
+
+    def setUp(self):
+        self.configs = []
+        for idx, host in enumerate(self.hosts):
+            user = User.objects.create_user(username=f"c{idx}@test.com", email=f"c{idx}@test.com", password="x")
+            Subscription.objects.create(user=user)
+            ats_client = ATSClient.objects.create(user=user, company_name=f"Cliente {idx}", contact_name="C")
+            ATSForm.objects.create(client=ats_client, name=f"Form {idx}", is_active=True)
+            self.configs.append(ATSClientEmailConfig.objects.create(
+                client=ats_client,
+                incoming_subject_regex="Postulación",
+                imap_enabled=True,
+                imap_host=host,
+                imap_user=f"empleos@{host}",
+                imap_password_encrypted="secreto",
+            ))
+
+    def _run(self, workers=1, dry_run=False, allowed_ext=("pdf",), max_emails=10):
+        command = Command(stdout=io.StringIO())
+        command.workers = workers
+        with mock.patch("imaplib.IMAP4_SSL", FakeIMAP):
+            return command._run_cycle(max_emails=max_emails, dry_run=dry_run, allowed_ext=set(allowed_ext))
+
+
+class IncomingEmailConcurrencyTests(IncomingEmailTestsMixin, TestCase):
+    def test_failing_mailbox_does_not_stop_the_others(self):
+        FakeIMAP.servers = {
+            "lento.example": FakeMailboxState(login_error=socket.timeout("timed out")),
+            "ok.example": FakeMailboxState([_raw_email("Postulación backend")]),
+        }
+        results = self._run()
+
+        by_mailbox = {stats.mailbox: stats for stats in results}
+        self.assertIn("timed out", by_mailbox["empleos@lento.example (lento.example)"].error)
+        ok = by_mailbox["empleos@ok.example (ok.example)"]
+        self.assertEqual((ok.error, ok.created), ("", 1))
+        self.assertEqual(FakeIMAP.servers["ok.example"].seen, {1})
+        self.assertEqual(ATSFormSubmission.objects.get().submitter_email, "ana@example.com")
+
+
+class IncomingEmailParallelTests(IncomingEmailTestsMixin, TransactionTestCase):
+    # Los hilos del pool usan su propia conexión: los datos del setUp deben estar confirmados.
+    def test_mailboxes_run_in_parallel_with_timeouts(self):
+        # Cada buzón espera al otro en la búsqueda: solo termina si ambos corren a la vez.
+        barrier = threading.Barrier(2, timeout=5)
+        FakeIMAP.servers = {host: FakeMailboxState(wait=barrier.wait) for host in self.hosts}
+        with self.settings(ORBITA_IMAP_CONNECT_TIMEOUT_SECONDS=7):
+            results = self._run(workers=2, dry_run=True)
+
+        self.assertEqual([stats.error for stats in results], ["", ""])
+        self.assertEqual([FakeIMAP.servers[host].timeout for host in self.hosts], [7, 7])
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class IncomingEmailCheckpointTests(IncomingEmailTestsMixin, TestCase):
+    hosts = ["ok.example"]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_only_matching_mail_downloads_parts_and_checkpoint_skips_old_uids(self):
+        state = FakeMailboxState([
+            _raw_email("Oferta imperdible", attachment=("spam.pdf", b"%PDF spam" * 1000)),
+            _raw_email("Postulación backend", attachment=("cv.pdf", b"%PDF-1.4 cv")),
+        ])
+        FakeIMAP.servers = {"ok.example": state}
+
+        stats = self._run()[0]
+
+        self.assertEqual((stats.fetched, stats.skipped, stats.created), (2, 1, 1))
+        # Un fetch de encabezados por lote; texto (parcial) y adjunto solo para el que coincide.
+        self.assertEqual(len(state.fetches), 3)
+        self.assertIn(f"BODY.PEEK[1]<0.{process_incoming_emails.TEXT_FETCH_MAX_BYTES}>", state.fetches[1])
+        self.assertIn("BODY.PEEK[2]", state.fetches[2])
+        submission = ATSFormSubmission.objects.get()
+        self.assertEqual(submission.files.get().original_name, "cv.pdf")
+        checkpoint = IMAPMailboxCheckpoint.objects.get()
+        self.assertEqual((checkpoint.uidvalidity, checkpoint.last_uid), (1, 2))
+
+        # Un correo ya leído que llega después del checkpoint sí se procesa; los anteriores no.
+        state.seen.add(state.add(_raw_email("Postulación frontend", sender="luis@example.com")))
+        state.fetches.clear()
+        stats = self._run()[0]
+        self.assertEqual((stats.new, stats.created), (1, 1))
+        self.assertEqual(IMAPMailboxCheckpoint.objects.get().last_uid, 3)
+
+    def test_uidvalidity_change_rereads_from_unseen(self):
+        state = FakeMailboxState([_raw_email("Postulación backend")])
+        FakeIMAP.servers = {"ok.example": state}
+        self._run()
+
+        state.uidvalidity = 2
+        state.add(_raw_email("Postulación frontend", sender="luis@example.com"))
+        stats = self._run()[0]
+
+        self.assertEqual((stats.new, stats.created), (1, 1))
+        self.assertEqual(IMAPMailboxCheckpoint.objects.get().uidvalidity, 2)
+
+    @override_settings(ORBITA_IMAP_MESSAGE_MAX_ATTEMPTS=2)
+    def test_message_that_always_fails_is_skipped_after_max_attempts(self):
+        state = FakeMailboxState([
+            _raw_email("Postulación rota"),
+            _raw_email("Postulación frontend", sender="luis@example.com"),
+        ])
+        FakeIMAP.servers = {"ok.example": state}
+        original = Command._process_message
+
+        def process(command, mailbox, mailbox_conn, fetched, *args):
+            if fetched.uid == 1:
+                raise ValueError("correo ilegible")
+            return original(command, mailbox, mailbox_conn, fetched, *args)
+
+        with mock.patch.object(Command, "_process_message", autospec=True, side_effect=process) as processed:
+            first = self._run()[0]
+            self.assertEqual((first.errors, first.created), (1, 0))
+            self.assertEqual(IMAPMailboxCheckpoint.objects.get().failed_attempts, 1)
+
+            second = self._run()[0]
+            self.assertEqual((second.errors, second.created), (1, 1))
+            checkpoint = IMAPMailboxCheckpoint.objects.get()
+            self.assertEqual((checkpoint.last_uid, checkpoint.failed_uid), (2, None))
+
+            third = self._run()[0]
+        self.assertEqual((third.new, third.errors), (0, 0))
+        self.assertEqual([call.args[3].uid for call in processed.call_args_list], [1, 1, 2])
+        self.assertEqual(ATSFormSubmission.objects.get().submitter_email, "luis@example.com")
+
+    def test_first_read_drains_unseen_before_switching_to_uids(self):
+        state = FakeMailboxState([
+            _raw_email("Postulación antigua", sender="vieja@example.com"),
+            _raw_email("Postulación backend", sender="ana@example.com"),
+            _raw_email("Postulación frontend", sender="luis@example.com"),
+            _raw_email("Postulación datos", sender="eva@example.com"),
+        ])
+        # El correo 3 ya estaba leído antes del primer despliegue.
+        state.seen.add(3)
+        FakeIMAP.servers = {"ok.example": state}
+
+        first = self._run(max_emails=1)[0]
+        self.assertEqual((first.new, first.created), (3, 1))
+        checkpoint = IMAPMailboxCheckpoint.objects.get()
+        self.assertEqual((checkpoint.last_uid, checkpoint.bootstrapping), (1, True))
+
+        second = self._run(max_emails=1)[0]
+        third = self._run(max_emails=1)[0]
+        self.assertEqual([(s.new, s.created) for s in (second, third)], [(2, 1), (1, 1)])
+        checkpoint = IMAPMailboxCheckpoint.objects.get()
+        self.assertEqual((checkpoint.last_uid, checkpoint.bootstrapping), (4, False))
+
+        self.assertEqual(self._run(max_emails=1)[0].new, 0)
+        self.assertEqual(
+            sorted(ATSFormSubmission.objects.values_list("submitter_email", flat=True)),
+            ["ana@example.com", "eva@example.com", "vieja@example.com"],
+        )
+
+    def test_attachments_over_the_size_limit_are_skipped(self):
+        state = FakeMailboxState([
+            _raw_email("Postulación backend", attachment=("portafolio.pdf", b"%PDF" + b"x" * 6000)),
+            _raw_email("Postulación frontend", sender="luis@example.com", attachment=("cv.pdf", b"%PDF" + b"y" * 1000)),
+        ])
+        FakeIMAP.servers = {"ok.example": state}
+        # El primero ya se declara mayor en BODYSTRUCTURE: ni se descarga.
+        with self.settings(ORBITA_FORM_PUBLIC_MAX_FILE_SIZE=2000):
+            stats = self._run()[0]
+
+        self.assertEqual(stats.created, 2)
+        self.assertEqual(sum("BODY.PEEK[2]" in query for query in state.fetches), 1)
+        files = {s.submitter_email: [f.original_name for f in s.files.all()] for s in ATSFormSubmission.objects.all()}
+        self.assertEqual(files, {"ana@example.com": [], "luis@example.com": ["cv.pdf"]})
+
+
+class PartDecodingTests(TestCase):
+    def test_base64_is_decoded_in_chunks_with_hash_and_cap(self):
+        data = bytes(range(256)) * 50
+        raw = base64.encodebytes(data)
+        part = MessagePart(section="2", content_type="application/pdf", encoding="base64", size=len(raw))
+        out = io.BytesIO()
+        with mock.patch("mi_app.services.imap_fetch.DECODE_CHUNK_SIZE", 1000):
+            sha256, size = decode_part_to(part, raw, out)
+        self.assertEqual((out.getvalue(), size, sha256), (data, len(data), hashlib.sha256(data).hexdigest()))
+
+        with self.assertRaises(PartTooLarge):
+            decode_part_to(part, raw, io.BytesIO(), max_bytes=len(data) - 1)
+
+    def test_truncated_base64_and_quoted_printable(self):
+        part = MessagePart(section="1", content_type="text/plain", encoding="base64")
+        self.assertEqual(decode_part(part, base64.b64encode(b"hola mundo")[:-3]), b"hola mund")
+        qp = MessagePart(section="1", content_type="text/plain", encoding="quoted-printable")
+        self.assertEqual(decode_part(qp, b"Postulaci=C3=B3n =\r\nbackend"), "Postulación backend".encode())
+
+
+class IncomingEmailLedgerTests(IncomingEmailTestsMixin, TestCase):
+    hosts = ["ok.example"]
+
+    def test_crash_before_seen_is_not_ingested_twice(self):
+        state = FakeMailboxState([_raw_email("Postulación backend", message_id="<a1@example.com>")])
+        FakeIMAP.servers = {"ok.example": state}
+        # El worker cae después de guardar el envío y antes de marcar el correo como leído.
+        with mock.patch.object(process_incoming_emails, "notify_orbita_client", side_effect=RuntimeError("caída")):
+            stats = self._run()[0]
+        self.assertEqual((stats.errors, state.seen), (1, set()))
+
+        stats = self._run()[0]
+
+        self.assertEqual((stats.created, stats.skipped), (0, 1))
+        self.assertEqual(state.seen, {1})
+        self.assertEqual(ATSFormSubmission.objects.count(), 1)
+        entry = ProcessedIncomingEmail.objects.get()
+        self.assertEqual((entry.message_key, entry.outcome), ("<a1@example.com>", ProcessedIncomingEmail.OUTCOME_CREATED))
+
+    def test_replay_processes_only_what_the_ledger_does_not_have(self):
+        state = FakeMailboxState([
+            _raw_email("Postulación backend", message_id="<a1@example.com>"),
+            _raw_email("Solicitud de empleo", sender="luis@example.com"),
+        ])
+        FakeIMAP.servers = {"ok.example": state}
+        self._run()
+        self.assertEqual(ATSFormSubmission.objects.count(), 1)
+
+        # Se corrige la regex: el replay recupera el correo omitido y no repite el otro.
+        config = self.configs[0]
+        config.incoming_subject_regex = "Postulación|Solicitud"
+        config.save()
+        out = io.StringIO()
+        with mock.patch("imaplib.IMAP4_SSL", FakeIMAP):
+            call_command("replay_incoming_emails", "--since", "2026-01-01", stdout=out)
+
+        self.assertIn("creados=1 omitidos=1", out.getvalue())
+        self.assertEqual(
+            sorted(ATSFormSubmission.objects.values_list("submitter_email", flat=True)),
+            ["ana@example.com", "luis@example.com"],
+        )
+        self.assertEqual(ProcessedIncomingEmail.objects.count(), 2)
+        self.assertEqual(IMAPMailboxCheckpoint.objects.get().last_uid, 2)
+
+
+class IncomingEmailIdleTests(IncomingEmailTestsMixin, TestCase):
+    hosts = ["ok.example"]
+
+    def test_watcher_reconnects_and_polls_servers_without_idle(self):
+        stop = threading.Event()
+        # Primer login falla; tras reconectar se procesa el correo y se pide detener el hilo.
+        state = FakeMailboxState([_raw_email("Postulación backend")], failed_logins=1, wait=stop.set)
+        FakeIMAP.servers = {"ok.example": state}
+        command = Command(stdout=io.StringIO())
+        command._idle_configs = command._resolve_mailboxes(command._load_configs())
+        (conn,) = command._idle_configs
+
+        with mock.patch("imaplib.IMAP4_SSL", FakeIMAP), mock.patch.object(
+            process_incoming_emails, "RECONNECT_MIN_SECONDS", 0.01
+        ):
+            command._watch_mailbox(conn, stop, 10, False, {"pdf"}, 60)
+
+        self.assertEqual(state.logins, 2)
+        self.assertEqual(ATSFormSubmission.objects.count(), 1)
+        self.assertEqual(IMAPMailboxCheckpoint.objects.get().last_uid, 1)
+
+
+class IdleWaitTests(TestCase):
+    def _connect(self, server):
+        server.start()
+        self.addCleanup(server.stop)
+        mailbox = imaplib.IMAP4(server.host, server.port, timeout=5)
+        self.addCleanup(mailbox.logout)
+        mailbox.login("empleos", "secreto")
+        mailbox.select("INBOX")
+        return mailbox
+
+    def test_idle_returns_as_soon_as_the_server_announces_mail(self):
+        server = FakeIMAPServer()
+        mailbox = self._connect(server)
+        self.assertTrue(supports_idle(mailbox))
+        threading.Timer(0.2, server.add, args=[_raw_email("Postulación backend")]).start()
+
+        started = time.monotonic()
+        self.assertTrue(idle_wait(mailbox, timeout=10))
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_idle_renews_after_timeout_without_mail(self):
+        mailbox = self._connect(FakeIMAPServer())
+        self.assertFalse(idle_wait(mailbox, timeout=0.3, tick=0.1))
+        # La conexión sigue usable después del DONE.
+        self.assertFalse(idle_wait(mailbox, timeout=0.1, tick=0.05))
+        self.assertEqual(mailbox.noop()[0], "OK")
@@ -0,0 +1,155 @@
+"""
+Tests para el stream en vivo (eventos, Last-Event-ID) y el polling condicional de sesiones de chat.
+"""
+import json
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from mi_app.models import ATSClient, ATSForm, ATSNotification, FormChatSession, OrbitaEvent, Subscription
+from mi_app.orbita_notifications import notify_orbita_client
+from mi_app.services.live_events import EVENTS_OVERLAP_SECONDS, stream_events
+
+User = get_user_model()
+
+
+async def _collect(client_id, last_event_id, count):
+    chunks = []
+    stream = stream_events(client_id, last_event_id)
+    try:
+        async for chunk in stream:
+            chunks.append(chunk)
+            if len(chunks) >= count:
+                break
+    finally:
+        await stream.aclose()
+    return chunks
+
+
+@override_settings(ORBITA_SSE_ENABLED=True, ORBITA_SSE_POLL_SECONDS=1, ORBITA_SSE_HEARTBEAT_SECONDS=1)
+class LiveEventsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="l@test.com", email="l@test.com", password="x")
+        self.ats_client = ATSClient.objects.create(user=self.user, company_name="Test", contact_name="C")
+        Subscription.objects.create(user=self.user)
+        self.ats_form = ATSForm.objects.create(client=self.ats_client, name="Chat", is_active=True, request_email=True)
+
+    def test_notification_and_chat_progress_publish_events(self):
+        notify_orbita_client(self.ats_client, ATSNotification.TYPE_PLAN, "Plan actualizado")
+        start = Client().post(reverse("orbita_form_chat_start", args=[self.ats_form.uuid]))
+        session_uuid = start.json()["session_uuid"]
+        Client().post(
+            reverse("orbita_form_chat_answer", args=[self.ats_form.uuid]),
+            data=json.dumps({"session_uuid": session_uuid, "step_id": "submitter_email", "value": "a@b.com"}),
+            content_type="application/json",
+        )
+
+        events = list(OrbitaEvent.objects.filter(client=self.ats_client).order_by("id"))
+        self.assertEqual(events[0].kind, OrbitaEvent.KIND_NOTIFICATION)
+        self.assertEqual(events[0].payload["unread_count"], 1)
+        progress = [e.payload for e in events if e.kind == OrbitaEvent.KIND_CHAT_SESSION]
+        self.assertEqual(progress[-1]["session_uuid"], session_uuid)
+        self.assertEqual(progress[-1]["status"], FormChatSession.STATUS_COMPLETED)
+
+    @mock.patch("mi_app.services.live_events.close_old_connections")
+    def test_stream_resumes_after_last_event_id(self, _close):
+        notify_orbita_client(self.ats_client, ATSNotification.TYPE_PLAN, "Uno")
+        notify_orbita_client(self.ats_client, ATSNotification.TYPE_PLAN, "Dos")
+        # Fuera de la ventana de solape: solo cuenta el Last-Event-ID.
+        OrbitaEvent.objects.update(created_at=timezone.now() - timedelta(seconds=EVENTS_OVERLAP_SECONDS + 5))
+        first_id = OrbitaEvent.objects.order_by("id").first().pk
+
+        chunks = async_to_sync(_collect)(self.ats_client.pk, first_id, 3)
+
+        self.assertTrue(chunks[0].startswith("retry:"))
+        self.assertIn(f"id: {first_id + 1}\nevent: notification\n", chunks[1])
+        self.assertIn('"title": "Dos"', chunks[1])
+        self.assertEqual(chunks[2], ": ping\n\n")
+
+    @mock.patch("mi_app.services.live_events.close_old_connections")
+    def test_stream_rereads_recent_events_committed_out_of_order(self, _close):
+        notify_orbita_client(self.ats_client, ATSNotification.TYPE_PLAN, "Tardío")
+        notify_orbita_client(self.ats_client, ATSNotification.TYPE_PLAN, "Rápido")
+        late_id, last_id = OrbitaEvent.objects.order_by("id").values_list("id", flat=True)
+
+        # El navegador ya vio el id mayor; el menor se confirmó después y sigue en la ventana.
+        chunks = async_to_sync(_collect)(self.ats_client.pk, last_id, 3)
+
+        self.assertIn(f"id: {late_id}\n", chunks[1])
+        self.assertIn(f"id: {last_id}\n", chunks[2])
+
+    def test_internal_session_saves_do_not_publish(self):
+        session = FormChatSession.objects.create(form=self.ats_form, total_steps=2)
+        created = OrbitaEvent.objects.count()
+
+        session.save(update_fields=["submission"])
+        self.assertEqual(OrbitaEvent.objects.count(), created)
+
+        session.status = FormChatSession.STATUS_IN_PROGRESS
+        session.save(update_fields=["status"])
+        self.assertEqual(OrbitaEvent.objects.count(), created + 1)
+
+    @override_settings(ORBITA_SSE_ENABLED=False)
+    def test_disabled_stream_records_no_events(self):
+        notify_orbita_client(self.ats_client, ATSNotification.TYPE_PLAN, "Plan actualizado")
+        FormChatSession.objects.create(form=self.ats_form, total_steps=2)
+
+        self.assertFalse(OrbitaEvent.objects.exists())
+
+    def test_stream_under_wsgi_falls_back_to_polling(self):
+        client = Client()
+        client.force_login(self.user)
+
+        response = client.get(reverse("orbita_event_stream"))
+
+        self.assertEqual(response.status_code, 204)
+
+
+class ChatSessionPollingTests(TestCase):
+    """ETag/304 y modo delta (`since`) en las APIs de polling del reclutador."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="p@test.com", email="p@test.com", password="x")
+        self.ats_client = ATSClient.objects.create(user=self.user, company_name="Test", contact_name="C")
+        Subscription.objects.create(user=self.user)
+        self.ats_form = ATSForm.objects.create(client=self.ats_client, name="Chat", is_active=True)
+        self.first = FormChatSession.objects.create(form=self.ats_form, total_steps=2)
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.list_url = reverse("orbita_form_chat_sessions_list_api", args=[self.ats_form.pk])
+
+    def test_unchanged_list_returns_304(self):
+        response = self.client.get(self.list_url)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(5):
+            # sesión + usuario, formulario con suscripción, cliente del usuario y el agregado.
+            cached = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        FormChatSession.objects.create(form=self.ats_form, total_steps=2)
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_since_returns_only_changed_sessions(self):
+        cursor = self.client.get(self.list_url).json()["cursor"]
+        second = FormChatSession.objects.create(form=self.ats_form, total_steps=2)
+
+        data = self.client.get(self.list_url, {"since": cursor}).json()
+
+        self.assertTrue(data["delta"])
+        self.assertEqual(data["total"], 2)
+        self.assertEqual([s["session_uuid"] for s in data["sessions"]], [str(second.session_uuid)])
+
+    def test_detail_etag_changes_with_progress(self):
+        url = reverse("orbita_form_chat_session_detail", args=[self.ats_form.pk, self.first.session_uuid])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.first.answers = {"field_1": "Ana"}
+        self.first.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
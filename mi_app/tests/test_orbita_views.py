@@ -4,6 +4,9 @@ Tests para vistas ATS: acceso, permisos, flujos cliente y admin.
 import json
 from decimal import Decimal
 
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
@@ -13,6 +16,8 @@ from mi_app.models import (
     ATSForm,
     ATSFormField,
     ATSFormSubmission,
+    ATSNotification,
+    ATSNotificationCounter,
     Candidate,
     FormChatSession,
     SkillEvaluation,
@@ -24,6 +29,15 @@ from mi_app.models import (
     WorkforcePlan,
     WorkforcePosition,
 )
+from mi_app.orbita_notifications import (
+    get_notification_context,
+    get_unread_count,
+    mark_all_notifications_read,
+    mark_notification_read,
+    notify_orbita_client,
+    prune_notifications,
+)
+from mi_app.services.form_submissions import create_submission_once
 from mi_app.views.orbita.forms import ATSVacancyForm
 
 User = get_user_model()
@@ -117,6 +131,21 @@ class ATSFormPublicTests(TestCase):
         self.assertContains(second, "Respuesta ya registrada")
         self.assertEqual(ATSFormSubmission.objects.filter(form=self.ats_form).count(), 1)
 
+    def test_submission_email_is_unique_per_form_at_database_level(self):
+        ATSFormSubmission.objects.create(form=self.ats_form, payload={}, submitter_email="Dup@Example.com")
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ATSFormSubmission.objects.create(form=self.ats_form, payload={}, submitter_email=" dup@example.com")
+        submission, duplicate = create_submission_once(self.ats_form, {}, "DUP@example.com")
+
+        self.assertIsNone(submission)
+        self.assertTrue(duplicate)
+        ATSFormSubmission.objects.create(form=self.ats_form, payload={}, submitter_email="")
+        ATSFormSubmission.objects.create(form=self.ats_form, payload={}, submitter_email="")
+        self.assertEqual(
+            ATSFormSubmission.objects.filter(form=self.ats_form, normalized_email__isnull=True).count(), 2
+        )
+
     def test_form_chat_accepts_only_one_submission_per_email(self):
         ATSFormSubmission.objects.create(
             form=self.ats_form,
@@ -159,6 +188,59 @@ class ATSNotificationPanelTests(TestCase):
         self.assertTrue(len(response.redirect_chain) > 0 or not response.context.get("notifications") is None)
 
 
+class ATSNotificationCounterTests(TestCase):
+    """Contador de no leídas y retención por lotes de notificaciones."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="n@test.com", email="n@test.com", password="x")
+        self.ats_client = ATSClient.objects.create(user=self.user, company_name="Test", contact_name="C")
+
+    def test_unread_counter_follows_inserts_and_reads(self):
+        first = notify_orbita_client(self.ats_client, ATSNotification.TYPE_PLAN, "Uno")
+        notify_orbita_client(self.ats_client, ATSNotification.TYPE_PLAN, "Dos")
+        self.assertEqual(get_unread_count(self.ats_client), 2)
+
+        mark_notification_read(first)
+        mark_notification_read(first)
+        self.assertEqual(get_unread_count(self.ats_client), 1)
+
+        mark_all_notifications_read(self.ats_client)
+        self.assertEqual(get_unread_count(self.ats_client), 0)
+
+    def test_prune_keeps_newest_per_client(self):
+        for i in range(5):
+            notify_orbita_client(self.ats_client, ATSNotification.TYPE_PLAN, f"Aviso {i}")
+
+        deleted = prune_notifications(keep=3, batch_size=1)
+
+        self.assertEqual(deleted, 2)
+        titles = list(ATSNotification.objects.filter(client=self.ats_client).order_by("pk").values_list("title", flat=True))
+        self.assertEqual(titles, ["Aviso 2", "Aviso 3", "Aviso 4"])
+        self.assertEqual(get_unread_count(self.ats_client), 3)
+
+    def test_bell_context_is_cached_until_version_bump(self):
+        first = notify_orbita_client(self.ats_client, ATSNotification.TYPE_PLAN, "Uno")
+        self.assertEqual(get_notification_context(self.ats_client)["unread_count"], 1)
+
+        # Solo se lee la fila del contador (no leídas + versión).
+        with self.assertNumQueries(1):
+            cached = get_notification_context(self.ats_client)
+        self.assertEqual([n.title for n in cached["notifications"]], ["Uno"])
+
+        mark_notification_read(first)
+        self.assertEqual(get_notification_context(self.ats_client)["unread_count"], 0)
+
+    def test_bell_sees_changes_made_by_other_processes(self):
+        get_notification_context(self.ats_client)
+        # Un worker (otro proceso, otra caché local) crea la notificación: la versión está en BD.
+        ATSNotification.objects.create(client=self.ats_client, type=ATSNotification.TYPE_PLAN, title="Desde worker")
+        ATSNotificationCounter.objects.filter(client=self.ats_client).update(version=F("version") + 1)
+
+        context = get_notification_context(self.ats_client)
+        self.assertEqual([n.title for n in context["notifications"]], ["Desde worker"])
+
+
 class ATSVacancyFormTests(TestCase):
     """Validaciones de vacantes visibles para usuarios en español."""
 
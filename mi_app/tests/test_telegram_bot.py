@@ -0,0 +1,89 @@
+"""
+Tests para la descarga de documentos del bot de Telegram (validación previa y streaming).
+"""
+import hashlib
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from mi_app.models import StoredBlob
+from mi_app.telegram_bot import _download_and_store_file
+
+MEDIA_ROOT = tempfile.mkdtemp()
+FILE_URL = "https://api.telegram.org/file/bot123:abc/documents/cv.pdf"
+
+
+async def _run_in_test_thread(fn, *args, **kwargs):
+    return await sync_to_async(fn)(*args, **kwargs)
+
+
+def _update(file_name, file_size):
+    document = SimpleNamespace(file_id="f1", file_name=file_name, file_size=file_size)
+    return SimpleNamespace(message=SimpleNamespace(document=document))
+
+
+def _context():
+    bot = mock.Mock()
+    bot.get_file = mock.AsyncMock(return_value=SimpleNamespace(file_path=FILE_URL))
+    return SimpleNamespace(bot=bot)
+
+
+def _serving(content):
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=content))
+    real_client = httpx.AsyncClient
+    return mock.patch("mi_app.telegram_bot.httpx.AsyncClient", lambda **kw: real_client(transport=transport, **kw))
+
+
+@mock.patch("mi_app.services.telegram_repository.run_db", _run_in_test_thread)
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    ORBITA_FORM_PUBLIC_MAX_FILE_SIZE=1024 * 1024,
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class TelegramDownloadTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_declared_size_and_extension_are_checked_before_download(self):
+        context = _context()
+
+        _name, blob, error = async_to_sync(_download_and_store_file)(_update("cv.pdf", 5 * 1024 * 1024), context)
+        self.assertIsNone(blob)
+        self.assertIn("supera", error)
+
+        _name, blob, error = async_to_sync(_download_and_store_file)(_update("cv.exe", 100), context)
+        self.assertIsNone(blob)
+        self.assertIn("Solo se permiten", error)
+        context.bot.get_file.assert_not_called()
+
+    def test_document_is_streamed_into_blob_store(self):
+        content = b"%PDF-" + b"x" * (3 * 1024 * 1024 // 2)
+
+        with override_settings(ORBITA_FORM_PUBLIC_MAX_FILE_SIZE=2 * 1024 * 1024), _serving(content):
+            name, blob, error = async_to_sync(_download_and_store_file)(_update("cv.pdf", len(content)), _context())
+
+        self.assertIsNone(error)
+        self.assertEqual(name, "cv.pdf")
+        self.assertEqual(blob.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(blob.size, len(content))
+        with default_storage.open(blob.storage_name, "rb") as fh:
+            self.assertEqual(fh.read(), content)
+
+    def test_download_larger_than_declared_is_aborted(self):
+        with _serving(b"x" * (1024 * 1024 + 1)):
+            _name, blob, error = async_to_sync(_download_and_store_file)(_update("cv.pdf", 10), _context())
+
+        self.assertIsNone(blob)
+        self.assertIn("supera", error)
+        self.assertFalse(StoredBlob.objects.exists())
@@ -0,0 +1,92 @@
+"""
+Tests para el acceso a datos del bot de Telegram: caché de formularios y escritura diferida.
+"""
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from mi_app.models import ATSClient, ATSForm, ATSFormField, FormChatAnswer, FormChatSession, Subscription
+from mi_app.services import telegram_repository as repository
+
+User = get_user_model()
+
+
+async def _run_in_test_thread(fn, *args, **kwargs):
+    # El pool del bot usa otras conexiones, que no ven la transacción del test.
+    return await sync_to_async(fn)(*args, **kwargs)
+
+
+@mock.patch("mi_app.services.telegram_repository.run_db", _run_in_test_thread)
+class TelegramRepositoryTests(TestCase):
+    def setUp(self):
+        repository.clear_form_cache()
+        self.user = User.objects.create_user(username="t@test.com", email="t@test.com", password="x")
+        self.ats_client = ATSClient.objects.create(user=self.user, company_name="Test", contact_name="C")
+        Subscription.objects.create(user=self.user)
+        self.ats_form = ATSForm.objects.create(client=self.ats_client, name="Chat", is_active=True, request_email=False)
+        ATSFormField.objects.create(form=self.ats_form, label="Nombre completo", order=1)
+        ATSFormField.objects.create(form=self.ats_form, label="Ciudad", order=2)
+
+    def test_form_and_steps_are_cached_per_version(self):
+        form, steps = async_to_sync(repository.get_form)(self.ats_form.uuid)
+        self.assertEqual([s["label"] for s in steps], ["Nombre completo", "Ciudad"])
+
+        with self.assertNumQueries(0):
+            async_to_sync(repository.get_form)(self.ats_form.uuid)
+
+        with override_settings(ORBITA_TELEGRAM_FORM_CACHE_SECONDS=0):
+            with self.assertNumQueries(1):
+                _form, same_steps = async_to_sync(repository.get_form)(self.ats_form.uuid)
+            self.assertIs(same_steps, steps)
+
+            ATSFormField.objects.create(form=self.ats_form, label="Teléfono", order=3)
+            _form, new_steps = async_to_sync(repository.get_form)(self.ats_form.uuid)
+            self.assertEqual(len(new_steps), 3)
+
+            ATSForm.objects.filter(pk=self.ats_form.pk).update(is_active=False)
+            self.assertEqual(async_to_sync(repository.get_form)(self.ats_form.uuid), (None, None))
+
+    def test_answers_are_written_behind_in_order(self):
+        form, steps = async_to_sync(repository.get_form)(self.ats_form.uuid)
+        state = async_to_sync(repository.create_session)(form, steps, 42, "Ana")
+
+        async def _answer_all():
+            repository.queue_answer(state, steps[0]["id"], "Ana López", candidate_name="Ana López")
+            repository.queue_answer(state, steps[1]["id"], "Lima")
+            return await repository.flush(state)
+
+        self.assertTrue(async_to_sync(_answer_all)())
+
+        self.assertTrue(state["completed"])
+        self.assertEqual(state["unsaved"], [])
+        session = FormChatSession.objects.get(pk=state["id"])
+        self.assertEqual(session.status, FormChatSession.STATUS_COMPLETED)
+        self.assertEqual(session.candidate_name, "Ana López")
+        self.assertEqual(
+            list(FormChatAnswer.objects.filter(session=session).order_by("id").values_list("value", flat=True)),
+            ["Ana López", "Lima"],
+        )
+
+    def test_failed_write_is_kept_and_retried(self):
+        form, steps = async_to_sync(repository.get_form)(self.ats_form.uuid)
+        state = async_to_sync(repository.create_session)(form, steps, 42, "Ana")
+        real_record = repository._record
+        calls = []
+
+        def _flaky_record(state, write):
+            calls.append(write["step_id"])
+            if len(calls) == 1:
+                raise RuntimeError("BD caída")
+            return real_record(state, write)
+
+        async def _answer():
+            repository.queue_answer(state, steps[0]["id"], "Ana")
+            return await repository.flush(state)
+
+        with mock.patch("mi_app.services.telegram_repository._record", _flaky_record):
+            self.assertTrue(async_to_sync(_answer)())
+
+        self.assertEqual(calls, [steps[0]["id"], steps[0]["id"]])
+        self.assertEqual(FormChatAnswer.objects.filter(session_id=state["id"]).count(), 1)
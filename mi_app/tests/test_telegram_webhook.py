@@ -0,0 +1,85 @@
+"""
+Tests para el modo webhook del bot: cola de updates por partición y persistencia en BD.
+"""
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from mi_app.models import TelegramBotState, TelegramUpdate
+from mi_app.services.telegram_persistence import DjangoPersistence
+from mi_app.services.telegram_updates import claim_updates, mark_done, release_claims
+
+
+def _message(update_id, chat_id, text="hola"):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Ana"},
+            "text": text,
+        },
+    }
+
+
+@override_settings(TELEGRAM_WEBHOOK_SECRET="s3creto")
+class TelegramWebhookQueueTests(TestCase):
+    def setUp(self):
+        self.url = reverse("orbita_telegram_webhook")
+
+    def _post(self, payload, secret="s3creto"):
+        return Client().post(
+            self.url, data=payload, content_type="application/json", HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN=secret
+        )
+
+    def test_webhook_requires_secret_and_ignores_retries(self):
+        self.assertEqual(self._post(_message(1, 10), secret="otro").status_code, 403)
+
+        self.assertEqual(self._post(_message(1, 10)).status_code, 200)
+        self.assertEqual(self._post(_message(1, 10)).status_code, 200)
+
+        update = TelegramUpdate.objects.get()
+        self.assertEqual((update.update_id, update.partition_key), (1, 10))
+
+    def test_replicas_only_claim_their_chats_in_order(self):
+        for update_id, chat_id in [(1, 10), (2, 11), (3, 10), (4, -13)]:
+            self._post(_message(update_id, chat_id))
+
+        even = claim_updates(replica=0, replicas=2)
+        odd = claim_updates(replica=1, replicas=2)
+
+        self.assertEqual([p["update_id"] for _pk, p in even], [1, 3])
+        self.assertEqual([p["update_id"] for _pk, p in odd], [2, 4])
+        # Reservados: otra pasada no los repite.
+        self.assertEqual(claim_updates(replica=0, replicas=2), [])
+
+        mark_done([pk for pk, _p in even])
+        self.assertEqual(release_claims(replica=1, replicas=2), 2)
+        self.assertEqual([p["update_id"] for _pk, p in claim_updates(replica=1, replicas=2)], [2, 4])
+
+
+async def _run_in_test_thread(fn, *args, **kwargs):
+    return await sync_to_async(fn)(*args, **kwargs)
+
+
+@mock.patch("mi_app.services.telegram_persistence.run_db", _run_in_test_thread)
+class TelegramPersistenceTests(TestCase):
+    def test_user_data_and_conversations_round_trip_per_partition(self):
+        writer = DjangoPersistence()
+        async_to_sync(writer.update_user_data)(10, {"session": {"id": 5, "unsaved": []}, "current_step": 2})
+        async_to_sync(writer.update_user_data)(11, {"current_step": 1})
+        async_to_sync(writer.update_conversation)("postulacion", (10, 10), 1)
+        async_to_sync(writer.update_conversation)("postulacion", (11, 11), 1)
+
+        replica = DjangoPersistence(replica=0, replicas=2)
+        self.assertEqual(
+            async_to_sync(replica.get_user_data)(), {10: {"session": {"id": 5, "unsaved": []}, "current_step": 2}}
+        )
+        self.assertEqual(async_to_sync(replica.get_conversations)("postulacion"), {(10, 10): 1})
+
+        async_to_sync(writer.update_conversation)("postulacion", (10, 10), None)
+        async_to_sync(writer.update_user_data)(10, {})
+        self.assertFalse(TelegramBotState.objects.filter(partition_key=10).exists())
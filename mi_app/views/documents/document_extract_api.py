@@ -1,10 +1,15 @@
 """
 API para extracción de información de documentos (INE, Comprobante de domicilio).
 Recibe PDF o imagen, convierte a base64 y usa OpenAI Vision para devolver JSON.
+Para muchos archivos: lote asíncrono (extract/batch/) y consulta del resultado (jobs/<id>/).
 """
 from __future__ import annotations
 
 import logging
+import os
+
+from django.conf import settings
+from django.urls import reverse
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -12,12 +17,16 @@ from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.throttling import ScopedRateThrottle
 from mi_app.authentication import DocumentsAPIKeyAuthentication, IsAPIKeyAuthenticated
+from mi_app.models import DocumentExtractionJob
 from mi_app.services.document_extraction import (
     extract_document_info,
+    ALLOWED_EXT,
     DOC_TYPE_INE,
     DOC_TYPE_COMPROBANTE,
     DOC_TYPES,
+    MAX_FILE_SIZE,
 )
+from mi_app.services.document_jobs import create_job, job_status
 
 logger = logging.getLogger(__name__)
 
@@ -84,3 +93,81 @@ class DocumentExtractAPIView(APIView):
             return Response(result, status=status.HTTP_200_OK)
         logger.warning("documents_extract failed file=%s doc_type=%s error=%s", filename, doc_type, result.get("error", ""))
         return Response(result, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DocumentExtractBatchAPIView(APIView):
+    """
+    POST /api/documents/extract/batch/
+    Misma autenticación que /api/documents/extract/.
+    - files: varios archivos (PDF o imagen) en multipart/form-data
+    - document_type: un valor para todos, o uno por archivo en el mismo orden
+
+    Respuesta 202: {"ok": true, "job_id": "...", "status_url": "...", ...estado del lote}
+    Los documentos ya extraídos antes (mismo archivo y tipo) vienen listos desde la caché.
+    """
+    authentication_classes = [DocumentsAPIKeyAuthentication]
+    permission_classes = [IsAPIKeyAuthenticated]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "documents_batch"
+    parser_classes = [MultiPartParser, FormParser]
+
+    def _error(self, message):
+        return Response({"ok": False, "error": message}, status=status.HTTP_400_BAD_REQUEST)
+
+    def post(self, request, *args, **kwargs):
+        files = request.FILES.getlist("files")
+        doc_types = [(t or "").strip().lower() for t in request.data.getlist("document_type")]
+        max_files = int(getattr(settings, "ORBITA_DOCUMENTS_BATCH_MAX_FILES", 20))
+        logger.info("documents_batch POST files=%d", len(files))
+
+        if not files:
+            return self._error("Faltan archivos. Envía uno o más 'files' en multipart/form-data.")
+        if len(files) > max_files:
+            return self._error(f"Demasiados archivos. Máximo {max_files} por lote.")
+        if len(doc_types) == 1:
+            doc_types = doc_types * len(files)
+        if len(doc_types) != len(files) or any(t not in DOC_TYPES for t in doc_types):
+            return self._error(
+                f"document_type inválido. Envía uno ({DOC_TYPE_INE} o {DOC_TYPE_COMPROBANTE}) o uno por archivo."
+            )
+
+        documents = []
+        for index, (uploaded, doc_type) in enumerate(zip(files, doc_types)):
+            filename = getattr(uploaded, "name", "") or "document"
+            content_type = getattr(uploaded, "content_type", "") or ""
+            ext = os.path.splitext(filename)[1].lower()
+            if ext not in ALLOWED_EXT and not content_type.startswith("image/") and content_type != "application/pdf":
+                return self._error(f"Archivo {index} ({filename}): use imagen (JPG, PNG, GIF, WEBP) o PDF.")
+            if uploaded.size > MAX_FILE_SIZE:
+                return self._error(
+                    f"Archivo {index} ({filename}) demasiado grande. Máximo {MAX_FILE_SIZE // (1024 * 1024)} MB."
+                )
+            try:
+                content = uploaded.read()
+            except Exception as e:
+                logger.warning("documents_batch read file failed: %s", e)
+                return self._error(f"No se pudo leer el archivo {index} ({filename}).")
+            documents.append((content, filename, content_type, doc_type))
+
+        job = create_job(documents)
+        payload = job_status(job)
+        payload["status_url"] = request.build_absolute_uri(reverse("api_documents_job", args=[job.public_id]))
+        return Response(payload, status=status.HTTP_202_ACCEPTED)
+
+
+class DocumentExtractJobAPIView(APIView):
+    """
+    GET /api/documents/jobs/<job_id>/
+    Estado del lote: "processing" mientras quede algún documento pendiente, "done" al
+    terminar. Cada documento trae "data" (ok) o "error" (fallido).
+    """
+    authentication_classes = [DocumentsAPIKeyAuthentication]
+    permission_classes = [IsAPIKeyAuthenticated]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "documents_status"
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = DocumentExtractionJob.objects.filter(public_id=job_id).first()
+        if job is None:
+            return Response({"ok": False, "error": "Lote no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(job_status(job), status=status.HTTP_200_OK)
@@ -1,12 +1,13 @@
 import logging
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.renderers import TemplateHTMLRenderer
 from rest_framework import status
 
+from mi_app.services.email_outbox import enqueue_email
+
 logger = logging.getLogger(__name__)
 
 CONTACT_EMAIL_TEMPLATE_HTML = "email/contact_form.html"
@@ -75,19 +76,18 @@ class LandingPage(APIView):
                 {"name": name, "company": company, "email": email, "subject": subject, "message": message},
             )
 
-            msg = EmailMultiAlternatives(
+            enqueue_email(
                 subject=f"[Contacto Star Path] {subject}",
                 body=plain_body,
-                from_email=settings.DEFAULT_FROM_EMAIL,
                 to=to_list,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                html_body=html_body,
                 reply_to=[email],
             )
-            msg.attach_alternative(html_body, "text/html")
-            msg.send(fail_silently=False)
 
-            logger.info("landing_contact_post correo enviado ok to=%s", to_list)
+            logger.info("landing_contact_post correo en cola to=%s", to_list)
             return Response({"ok": True}, status=200)
 
         except Exception as e:
-            logger.exception("landing_contact_post error enviando correo (SMTP): %s", e)
+            logger.exception("landing_contact_post error encolando correo: %s", e)
             return Response({"ok": False, "error": str(e)}, status=500)
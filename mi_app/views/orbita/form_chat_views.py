@@ -5,15 +5,19 @@ Vistas para el chat conversacional de Órbita.
 - FormChatSessionsView: vista para el reclutador (historial de sesiones en tiempo real).
 - FormChatSessionDetailAPI: endpoint AJAX para polling del progreso de una sesión.
 """
+import hashlib
 import json
 import logging
 import uuid as _uuid
 from django.conf import settings
 from django.core.cache import cache
-from django.http import HttpResponseForbidden, JsonResponse
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import HttpResponseForbidden, HttpResponseNotModified, JsonResponse
 from django.shortcuts import get_object_or_404, render, redirect
-from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
 
@@ -21,17 +25,23 @@ from mi_app.models import (
     ATSForm,
     ATSFormField,
     ATSFormSubmission,
-    ATSFormSubmissionFile,
-    ATSNotification,
     FormChatSession,
+    FormChatSessionArchive,
 )
-from mi_app.orbita_notifications import notify_orbita_client
 from mi_app.orbita_plans import subscription_module_enabled
+from mi_app.services.blob_store import store_file
+from mi_app.services.chat_answers import (
+    mark_completed,
+    record_answer,
+    session_answers,
+)
 from mi_app.services.form_submissions import (
-    create_submission_once,
     has_existing_submission_for_email,
     normalize_submitter_email,
 )
+from mi_app.services.chat_finalization import commit_submission
+from mi_app.services.chunked_uploads import claim_upload, get_chunk_size, get_completed_upload
+from mi_app.services.live_events import publish_session_progress
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +51,55 @@ def _form_module_enabled(orbita_form):
     return subscription_module_enabled(subscription, "forms")
 
 
+def _recruiter_form_or_error(request, pk):
+    """
+    Formulario del reclutador con cliente y suscripción en una sola consulta.
+    Retorna (form, None) o (None, JsonResponse de error).
+    """
+    orbita_form = get_object_or_404(ATSForm.objects.select_related("client__user__ats_subscription"), pk=pk)
+    if not _form_module_enabled(orbita_form):
+        return None, JsonResponse({"ok": False}, status=403)
+    orbita_client = getattr(request.user, "ats_client", None)
+    if not request.user.is_staff and (not orbita_client or orbita_form.client_id != orbita_client.pk):
+        return None, JsonResponse({"ok": False}, status=403)
+    return orbita_form, None
+
+
+def _session_etag(*parts):
+    digest = hashlib.sha1(":".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def _conditional_json(request, etag, build):
+    """304 si el cliente ya tiene `etag` (If-None-Match); si no, JSON de `build()` con el ETag."""
+    # GZip u otros proxies pueden debilitar el ETag (W/"..."): se compara el valor.
+    known = {tag.removeprefix("W/") for tag in parse_etags(request.headers.get("If-None-Match", ""))}
+    if etag in known or "*" in known:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(build())
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _session_list_item(s):
+    pct = round((s.current_step / s.total_steps) * 100) if s.total_steps > 0 else 0
+    return {
+        "session_uuid": str(s.session_uuid),
+        "status": s.status,
+        "status_display": s.get_status_display(),
+        "current_step": s.current_step,
+        "total_steps": s.total_steps,
+        "pct": pct,
+        "candidate_name": s.candidate_name or s.candidate_email or "Sin nombre",
+        "candidate_email": s.candidate_email or "",
+        "source": getattr(s, "source", "web"),
+        "started_at": s.started_at.isoformat() if s.started_at else None,
+        "updated_at": s.updated_at.isoformat() if s.updated_at else None,
+    }
+
+
 def _build_steps(orbita_form):
     """Construye la lista ordenada de pasos del chat a partir de los campos del formulario."""
     steps = []
@@ -92,6 +151,7 @@ class FormChatPageView(View):
             "orbita_form": orbita_form,
             "steps_json": json.dumps(steps),
             "total_steps": len(steps),
+            "upload_chunk_size": get_chunk_size(),
         })
 
 
@@ -160,23 +220,18 @@ class FormChatAnswerAPI(View):
         if session.status == FormChatSession.STATUS_COMPLETED:
             return JsonResponse({"ok": False, "error": "Sesión ya completada."}, status=400)
 
-        answers = session.answers or {}
-        answers[step_id] = value
-        session.answers = answers
-        session.current_step = min(session.current_step + 1, session.total_steps)
-        session.status = FormChatSession.STATUS_IN_PROGRESS
-
         val_str = str(value).strip()
 
+        candidate_email = ""
         if step_id == "submitter_email" or (
             "_email" not in step_id and not session.candidate_email and "@" in val_str
         ):
-            session.candidate_email = normalize_submitter_email(val_str)
+            candidate_email = normalize_submitter_email(val_str)
 
-        if session.candidate_email and has_existing_submission_for_email(orbita_form, session.candidate_email):
-            session.status = FormChatSession.STATUS_COMPLETED
-            session.completed_at = timezone.now()
-            session.save()
+        email = candidate_email or session.candidate_email
+        if email and has_existing_submission_for_email(orbita_form, email):
+            record_answer(session, step_id, value, candidate_email=candidate_email)
+            mark_completed(session)
             return JsonResponse({
                 "ok": True,
                 "current_step": session.current_step,
@@ -193,19 +248,18 @@ class FormChatAnswerAPI(View):
                 current_step = s
                 break
 
+        candidate_name = ""
         if current_step and not session.candidate_name:
             label_lower = current_step["label"].lower()
+            next_step = min(session.current_step + 1, session.total_steps)
             if any(kw in label_lower for kw in name_keywords):
-                session.candidate_name = val_str[:200]
-            elif current_step["type"] in ("text", "textarea") and session.current_step <= 1 and "@" not in val_str and len(val_str) < 80:
-                session.candidate_name = val_str[:200]
-
-        is_last = session.current_step >= session.total_steps
-        if is_last:
-            session.status = FormChatSession.STATUS_COMPLETED
-            session.completed_at = timezone.now()
+                candidate_name = val_str[:200]
+            elif current_step["type"] in ("text", "textarea") and next_step <= 1 and "@" not in val_str and len(val_str) < 80:
+                candidate_name = val_str[:200]
 
-        session.save()
+        is_last = record_answer(
+            session, step_id, value, candidate_email=candidate_email, candidate_name=candidate_name
+        )
 
         duplicate_submission = False
         if is_last:
@@ -220,74 +274,16 @@ class FormChatAnswerAPI(View):
         })
 
     def _finalize_submission(self, request, orbita_form, session):
-        """Al completar el chat, crea la ATSFormSubmission compatible con el sistema existente."""
-        answers = session.answers or {}
-        pending_files = answers.pop("_pending_files", {})
-        steps = _build_steps(orbita_form)
-
-        payload = {}
-        submitter_email = normalize_submitter_email(session.candidate_email or "")
-
-        for step in steps:
-            val = answers.get(step["id"], "")
-            if val and step["type"] != "file":
-                payload[step["label"]] = val
-            elif val and step["type"] == "file":
-                payload[step["label"]] = val
-            if step["type"] == "email" and val and not submitter_email:
-                submitter_email = normalize_submitter_email(val)
-
-        submission, duplicate_submission = create_submission_once(orbita_form, payload, submitter_email)
+        """
+        Al completar el chat crea la ATSFormSubmission; archivos, candidato, análisis y
+        notificación los procesa después `process_chat_finalizations`.
+        """
+        _submission, duplicate_submission = commit_submission(
+            orbita_form, session, _build_steps(orbita_form), base_url=request.build_absolute_uri("/")
+        )
         if duplicate_submission:
-            logger.info("chat_session duplicate form=%s session=%s email=%s", orbita_form.pk, session.session_uuid, submitter_email)
             return True
 
-        session.submission = submission
-        session.save(update_fields=["submission"])
-
-        from django.core.files.storage import default_storage
-        for step_id, file_info in pending_files.items():
-            field_obj = None
-            if step_id.startswith("field_"):
-                try:
-                    field_obj = ATSFormField.objects.get(pk=int(step_id.replace("field_", "")))
-                except (ATSFormField.DoesNotExist, ValueError):
-                    pass
-            try:
-                saved_file = default_storage.open(file_info["path"])
-                from django.core.files import File
-                sub_file = ATSFormSubmissionFile(
-                    submission=submission,
-                    form_field=field_obj,
-                    original_name=file_info["name"],
-                )
-                sub_file.file.save(file_info["name"], File(saved_file), save=True)
-                saved_file.close()
-            except Exception as e:
-                logger.warning("chat finalize: could not attach file %s: %s", file_info["path"], e)
-
-        if orbita_form.vacancy_id:
-            from mi_app.views.orbita.orbita_views import _create_candidate_from_submission
-            _create_candidate_from_submission(submission, payload, submitter_email)
-            if submission.candidate_id:
-                notify_orbita_client(
-                    orbita_form.client,
-                    ATSNotification.TYPE_CANDIDATE,
-                    "Nuevo candidato (chat)",
-                    message=f"{submission.candidate.name} — Chat «{orbita_form.name}».",
-                    link=reverse("orbita_candidate_detail", args=[submission.candidate.public_id]),
-                    request=request,
-                )
-        else:
-            notify_orbita_client(
-                orbita_form.client,
-                ATSNotification.TYPE_SUBMISSION,
-                "Nuevo envío (chat)",
-                message=f"Chat «{orbita_form.name}»: {submitter_email or 'Sin correo'}.",
-                link=reverse("orbita_form_submissions", args=[orbita_form.pk]),
-                request=request,
-            )
-
         ip = request.META.get("REMOTE_ADDR", "") or "unknown"
         cache_key = f"orbita_chat_start:{ip}:{orbita_form.uuid}"
         count = cache.get(cache_key, 0)
@@ -315,48 +311,42 @@ class FormChatFileUploadAPI(View):
         except FormChatSession.DoesNotExist:
             return JsonResponse({"ok": False, "error": "Sesión no encontrada."}, status=404)
 
-        if not uploaded:
+        # Subida por partes: el archivo ya está en storage y solo llega el token.
+        upload = None if uploaded else get_completed_upload(orbita_form, request.POST.get("upload_token"))
+        if not uploaded and not upload:
             return JsonResponse({"ok": False, "error": "Falta el archivo."}, status=400)
 
-        max_size = getattr(settings, "ORBITA_FORM_PUBLIC_MAX_FILE_SIZE", 10 * 1024 * 1024)
-        allowed_ext = getattr(settings, "ORBITA_FORM_PUBLIC_ALLOWED_EXTENSIONS", ["pdf", "doc", "docx"])
-        ext = (uploaded.name or "").rsplit(".", 1)[-1].lower() if "." in (uploaded.name or "") else ""
-        if uploaded.size > max_size:
-            return JsonResponse({"ok": False, "error": f"Archivo supera {max_size // (1024*1024)} MB."}, status=400)
-        if ext and allowed_ext and ext not in allowed_ext:
-            return JsonResponse({"ok": False, "error": f"Solo se permiten: {', '.join(allowed_ext)}."}, status=400)
-
-        from django.core.files.storage import default_storage
-        saved_path = default_storage.save(
-            f"orbita/chat_uploads/{session.session_uuid}/{uploaded.name}",
-            uploaded,
+        if uploaded:
+            max_size = getattr(settings, "ORBITA_FORM_PUBLIC_MAX_FILE_SIZE", 10 * 1024 * 1024)
+            allowed_ext = getattr(settings, "ORBITA_FORM_PUBLIC_ALLOWED_EXTENSIONS", ["pdf", "doc", "docx"])
+            ext = (uploaded.name or "").rsplit(".", 1)[-1].lower() if "." in (uploaded.name or "") else ""
+            if uploaded.size > max_size:
+                return JsonResponse({"ok": False, "error": f"Archivo supera {max_size // (1024*1024)} MB."}, status=400)
+            if ext and allowed_ext and ext not in allowed_ext:
+                return JsonResponse({"ok": False, "error": f"Solo se permiten: {', '.join(allowed_ext)}."}, status=400)
+
+            blob = store_file(uploaded)
+            file_name = uploaded.name
+        else:
+            if not claim_upload(upload):
+                return JsonResponse({"ok": False, "error": "Esta subida ya fue utilizada."}, status=400)
+            blob = upload.blob
+            file_name = upload.original_name
+
+        is_last = record_answer(
+            session,
+            step_id,
+            file_name,
+            attachment={"path": blob.storage_name, "name": file_name, "blob": blob.pk},
         )
 
-        answers = session.answers or {}
-        answers[step_id] = uploaded.name
-
-        pending_files = answers.get("_pending_files", {})
-        pending_files[step_id] = {"path": saved_path, "name": uploaded.name}
-        answers["_pending_files"] = pending_files
-
-        session.answers = answers
-        session.current_step = min(session.current_step + 1, session.total_steps)
-        session.status = FormChatSession.STATUS_IN_PROGRESS
-
-        is_last = session.current_step >= session.total_steps
-        if is_last:
-            session.status = FormChatSession.STATUS_COMPLETED
-            session.completed_at = timezone.now()
-
-        session.save()
-
         duplicate_submission = False
         if is_last:
             duplicate_submission = FormChatAnswerAPI()._finalize_submission(request, orbita_form, session)
 
         return JsonResponse({
             "ok": True,
-            "filename": uploaded.name,
+            "filename": file_name,
             "current_step": session.current_step,
             "total_steps": session.total_steps,
             "completed": is_last,
@@ -391,35 +381,41 @@ class FormChatSessionsView(LoginRequiredMixin, View):
 
 
 class FormChatSessionsListAPI(LoginRequiredMixin, View):
-    """GET: devuelve la lista de sesiones como JSON para auto-refresh."""
+    """
+    GET: devuelve la lista de sesiones como JSON para auto-refresh.
+    Responde 304 si el ETag (total + última actividad) no cambió; con `since=<ISO>`
+    devuelve solo las sesiones con actividad posterior (modo delta).
+    """
     login_url = "/orbita/plataforma/"
 
     def get(self, request, pk):
-        orbita_form = get_object_or_404(ATSForm, pk=pk)
-        if not _form_module_enabled(orbita_form):
-            return JsonResponse({"ok": False}, status=403)
-        orbita_client = getattr(request.user, "ats_client", None)
-        if not request.user.is_staff and (not orbita_client or orbita_form.client_id != orbita_client.pk):
-            return JsonResponse({"ok": False}, status=403)
+        orbita_form, error = _recruiter_form_or_error(request, pk)
+        if error:
+            return error
 
-        sessions = orbita_form.chat_sessions.all()[:50]
-        items = []
-        for s in sessions:
-            pct = round((s.current_step / s.total_steps) * 100) if s.total_steps > 0 else 0
-            items.append({
-                "session_uuid": str(s.session_uuid),
-                "status": s.status,
-                "status_display": s.get_status_display(),
-                "current_step": s.current_step,
-                "total_steps": s.total_steps,
-                "pct": pct,
-                "candidate_name": s.candidate_name or s.candidate_email or "Sin nombre",
-                "candidate_email": s.candidate_email or "",
-                "source": getattr(s, "source", "web"),
-                "started_at": s.started_at.isoformat() if s.started_at else None,
-                "updated_at": s.updated_at.isoformat() if s.updated_at else None,
-            })
-        return JsonResponse({"ok": True, "sessions": items})
+        # Una consulta sobre el índice (form, updated_at) decide si hay algo nuevo.
+        state = FormChatSession.objects.filter(form=orbita_form).aggregate(
+            latest=Max("updated_at"), total=Count("id")
+        )
+        latest = state["latest"]
+        etag = _session_etag("list", orbita_form.pk, state["total"], latest.isoformat() if latest else "")
+        since = parse_datetime(request.GET.get("since", "") or "")
+        if since is not None and timezone.is_naive(since):
+            since = timezone.make_aware(since)
+
+        def build():
+            sessions = orbita_form.chat_sessions.all()
+            if since is not None:
+                sessions = sessions.filter(updated_at__gt=since)
+            return {
+                "ok": True,
+                "delta": since is not None,
+                "total": state["total"],
+                "cursor": latest.isoformat() if latest else None,
+                "sessions": [_session_list_item(s) for s in sessions[:50]],
+            }
+
+        return _conditional_json(request, etag, build)
 
 
 class FormChatSessionDeleteAPI(LoginRequiredMixin, View):
@@ -440,7 +436,9 @@ class FormChatSessionDeleteAPI(LoginRequiredMixin, View):
             return JsonResponse({"ok": False, "error": "Sesión no encontrada."}, status=404)
 
         logger.info("chat_session deleted form=%s session=%s by=%s", orbita_form.pk, session.session_uuid, request.user.pk)
-        session.delete()
+        with transaction.atomic():
+            session.delete()
+            publish_session_progress(session, client_id=orbita_form.client_id, deleted=True)
         return JsonResponse({"ok": True})
 
 
@@ -449,22 +447,26 @@ class FormChatSessionDetailAPI(LoginRequiredMixin, View):
     login_url = "/orbita/plataforma/"
 
     def get(self, request, pk, session_uuid):
-        orbita_form = get_object_or_404(ATSForm, pk=pk)
-        if not _form_module_enabled(orbita_form):
-            return JsonResponse({"ok": False}, status=403)
-        orbita_client = getattr(request.user, "ats_client", None)
-        if not request.user.is_staff and (not orbita_client or orbita_form.client_id != orbita_client.pk):
-            return JsonResponse({"ok": False}, status=403)
+        orbita_form, error = _recruiter_form_or_error(request, pk)
+        if error:
+            return error
 
         try:
             session = FormChatSession.objects.get(session_uuid=session_uuid, form=orbita_form)
         except FormChatSession.DoesNotExist:
             return JsonResponse({"ok": False, "error": "Sesión no encontrada."}, status=404)
 
+        etag = _session_etag(
+            "detail", session.session_uuid, session.updated_at.isoformat(), orbita_form.updated_at.isoformat()
+        )
+        return _conditional_json(request, etag, lambda: self._build(orbita_form, session))
+
+    def _build(self, orbita_form, session):
         steps = _build_steps(orbita_form)
+        answers = session_answers(session)
         conversation = []
         for s in steps:
-            val = (session.answers or {}).get(s["id"])
+            val = answers.get(s["id"])
             conversation.append({
                 "step_id": s["id"],
                 "label": s["label"],
@@ -473,7 +475,7 @@ class FormChatSessionDetailAPI(LoginRequiredMixin, View):
                 "answered": val is not None,
             })
 
-        return JsonResponse({
+        return {
             "ok": True,
             "session_uuid": str(session.session_uuid),
             "status": session.status,
@@ -485,7 +487,7 @@ class FormChatSessionDetailAPI(LoginRequiredMixin, View):
             "updated_at": session.updated_at.isoformat() if session.updated_at else None,
             "completed_at": session.completed_at.isoformat() if session.completed_at else None,
             "conversation": conversation,
-        })
+        }
 
 
 class CandidateChatSessionAPI(LoginRequiredMixin, View):
@@ -498,9 +500,11 @@ class CandidateChatSessionAPI(LoginRequiredMixin, View):
         if not request.user.is_staff and not orbita_client:
             return JsonResponse({"ok": False}, status=403)
 
-        try:
-            session = FormChatSession.objects.select_related("form").get(session_uuid=session_uuid)
-        except FormChatSession.DoesNotExist:
+        session = FormChatSession.objects.select_related("form").filter(session_uuid=session_uuid).first()
+        if session is None:
+            # Las completadas antiguas quedan en el archivo (reap_chat_sessions).
+            session = FormChatSessionArchive.objects.select_related("form").filter(session_uuid=session_uuid).first()
+        if session is None:
             return JsonResponse({"ok": False, "error": "Sesión no encontrada."}, status=404)
         if not _form_module_enabled(session.form):
             return JsonResponse({"ok": False}, status=403)
@@ -509,9 +513,13 @@ class CandidateChatSessionAPI(LoginRequiredMixin, View):
             return JsonResponse({"ok": False}, status=403)
 
         steps = _build_steps(session.form)
+        if isinstance(session, FormChatSessionArchive):
+            answers = session.answers or {}
+        else:
+            answers = session_answers(session)
         conversation = []
         for i, s in enumerate(steps):
-            val = (session.answers or {}).get(s["id"])
+            val = answers.get(s["id"])
             conversation.append({
                 "step_id": s["id"],
                 "label": s["label"],
@@ -0,0 +1,126 @@
+"""
+Endpoints de subida por partes (reanudable) para formularios públicos y chat web.
+- FormUploadStartAPI: primer chunk + metadatos (nombre, tamaño); valida antes de guardar.
+- FormUploadChunkAPI: GET estado para reanudar / POST siguiente chunk en `offset`.
+
+El cuerpo de cada POST es el chunk en crudo (application/octet-stream).
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views import View
+
+from mi_app.models import ATSForm
+from mi_app.services.chunked_uploads import (
+    append_chunk,
+    get_chunk_size,
+    get_upload,
+    start_upload,
+    validate_upload_metadata,
+)
+from mi_app.views.orbita.form_chat_views import _form_module_enabled
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_int(value):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _read_chunk(request):
+    """Lee el chunk del cuerpo con tope de tamaño. Retorna (bytes, error)."""
+    limit = get_chunk_size()
+    declared = _parse_int(request.META.get("CONTENT_LENGTH"))
+    if declared is not None and declared > limit:
+        return None, "Chunk demasiado grande."
+    data = request.read(limit + 1)
+    if len(data) > limit:
+        return None, "Chunk demasiado grande."
+    return data, None
+
+
+def _upload_json(upload, status=200, error=None):
+    data = {
+        "ok": error is None,
+        "token": str(upload.token),
+        "received": upload.received_size,
+        "size": upload.total_size,
+        "complete": upload.is_complete,
+    }
+    if error:
+        data["error"] = error
+    return JsonResponse(data, status=status)
+
+
+class FormUploadStartAPI(View):
+    """POST ?name=<archivo>&size=<bytes>: inicia la subida con el primer chunk."""
+
+    def post(self, request, uuid):
+        orbita_form = get_object_or_404(ATSForm, uuid=uuid, is_active=True)
+        if not _form_module_enabled(orbita_form):
+            return JsonResponse({"ok": False, "error": "Este formulario no está disponible."}, status=403)
+
+        ip = request.META.get("REMOTE_ADDR", "") or "unknown"
+        cache_key = f"orbita_upload_start:{ip}:{uuid}"
+        count = cache.get(cache_key, 0)
+        max_count = getattr(settings, "ORBITA_FORM_UPLOAD_RATE_LIMIT_COUNT", 20)
+        if count >= max_count:
+            return JsonResponse({"ok": False, "error": "Límite de subidas alcanzado."}, status=429)
+
+        name = (request.GET.get("name") or "").strip()
+        size = _parse_int(request.GET.get("size"))
+        error = validate_upload_metadata(name, size)
+        if error:
+            return JsonResponse({"ok": False, "error": error}, status=400)
+
+        data, error = _read_chunk(request)
+        if error:
+            return JsonResponse({"ok": False, "error": error}, status=413)
+
+        result = start_upload(orbita_form, name, size, data)
+        if not result["ok"]:
+            return JsonResponse({"ok": False, "error": result["error"]}, status=result.get("status", 400))
+
+        timeout = getattr(settings, "ORBITA_FORM_PUBLIC_RATE_LIMIT_SECONDS", 3600)
+        cache.set(cache_key, count + 1, timeout=timeout)
+        upload = result["upload"]
+        logger.info("form_upload started form=%s token=%s size=%d", orbita_form.pk, upload.token, upload.total_size)
+        return _upload_json(upload, status=201)
+
+
+class FormUploadChunkAPI(View):
+    """GET: estado para reanudar. POST ?offset=<byte>: agrega el siguiente chunk."""
+
+    def get(self, request, uuid, token):
+        orbita_form = get_object_or_404(ATSForm, uuid=uuid, is_active=True)
+        upload = get_upload(orbita_form, token)
+        if not upload:
+            return JsonResponse({"ok": False, "error": "Subida no encontrada."}, status=404)
+        return _upload_json(upload)
+
+    def post(self, request, uuid, token):
+        orbita_form = get_object_or_404(ATSForm, uuid=uuid, is_active=True)
+        if not _form_module_enabled(orbita_form):
+            return JsonResponse({"ok": False, "error": "Este formulario no está disponible."}, status=403)
+
+        offset = _parse_int(request.GET.get("offset"))
+        if offset is None or offset < 0:
+            return JsonResponse({"ok": False, "error": "Offset inválido."}, status=400)
+
+        data, error = _read_chunk(request)
+        if error:
+            return JsonResponse({"ok": False, "error": error}, status=413)
+
+        result = append_chunk(orbita_form, token, offset, data)
+        upload = result.get("upload")
+        if not result["ok"]:
+            if upload is None:
+                return JsonResponse({"ok": False, "error": result["error"]}, status=result.get("status", 400))
+            return _upload_json(upload, status=result.get("status", 400), error=result["error"])
+        return _upload_json(upload)
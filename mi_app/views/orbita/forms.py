@@ -426,6 +426,7 @@ class ATSEmailConfigForm(forms.ModelForm):
         model = ATSClientEmailConfig
         fields = (
             "notification_email",
+            "notification_digest_minutes",
             "incoming_subject_regex",
             "company_from_email",
             "company_from_name",
@@ -442,6 +443,7 @@ class ATSEmailConfigForm(forms.ModelForm):
         )
         widgets = {
             "notification_email": forms.EmailInput(attrs={"class": "form-control", "placeholder": "notificaciones@tuempresa.com"}),
+            "notification_digest_minutes": forms.Select(attrs={"class": "form-select"}),
             "incoming_subject_regex": forms.TextInput(attrs={"class": "form-control", "placeholder": r"(?i)(postulante|interesado en la vacante)"}),
             "company_from_email": forms.EmailInput(attrs={"class": "form-control", "placeholder": "rrhh@tuempresa.com"}),
             "company_from_name": forms.TextInput(attrs={"class": "form-control", "placeholder": "Recursos Humanos - Mi Empresa"}),
@@ -0,0 +1,57 @@
+"""
+Stream en vivo (Server-Sent Events) para la plataforma Órbita.
+- OrbitaEventStreamView: eventos `notification` y `chat_session` del cliente autenticado.
+
+Requiere servir el proyecto por ASGI (starpath_web/asgi.py) y ORBITA_SSE_ENABLED; si no,
+responde 204 y las páginas siguen con su polling.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
+
+from mi_app.services.live_events import live_events_enabled, stream_events
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_last_event_id(request):
+    raw = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id") or ""
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+def _client_for(user):
+    return getattr(user, "ats_client", None)
+
+
+class OrbitaEventStreamView(View):
+    """GET: stream SSE con latidos; se reanuda desde `Last-Event-ID`."""
+    http_method_names = ["get"]
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest) or not live_events_enabled():
+            # Bajo WSGI el stream bloquearía un worker (y sin ORBITA_SSE_ENABLED no se registran
+            # eventos): 204 hace que EventSource no reconecte y la página se queda con el polling.
+            return HttpResponse(status=204)
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({"ok": False, "error": "No autenticado."}, status=401)
+        orbita_client = await sync_to_async(_client_for)(user)
+        if not orbita_client:
+            return JsonResponse({"ok": False}, status=403)
+
+        response = StreamingHttpResponse(
+            stream_events(orbita_client.pk, _parse_last_event_id(request)),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # Nginx: no acumular el stream en el buffer del proxy.
+        response["X-Accel-Buffering"] = "no"
+        logger.info("sse open client=%s", orbita_client.pk)
+        return response
@@ -35,6 +35,7 @@ from django.contrib import messages
 from django.http import HttpResponseForbidden, HttpResponseRedirect, HttpResponse, JsonResponse, FileResponse
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, FormView
 from django.utils import timezone
+from django.utils.text import slugify
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import never_cache
 
@@ -54,6 +55,7 @@ from mi_app.views.orbita.forms import (
     WorkforcePlanForm,
     CVAnalysisConfigForm,
 )
+from django.db import transaction
 from django.db.models import Count, Q, Sum  # Count for annotate, Q for filter
 from datetime import timedelta
 
@@ -68,10 +70,10 @@ from mi_app.models import (
     ATSFormField,
     ATSFormCriterion,
     ATSFormSubmission,
-    ATSFormSubmissionFile,
     ATSCandidateCriterionResponse,
     ATSClientEmailConfig,
     ATSNotification,
+    FormChatSessionArchive,
     PlanChangeRequest,
     LLMUsageLog,
     WorkforceArea,
@@ -91,11 +93,27 @@ from mi_app.orbita_plans import (
     get_subscription_module_flags,
     subscription_module_enabled,
 )
-from mi_app.orbita_notifications import notify_orbita_client, notify_support_plan_change, notify_support_account_deletion_request, send_email_to_candidate
+from mi_app.orbita_notifications import (
+    get_unread_count,
+    mark_all_notifications_read,
+    mark_notification_read,
+    notify_orbita_client,
+    notify_support_account_deletion_request,
+    notify_support_plan_change,
+    send_email_to_candidate,
+)
 from mi_app.services.form_submissions import (
     create_submission_once,
     normalize_submitter_email,
 )
+from mi_app.services.blob_store import (
+    attach_to_submission,
+    blob_for_submission_file,
+    set_candidate_cv,
+    store_file,
+)
+from mi_app.services.chat_answers import session_answers
+from mi_app.services.chunked_uploads import claim_upload, get_chunk_size, get_completed_upload
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -555,10 +573,16 @@ class ATSCandidateDetailView(OrbitaModuleRequiredMixin, LoginRequiredMixin, View
                 chat_session = form_submission.chat_session
             except Exception:
                 chat_session = None
+            if chat_session is None:
+                # Sesiones completadas antiguas quedan en el archivo (reap_chat_sessions).
+                chat_session = FormChatSessionArchive.objects.filter(submission=form_submission).first()
             if chat_session and orbita_form:
                 from mi_app.views.orbita.form_chat_views import _build_steps
                 steps = _build_steps(orbita_form)
-                answers = chat_session.answers or {}
+                if isinstance(chat_session, FormChatSessionArchive):
+                    answers = chat_session.answers or {}
+                else:
+                    answers = session_answers(chat_session)
                 for i, s in enumerate(steps):
                     val = answers.get(s["id"])
                     chat_conversation.append({
@@ -666,11 +690,8 @@ class ATSCandidateUploadCVView(OrbitaModuleRequiredMixin, LoginRequiredMixin, Vi
         if cv_file.size > max_size:
             messages.error(request, f"El archivo es demasiado grande. Máximo {max_size // (1024*1024)} MB.")
             return redirect("orbita_candidate_detail", public_id=candidate.public_id)
-        from django.core.files.base import ContentFile
         name = _safe_upload_filename(cv_file.name or "cv.pdf")
-        if candidate.cv_file:
-            candidate.cv_file.delete(save=False)
-        candidate.cv_file.save(name, ContentFile(cv_file.read()), save=True)
+        set_candidate_cv(candidate, store_file(cv_file, name))
         messages.success(request, "CV cargado correctamente. Ya puedes analizarlo con IA si lo deseas.")
         return redirect("orbita_candidate_detail", public_id=candidate.public_id)
 
@@ -690,7 +711,9 @@ class ATSCandidateDownloadCVView(OrbitaModuleRequiredMixin, LoginRequiredMixin,
             messages.error(request, "Este candidato no tiene CV cargado.")
             return redirect("orbita_candidate_detail", public_id=candidate.public_id)
 
-        filename = os.path.basename(candidate.cv_file.name) or "cv.pdf"
+        # El archivo puede ser un blob compartido: el nombre sale del candidato, no de la ruta.
+        ext = os.path.splitext(candidate.cv_file.name)[1].lower() or ".pdf"
+        filename = f"cv-{slugify(candidate.name or '') or candidate.pk}{ext}"
         try:
             return FileResponse(candidate.cv_file.open("rb"), as_attachment=True, filename=filename)
         except Exception as exc:
@@ -1304,6 +1327,7 @@ class ATSFormPublicView(View):
         return render(request, self.template_name, {
             "orbita_form": orbita_form,
             "orbita_form_has_email_field": has_email_field,
+            "upload_chunk_size": get_chunk_size(),
         })
 
     def post(self, request, uuid):
@@ -1333,11 +1357,14 @@ class ATSFormPublicView(View):
             return True, None
         payload = {}
         files_to_save = []
+        # Archivos ya subidos por partes: el POST solo trae el token de la subida completada
+        uploads_to_attach = []
         submitter_email = ""
         for field in orbita_form.fields.all().order_by("order", "id"):
             key = f"field_{field.id}"
             if field.field_type == ATSFormField.FIELD_FILE:
                 f = request.FILES.get(key)
+                upload = None if f else get_completed_upload(orbita_form, request.POST.get(f"{key}_upload"))
                 if f and field.required or f:
                     ok, err = _check_file(f)
                     if not ok:
@@ -1348,6 +1375,9 @@ class ATSFormPublicView(View):
                         })
                     files_to_save.append((field, f))
                     payload[field.label] = f.name
+                elif upload:
+                    uploads_to_attach.append((field, upload))
+                    payload[field.label] = upload.original_name
             elif field.field_type == ATSFormField.FIELD_MULTI:
                 vals = [v.strip() for v in request.POST.getlist(key) if (v or "").strip()]
                 allowed_options = {str(v).strip() for v in (field.option_values or []) if str(v).strip()}
@@ -1379,6 +1409,10 @@ class ATSFormPublicView(View):
                         submitter_email = val
         if getattr(orbita_form, "request_cv", False):
             cv_file = request.FILES.get("cv_file")
+            cv_upload = None if cv_file else get_completed_upload(orbita_form, request.POST.get("cv_file_upload"))
+            if cv_upload:
+                uploads_to_attach.append((None, cv_upload))
+                payload["CV"] = cv_upload.original_name
             if cv_file:
                 ok, err = _check_file(cv_file)
                 if not ok:
@@ -1392,19 +1426,31 @@ class ATSFormPublicView(View):
         submitter_email = normalize_submitter_email(submitter_email or request.POST.get("submitter_email", "").strip())
         if submitter_email and "Correo electrónico" not in payload and "Email" not in payload:
             payload["Correo electrónico"] = submitter_email
-        submission, duplicate_submission = create_submission_once(orbita_form, payload, submitter_email)
+        # Las subidas se reservan en la misma transacción que el envío: si otra petición ya
+        # usó alguna (token repetido o doble clic), no se crea el envío sin su archivo.
+        with transaction.atomic():
+            claimed = all(claim_upload(upload) for _field, upload in uploads_to_attach)
+            if claimed:
+                submission, duplicate_submission = create_submission_once(orbita_form, payload, submitter_email)
+            if not claimed or duplicate_submission:
+                transaction.set_rollback(True)
+            else:
+                for field, upload in uploads_to_attach:
+                    attach_to_submission(submission, upload.blob, field, upload.original_name)
+        if not claimed:
+            logger.warning("Subida ya adjuntada a otro envío en form=%s; se rechaza el envío", orbita_form.pk)
+            return render(request, self.template_name, {
+                "orbita_form": orbita_form,
+                "orbita_form_has_email_field": orbita_form.fields.filter(field_type=ATSFormField.FIELD_EMAIL).exists(),
+                "form_error": "Uno de los archivos ya se usó en otro envío. Vuelve a subirlo e intenta de nuevo.",
+            })
         if duplicate_submission:
             return render(request, self.thank_you_template, {
                 "orbita_form": orbita_form,
                 "already_submitted": True,
             })
         for field, uploaded_file in files_to_save:
-            ATSFormSubmissionFile.objects.create(
-                submission=submission,
-                form_field=field,
-                file=uploaded_file,
-                original_name=uploaded_file.name,
-            )
+            attach_to_submission(submission, store_file(uploaded_file), field, uploaded_file.name)
         # Si el formulario está ligado a una vacante, crear candidato y una sola notificación "Nuevo candidato"
         if orbita_form.vacancy_id:
             _create_candidate_from_submission(submission, payload, submitter_email)
@@ -1445,8 +1491,8 @@ class ATSFormPublicThanksView(View):
         return render(request, self.template_name, {"orbita_form": orbita_form})
 
 
-def _create_candidate_from_submission(submission, payload, submitter_email):
-    """Crea un Candidato a partir de un envío de formulario y lo vincula. Usado en POST público y en backfill. Respeta límite de candidatos del plan."""
+def _create_candidate_from_submission(submission, payload, submitter_email, analyze=True):
+    """Crea un Candidato a partir de un envío de formulario y lo vincula. Usado en POST público y en backfill. Respeta límite de candidatos del plan. Con analyze=False el análisis de CV queda a cargo del llamador."""
     orbita_form = submission.form
     if not orbita_form.vacancy_id:
         return None
@@ -1476,24 +1522,23 @@ def _create_candidate_from_submission(submission, payload, submitter_email):
     )
     submission.candidate = candidate
     submission.save(update_fields=["candidate"])
-    # Si el envío incluyó un archivo (CV), copiarlo al candidato para poder procesarlo con IA después
+    # Si el envío incluyó un archivo (CV), ligarlo al candidato para poder procesarlo con IA después.
+    # Candidato y adjunto comparten el mismo blob: no se vuelve a leer ni a subir el archivo.
     # Preferir el archivo del campo "Solicitar CV" (form_field=None); si no, el primer archivo adjunto
     cv_attachment = submission.files.filter(form_field__isnull=True).first() or submission.files.first()
     if cv_attachment and cv_attachment.file:
-        from django.core.files.base import ContentFile
         try:
-            name = _safe_upload_filename(cv_attachment.original_name or os.path.basename(cv_attachment.file.name) or "cv_adjunto.pdf")
-            with cv_attachment.file.open("rb") as fh:
-                candidate.cv_file.save(name, ContentFile(fh.read()), save=True)
+            set_candidate_cv(candidate, blob_for_submission_file(cv_attachment))
         except Exception as exc:
             logger.warning(
-                "No se pudo copiar CV de submission=%s a candidate=%s: %s",
+                "No se pudo ligar CV de submission=%s a candidate=%s: %s",
                 submission.pk,
                 candidate.pk,
                 exc,
             )
 
-    _auto_analyze_candidate_if_applicable(candidate)
+    if analyze:
+        _auto_analyze_candidate_if_applicable(candidate)
     return candidate
 
 
@@ -2941,8 +2986,7 @@ class ATSNotificationGoView(OrbitaModuleRequiredMixin, LoginRequiredMixin, View)
         if not client:
             return redirect("orbita_dashboard")
         notification = get_object_or_404(ATSNotification, pk=pk, client=client)
-        notification.read = True
-        notification.save(update_fields=["read"])
+        mark_notification_read(notification)
         link = (notification.link or "").strip()
         if link and "/candidato/" in link:
             try:
@@ -2965,7 +3009,7 @@ class ATSNotificationMarkAllReadView(OrbitaModuleRequiredMixin, LoginRequiredMix
     def post(self, request):
         client = _get_client_or_403(request)
         if client:
-            ATSNotification.objects.filter(client=client, read=False).update(read=True)
+            mark_all_notifications_read(client)
         ref = request.META.get("HTTP_REFERER") or reverse("orbita_dashboard")
         return redirect(ref)
 
@@ -2985,7 +3029,7 @@ class ATSNotificationPanelView(OrbitaModuleRequiredMixin, LoginRequiredMixin, Vi
         paginator = Paginator(qs, self.paginate_by)
         page_number = request.GET.get("page", 1)
         page = paginator.get_page(page_number)
-        unread_count = ATSNotification.objects.filter(client=client, read=False).count()
+        unread_count = get_unread_count(client)
         return render(request, self.template_name, {
             "page_obj": page,
             "notifications": page.object_list,
@@ -2999,7 +3043,7 @@ class ATSNotificationPanelView(OrbitaModuleRequiredMixin, LoginRequiredMixin, Vi
         """Marcar todas como leídas y redirigir al panel."""
         client = _get_client_or_403(request)
         if client:
-            ATSNotification.objects.filter(client=client, read=False).update(read=True)
+            mark_all_notifications_read(client)
         return redirect("orbita_notification_panel")
 
 
@@ -0,0 +1,39 @@
+"""
+Webhook del bot de Telegram de Órbita.
+- TelegramWebhookView: recibe updates y los encola (TelegramUpdate) para `run_telegram_bot --webhook`.
+
+Telegram reintenta mientras no reciba 200; responder rápido (solo un INSERT) evita
+reintentos y el procesamiento queda en los workers del bot.
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from mi_app.services.telegram_updates import enqueue_update
+
+logger = logging.getLogger(__name__)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class TelegramWebhookView(View):
+    """POST: update de Telegram autenticado con `X-Telegram-Bot-Api-Secret-Token`."""
+    http_method_names = ["post"]
+
+    def post(self, request):
+        secret = getattr(settings, "TELEGRAM_WEBHOOK_SECRET", "")
+        received = request.headers.get("X-Telegram-Bot-Api-Secret-Token") or ""
+        if not secret or not constant_time_compare(received, secret):
+            return JsonResponse({"ok": False, "error": "No autorizado."}, status=403)
+        try:
+            payload = json.loads(request.body or b"{}")
+        except (ValueError, UnicodeDecodeError):
+            return JsonResponse({"ok": False, "error": "JSON inválido."}, status=400)
+        if not isinstance(payload, dict) or not enqueue_update(payload):
+            return JsonResponse({"ok": False, "error": "Update inválido."}, status=400)
+        return HttpResponse(status=200)
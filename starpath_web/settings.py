@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 from pathlib import Path
 import json
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -310,6 +311,8 @@ if _extra_csrf:
 # Órbita: login y redirección para clientes de la plataforma
 LOGIN_URL = "/orbita/plataforma/"
 LOGIN_REDIRECT_URL = "/orbita/plataforma/dashboard/"
+# Órbita: origen público (https://dominio) para enlaces absolutos en correos enviados desde workers
+ORBITA_SITE_URL = (os.environ.get("ORBITA_SITE_URL") or "").strip().rstrip("/")
 # Órbita: correo al que se notifica cuando un cliente solicita cambio de plan (activación manual / pago posterior)
 ORBITA_SUPPORT_EMAIL = os.environ.get(
     "ORBITA_SUPPORT_EMAIL",
@@ -327,6 +330,49 @@ ORBITA_FORM_PUBLIC_ALLOWED_EXTENSIONS = [
     ).split(",")
     if e.strip()
 ]
+# Correo entrante (worker: manage.py process_incoming_emails --loop): buzones IMAP procesados en paralelo y
+# timeouts de conexión y de lectura por buzón
+ORBITA_IMAP_MAX_WORKERS = int(os.environ.get("ORBITA_IMAP_MAX_WORKERS", 4))
+ORBITA_IMAP_CONNECT_TIMEOUT_SECONDS = int(os.environ.get("ORBITA_IMAP_CONNECT_TIMEOUT_SECONDS", 15))
+ORBITA_IMAP_READ_TIMEOUT_SECONDS = int(os.environ.get("ORBITA_IMAP_READ_TIMEOUT_SECONDS", 60))
+# Intentos de un correo que falla siempre antes de omitirlo y avanzar el checkpoint del buzón
+ORBITA_IMAP_MESSAGE_MAX_ATTEMPTS = int(os.environ.get("ORBITA_IMAP_MESSAGE_MAX_ATTEMPTS", 3))
+# Modo --idle: segundos antes de renovar cada IDLE, tope del backoff de reconexión y cada cuánto se
+# releen las configuraciones de buzones
+ORBITA_IMAP_IDLE_SECONDS = int(os.environ.get("ORBITA_IMAP_IDLE_SECONDS", 540))
+ORBITA_IMAP_RECONNECT_MAX_SECONDS = int(os.environ.get("ORBITA_IMAP_RECONNECT_MAX_SECONDS", 300))
+ORBITA_IMAP_IDLE_REFRESH_SECONDS = int(os.environ.get("ORBITA_IMAP_IDLE_REFRESH_SECONDS", 300))
+# Outbox de correos (worker: manage.py send_outbox_emails --loop)
+ORBITA_EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("ORBITA_EMAIL_OUTBOX_MAX_ATTEMPTS", 5))
+ORBITA_EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.environ.get("ORBITA_EMAIL_OUTBOX_RETRY_BASE_SECONDS", 60))
+ORBITA_EMAIL_OUTBOX_CLIENT_RATE_PER_MINUTE = int(os.environ.get("ORBITA_EMAIL_OUTBOX_CLIENT_RATE_PER_MINUTE", 30))
+# Stream SSE de eventos en vivo: solo con servidor ASGI (bajo WSGI no se registran eventos que nadie lee)
+ORBITA_SSE_ENABLED = os.environ.get("ORBITA_SSE_ENABLED", "").strip().lower() in ("1", "true", "yes")
+# Stream SSE de eventos en vivo (ASGI): latido, consulta a BD como respaldo entre procesos y vida máxima de la conexión
+ORBITA_SSE_HEARTBEAT_SECONDS = int(os.environ.get("ORBITA_SSE_HEARTBEAT_SECONDS", 15))
+ORBITA_SSE_POLL_SECONDS = int(os.environ.get("ORBITA_SSE_POLL_SECONDS", 5))
+ORBITA_SSE_MAX_SECONDS = int(os.environ.get("ORBITA_SSE_MAX_SECONDS", 600))
+# Sesiones de chat (worker: manage.py reap_chat_sessions --loop): horas sin actividad para expirar una
+# sesión incompleta y días tras completarse para archivarla
+ORBITA_CHAT_SESSION_TTL_HOURS = int(os.environ.get("ORBITA_CHAT_SESSION_TTL_HOURS", 72))
+ORBITA_CHAT_SESSION_ARCHIVE_DAYS = int(os.environ.get("ORBITA_CHAT_SESSION_ARCHIVE_DAYS", 90))
+# Cierre diferido de chats (worker: manage.py process_chat_finalizations --loop): archivos, candidato,
+# análisis de CV y notificación; intentos máximos y base del backoff entre reintentos
+ORBITA_CHAT_FINALIZATION_MAX_ATTEMPTS = int(os.environ.get("ORBITA_CHAT_FINALIZATION_MAX_ATTEMPTS", 5))
+ORBITA_CHAT_FINALIZATION_RETRY_BASE_SECONDS = int(os.environ.get("ORBITA_CHAT_FINALIZATION_RETRY_BASE_SECONDS", 30))
+# Bot de Telegram: hilos (y conexiones) de BD del bot, revisión de conexiones, caché de formularios
+# y updates procesados a la vez (en orden dentro de cada chat)
+ORBITA_TELEGRAM_DB_WORKERS = int(os.environ.get("ORBITA_TELEGRAM_DB_WORKERS", 8))
+ORBITA_TELEGRAM_DB_CHECK_SECONDS = int(os.environ.get("ORBITA_TELEGRAM_DB_CHECK_SECONDS", 30))
+ORBITA_TELEGRAM_FORM_CACHE_SECONDS = int(os.environ.get("ORBITA_TELEGRAM_FORM_CACHE_SECONDS", 30))
+ORBITA_TELEGRAM_CONCURRENT_UPDATES = int(os.environ.get("ORBITA_TELEGRAM_CONCURRENT_UPDATES", 256))
+# Descargas de documentos simultáneas por proceso del bot (cada una se copia por bloques a storage)
+ORBITA_TELEGRAM_MAX_CONCURRENT_DOWNLOADS = int(os.environ.get("ORBITA_TELEGRAM_MAX_CONCURRENT_DOWNLOADS", 4))
+# Órbita subidas por partes (reanudables): tamaño máximo de cada chunk y subidas iniciadas por IP por ventana
+ORBITA_FORM_UPLOAD_CHUNK_SIZE = int(os.environ.get("ORBITA_FORM_UPLOAD_CHUNK_SIZE", 1024 * 1024))  # 1 MB
+ORBITA_FORM_UPLOAD_RATE_LIMIT_COUNT = int(os.environ.get("ORBITA_FORM_UPLOAD_RATE_LIMIT_COUNT", 20))
+# Horas sin actividad tras las que purge_orphan_blobs borra una subida que nadie adjuntó
+ORBITA_FORM_UPLOAD_EXPIRY_HOURS = int(os.environ.get("ORBITA_FORM_UPLOAD_EXPIRY_HOURS", 24))
 # Órbita formulario público: rate limit (máx envíos por IP por ventana)
 ORBITA_FORM_PUBLIC_RATE_LIMIT_COUNT = int(
     os.environ.get("ORBITA_FORM_PUBLIC_RATE_LIMIT_COUNT", os.environ.get("ATS_FORM_PUBLIC_RATE_LIMIT_COUNT", 5))
@@ -344,12 +390,39 @@ ATS_FORM_PUBLIC_RATE_LIMIT_SECONDS = ORBITA_FORM_PUBLIC_RATE_LIMIT_SECONDS
 
 # Telegram Bot
 TELEGRAM_BOT_TOKEN = (os.environ.get("TELEGRAM_BOT_TOKEN") or "").strip()
+# Modo webhook (run_telegram_bot --webhook): URL pública de /orbita/telegram/webhook/ y secreto que
+# Telegram envía en X-Telegram-Bot-Api-Secret-Token
+TELEGRAM_WEBHOOK_SECRET = (os.environ.get("TELEGRAM_WEBHOOK_SECRET") or "").strip()
+ORBITA_TELEGRAM_WEBHOOK_URL = (os.environ.get("ORBITA_TELEGRAM_WEBHOOK_URL") or "").strip()
+ORBITA_TELEGRAM_QUEUE_POLL_SECONDS = float(os.environ.get("ORBITA_TELEGRAM_QUEUE_POLL_SECONDS", 1))
 
 # Órbita análisis de CV con IA (OpenAI). Si OPENAI_API_KEY está vacío, se usa evaluación stub.
 OPENAI_API_KEY = (os.environ.get("OPENAI_API_KEY") or "").strip()
 # Extracción de documentos (INE, comprobante). Si está vacío, usa OPENAI_API_KEY como fallback.
 OPENAI_API_KEY_DOCUMENTS = (os.environ.get("OPENAI_API_KEY_DOCUMENTS") or "").strip() or OPENAI_API_KEY
 OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+# Imagen que se envía a Vision tras orientar, recortar y reducir: formato (jpeg|webp) y calidad
+ORBITA_DOCUMENTS_IMAGE_FORMAT = os.environ.get("ORBITA_DOCUMENTS_IMAGE_FORMAT", "jpeg")
+ORBITA_DOCUMENTS_IMAGE_QUALITY = int(os.environ.get("ORBITA_DOCUMENTS_IMAGE_QUALITY", 85))
+# PDF: páginas revisadas y enviadas, procesos de render (0 = en el proceso web), tope de render y caché de páginas
+ORBITA_DOCUMENTS_PDF_SCAN_PAGES = int(os.environ.get("ORBITA_DOCUMENTS_PDF_SCAN_PAGES", 10))
+ORBITA_DOCUMENTS_PDF_MAX_PAGES = int(os.environ.get("ORBITA_DOCUMENTS_PDF_MAX_PAGES", 3))
+ORBITA_DOCUMENTS_PDF_WORKERS = int(os.environ.get("ORBITA_DOCUMENTS_PDF_WORKERS", 2))
+ORBITA_DOCUMENTS_PDF_RENDER_SECONDS = float(os.environ.get("ORBITA_DOCUMENTS_PDF_RENDER_SECONDS", 20))
+ORBITA_DOCUMENTS_PDF_CACHE_SECONDS = int(os.environ.get("ORBITA_DOCUMENTS_PDF_CACHE_SECONDS", 3600))
+# Caché de páginas en disco (compartida por los procesos del servidor): carpeta y máximo de páginas guardadas
+ORBITA_DOCUMENTS_PDF_CACHE_DIR = os.environ.get(
+    "ORBITA_DOCUMENTS_PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "orbita-docpdf")
+)
+ORBITA_DOCUMENTS_PDF_CACHE_MAX_PAGES = int(os.environ.get("ORBITA_DOCUMENTS_PDF_CACHE_MAX_PAGES", 500))
+# Caché de resultados de Vision por (sha256, tipo, versión de prompt); 0 la desactiva
+ORBITA_DOCUMENTS_RESULT_CACHE_DAYS = int(os.environ.get("ORBITA_DOCUMENTS_RESULT_CACHE_DAYS", 30))
+# Lotes (extract/batch/): archivos por lote, hilos del worker process_document_jobs, reintentos y retención
+ORBITA_DOCUMENTS_BATCH_MAX_FILES = int(os.environ.get("ORBITA_DOCUMENTS_BATCH_MAX_FILES", 20))
+ORBITA_DOCUMENTS_JOB_WORKERS = int(os.environ.get("ORBITA_DOCUMENTS_JOB_WORKERS", 4))
+ORBITA_DOCUMENTS_JOB_MAX_ATTEMPTS = int(os.environ.get("ORBITA_DOCUMENTS_JOB_MAX_ATTEMPTS", 3))
+ORBITA_DOCUMENTS_JOB_RETRY_BASE_SECONDS = int(os.environ.get("ORBITA_DOCUMENTS_JOB_RETRY_BASE_SECONDS", 30))
+ORBITA_DOCUMENTS_JOB_RETENTION_HOURS = int(os.environ.get("ORBITA_DOCUMENTS_JOB_RETENTION_HOURS", 72))
 
 # API key para proteger el endpoint de extracción de documentos. Obligatorio.
 DOCUMENTS_API_KEY = (os.environ.get("DOCUMENTS_API_KEY") or "").strip()
@@ -358,7 +431,15 @@ DOCUMENTS_API_KEY = (os.environ.get("DOCUMENTS_API_KEY") or "").strip()
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-    }
+    },
+    # Páginas de PDF ya rasterizadas (services/document_pdf.py): en disco para no ocupar la
+    # memoria de cada worker; al pasar del máximo se descarta un tercio de las entradas.
+    "documents_pdf": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": ORBITA_DOCUMENTS_PDF_CACHE_DIR,
+        "TIMEOUT": ORBITA_DOCUMENTS_PDF_CACHE_SECONDS,
+        "OPTIONS": {"MAX_ENTRIES": ORBITA_DOCUMENTS_PDF_CACHE_MAX_PAGES, "CULL_FREQUENCY": 3},
+    },
 }
 
 REST_FRAMEWORK = {
@@ -372,6 +453,8 @@ REST_FRAMEWORK = {
         "user": "60/min",       # usuarios autenticados
         "chat": "10/min",       # SOLO para el endpoint del chat
         "documents": "10/min",  # extracción de documentos (INE, comprobante)
+        "documents_batch": "5/min",     # lotes de documentos (cada uno hasta ORBITA_DOCUMENTS_BATCH_MAX_FILES)
+        "documents_status": "120/min",  # consulta del estado de un lote
     }
 }
 
@@ -21,7 +21,11 @@ from django.conf.urls.static import static
 from django.views.generic.base import RedirectView
 from mi_app.views.landing_page.landing_page_views import LandingPage
 from mi_app.views.chatbot.chatbot_api import ChatAPIView
-from mi_app.views.documents.document_extract_api import DocumentExtractAPIView
+from mi_app.views.documents.document_extract_api import (
+    DocumentExtractAPIView,
+    DocumentExtractBatchAPIView,
+    DocumentExtractJobAPIView,
+)
 from mi_app.views.chatbot.services.kb_api import KBItemAPIView
 from mi_app.views.orbita.form_chat_views import (
     FormChatPageView,
@@ -34,6 +38,9 @@ from mi_app.views.orbita.form_chat_views import (
     FormChatSessionDetailAPI,
     CandidateChatSessionAPI,
 )
+from mi_app.views.orbita.form_upload_views import FormUploadStartAPI, FormUploadChunkAPI
+from mi_app.views.orbita.live_views import OrbitaEventStreamView
+from mi_app.views.orbita.telegram_views import TelegramWebhookView
 from mi_app.views.orbita.orbita_views import (
     ATSProductoView,
     ATSPlataformaView,
@@ -134,6 +141,8 @@ urlpatterns = [
     path("orbita/plataforma/dashboard/formularios/<int:pk>/envios/eliminar-todos/", ATSFormSubmissionDeleteAllView.as_view(), name="orbita_form_submission_delete_all"),
     path("orbita/f/<uuid:uuid>/", ATSFormPublicView.as_view(), name="orbita_form_public"),
     path("orbita/f/<uuid:uuid>/gracias/", ATSFormPublicThanksView.as_view(), name="orbita_form_public_thanks"),
+    path("orbita/f/<uuid:uuid>/api/uploads/", FormUploadStartAPI.as_view(), name="orbita_form_upload_start"),
+    path("orbita/f/<uuid:uuid>/api/uploads/<uuid:token>/", FormUploadChunkAPI.as_view(), name="orbita_form_upload_chunk"),
     path("orbita/chat/<uuid:uuid>/", FormChatPageView.as_view(), name="orbita_form_chat"),
     path("orbita/chat/<uuid:uuid>/api/start/", FormChatStartAPI.as_view(), name="orbita_form_chat_start"),
     path("orbita/chat/<uuid:uuid>/api/answer/", FormChatAnswerAPI.as_view(), name="orbita_form_chat_answer"),
@@ -179,6 +188,8 @@ urlpatterns = [
     path("orbita/plataforma/dashboard/notificaciones/", ATSNotificationPanelView.as_view(), name="orbita_notification_panel"),
     path("orbita/plataforma/dashboard/notificaciones/<int:pk>/ir/", ATSNotificationGoView.as_view(), name="orbita_notification_go"),
     path("orbita/plataforma/dashboard/notificaciones/marcar-todas-leidas/", ATSNotificationMarkAllReadView.as_view(), name="orbita_notification_mark_all_read"),
+    path("orbita/plataforma/dashboard/eventos/", OrbitaEventStreamView.as_view(), name="orbita_event_stream"),
+    path("orbita/telegram/webhook/", TelegramWebhookView.as_view(), name="orbita_telegram_webhook"),
     path("orbita/plataforma/administracion/", ATSAdminDashboardView.as_view(), name="orbita_admin_dashboard"),
     path("orbita/plataforma/administracion/cambiar-plan/", ATSAdminChangePlanView.as_view(), name="orbita_admin_change_plan"),
     path("orbita/plataforma/administracion/modulos/", ATSAdminUpdateModulesView.as_view(), name="orbita_admin_update_modules"),
@@ -193,6 +204,8 @@ urlpatterns = [
     path("api/chat/", ChatAPIView.as_view(), name="api_chat"),
     path("api/kb/item/<str:item_id>/", KBItemAPIView.as_view(), name="api_kb_item"),
     path("api/documents/extract/", DocumentExtractAPIView.as_view(), name="api_documents_extract"),
+    path("api/documents/extract/batch/", DocumentExtractBatchAPIView.as_view(), name="api_documents_extract_batch"),
+    path("api/documents/jobs/<uuid:job_id>/", DocumentExtractJobAPIView.as_view(), name="api_documents_job"),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)